@@ -0,0 +1,31 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+Each script is run directly (``python benchmarks/bench_<name>.py``) against
+whatever spasm is importable, and prints one line per measurement.
+"""
+
+import timeit
+
+
+def best_of(fn, *, number=10, repeat=5):
+    """Best per-call time of ``fn()`` in seconds, over ``repeat`` runs of ``number`` calls."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def to_code_uncached(bc):
+    """``bc.to_code()``, made to re-encode by touching an instruction first.
+
+    ``to_code()`` returns its previous result while nothing has changed, so
+    timing it in a loop would otherwise only time the cache lookup.
+    """
+    first = bc.instrs[0]
+    first.lineno = first.lineno
+    return bc.to_code()
+
+
+def report(label, seconds, per=None):
+    """Print one measurement; with ``per``, also the time per item of ``per`` items."""
+    line = f"{label:<48} {seconds * 1e3:10.3f} ms"
+    if per:
+        line += f" {seconds / per * 1e9:10.1f} ns/item"
+    print(line)
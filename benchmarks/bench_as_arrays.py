@@ -0,0 +1,84 @@
+"""Scanning instructions: a loop over bc.instrs versus Bytecode.as_arrays().
+
+The scan is the one analysis passes do most: find every LOAD_GLOBAL and the
+line it is on. Timed on the code objects of a few large stdlib modules, from
+an already decoded Bytecode, both with the usual ``dis.opname`` lookup per
+instruction and over the ``op``/``lineno`` columns, and, if NumPy is
+installed, vectorized over the columns wrapped with ``np.frombuffer``.
+"""
+
+import dis
+import importlib.util
+import types
+
+from _util import best_of, report
+
+from spasm import _core
+
+MODULES = ("typing", "argparse", "inspect", "ast", "dataclasses", "pathlib")
+LOAD_GLOBAL = dis.opmap["LOAD_GLOBAL"]
+
+
+def code_objects(co):
+    yield co
+    for c in co.co_consts:
+        if isinstance(c, types.CodeType):
+            yield from code_objects(c)
+
+
+def load_codes():
+    for name in MODULES:
+        path = importlib.util.find_spec(name).origin
+        with open(path, "rb") as f:
+            yield from code_objects(compile(f.read(), path, "exec"))
+
+
+def scan_instrs(bcs):
+    return [
+        [(i, instr.lineno) for i, instr in enumerate(bc.instrs) if dis.opname[instr.op] == "LOAD_GLOBAL"] for bc in bcs
+    ]
+
+
+def scan_arrays(bcs):
+    out = []
+    for bc in bcs:
+        cols = bc.as_arrays()
+        lineno = cols.lineno
+        out.append([(i, lineno[i]) for i, op in enumerate(cols.op) if op == LOAD_GLOBAL])
+    return out
+
+
+def scan_numpy(bcs):
+    import numpy as np
+
+    out = []
+    for bc in bcs:
+        cols = bc.as_arrays()
+        idx = np.flatnonzero(np.frombuffer(cols.op, dtype=np.uint8) == LOAD_GLOBAL)
+        lineno = np.frombuffer(cols.lineno, dtype=np.int32)[idx]
+        out.append(list(zip(idx.tolist(), lineno.tolist())))
+    return out
+
+
+def main():
+    bcs = [_core.Bytecode.from_code(co) for co in load_codes()]
+    n = sum(len(bc.instrs) for bc in bcs)
+    assert scan_instrs(bcs) == scan_arrays(bcs)
+    print(f"{len(bcs)} code objects, {n} instrs")
+    report("loop over instrs, dis.opname", best_of(lambda: scan_instrs(bcs), number=3), per=n)
+    report("as_arrays()", best_of(lambda: scan_arrays(bcs), number=3), per=n)
+
+    lazy = [_core.Bytecode.from_code(co, lazy=True) for co in load_codes()]
+    report("as_arrays(), lazy decode", best_of(lambda: scan_arrays(lazy), number=3), per=n)
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        print("numpy not installed; skipping the vectorized scan")
+        return
+    assert scan_numpy(bcs) == scan_instrs(bcs)
+    report("as_arrays() + numpy", best_of(lambda: scan_numpy(bcs), number=3), per=n)
+
+
+if __name__ == "__main__":
+    main()
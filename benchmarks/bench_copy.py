@@ -0,0 +1,99 @@
+"""Cloning one callee for many call sites: decode per site vs copy_into().
+
+An inliner needs a fresh copy of the callee's body, with labels that don't
+collide with the caller's, for every site it splices into. Decoding the
+callee again at each site and renumbering its labels through a dict in
+Python is what inline() used to do; decoding it once and taking a
+Bytecode.copy_into(caller) per site clones the Instr and ExcEntry objects
+and renumbers labels in one native pass. Also times inline() itself on a
+caller with many sites calling one callee.
+"""
+
+from _util import best_of, report
+
+from spasm import _core
+from spasm.inliner import inline
+
+Bytecode = _core.Bytecode
+Instr = _core.Instr
+Label = _core.Label
+
+SITES = 200
+
+
+def callee(x):
+    total = 0
+    for i in range(x):
+        if i % 3:
+            total += i
+        elif i % 5:
+            total -= 1
+        else:
+            total *= 2
+    while total > 100:
+        total //= 2
+    return total
+
+
+def clone_by_decode(code, caller_bc):
+    bc = Bytecode.from_code(code)
+    label_map = {}
+
+    def mapped(label):
+        if label not in label_map:
+            label_map[label] = caller_bc.new_label()
+        return label_map[label]
+
+    out = []
+    for instr in bc.instrs:
+        arg = mapped(instr.arg) if isinstance(instr.arg, Label) else instr.arg
+        new = Instr(instr.op, arg, lineno=instr.lineno)
+        new.labels = [mapped(label) for label in instr.labels]
+        out.append(new)
+    return out
+
+
+def clone_by_copy(callee_bc, caller_bc):
+    return callee_bc.copy_into(caller_bc)[0]
+
+
+def caller_source(sites):
+    body = "\n".join(f"    x = callee(x) + {i}" for i in range(sites))
+    return f"def caller(x):\n{body}\n    return x\n"
+
+
+def main():
+    code = callee.__code__
+    n = len(Bytecode.from_code(code).instrs) * SITES
+    print(f"{SITES} clones of a {n // SITES}-instruction callee")
+
+    def per_site_decode():
+        caller_bc = Bytecode()
+        for _ in range(SITES):
+            clone_by_decode(code, caller_bc)
+
+    def decode_once():
+        caller_bc = Bytecode()
+        callee_bc = Bytecode.from_code(code)
+        for _ in range(SITES):
+            clone_by_copy(callee_bc, caller_bc)
+
+    report("from_code() + python relabel per site", best_of(per_site_decode, number=1), per=n)
+    report("from_code() once + copy_into() per site", best_of(decode_once, number=1), per=n)
+
+    src = caller_source(SITES)
+
+    def inline_caller():
+        ns = {"callee": callee}
+        exec(compile(src, "<caller>", "exec"), ns)  # noqa: S102
+        inline(ns["caller"])
+
+    def compile_only():
+        exec(compile(src, "<caller>", "exec"), {"callee": callee})  # noqa: S102
+
+    report(f"compile caller with {SITES} sites", best_of(compile_only, number=1))
+    report(f"compile + inline() caller with {SITES} sites", best_of(inline_caller, number=1))
+
+
+if __name__ == "__main__":
+    main()
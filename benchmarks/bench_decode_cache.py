@@ -0,0 +1,49 @@
+"""Decoding the same code objects again: from_code() vs a DecodeCache hit.
+
+Decodes the functions of a few stdlib modules repeatedly, the way an import
+hook or profiler revisiting the same code would. A cache hit hands out a copy
+of the cached decode: an eager copy still creates every Instr, a lazy copy
+only clones the decoded entries. Also reports the cache's estimated size.
+"""
+
+import importlib
+import inspect
+
+from _util import best_of, report
+
+from spasm._core import Bytecode
+from spasm.cache import DecodeCache
+
+MODULES = ("typing", "argparse", "inspect", "ast", "dataclasses", "pathlib", "pydoc", "tarfile")
+
+
+def function_codes():
+    codes = []
+    for name in MODULES:
+        for _, obj in inspect.getmembers(importlib.import_module(name)):
+            if inspect.isfunction(obj):
+                codes.append(obj.__code__)
+            elif inspect.isclass(obj):
+                codes.extend(f.__code__ for _, f in inspect.getmembers(obj, inspect.isfunction))
+    return list({id(co): co for co in codes}.values())
+
+
+def main():
+    codes = function_codes()
+    n = sum(len(Bytecode.from_code(co).instrs) for co in codes)
+    print(f"{len(codes)} functions, {n} instrs")
+
+    cache = DecodeCache()
+    for co in codes:
+        cache.from_code(co)
+
+    report("from_code()", best_of(lambda: [Bytecode.from_code(co) for co in codes], number=1), per=n)
+    report("from_code(lazy=True)", best_of(lambda: [Bytecode.from_code(co, lazy=True) for co in codes], number=1), per=n)
+    report("cache hit", best_of(lambda: [cache.from_code(co) for co in codes], number=1), per=n)
+    report("cache hit, lazy", best_of(lambda: [cache.from_code(co, lazy=True) for co in codes], number=1), per=n)
+
+    stats = cache.stats()
+    print(f"estimated size {stats.size / 1024:.0f} KiB for {stats.entries} entries ({stats.size / n:.0f} B/instr)")
+
+if __name__ == "__main__":
+    main()
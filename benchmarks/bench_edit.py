@@ -0,0 +1,126 @@
+"""Per-line hook injection: list.insert() in place, a Python rebuild, and edit().
+
+Inserts a four-instruction hook before the first instruction of every source
+line, moving jump targets onto the hook, the way a line tracer does. Done in
+place with list.insert() each insertion shifts the rest of the list, so the
+whole pass is quadratic; rebuilding a new list in Python is linear but
+allocates and copies label lists for every instruction; Bytecode.edit()
+records the insertions and applies them in one native pass. Timed on a
+generated function of a few thousand lines, and on the module bodies of a few
+big stdlib modules. Each run decodes afresh; the decode alone is reported
+first.
+"""
+
+import importlib.util
+
+from _util import best_of, report
+
+from spasm import _core
+
+Instr = _core.Instr
+
+MODULES = ("typing", "argparse", "inspect", "ast", "dataclasses", "pathlib", "pydoc", "tarfile")
+
+
+def big_function(lines):
+    body = "\n".join(f"    x = x + {i}\n    if x > {i}:\n        x -= 1" for i in range(lines))
+    ns = {}
+    exec(compile(f"def big(x):\n{body}\n    return x\n", "<big>", "exec"), ns)  # noqa: S102
+    return ns["big"].__code__
+
+
+def module_code(name):
+    path = importlib.util.find_spec(name).origin
+    with open(path, "rb") as f:
+        return compile(f.read(), path, "exec")
+
+
+def hook(lineno):
+    return [
+        Instr("NOP", lineno=lineno),
+        Instr("NOP", lineno=lineno),
+        Instr("NOP", lineno=lineno),
+        Instr("NOP", lineno=lineno),
+    ]
+
+
+def line_starts(bc):
+    out = []
+    last = None
+    for i, instr in enumerate(bc.instrs):
+        if instr.lineno >= 0 and instr.lineno != last:
+            out.append(i)
+            last = instr.lineno
+    return out
+
+
+def with_insert(bc):
+    instrs = bc.instrs
+    for i in reversed(line_starts(bc)):
+        instr = instrs[i]
+        new = hook(instr.lineno)
+        new[0].labels = instr.labels
+        instr.labels = []
+        instrs[i:i] = new
+
+
+def with_rebuild(bc):
+    starts = set(line_starts(bc))
+    out = []
+    for i, instr in enumerate(bc.instrs):
+        if i in starts:
+            new = hook(instr.lineno)
+            new[0].labels = instr.labels
+            instr.labels = []
+            out.extend(new)
+        out.append(instr)
+    bc.instrs = out
+
+
+def with_edit(bc):
+    instrs = bc.instrs
+    with bc.edit() as edit:
+        for i in line_starts(bc):
+            new = hook(instrs[i].lineno)
+            edit.insert_before(i, new)
+            edit.move_labels(i, new[0])
+
+
+def bench(title, codes):
+    n = sum(len(_core.Bytecode.from_code(co).instrs) for co in codes)
+    print(f"{title}: {n} instrs")
+
+    results = []
+    for fn in (with_insert, with_rebuild, with_edit):
+        bcs = [_core.Bytecode.from_code(co) for co in codes]
+        for bc in bcs:
+            fn(bc)
+        results.append([[instr.op for instr in bc.instrs] for bc in bcs])
+    assert results[0] == results[1] == results[2]
+
+    def decode_only():
+        for co in codes:
+            _core.Bytecode.from_code(co)
+
+    report("from_code() alone", best_of(decode_only, number=1), per=n)
+    for label, fn in (
+        ("list.insert() in place", with_insert),
+        ("python rebuild", with_rebuild),
+        ("edit()", with_edit),
+    ):
+
+        def run(fn=fn):
+            for co in codes:
+                fn(_core.Bytecode.from_code(co))
+
+        report(label, best_of(run, number=1), per=n)
+
+
+def main():
+    bench("generated 6000-line function", [big_function(2000)])
+    bench("generated 24000-line function", [big_function(8000)])
+    bench("stdlib module bodies", [module_code(name) for name in MODULES])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Finding call sites: the inliner's Python matcher versus Bytecode.find_pattern().
+
+The scan is the one the inliner runs over every function it is applied to:
+LOAD_GLOBAL, a run of simple argument pushes with nothing jumping into it,
+then the call. Times the Python loop the inliner used before, and the same
+scan as one Pattern matched natively, over the code objects of a few large
+stdlib modules.
+"""
+
+import dis
+import importlib.util
+import types
+
+from _util import best_of, report
+
+from spasm import _core
+from spasm.inliner import _CALL_SITE_PATTERN
+from spasm.inliner import _CALL_TERMINATOR
+from spasm.inliner import _PAIRED_ARG_PUSH_OPS
+from spasm.inliner import _SIMPLE_ARG_OPS
+
+MODULES = ("typing", "argparse", "inspect", "ast", "dataclasses", "pathlib")
+
+
+def code_objects(co):
+    yield co
+    for c in co.co_consts:
+        if isinstance(c, types.CodeType):
+            yield from code_objects(c)
+
+
+def load_codes():
+    for name in MODULES:
+        path = importlib.util.find_spec(name).origin
+        with open(path, "rb") as f:
+            yield from code_objects(compile(f.read(), path, "exec"))
+
+
+def match_python(instrs, start):
+    idx = start + 1
+    while idx < len(instrs) and dis.opname[instrs[idx].op] != _CALL_TERMINATOR[0]:
+        instr = instrs[idx]
+        op_name = dis.opname[instr.op]
+        if instr.labels or (op_name not in _SIMPLE_ARG_OPS and op_name not in _PAIRED_ARG_PUSH_OPS):
+            return None
+        idx += 1
+    end = idx
+    for term_name in _CALL_TERMINATOR:
+        if end >= len(instrs) or dis.opname[instrs[end].op] != term_name or instrs[end].labels:
+            return None
+        end += 1
+    return end
+
+
+def scan_python(bcs):
+    out = []
+    for bc in bcs:
+        instrs = bc.instrs
+        spans = []
+        i = 0
+        while i < len(instrs):
+            if dis.opname[instrs[i].op] == "LOAD_GLOBAL":
+                end = match_python(instrs, i)
+                if end is not None:
+                    spans.append((i, end))
+                    i = end
+                    continue
+            i += 1
+        out.append(spans)
+    return out
+
+
+def scan_native(bcs):
+    return [[(m.start, m.end) for m in bc.find_pattern(_CALL_SITE_PATTERN)] for bc in bcs]
+
+
+def main():
+    bcs = [_core.Bytecode.from_code(co) for co in load_codes()]
+    n = sum(len(bc.instrs) for bc in bcs)
+    assert scan_python(bcs) == scan_native(bcs)
+    print(f"{len(bcs)} code objects, {n} instrs, {sum(map(len, scan_native(bcs)))} call sites")
+    report("python matcher", best_of(lambda: scan_python(bcs), number=3), per=n)
+    report("find_pattern()", best_of(lambda: scan_native(bcs), number=3), per=n)
+
+    lazy = [_core.Bytecode.from_code(co, lazy=True) for co in load_codes()]
+    report("find_pattern(), lazy decode", best_of(lambda: scan_native(lazy), number=3), per=n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Memory retained per instruction by decoding a large stdlib module eagerly.
+
+Each module is compiled and decoded with ``recursive=True``, so every nested
+function is decoded too, and ``from_code`` makes an ``Instr`` object for every
+instruction. Reports the Python heap (tracemalloc) and the number of live
+Python allocations the decoded Bytecode holds, per instruction, and how long
+the decode takes. Nothing is read from the instructions before the
+measurement.
+"""
+
+import importlib.util
+import sys
+import tracemalloc
+
+from _util import best_of, report
+
+from spasm import _core
+
+MODULES = ("_pydecimal", "typing", "argparse")
+
+
+def module_code(name):
+    path = importlib.util.find_spec(name).origin
+    with open(path, "rb") as f:
+        return compile(f.read(), path, "exec")
+
+
+def count_instrs(bc):
+    n = len(bc.instrs)
+    for const in bc.consts:
+        if isinstance(const, _core.Bytecode):
+            n += count_instrs(const)
+    return n
+
+
+def main():
+    for name in MODULES:
+        co = module_code(name)
+        took = best_of(lambda: _core.Bytecode.from_code(co, recursive=True), number=3)
+
+        tracemalloc.start()
+        blocks = sys.getallocatedblocks()
+        bc = _core.Bytecode.from_code(co, recursive=True)
+        heap, _ = tracemalloc.get_traced_memory()
+        blocks = sys.getallocatedblocks() - blocks
+        tracemalloc.stop()
+
+        n = count_instrs(bc)
+        report(f"{name}: from_code(recursive=True)", took, n)
+        print(f"{'  Python heap retained':<48} {heap / 2**10:10.1f} KiB {heap / n:10.1f} B/instr")
+        print(f"{'  Python allocations retained':<48} {blocks:10d} {blocks / n:10.2f} /instr")
+        del bc
+
+
+if __name__ == "__main__":
+    main()
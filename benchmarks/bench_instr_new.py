@@ -0,0 +1,38 @@
+"""Constructing Instr and Label objects one at a time, a million of each.
+
+The assembler, the inliner and instrumentation passes build instructions one
+call at a time, nearly always naming the opcode with a string literal. Times
+``Instr("LOAD_FAST", "x")``, the same with an int opcode and with a keyword,
+and ``Label(n)``. The calls are made from a list comprehension, so the loop
+itself is part of each figure; the empty loop is reported first for scale.
+"""
+
+import dis
+
+from _util import best_of, report
+
+from spasm import _core
+
+Instr = _core.Instr
+Label = _core.Label
+
+N = 1_000_000
+LOAD_FAST = dis.opmap["LOAD_FAST"]
+
+
+def main():
+    rng = range(N)
+    cases = [
+        ("empty loop", lambda: [None for _ in rng]),
+        ('Instr("LOAD_FAST", "x")', lambda: [Instr("LOAD_FAST", "x") for _ in rng]),
+        ('Instr(LOAD_FAST, "x")', lambda: [Instr(LOAD_FAST, "x") for _ in rng]),
+        ('Instr("LOAD_FAST", "x", lineno=3)', lambda: [Instr("LOAD_FAST", "x", lineno=3) for _ in rng]),
+        ("Label(n)", lambda: [Label(n) for n in rng]),
+    ]
+    for label, fn in cases:
+        took = best_of(fn, number=1, repeat=5)
+        report(f"{label} x {N}", took, N)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Memory retained by decoding every code object in the standard library.
+
+The same corpus ``tests/core/test_corpus.py`` runs over, decoded eagerly with
+every Bytecode kept alive. Reports the Python heap (tracemalloc) and the
+number of live Python allocations, plus how many Label references the decoded
+instructions and exception entries hold and how many distinct Label objects
+those are.
+"""
+
+import sys
+import sysconfig
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+from spasm import _core
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "tests" / "core"))
+
+from test_corpus import compile_file  # noqa: E402
+from test_corpus import iter_code_objects  # noqa: E402
+
+
+def corpus_code_objects(root):
+    for path in sorted(root.rglob("*.py")):
+        if "site-packages" in path.parts:
+            continue
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            top = compile_file(path)
+        if top is not None:
+            yield from iter_code_objects(top)
+
+
+def main():
+    root = Path(sysconfig.get_paths()["stdlib"])
+    codes = list(corpus_code_objects(root))
+
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    decoded = [_core.Bytecode.from_code(co) for co in codes]
+    elapsed = time.perf_counter() - start
+    heap, _ = tracemalloc.get_traced_memory()
+    blocks = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+
+    refs = 0
+    objects = set()
+    for bc in decoded:
+        for instr in bc.instrs:
+            for lbl in (instr.arg, *instr.labels):
+                if isinstance(lbl, _core.Label):
+                    refs += 1
+                    objects.add(id(lbl))
+        for entry in bc.exc_entries:
+            for lbl in (entry.start, entry.stop, entry.handler):
+                refs += 1
+                objects.add(id(lbl))
+
+    n = sum(len(bc.instrs) for bc in decoded)
+    print(f"{root}: {len(codes)} code objects, {n} instrs")
+    print(f"{'from_code, all':<48} {elapsed * 1e3:10.1f} ms")
+    print(f"{'Python heap retained':<48} {heap / 2**20:10.1f} MiB {heap / n:10.1f} B/instr")
+    print(f"{'Python allocations retained':<48} {blocks:10d}")
+    print(f"{'Label references':<48} {refs:10d}")
+    print(f"{'distinct Label objects':<48} {len(objects):10d}")
+
+
+if __name__ == "__main__":
+    main()
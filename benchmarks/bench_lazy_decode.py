@@ -0,0 +1,86 @@
+"""from_code on a large function, eager versus lazy (``lazy=True``).
+
+A lazy decode keeps the instructions in C++ and only creates an Instr for an
+entry when it is accessed. This times both decodes, plus a typical lazy pass
+that only counts LOAD_GLOBALs, and reports how much each decoded Bytecode
+grows the resident set by. The decoded C++ instructions are invisible to
+tracemalloc, so that is measured in a fresh interpreter per decode (Linux
+only, via /proc/self/statm), which is handed the code object already
+compiled: memory freed by compiling it would otherwise be reused by the
+eager decode's Instrs and hide them.
+"""
+
+import dis
+import marshal
+import os
+import subprocess
+import sys
+
+from _util import best_of, report
+
+from spasm import _core
+
+N_STATEMENTS = 20_000
+
+
+def make_function(n):
+    lines = ["def f(x, y):"]
+    lines += [f"    x = g(x, y[{i}], {i}) if x else y.attr{i % 50}" for i in range(n)]
+    lines.append("    return x")
+    ns = {}
+    exec("\n".join(lines), ns)  # noqa: S102
+    return ns["f"]
+
+
+RSS_SCRIPT = """
+import ctypes, marshal, os, sys
+from spasm import _core
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+co = marshal.loads(sys.stdin.buffer.read())
+# Hand freed memory back to the OS on either side, so that neither what
+# loading the function freed nor the decode's own scratch space counts.
+trim = ctypes.CDLL(None).malloc_trim
+trim(0)
+before = rss()
+bc = _core.Bytecode.from_code(co, lazy=sys.argv[1] == "lazy")
+trim(0)
+print(rss() - before)
+"""
+
+
+def retained(co, mode):
+    """Resident-set growth, in bytes, from decoding `co` in a fresh interpreter."""
+    if not os.path.exists("/proc/self/statm"):
+        return None
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    out = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", RSS_SCRIPT, mode], input=marshal.dumps(co), env=env, capture_output=True, check=True
+    )
+    return int(out.stdout)
+
+
+def main():
+    co = make_function(N_STATEMENTS).__code__
+    load_global = dis.opmap["LOAD_GLOBAL"]
+
+    def lazy_scan():
+        bc = _core.Bytecode.from_code(co, lazy=True)
+        return bc.instrs.opcodes().count(load_global)
+
+    n = len(_core.Bytecode.from_code(co).instrs)
+    print(f"{n} instrs")
+    report("from_code", best_of(lambda: _core.Bytecode.from_code(co), number=3), per=n)
+    report("from_code(lazy=True)", best_of(lambda: _core.Bytecode.from_code(co, lazy=True), number=3), per=n)
+    report("from_code(lazy=True) + LOAD_GLOBAL count", best_of(lazy_scan, number=3), per=n)
+    for mode in ("eager", "lazy"):
+        size = retained(co, mode)
+        if size is not None:
+            print(f"{'resident growth, ' + mode:<48} {size / 2**20:10.1f} MiB {size / n:10.1f} B/instr")
+
+
+if __name__ == "__main__":
+    main()
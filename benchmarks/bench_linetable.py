@@ -0,0 +1,183 @@
+"""Line table size: exact-match runs vs runs of identical encoded entries.
+
+The 3.11+ location table gives each entry up to 8 code units that share one
+location. A location with no column stores only its line, and one with no
+line stores nothing, so positions that differ only in fields their entry
+drops can share an entry. Code from ``inline()`` and from instrumentation
+mixes ``Instr(lineno=n)``, whose end line is unset, with decoded line-only
+instructions whose end line is set, and those used to break runs.
+
+For each workload this prints the bytes of the tables ``to_code()`` emits
+(cross-checked against a size model of the encoder) and what the same
+instructions took when runs needed all four fields to match.
+"""
+
+import dis
+import importlib.util
+import sys
+
+from spasm import _core
+from spasm._asm import Assembly
+from spasm.inliner import inline
+
+Bytecode = _core.Bytecode
+Instr = _core.Instr
+
+MODULES = ("typing", "argparse", "inspect", "ast", "dataclasses", "pathlib", "pydoc", "tarfile")
+
+
+def _uvarint_len(val):
+    n = 1
+    while val >= 0x40:
+        val >>= 6
+        n += 1
+    return n
+
+
+def _svarint_len(val):
+    return _uvarint_len((-val << 1) | 1 if val < 0 else val << 1)
+
+
+def _entry_size(loc, cur):
+    lineno, end_lineno, col, ecol = loc
+    if lineno < 0:
+        return 1, cur
+    if col < 0:
+        return 1 + _svarint_len(lineno - cur), lineno
+    delta = lineno - cur
+    if lineno == end_lineno:
+        if delta == 0 and col < 80 and 0 <= ecol - col < 16:
+            return 2, cur
+        if 0 <= delta <= 2 and 0 <= col < 128 and 0 <= ecol < 128:
+            return 3, lineno
+        return 1 + _svarint_len(delta) + 1 + _uvarint_len(col + 1) + _uvarint_len(ecol + 1), lineno
+    # The end-line delta was written as an unsigned 32-bit value.
+    end_delta = (end_lineno - lineno) & 0xFFFFFFFF
+    return 1 + _svarint_len(delta) + _uvarint_len(end_delta) + _uvarint_len(col + 1) + _uvarint_len(ecol + 1), lineno
+
+
+def _encoded(loc):
+    lineno, end_lineno, col, ecol = loc
+    if lineno < 0:
+        return (-1, -1, -1, -1)
+    if col < 0:
+        return (lineno, lineno, -1, -1)
+    return (lineno, max(end_lineno, lineno), col, ecol)
+
+
+def table_size(units, firstlineno, key):
+    """Size of the table for per-code-unit locations, runs split where ``key`` differs."""
+    size, cur, i = 0, firstlineno, 0
+    while i < len(units):
+        first = key(units[i])
+        run = 1
+        while i + run < len(units) and run < 8 and key(units[i + run]) == first:
+            run += 1
+        n, cur = _entry_size(first if key is _encoded else units[i], cur)
+        size += n
+        i += run
+    return size
+
+
+def unit_locations(bc, code):
+    """The location of every code unit of ``code``, which ``bc`` encoded to."""
+    locs = [(i.lineno, i.end_lineno, i.col_offset, i.end_col) for i in bc.instrs]
+    starts = []
+    group = None
+    for instr in dis.get_instructions(code):
+        if instr.opname == "EXTENDED_ARG":
+            group = instr.offset if group is None else group
+            continue
+        starts.append(instr.offset if group is None else group)
+        group = None
+    starts.append(len(code.co_code))
+    units = []
+    for k, loc in enumerate(locs):
+        units.extend([loc] * ((starts[k + 1] - starts[k]) // 2))
+    return units
+
+
+def measure(title, bcs):
+    before = after = 0
+    for bc in bcs:
+        code = bc.to_code()
+        units = unit_locations(bc, code)
+        new = table_size(units, bc.firstlineno, _encoded)
+        assert new == len(code.co_linetable), (bc.name, new, len(code.co_linetable))
+        after += new
+        before += table_size(units, bc.firstlineno, lambda loc: loc)
+    saved = before - after
+    print(f"{title:<40} {before:8d} B -> {after:8d} B  saved {saved:7d} B ({saved / max(before, 1):.1%})")
+
+
+def module_code(name):
+    path = importlib.util.find_spec(name).origin
+    with open(path, "rb") as f:
+        return compile(f.read(), path, "exec")
+
+
+def functions(code):
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            yield const
+            yield from functions(const)
+
+
+def with_hooks(bcs):
+    # A hook before every line, as a line tracer or coverage tool inserts.
+    for bc in bcs:
+        instrs = bc.instrs
+        with bc.edit() as edit:
+            last = None
+            for i, instr in enumerate(instrs):
+                if i and instr.lineno >= 0 and instr.lineno != last:
+                    hook = [Instr("NOP", lineno=instr.lineno), Instr("NOP", lineno=instr.lineno)]
+                    edit.insert_before(i, hook)
+                    edit.move_labels(i, hook[0])
+                last = instr.lineno
+    return bcs
+
+
+def stdlib():
+    return [Bytecode.from_code(co) for name in MODULES for co in functions(module_code(name))]
+
+
+def callee(a, b):
+    c = a * b
+    d = c + a
+    return d - b
+
+
+def inlined(n_callers, n_sites):
+    out = []
+    body = "\n".join(f"    x = callee(x, {i})" for i in range(n_sites))
+    for k in range(n_callers):
+        ns = {"callee": callee}
+        exec(compile(f"def caller_{k}(x):\n{body}\n    return x\n", "<gen>", "exec"), ns)  # noqa: S102
+        func = inline(ns[f"caller_{k}"])
+        out.append(Bytecode.from_code(func.__code__))
+    return out
+
+
+def assembled(n_funcs, n_lines):
+    out = []
+    src = "\n".join(f"    load_fast $x\n    load_const {i}\n    binary_op 0\n    store_fast $x" for i in range(n_lines))
+    for k in range(n_funcs):
+        asm = Assembly(name=f"f{k}", filename="<asm>", lineno=1, is_function=True, argnames=["x"])
+        asm.parse(f"\n{src}\n    load_fast $x\n    return_value\n")
+        out.append(Bytecode.from_code(asm.compile()))
+    return out
+
+
+def main():
+    if sys.version_info < (3, 11):
+        print("the 3.10 lnotab has no column info to coalesce")
+        return
+    measure("stdlib functions, as decoded", stdlib())
+    measure("stdlib functions, a hook per line", with_hooks(stdlib()))
+    measure("inline(): 20 callers x 50 sites", inlined(20, 50))
+    measure("assembled: 20 functions x 200 lines", assembled(20, 200))
+    measure("assembled, a hook per line", with_hooks(assembled(20, 200)))
+
+if __name__ == "__main__":
+    main()
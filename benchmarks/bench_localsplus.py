@@ -0,0 +1,43 @@
+"""from_code/to_code on a function with hundreds of locals and cells.
+
+Every variable instruction (LOAD_FAST, STORE_DEREF, LOAD_CLOSURE, ...) has to
+map between a name and its localsplus slot. This exercises that mapping on a
+closure-heavy function where the slot tables are large.
+"""
+
+import sys
+
+from _util import best_of, report, to_code_uncached
+
+from spasm import _core
+
+N_LOCALS = 400
+N_CELLS = 400
+
+
+def make_function(n_locals, n_cells):
+    lines = ["def outer():"]
+    lines += [f"    l{i} = {i}" for i in range(n_locals)]
+    lines += [f"    c{i} = {i}" for i in range(n_cells)]
+    lines.append("    def inner():")
+    lines.append("        return (" + " + ".join(f"c{i}" for i in range(n_cells)) + ")")
+    lines.append("    return inner, " + " + ".join(f"l{i}" for i in range(n_locals)))
+    ns = {}
+    exec("\n".join(lines), ns)  # noqa: S102
+    return ns["outer"]
+
+
+def main():
+    sys.setrecursionlimit(10_000)
+    outer = make_function(N_LOCALS, N_CELLS)
+    co = outer.__code__
+    bc = _core.Bytecode.from_code(co)
+    assert bc.to_code().co_code == co.co_code
+
+    print(f"{len(co.co_varnames)} varnames, {len(co.co_cellvars)} cellvars, {len(bc.instrs)} instrs")
+    report("from_code", best_of(lambda: _core.Bytecode.from_code(co)))
+    report("to_code", best_of(lambda: to_code_uncached(bc)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""What spasm.optimize gains on inlined code, and what it costs to run.
+
+``scaled`` calls two small functions with constant arguments, which
+``spasm.inline`` splices in. The constants then sit in front of comparisons
+and branches that ``optimize()`` resolves. Times a loop over the caller as
+written, inlined, and inlined and then optimized. Then times ``optimize()``
+over a whole large stdlib module, which the compiler has already folded, so
+that time is mostly the cost of looking.
+"""
+
+import importlib.util
+
+from _util import best_of, report
+
+import spasm
+from spasm import _core
+from spasm.optimize import optimize
+
+MODULE = "typing"
+N = 100_000
+
+
+def clamp(x, low, high):
+    if x < low:
+        return low
+    if x > high:
+        return high
+    return x
+
+
+def sign(x):
+    if x > 0:
+        return 1
+    if x < 0:
+        return -1
+    return 0
+
+
+def scaled(n):
+    total = 0
+    for i in range(n):
+        total += i * clamp(300, 0, 255) * sign(-7)
+    return total
+
+
+def module_code(name):
+    path = importlib.util.find_spec(name).origin
+    with open(path, "rb") as f:
+        return compile(f.read(), path, "exec")
+
+
+def main():
+    plain = scaled
+    inlined = spasm.inline(type(scaled)(scaled.__code__, globals()))
+    optimized = type(scaled)(inlined.__code__, globals())
+    optimized.__code__ = optimize(_core.Bytecode.from_code(optimized.__code__)).to_code()
+    assert plain(10) == inlined(10) == optimized(10)
+
+    for label, fn in (("as written", plain), ("inline", inlined), ("inline + optimize", optimized)):
+        report(f"{label}, {N} iterations", best_of(lambda fn=fn: fn(N), number=1), per=N)
+
+    co = module_code(MODULE)
+    report(
+        f"{MODULE}: from_code(recursive=True) + optimize()",
+        best_of(lambda: optimize(_core.Bytecode.from_code(co, recursive=True)), number=1),
+    )
+    report(f"{MODULE}: from_code(recursive=True) alone", best_of(lambda: _core.Bytecode.from_code(co, recursive=True)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Whole-module round trip: a Python walk over nested code versus recursive=True.
+
+The walk is what tools did before ``from_code(co, recursive=True)``: decode
+a code object, round-trip every nested code object in its consts the same
+way, swap the results in and encode. Times both over a few large stdlib
+modules, plus a second ``to_code()`` after editing one nested function,
+which with recursive=True only re-encodes the path down to it.
+"""
+
+import importlib.util
+import types
+
+from _util import best_of, report
+
+from spasm import _core
+
+MODULES = ("typing", "argparse", "inspect", "ast", "dataclasses", "pathlib")
+
+
+def module_code(name):
+    path = importlib.util.find_spec(name).origin
+    with open(path, "rb") as f:
+        return compile(f.read(), path, "exec")
+
+
+def walk(co):
+    bc = _core.Bytecode.from_code(co)
+    consts = bc.consts
+    for i, c in enumerate(consts):
+        if isinstance(c, types.CodeType):
+            consts[i] = walk(c)
+    for instr in bc.instrs:
+        if isinstance(instr.arg, types.CodeType):
+            instr.arg = consts[co.co_consts.index(instr.arg)]
+    return bc.to_code()
+
+
+def recursive(co):
+    return _core.Bytecode.from_code(co, recursive=True).to_code()
+
+
+def count(co):
+    return 1 + sum(count(c) for c in co.co_consts if isinstance(c, types.CodeType))
+
+
+def first_leaf(bc):
+    for c in bc.consts:
+        if isinstance(c, _core.Bytecode):
+            return first_leaf(c)
+    return bc
+
+
+def main():
+    codes = [module_code(name) for name in MODULES]
+    n = sum(count(co) for co in codes)
+    print(f"{', '.join(MODULES)}: {n} code objects")
+
+    report("python walk, from_code + to_code", best_of(lambda: [walk(co) for co in codes], number=1), per=n)
+    report("recursive=True, from_code + to_code", best_of(lambda: [recursive(co) for co in codes], number=1), per=n)
+
+    trees = [_core.Bytecode.from_code(co, recursive=True) for co in codes]
+    for bc in trees:
+        bc.to_code()
+
+    def edit_one_leaf():
+        for bc in trees:
+            leaf = first_leaf(bc)
+            leaf.instrs[0].lineno = leaf.instrs[0].lineno
+            bc.to_code()
+
+    report("recursive=True, to_code after one edit", best_of(edit_one_leaf, number=1), per=n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""to_code scaling on large module-level code objects.
+
+Generates modules of increasing size made of nested loops and branches, so
+that a large share of the jumps need EXTENDED_ARG prefixes and the
+relaxation takes several rounds, and reports to_code time per instruction.
+Linear scaling shows up as a flat per-instruction column.
+"""
+
+import dis
+
+from _util import best_of, report, to_code_uncached
+
+from spasm import _core
+
+SIZES = (12_500, 25_000, 50_000, 100_000, 200_000)
+
+
+def make_module(n_instrs):
+    block = [
+        "for i in range(n):",
+        "    if i % 3:",
+        *(f"        t = t + {k}" for k in range(40)),
+        "    elif i % 5:",
+        "        continue",
+        "    else:",
+        "        break",
+        "while t:",
+        "    t = t - 1",
+    ]
+    per_block = len(list(dis.get_instructions(compile("\n".join(block), "<b>", "exec"))))
+    # One enclosing loop, so the outer backward jump spans the whole module.
+    source = ["while n:"]
+    source += ["    " + line for _ in range(max(1, n_instrs // per_block)) for line in block]
+    return compile("\n".join(source), "<bench>", "exec")
+
+
+def main():
+    for n in SIZES:
+        co = make_module(n)
+        bc = _core.Bytecode.from_code(co)
+        count = len(bc.instrs)
+        seconds = best_of(lambda: to_code_uncached(bc), number=1, repeat=5)
+        report(f"to_code, {count:>7} instrs", seconds, per=count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Assembling large code objects serially versus on a pool of threads.
+
+Every function of a few large stdlib modules with at least 256 instructions
+is decoded once; the timing is of re-encoding all of them with ``to_code()``,
+which lets go of the GIL for the layout and encoding of each. Serially that
+runs on this thread; in parallel the same work is spread over a thread pool,
+so the encodings overlap each other and the Python-level bookkeeping around
+them. Without spare cores, or on a free-threaded build where nothing is
+released because nothing is held, the two should come out about even.
+"""
+
+import importlib.util
+import os
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from _util import best_of, report, to_code_uncached
+
+from spasm import _core
+
+MODULES = ("typing", "argparse", "inspect", "ast", "dataclasses", "pathlib",
+           "email.message", "tarfile", "logging", "subprocess", "unittest.case", "decimal")
+MIN_INSTRS = 256
+
+
+def functions(co):
+    for const in co.co_consts:
+        if isinstance(const, types.CodeType):
+            yield const
+            yield from functions(const)
+
+
+def corpus():
+    bcs = []
+    for name in MODULES:
+        path = importlib.util.find_spec(name).origin
+        with open(path, "rb") as f:
+            module = compile(f.read(), path, "exec")
+        for co in functions(module):
+            bc = _core.Bytecode.from_code(co)
+            if len(bc.instrs) >= MIN_INSTRS:
+                bcs.append(bc)
+    return bcs
+
+
+def assemble(bcs):
+    for bc in bcs:
+        to_code_uncached(bc)
+
+
+def main():
+    bcs = corpus()
+    n_instrs = sum(len(bc.instrs) for bc in bcs)
+    print(f"{len(bcs)} functions, {n_instrs} instructions")
+
+    serial = best_of(lambda: assemble(bcs), number=3)
+    report("serial", serial, n_instrs)
+
+    for n in sorted({2, 4, os.cpu_count() or 1}):
+        shares = [bcs[k::n] for k in range(n)]
+        with ThreadPoolExecutor(n) as pool:
+            took = best_of(lambda: list(pool.map(assemble, shares)), number=3)
+        report(f"{n} threads", took, n_instrs)
+        print(f"{'':<48} {serial / took:10.2f}x serial")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Saving and restoring a decoded module: to_bytes()/from_bytes() versus pickle.
+
+A large stdlib module is decoded with ``recursive=True``, as a build step that
+caches its IR would hold it. Reports the size of ``to_bytes()`` against the
+marshalled code object, then times serializing, restoring (eagerly and
+lazily) and a pickle round trip. Decoding the code object afresh with
+``from_code()`` is the baseline restoring competes with; unlike it, a
+restored Bytecode keeps any labels, symbolic arguments and edits it had.
+"""
+
+import marshal
+import pickle
+import sys
+
+from _util import best_of, report
+
+from spasm import _core
+
+Bytecode = _core.Bytecode
+
+MODULE = "typing"
+
+
+def module_code(name):
+    path = sys.modules[name].__file__
+    with open(path, "rb") as f:
+        return compile(f.read(), path, "exec")
+
+
+def main():
+    __import__(MODULE)
+    co = module_code(MODULE)
+    bc = Bytecode.from_code(co, recursive=True)
+    data = bc.to_bytes()
+    print(f"{MODULE}: to_bytes() {len(data)} bytes, marshal of the code object "
+          f"{len(marshal.dumps(co))} bytes")
+
+    cases = [
+        ("from_code(recursive=True)", lambda: Bytecode.from_code(co, recursive=True)),
+        ("from_code(recursive=True, lazy=True)",
+         lambda: Bytecode.from_code(co, recursive=True, lazy=True)),
+        ("to_bytes()", bc.to_bytes),
+        ("from_bytes()", lambda: Bytecode.from_bytes(data, lazy=False)),
+        ("from_bytes(lazy=True)", lambda: Bytecode.from_bytes(data, lazy=True)),
+        ("pickle round trip", lambda: pickle.loads(pickle.dumps(bc, pickle.HIGHEST_PROTOCOL))),
+    ]
+    for label, fn in cases:
+        report(label, best_of(fn, number=5, repeat=5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""co_stacksize computation on deep loop nests.
+
+Each level of a for-loop nest keeps its iterator on the stack and carries a
+long straight-line body, with an inner loop that can break out early. Stack
+depth is propagated over basic blocks, so a body is walked once for its
+summary however many times a higher entry depth reaches it. Reported as
+to_code time per instruction, and against a flat function of the same size.
+"""
+
+from _util import best_of, report, to_code_uncached
+
+from spasm import _core
+
+BODY = 60  # straight-line statements per level
+DEPTHS = (1, 5, 10, 19)  # CPython allows 20 statically nested blocks
+
+
+def make_nest(depth):
+    lines = ["def f(n):", "    t = 0"]
+    for level in range(depth):
+        pad = "    " * (level + 1)
+        lines.append(f"{pad}for i{level} in range(n):")
+        lines += [f"{pad}    t = t + i{level} * {k}" for k in range(BODY)]
+        lines.append(f"{pad}    if t > n:")
+        lines.append(f"{pad}        break")
+    lines.append("    return t")
+    namespace = {}
+    exec(compile("\n".join(lines), "<bench>", "exec"), namespace)
+    return namespace["f"].__code__
+
+
+def make_flat(n_statements):
+    lines = ["def f(n):", "    t = 0"]
+    lines += [f"    t = t + n * {k}" for k in range(n_statements)]
+    lines.append("    return t")
+    namespace = {}
+    exec(compile("\n".join(lines), "<bench>", "exec"), namespace)
+    return namespace["f"].__code__
+
+
+def main():
+    for depth in DEPTHS:
+        for label, co in ((f"nest of {depth:>2}", make_nest(depth)), (f"flat, as {depth:>2}", make_flat(depth * BODY))):
+            bc = _core.Bytecode.from_code(co)
+            count = len(bc.instrs)
+            report(f"to_code, {label}, {count:>5} instrs", best_of(lambda bc=bc: to_code_uncached(bc)), per=count)
+
+
+if __name__ == "__main__":
+    main()
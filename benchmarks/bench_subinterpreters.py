@@ -0,0 +1,115 @@
+"""Assembling a corpus serially versus across isolated sub-interpreters.
+
+Each of a few large stdlib modules is compiled, decoded with
+``recursive=True`` and re-encoded (the whole module, every nested function
+included). Serially that runs in the main interpreter; in parallel the
+modules are dealt out to sub-interpreters with a GIL each (PEP 684), one
+thread driving each, so the work spreads over cores without pickling
+anything through multiprocessing. Interpreter start-up and the import of
+spasm are outside the timing.
+
+Uses ``concurrent.interpreters`` (3.14+), else the private ``_interpreters``
+module on 3.13.
+"""
+
+import os
+import sys
+import threading
+import time
+
+from _util import best_of, report
+
+MODULES = ("typing", "argparse", "inspect", "ast", "dataclasses", "pathlib",
+           "email.message", "tarfile", "logging", "subprocess", "unittest.case", "decimal")
+ROUNDS = 5
+
+SETUP = f"""
+import importlib.util, sys
+sys.path[:] = {sys.path!r}
+from spasm import _core
+
+def module_code(name):
+    path = importlib.util.find_spec(name).origin
+    with open(path, "rb") as f:
+        return compile(f.read(), path, "exec")
+
+def assemble(names):
+    for _ in range({ROUNDS}):
+        for name in names:
+            _core.Bytecode.from_code(module_code(name), recursive=True).to_code()
+"""
+
+try:
+    from concurrent import interpreters
+except ImportError:
+    interpreters = None
+    try:
+        import _interpreters
+    except ImportError:
+        _interpreters = None
+
+
+class Interpreter:
+    """An isolated sub-interpreter that runs scripts, over whichever API there is."""
+
+    def __init__(self):
+        if interpreters is not None:
+            self._interp = interpreters.create()
+        else:
+            self._id = _interpreters.create("isolated")
+
+    def exec(self, script):
+        if interpreters is not None:
+            self._interp.exec(script)
+            return
+        err = _interpreters.run_string(self._id, script)
+        if err is not None:
+            raise RuntimeError(f"sub-interpreter failed: {err.formatted}")
+
+    def close(self):
+        if interpreters is not None:
+            self._interp.close()
+        else:
+            _interpreters.destroy(self._id)
+
+
+def parallel(pool, shares):
+    threads = [threading.Thread(target=interp.exec, args=(f"assemble({share!r})",))
+               for interp, share in zip(pool, shares)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def main():
+    if interpreters is None and (_interpreters is None or sys.version_info < (3, 13)):
+        print("skipped: needs concurrent.interpreters (3.14+) or _interpreters (3.13)")
+        return
+
+    namespace = {}
+    exec(SETUP, namespace)
+    namespace["assemble"](MODULES)  # warm the import and file caches
+    serial = best_of(lambda: namespace["assemble"](MODULES), number=1, repeat=3)
+    report(f"serial, {len(MODULES)} modules x {ROUNDS}", serial)
+
+    for n in sorted({2, 4, os.cpu_count() or 1}):
+        if n > len(MODULES):
+            continue
+        pool = [Interpreter() for _ in range(n)]
+        try:
+            start = time.perf_counter()
+            for interp in pool:
+                interp.exec(SETUP)
+            setup = time.perf_counter() - start
+            shares = [MODULES[k::n] for k in range(n)]
+            took = best_of(lambda: parallel(pool, shares), number=1, repeat=3)
+        finally:
+            for interp in pool:
+                interp.close()
+        report(f"{n} interpreters (start-up {setup * 1e3:.0f} ms)", took)
+        print(f"{'':<48} {serial / took:10.2f}x serial")
+
+
+if __name__ == "__main__":
+    main()
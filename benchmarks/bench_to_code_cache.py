@@ -0,0 +1,62 @@
+"""Repeated to_code() calls on one Bytecode.
+
+Instrumentation tends to patch a function and re-emit it over and over, often
+with nothing changed or with only metadata changed. This times a full encode
+against the cached paths: an unchanged Bytecode, a rename, a new constant,
+and a single edited instruction (which has to re-encode).
+"""
+
+from _util import best_of, report, to_code_uncached
+
+from spasm import _core
+
+N_STATEMENTS = 2_000
+
+
+def make_function(n):
+    lines = ["def f(x):", "    t = 0"]
+    for k in range(n):
+        lines.append(f"    if x > {k}:")
+        lines.append(f"        t = t + x * {k}")
+    lines.append("    return t")
+    ns = {}
+    exec("\n".join(lines), ns)  # noqa: S102
+    return ns["f"]
+
+
+def main():
+    co = make_function(N_STATEMENTS).__code__
+    bc = _core.Bytecode.from_code(co)
+    count = len(bc.instrs)
+    print(f"{count} instrs")
+
+    report("full encode", best_of(lambda: to_code_uncached(bc)), per=count)
+
+    bc.to_code()
+    report("unchanged", best_of(bc.to_code), per=count)
+
+    names = iter(range(10**9))
+
+    def rename():
+        bc.name = f"f{next(names)}"
+        return bc.to_code()
+
+    report("rename", best_of(rename), per=count)
+
+    def add_const():
+        bc.add_const(f"c{next(names)}")
+        return bc.to_code()
+
+    report("add_const", best_of(add_const), per=count)
+
+    middle = bc.instrs[count // 2]
+
+    def edit_one():
+        middle.lineno = middle.lineno
+        return bc.to_code()
+
+    report("one instr edited", best_of(edit_one), per=count)
+
+
+if __name__ == "__main__":
+    main()
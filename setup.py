@@ -228,6 +228,88 @@ with _stackdepth_gen.open("w") as _f:
         _f.write(f"    case {_op}: return true;  // {_name}\n")
     _f.write("    default: return false;\n    }\n}\n")
 
+# ── Generate stack-effect rule table ──────────────────────────────────────────
+# compute_stacksize() needs an opcode's stack effect for every instruction it
+# visits, and calling back into _opcode.stack_effect() for each one (tuple,
+# kwargs dict, PyObject_Call) dominates to_code() on large code objects. Almost
+# every opcode's effect is a simple function of its oparg, so the function is
+# sampled here, per opcode and per jump edge, and fitted to one of:
+#   CONST/LINEAR - base + mul * oparg (BUILD_TUPLE, CALL, RAISE_VARARGS, ...)
+#   MASKED       - depends only on oparg's low 4 bits (MAKE_FUNCTION's flag
+#                  count, LOAD_GLOBAL's NULL bit, FORMAT_VALUE's spec bit, ...)
+#   SMALL        - exact values for oparg 0..15 only (BUILD_SLICE, UNPACK_EX)
+# An opcode that fits none of them, or an oparg outside what its rule was
+# verified for, is left to the interpreter's own function at runtime. Every
+# fit is checked against a few hundred opargs plus a spread of large ones, so
+# a rule is only ever emitted where it reproduces the interpreter exactly.
+#
+# Two rules per opcode: [0] is the effect with `jump` omitted (non-jumps) or
+# the taken edge (jumps); [1] is a jump's fallthrough edge.
+_SAMPLE_OPARGS = [*range(512), 1000, 4095, 4096, 65535, 65536, 1 << 20, (1 << 24) - 1, (1 << 24) + 5]
+_SMALL_OPARGS = range(16)
+
+
+def _sampled_effect(op, oparg, jump):
+    try:
+        if not _has_arg.get(op, False):
+            return _opcode_mod.stack_effect(op) if jump is None else _opcode_mod.stack_effect(op, jump=jump)
+        if jump is None:
+            return _opcode_mod.stack_effect(op, oparg)
+        return _opcode_mod.stack_effect(op, oparg, jump=jump)
+    except (ValueError, SystemError):
+        return None
+
+
+def _fit_stack_effect(op, jump):
+    """Return (kind, base, mul, table) for op's effect on one edge, or None."""
+    if not _has_arg.get(op, False):
+        effect = _sampled_effect(op, 0, jump)
+        return None if effect is None else ("CONST", effect, 0, None)
+
+    samples = {arg: _sampled_effect(op, arg, jump) for arg in _SAMPLE_OPARGS}
+    if any(v is None for v in samples.values()):
+        # Some opargs are rejected outright; only trust the small range, and
+        # only if that range is fully defined.
+        small = [samples[arg] for arg in _SMALL_OPARGS]
+        return None if None in small else ("SMALL", 0, 0, small)
+
+    base, mul = samples[0], samples[1] - samples[0]
+    if all(v == base + mul * arg for arg, v in samples.items()):
+        return ("CONST" if mul == 0 else "LINEAR", base, mul, None)
+
+    small = [samples[arg] for arg in _SMALL_OPARGS]
+    if any(not -128 <= v <= 127 for v in small):
+        return None
+    if all(v == small[arg & 0xF] for arg, v in samples.items()):
+        return ("MASKED", 0, 0, small)
+    return ("SMALL", 0, 0, small)
+
+
+_stack_effect_gen = SRC / "stack_effect_gen.h"
+with _stack_effect_gen.open("w") as _f:
+    _f.write(f"// Auto-generated for CPython {sys.version_info.major}.{sys.version_info.minor}\n")
+    _f.write("enum class EffectKind : uint8_t { FALLBACK=0, CONST=1, LINEAR=2, MASKED=3, SMALL=4 };\n")
+    _f.write("struct StackEffectRule {\n")
+    _f.write("    EffectKind kind;\n    int32_t base;\n    int32_t mul;\n    int8_t table[16];\n};\n")
+    _f.write("static constexpr StackEffectRule STACK_EFFECT_RULES[256][2] = {\n")
+    for _op in range(256):
+        _rules = []
+        if _op in _has_arg:
+            _is_jump = _op in _all_jump_ops
+            _edges = (True, False) if _is_jump else (None, None)
+            _rules = [_fit_stack_effect(_op, _jump) for _jump in _edges]
+        _cells = []
+        for _rule in _rules or [None, None]:
+            if _rule is None:
+                _cells.append("{EffectKind::FALLBACK, 0, 0, {}}")
+                continue
+            _kind, _base, _mul, _table = _rule
+            _tbl = "{" + ", ".join(str(v) for v in _table) + "}" if _table else "{}"
+            _cells.append(f"{{EffectKind::{_kind}, {_base}, {_mul}, {_tbl}}}")
+        _name = next((n for n, o in dis.opmap.items() if o == _op), "")
+        _f.write(f"    {{{_cells[0]}, {_cells[1]}}},  // {_op} {_name}\n")
+    _f.write("};\n")
+
 # Touch the C++ sources so setuptools always recompiles after header regeneration.
 import os as _os, time as _time
 _now = _time.time()
@@ -243,6 +325,12 @@ if sys.platform == "win32":
 else:
     extra_compile_args = ["-std=c++20", "-O2", "-Wall", "-Wextra"]
 
+# SPASM_DEBUG_STACK_EFFECT=1 builds an extension that cross-checks every
+# stack-effect table lookup against _opcode.stack_effect() (see stackdepth.cpp).
+define_macros = []
+if _os.environ.get("SPASM_DEBUG_STACK_EFFECT"):
+    define_macros.append(("SPASM_DEBUG_STACK_EFFECT", "1"))
+
 ext = Extension(
     "spasm._core",
     # distutils requires paths relative to setup.py, not absolute.
@@ -252,8 +340,11 @@ ext = Extension(
         "linetable.cpp",
         "exctable.cpp",
         "stackdepth.cpp",
+        "tableindex.cpp",
+        "pattern.cpp",
     )],
     include_dirs=[str(SRC.relative_to(ROOT))],
+    define_macros=define_macros,
     extra_compile_args=extra_compile_args,
     language="c++",
 )
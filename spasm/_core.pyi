@@ -7,6 +7,9 @@ constructor signatures.
 """
 
 import typing as t
+from array import array
+from collections.abc import Iterable
+from collections.abc import MutableSequence
 from collections.abc import Sequence
 from types import CodeType
 
@@ -17,6 +20,8 @@ class Label:
 
     Allocate one with :meth:`Bytecode.new_label` rather than constructing it
     directly; the id has to be unique within the ``Bytecode`` that uses it.
+    Labels that come out of a ``Bytecode`` are shared: every occurrence of an
+    id is the same object.
     """
 
     def __init__(self, id: int) -> None: ...  # noqa: A002
@@ -46,6 +51,33 @@ class Instr:
     end_col: int
     labels: list[Label]
 
+class InstrList(MutableSequence[Instr]):
+    """The ``instrs`` of a ``Bytecode`` decoded with ``from_code(co, lazy=True)``.
+
+    Backed by the decoded instructions; an entry's ``Instr`` is only created the
+    first time it is accessed, and is the same object on every later access.
+    Slicing, ``+`` and ``*`` give a plain list.
+    """
+
+    __hash__: t.ClassVar[None]  # type: ignore[assignment]
+
+    def __len__(self) -> int: ...
+    @t.overload
+    def __getitem__(self, index: int) -> Instr: ...
+    @t.overload
+    def __getitem__(self, index: slice) -> list[Instr]: ...
+    @t.overload
+    def __setitem__(self, index: int, value: Instr) -> None: ...
+    @t.overload
+    def __setitem__(self, index: slice, value: Iterable[Instr]) -> None: ...
+    def __delitem__(self, index: int | slice) -> None: ...
+    def insert(self, index: int, value: Instr) -> None: ...
+    def __eq__(self, other: object) -> bool: ...
+    def __add__(self, other: list[Instr] | InstrList) -> list[Instr]: ...
+    def __mul__(self, n: t.SupportsIndex) -> list[Instr]: ...
+    def __rmul__(self, n: t.SupportsIndex) -> list[Instr]: ...
+    def opcodes(self) -> bytes: ...
+
 class ExcEntry:
     """One exception table entry (3.11+)."""
 
@@ -64,20 +96,91 @@ class ExcEntry:
     depth: int
     lasti: bool
 
+class InstrArrays(tuple[array[int], array[int], array[int], array[int], array[int]]):
+    """The instruction stream as parallel columns (see Bytecode.as_arrays)."""
+
+    op: array[int]
+    arg: array[int]
+    target: array[int]
+    lineno: array[int]
+    cache: array[int]
+
+class Step:
+    """One element of a Pattern: min_count..max_count instructions with an opcode in ops."""
+
+    def __init__(
+        self,
+        ops: int | str | Iterable[int | str] | None = ...,
+        *,
+        min_count: int = ...,
+        max_count: int | None = ...,
+        unlabeled: bool = ...,
+        capture: str | None = ...,
+    ) -> None: ...
+    @property
+    def ops(self) -> frozenset[int]: ...
+    @property
+    def min_count(self) -> int: ...
+    @property
+    def max_count(self) -> int | None: ...
+    @property
+    def unlabeled(self) -> bool: ...
+    @property
+    def capture(self) -> str | None: ...
+
+class Pattern:
+    """A compiled sequence of Steps (see Bytecode.find_pattern)."""
+
+    def __init__(self, steps: Iterable[Step]) -> None: ...
+    @property
+    def steps(self) -> tuple[Step, ...]: ...
+    @property
+    def captures(self) -> tuple[str, ...]: ...
+
+class PatternMatch(tuple[int, int, dict[str, tuple[int, int]]]):
+    """One match of a Pattern: instrs[start:end], and each capture's span."""
+
+    start: int
+    end: int
+    captures: dict[str, tuple[int, int]]
+
+class Edit:
+    """A batch of edits to Bytecode.instrs, applied together by commit()."""
+
+    def insert_before(self, index: int, instrs: Iterable[Instr]) -> None: ...
+    def insert_after(self, index: int, instrs: Iterable[Instr]) -> None: ...
+    def replace(self, start: int, stop: int, instrs: Iterable[Instr]) -> None: ...
+    def delete(self, start: int, stop: int = ...) -> None: ...
+    def move_labels(self, src: int, dst: int | Instr) -> None: ...
+    def commit(self) -> None: ...
+    def discard(self) -> None: ...
+    def __enter__(self) -> Edit: ...
+    def __exit__(self, *exc_info: object) -> bool: ...
+
 class Bytecode:
     """A mutable, decoded code object."""
 
     def __init__(self, instrs: Sequence[Instr] = ...) -> None: ...
     @staticmethod
-    def from_code(code: CodeType) -> Bytecode: ...
+    def from_code(code: CodeType, *, lazy: bool = ..., recursive: bool = ...) -> Bytecode: ...
     def to_code(self) -> CodeType: ...
     def new_label(self) -> Label: ...
     def label_positions(self) -> dict[Label, int]: ...
+    def as_arrays(self) -> InstrArrays: ...
+    def stack_depths(self) -> array[int]: ...
+    def find_pattern(self, pattern: Pattern) -> list[PatternMatch]: ...
+    def edit(self) -> Edit: ...
+    def copy(self, *, label_offset: int = ..., lazy: bool | None = ...) -> Bytecode: ...
+    def copy_into(self, other: Bytecode) -> tuple[list[Instr], list[ExcEntry], list[Label]]: ...
+    def to_bytes(self) -> bytes: ...
+    @staticmethod
+    def from_bytes(data: bytes | bytearray | memoryview, *, lazy: bool | None = ...) -> Bytecode: ...
+    def __reduce__(self) -> tuple[t.Any, ...]: ...
     def add_const(self, obj: t.Any) -> int: ...
     def add_name(self, name: str) -> int: ...
     def add_varname(self, name: str) -> int: ...
 
-    instrs: list[Instr]
+    instrs: list[Instr] | InstrList
     end_labels: list[Label]
     exc_entries: list[ExcEntry]
     consts: list[t.Any]
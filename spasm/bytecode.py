@@ -24,11 +24,15 @@ import enum
 import opcode as _opcode_module
 import sys
 import typing as t
+from collections.abc import MutableSequence
 
 from spasm._core import Bytecode
 from spasm._core import ExcEntry
 from spasm._core import Instr
+from spasm._core import InstrList
 from spasm._core import Label
+from spasm._core import Pattern
+from spasm._core import Step
 
 __all__ = [
     "UNSET",
@@ -37,7 +41,10 @@ __all__ = [
     "Compare",
     "ExcEntry",
     "Instr",
+    "InstrList",
     "Label",
+    "Pattern",
+    "Step",
     "compare_oparg",
     "decode_name_arg",
     "encode_name_arg",
@@ -48,6 +55,10 @@ PY311 = sys.version_info >= (3, 11)
 PY312 = sys.version_info >= (3, 12)
 PY313 = sys.version_info >= (3, 13)
 
+# The extension type implements the whole protocol, but only the ABC itself
+# can make isinstance() say so.
+MutableSequence.register(InstrList)
+
 
 class _Unset:
     """Sentinel for "this instruction takes no argument"."""
@@ -0,0 +1,196 @@
+"""A size-bounded cache of decoded code objects.
+
+Tools that decode the same code object again and again (an inliner splicing
+the same callee into many callers, an import hook rewriting every module, a
+profiler instrumenting hot functions on demand) can decode through a
+:class:`DecodeCache` instead of :meth:`Bytecode.from_code`::
+
+    from spasm.cache import DecodeCache
+
+    cache = DecodeCache(max_size=16 << 20)
+    bc = cache.from_code(func.__code__)
+
+Each call hands out a fresh :meth:`Bytecode.copy` of the cached decode, so
+callers may edit what they get freely. A lazy copy (``lazy=True``) doesn't
+create any ``Instr`` until one is accessed, and costs a fraction of decoding
+again.
+
+Entries are keyed on the identity of the code object and hold it only
+weakly: an entry goes away with its code object. Within ``max_size`` (an
+estimate of the memory the entries take, in bytes) the least recently used
+entries are evicted first. :meth:`DecodeCache.stats` reports hits, misses and
+evictions for export to metrics.
+
+The cache is opt-in. :func:`enable` installs a process-wide one that
+:func:`from_code` and :func:`spasm.inline` decode through; until then
+:func:`from_code` decodes afresh every time.
+"""
+
+import collections
+import sys
+import threading
+import types
+import typing as t
+import weakref
+
+from spasm._core import Bytecode
+
+__all__ = ["CacheStats", "DecodeCache", "default", "disable", "enable", "from_code"]
+
+DEFAULT_MAX_SIZE = 32 << 20
+
+
+class CacheStats(t.NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int  # estimated bytes held by the entries
+    max_size: int
+
+
+class _Entry(t.NamedTuple):
+    ref: "weakref.ref[types.CodeType]"
+    bc: Bytecode
+    size: int
+
+
+def _estimate_size(bc: Bytecode) -> int:
+    # The instruction entries plus the tables; the objects in the tables are
+    # shared with the code object.
+    tables = (bc.consts, bc.names, bc.varnames, bc.freevars, bc.cellvars)
+    return sys.getsizeof(bc) + sys.getsizeof(bc.instrs) + sum(sys.getsizeof(table) for table in tables)
+
+
+class DecodeCache:
+    """Decoded code objects, least recently used first out."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        if max_size < 0:
+            msg = "max_size must not be negative"
+            raise ValueError(msg)
+        self._max_size = max_size
+        self._entries: collections.OrderedDict[int, _Entry] = collections.OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, value: int) -> None:
+        if value < 0:
+            msg = "max_size must not be negative"
+            raise ValueError(msg)
+        with self._lock:
+            self._max_size = value
+            self._evict()
+
+    def from_code(self, code: types.CodeType, *, lazy: bool = False) -> Bytecode:
+        """A copy of ``Bytecode.from_code(code)``, decoding only on a miss."""
+        key = id(code)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry.bc.copy(lazy=lazy)
+            self._misses += 1
+
+        # Decode outside the lock. The cached copy is lazy and owns what its
+        # instructions refer to, not the code object, so the entry doesn't
+        # keep the code alive.
+        bc = Bytecode.from_code(code).copy(lazy=True)
+        size = _estimate_size(bc)
+        if size <= self._max_size:
+            this = weakref.ref(self)
+
+            def forget(ref: "weakref.ref[types.CodeType]") -> None:
+                cache = this()
+                if cache is not None:
+                    cache._forget(key, ref)
+
+            with self._lock:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._size -= old.size
+                self._entries[key] = _Entry(weakref.ref(code, forget), bc, size)
+                self._size += size
+                self._evict()
+        return bc.copy(lazy=lazy)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                size=self._size,
+                max_size=self._max_size,
+            )
+
+    def clear(self) -> None:
+        """Drop every entry. The counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, code: object) -> bool:
+        entry = self._entries.get(id(code))
+        return entry is not None and entry.ref() is code
+
+    def _forget(self, key: int, ref: "weakref.ref[types.CodeType]") -> None:
+        # The code object is being collected; its id may be reused as soon as
+        # this returns, so only the entry made for it is removed. Collection
+        # can happen while this thread holds the lock, hence an RLock.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.ref is ref:
+                del self._entries[key]
+                self._size -= entry.size
+
+    def _evict(self) -> None:
+        while self._size > self._max_size and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._size -= entry.size
+            self._evictions += 1
+
+
+_default: DecodeCache | None = None
+
+
+def enable(max_size: int = DEFAULT_MAX_SIZE) -> DecodeCache:
+    """Install a process-wide :class:`DecodeCache`, or resize the one installed."""
+    global _default  # noqa: PLW0603
+    if _default is None:
+        _default = DecodeCache(max_size)
+    else:
+        _default.max_size = max_size
+    return _default
+
+
+def disable() -> None:
+    """Remove the process-wide cache, dropping its entries."""
+    global _default  # noqa: PLW0603
+    _default = None
+
+
+def default() -> DecodeCache | None:
+    """The process-wide cache, or ``None`` if it isn't enabled."""
+    return _default
+
+
+def from_code(code: types.CodeType, *, lazy: bool = False) -> Bytecode:
+    """Decode ``code`` through the process-wide cache, if it is enabled."""
+    cache = _default
+    if cache is None:
+        return Bytecode.from_code(code, lazy=lazy)
+    return cache.from_code(code, lazy=lazy)
@@ -9,16 +9,21 @@ a plain function it can prove safe to inline — no generator/coroutine, no
 count match — it splices the callee's body directly into the caller in place
 of the call. Anything it can't prove safe is left exactly as it was: this is
 a pure optimization, never a correctness risk for the calls it declines to
-touch.
+touch. The jumps the splices leave are then threaded with
+:func:`spasm.optimize.thread_jumps`.
 """
 
 import dis
 import types
 import typing as t
 
+from spasm import cache
 from spasm._core import Bytecode
 from spasm._core import Instr
 from spasm._core import Label
+from spasm._core import Pattern
+from spasm._core import PatternMatch
+from spasm._core import Step
 from spasm.bytecode import CO_ASYNC_GENERATOR
 from spasm.bytecode import CO_COROUTINE
 from spasm.bytecode import CO_GENERATOR
@@ -29,6 +34,7 @@ from spasm.bytecode import PY312
 from spasm.bytecode import decode_name_arg
 from spasm.bytecode import encode_name_arg
 from spasm.bytecode import is_name_op
+from spasm.optimize import thread_jumps
 
 __all__ = ["inline"]
 
@@ -72,7 +78,7 @@ _PAIRED_ARG_PUSH_OPS = frozenset(
 
 # LOAD_FAST_AND_CLEAR (comprehension-only) doesn't fit the abstraction model
 # either and has no simple unpacking; a callee containing one is left alone.
-_DISALLOWED_CALLEE_OPNAMES = frozenset(name for name in ("LOAD_FAST_AND_CLEAR",) if name in dis.opmap)
+_DISALLOWED_CALLEE_OPS = frozenset(dis.opmap[name] for name in ("LOAD_FAST_AND_CLEAR",) if name in dis.opmap)
 
 _INELIGIBLE_CALLEE_FLAGS = CO_GENERATOR | CO_COROUTINE | CO_ASYNC_GENERATOR | CO_VARARGS | CO_VARKEYWORDS
 
@@ -100,8 +106,20 @@ def _decode_global(names: t.Sequence[str], instr: Instr) -> tuple[str, bool] | N
     return decode_name_arg(names, "LOAD_GLOBAL", instr.arg)
 
 
-def _match_call_site(instrs: list[Instr], names: t.Sequence[str], start: int) -> _CallSite | None:
-    decoded = _decode_global(names, instrs[start])
+# LOAD_GLOBAL, an unlabeled run of simple pushes, then the terminator. What
+# the pattern can't express (the NULL flag on the LOAD_GLOBAL, terminator args
+# agreeing with the number of values pushed) _call_site() checks per match.
+_CALL_SITE_PATTERN = Pattern(
+    [
+        Step("LOAD_GLOBAL"),
+        Step(_SIMPLE_ARG_OPS | _PAIRED_ARG_PUSH_OPS, min_count=0, max_count=None, unlabeled=True, capture="args"),
+        *(Step(name, unlabeled=True) for name in _CALL_TERMINATOR),
+    ]
+)
+
+
+def _call_site(instrs: t.Sequence[Instr], names: t.Sequence[str], match: PatternMatch) -> _CallSite | None:
+    decoded = _decode_global(names, instrs[match.start])
     if decoded is None:
         return None
     name, has_null = decoded
@@ -109,51 +127,23 @@ def _match_call_site(instrs: list[Instr], names: t.Sequence[str], start: int) ->
         # A plain global load, not the callable position of a call.
         return None
 
-    idx = start + 1
-    argcount = 0
-    while idx < len(instrs) and dis.opname[instrs[idx].op] != _CALL_TERMINATOR[0]:
-        instr = instrs[idx]
-        op_name = dis.opname[instr.op]
-        if instr.labels:
-            return None
-        if op_name in _SIMPLE_ARG_OPS:
-            argcount += 1
-        elif op_name in _PAIRED_ARG_PUSH_OPS:
-            # Pure double-push, no side effect — safe in an arg-push run.
-            argcount += 2
-        else:
-            return None
-        idx += 1
-
-    if idx >= len(instrs):
+    args_start, args_end = match.captures["args"]
+    argcount = sum(2 if dis.opname[instrs[i].op] in _PAIRED_ARG_PUSH_OPS else 1 for i in range(args_start, args_end))
+    if any(instrs[i].arg != argcount for i in range(args_end, match.end)):
         return None
 
-    arg_instr_count = idx - (start + 1)
-    end = idx
-    for term_name in _CALL_TERMINATOR:
-        if end >= len(instrs):
-            return None
-        instr = instrs[end]
-        if dis.opname[instr.op] != term_name or instr.arg != argcount or instr.labels:
-            return None
-        end += 1
-
-    return _CallSite(start=start, end=end, name=name, argcount=argcount, arg_instr_count=arg_instr_count)
+    return _CallSite(
+        start=match.start, end=match.end, name=name, argcount=argcount, arg_instr_count=args_end - args_start
+    )
 
 
 def _find_call_sites(bc: Bytecode) -> list[_CallSite]:
-    sites = []
+    # Matches don't overlap, and one rejected by _call_site() contains no
+    # LOAD_GLOBAL after its first instruction, so no call site is lost by
+    # the scan resuming past it.
     instrs = bc.instrs
-    i = 0
-    while i < len(instrs):
-        if dis.opname[instrs[i].op] == "LOAD_GLOBAL":
-            site = _match_call_site(instrs, bc.names, i)
-            if site is not None:
-                sites.append(site)
-                i = site.end
-                continue
-        i += 1
-    return sites
+    sites = (_call_site(instrs, bc.names, match) for match in bc.find_pattern(_CALL_SITE_PATTERN))
+    return [site for site in sites if site is not None]
 
 
 def _resolve_global(func: types.FunctionType, name: str) -> t.Any:
@@ -226,28 +216,30 @@ def _reassigned_params(callee_bc: Bytecode, argcount: int) -> list[bool]:
     return reassigned
 
 
+def _decode_callee(callee_code: types.CodeType) -> Bytecode | None:
+    callee_bc = cache.from_code(callee_code)
+    if callee_bc.exc_entries:
+        return None
+    if not _DISALLOWED_CALLEE_OPS.isdisjoint(callee_bc.as_arrays().op):
+        return None
+    return callee_bc
+
+
 def _splice(
     caller_bc: Bytecode,
-    callee_code: types.CodeType,
+    callee_bc: Bytecode,
     call_site: _CallSite,
     splice_id: int,
     arg_instrs: list[Instr],
-) -> tuple[list[Instr], list[Instr], Label] | None:
-    callee_bc = Bytecode.from_code(callee_code)
-    if callee_bc.exc_entries:
-        return None
-    if any(dis.opname[instr.op] in _DISALLOWED_CALLEE_OPNAMES for instr in callee_bc.instrs):
-        return None
-
+) -> tuple[list[Instr], list[Instr], list[Label]]:
     argcount = call_site.argcount
     varname_map = {name: f"__inline_{splice_id}_{name}" for name in callee_bc.varnames}
+    # A private copy of the callee's body with its labels already renumbered
+    # into the caller, so the instructions below are adjusted in place. The
+    # callee's end labels mark the same spot as end_label: whatever follows
+    # the call.
+    callee_instrs, _, callee_end_labels = callee_bc.copy_into(caller_bc)
     end_label = caller_bc.new_label()
-    label_map: dict[Label, Label] = dict.fromkeys(callee_bc.end_labels, end_label)
-
-    def mapped_label(label: Label) -> Label:
-        if label not in label_map:
-            label_map[label] = caller_bc.new_label()
-        return label_map[label]
 
     # A parameter that's read-only in the callee and pushed by a single,
     # side-effect-free instruction in the caller doesn't need a dedicated
@@ -289,13 +281,14 @@ def _splice(
     # carrying forward any label pointing at it onto the next instruction.
     pending_labels: list[Label] = []
 
-    for instr in callee_bc.instrs:
+    for instr in callee_instrs:
         op_name = dis.opname[instr.op]
-        new_labels = pending_labels + [mapped_label(label) for label in instr.labels]
-        pending_labels = []
+        if pending_labels:
+            instr.labels = pending_labels + instr.labels
+            pending_labels = []
 
         if op_name == "RESUME":
-            pending_labels = new_labels
+            pending_labels = instr.labels
             continue
 
         if op_name in _PAIRED_LOCAL_OPS:
@@ -305,7 +298,7 @@ def _splice(
                 local_read(op1, idx1, instr.lineno),
                 local_read(op2, idx2, instr.lineno),
             ]
-            new[0].labels = new_labels
+            new[0].labels = instr.labels
             spliced.extend(new)
             continue
 
@@ -317,30 +310,28 @@ def _splice(
                 Instr("LOAD_CONST", instr.arg, lineno=instr.lineno),
                 Instr("JUMP_FORWARD", end_label, lineno=instr.lineno),
             ]
-            new[0].labels = new_labels
+            new[0].labels = instr.labels
             spliced.extend(new)
             continue
 
         if op_name == "RETURN_VALUE":
-            new_instr = Instr("JUMP_FORWARD", end_label, lineno=instr.lineno)
+            instr.op = "JUMP_FORWARD"
+            instr.arg = end_label
         elif instr.op in _HASLOCAL:
             idx = name_to_index.get(instr.arg)
             if idx is not None:
                 new_instr = local_read(op_name, idx, instr.lineno)
-            else:
-                new_instr = Instr(op_name, varname_map[instr.arg], lineno=instr.lineno)
+                new_instr.labels = instr.labels
+                spliced.append(new_instr)
+                continue
+            instr.arg = varname_map[instr.arg]
         elif is_name_op(instr.op):
             name, flag = decode_name_arg(callee_bc.names, op_name, instr.arg)
-            new_instr = Instr(op_name, encode_name_arg(caller_bc, op_name, name, flag=flag), lineno=instr.lineno)
-        elif isinstance(instr.arg, Label):
-            new_instr = Instr(op_name, mapped_label(instr.arg), lineno=instr.lineno)
-        else:
-            new_instr = Instr(op_name, instr.arg, lineno=instr.lineno)
+            instr.arg = encode_name_arg(caller_bc, op_name, name, flag=flag)
 
-        new_instr.labels = new_labels
-        spliced.append(new_instr)
+        spliced.append(instr)
 
-    return kept_arg_instrs, spliced, end_label
+    return kept_arg_instrs, spliced, [end_label, *callee_end_labels]
 
 
 def inline(func: _F) -> _F:
@@ -353,39 +344,30 @@ def inline(func: _F) -> _F:
     """
     code = func.__code__
     bc = Bytecode.from_code(code)
-    sites = {site.start: site for site in _find_call_sites(bc)}
+    sites = _find_call_sites(bc)
     if not sites:
         return func
 
     instrs = bc.instrs
-    new_instrs: list[Instr] = []
-    pending_labels: list[Label] = []
+    edit = bc.edit()
     splice_id = 0
-    changed = False
     func_ = t.cast("types.FunctionType", func)
+    # Each callee is decoded once, however many sites call it; every splice
+    # takes its own copy of the decoded body.
+    callees: dict[types.CodeType, Bytecode | None] = {}
 
-    i = 0
-    while i < len(instrs):
-        site = sites.get(i)
-        result = None
-        if site is not None:
-            callee_code = _eligible_callee(_resolve_global(func_, site.name), func_, site.argcount)
-            if callee_code is not None:
-                arg_instrs = instrs[site.start + 1 : site.start + 1 + site.arg_instr_count]
-                result = _splice(bc, callee_code, site, splice_id, arg_instrs)
-
-        if site is None or result is None:
-            instr = instrs[i]
-            if pending_labels:
-                instr.labels = pending_labels + list(instr.labels)
-                pending_labels = []
-            new_instrs.append(instr)
-            i += 1
+    for site in sites:
+        callee_code = _eligible_callee(_resolve_global(func_, site.name), func_, site.argcount)
+        if callee_code is None:
             continue
-
-        kept_arg_instrs, spliced, end_label = result
+        if callee_code not in callees:
+            callees[callee_code] = _decode_callee(callee_code)
+        callee_bc = callees[callee_code]
+        if callee_bc is None:
+            continue
+        arg_instrs = instrs[site.start + 1 : site.start + 1 + site.arg_instr_count]
+        kept_arg_instrs, spliced, end_labels = _splice(bc, callee_bc, site, splice_id, arg_instrs)
         splice_id += 1
-        changed = True
 
         # The original argument-push instructions (between the LOAD_GLOBAL
         # and the CALL terminator) are kept as-is where their value still
@@ -393,21 +375,23 @@ def inline(func: _F) -> _F:
         # callee's STORE_FASTs below consume. Pushes that _splice inlined
         # directly at their use site instead are dropped here. Either way,
         # the LOAD_GLOBAL and the CALL/PRECALL/CALL_FUNCTION terminator
-        # itself are always dropped.
-        head = kept_arg_instrs[0] if kept_arg_instrs else spliced[0]
-        head.labels = pending_labels + list(instrs[site.start].labels) + head.labels
-        pending_labels = [end_label]
-
-        new_instrs.extend(kept_arg_instrs)
-        new_instrs.extend(spliced)
-        i = site.end
+        # itself are always dropped; the edit moves any labels on them to
+        # the first instruction put in their place.
+        edit.replace(site.start, site.end, kept_arg_instrs + spliced)
+
+        # The callee's returns jump to whatever follows the call. If that is
+        # itself replaced by a later splice, the edit carries the labels along.
+        if site.end < len(instrs):
+            instrs[site.end].labels = [*end_labels, *instrs[site.end].labels]
+        else:
+            bc.end_labels = [*end_labels, *bc.end_labels]
 
-    if not changed:
+    if not splice_id:
         return func
 
-    if pending_labels:
-        bc.end_labels = pending_labels + bc.end_labels
-
-    bc.instrs = new_instrs
+    edit.commit()
+    # Every splice ends in a jump to whatever follows the call, which is often
+    # the next instruction, or another splice's jump.
+    thread_jumps(bc)
     func.__code__ = bc.to_code()  # type: ignore[misc]
     return func
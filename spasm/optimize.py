@@ -0,0 +1,583 @@
+"""Peephole optimizations over a :class:`~spasm.bytecode.Bytecode`.
+
+:func:`optimize` runs the passes below, in place, on a ``Bytecode`` and on
+every ``Bytecode`` nested in its constants:
+
+* :func:`remove_nops` drops the ``NOP`` instructions that don't carry a line
+  number the instructions around them lack,
+* :func:`fold_constants` evaluates unary, binary, comparison and
+  ``BUILD_TUPLE`` instructions whose operands are all constant pushes, and
+  resolves conditional jumps on a constant,
+* :func:`thread_jumps` sends a jump to an unconditional jump straight on to
+  where that one goes, removes jumps to the next instruction, and turns a
+  conditional jump over an unconditional one into the inverse conditional
+  jump,
+* :func:`remove_unreachable` deletes the instructions no path reaches, such as
+  the code after an unconditional jump or a return.
+
+The compiler already does as much for Python source. What gains is
+hand-written assembly, and the code :func:`spasm.inline` leaves behind once it
+has substituted constant arguments into a callee. Every pass goes through
+:meth:`Bytecode.edit`, so labels move with the instructions they mark and
+exception entries keep protecting the same code.
+"""
+
+import dis
+import operator
+import re
+import typing as t
+import warnings
+
+from spasm._core import Bytecode
+from spasm._core import Instr
+from spasm._core import Label
+from spasm.bytecode import PY311
+from spasm.bytecode import PY312
+from spasm.bytecode import PY313
+from spasm.bytecode import BinaryOp
+
+__all__ = ["fold_constants", "optimize", "remove_nops", "remove_unreachable", "thread_jumps"]
+
+_NOP = dis.opmap["NOP"]
+_POP_TOP = dis.opmap["POP_TOP"]
+
+# Pushes of a constant. LOAD_SMALL_INT (3.14+) carries the int as its arg.
+_CONST_PUSH_OPS = frozenset(dis.opmap[name] for name in ("LOAD_CONST", "LOAD_SMALL_INT") if name in dis.opmap)
+
+_CONSTANT_TYPES = frozenset({int, float, complex, str, bytes, bool, type(None), type(...)})
+
+# Operators by BinaryOp member name; an INPLACE_ variant is the same operator,
+# since every constant it can apply to is immutable.
+_BINARY_FUNCS: dict[str, t.Callable[[t.Any, t.Any], t.Any]] = {
+    "ADD": operator.add,
+    "AND": operator.and_,
+    "FLOOR_DIVIDE": operator.floordiv,
+    "LSHIFT": operator.lshift,
+    "MATRIX_MULTIPLY": operator.matmul,
+    "MULTIPLY": operator.mul,
+    "REMAINDER": operator.mod,
+    "OR": operator.or_,
+    "POWER": operator.pow,
+    "RSHIFT": operator.rshift,
+    "SUBTRACT": operator.sub,
+    "TRUE_DIVIDE": operator.truediv,
+    "XOR": operator.xor,
+}
+
+if PY311:
+    _BINARY_OP = dis.opmap["BINARY_OP"]
+    _BINARY_ARGS = {member.value: _BINARY_FUNCS[member.name.removeprefix("INPLACE_")] for member in BinaryOp}
+else:
+    # 3.10 has an opcode per operator, in a BINARY_ and an INPLACE_ flavour,
+    # and calls REMAINDER MODULO.
+    _BINARY_OPCODES = {
+        op: _BINARY_FUNCS[name.split("_", 1)[1].replace("MODULO", "REMAINDER")]
+        for name, op in dis.opmap.items()
+        if name.startswith(("BINARY_", "INPLACE_"))
+        and name.split("_", 1)[1].replace("MODULO", "REMAINDER") in _BINARY_FUNCS
+    }
+
+# TO_BOOL (3.13+) is what a constant goes through before UNARY_NOT or a
+# conditional jump, so it is folded like the unary operators it feeds.
+_UNARY_FUNCS: dict[int, t.Callable[[t.Any], t.Any]] = {
+    dis.opmap[name]: func
+    for name, func in (
+        ("UNARY_NEGATIVE", operator.neg),
+        ("UNARY_POSITIVE", operator.pos),
+        ("UNARY_INVERT", operator.invert),
+        ("UNARY_NOT", operator.not_),
+        ("TO_BOOL", bool),
+    )
+    if name in dis.opmap
+}
+
+# In Compare order, the logical index compare_oparg() encodes.
+_COMPARE_FUNCS = (operator.lt, operator.le, operator.eq, operator.ne, operator.gt, operator.ge)
+_COMPARE_OP = dis.opmap["COMPARE_OP"]
+_BUILD_TUPLE = dis.opmap["BUILD_TUPLE"]
+
+# Whether each conditional jump is taken, given the value it pops. 3.11 has a
+# FORWARD and a BACKWARD variant of each.
+_BRANCH_TESTS: dict[int, t.Callable[[t.Any], bool]] = {}
+for _name, _op in dis.opmap.items():
+    if _name.startswith("POP_JUMP_") and "_IF_" in _name:
+        _BRANCH_TESTS[_op] = {
+            "FALSE": operator.not_,
+            "TRUE": bool,
+            "NONE": lambda value: value is None,
+            "NOT_NONE": lambda value: value is not None,
+        }[_name.rsplit("_IF_", 1)[1]]
+
+# From 3.13 POP_JUMP_IF_TRUE/FALSE only accept a bool (TO_BOOL makes one), and
+# what they do with anything else isn't truthiness.
+_BOOL_BRANCHES = frozenset(op for op in _BRANCH_TESTS if PY313 and dis.opname[op].endswith(("_TRUE", "_FALSE")))
+
+# The jumps that always go, which thread_jumps() threads through.
+# JUMP_BACKWARD_NO_INTERRUPT is left alone: it is how an await loop avoids
+# the eval breaker, which a JUMP_BACKWARD put in its place would check.
+_UNCONDITIONAL_JUMPS = frozenset(
+    dis.opmap[name] for name in ("JUMP_FORWARD", "JUMP_BACKWARD", "JUMP_ABSOLUTE") if name in dis.opmap
+)
+
+# Each conditional jump's condition ("FALSE", "NOT_NONE", ...), and the
+# opcodes testing a condition forward and backward. 3.10's are absolute, so
+# one opcode goes either way; from 3.12 they only go forward.
+_CONDITIONS = {op: dis.opname[op].rsplit("_IF_", 1)[1] for op in _BRANCH_TESTS}
+_INVERSE_CONDITIONS = {"FALSE": "TRUE", "TRUE": "FALSE", "NONE": "NOT_NONE", "NOT_NONE": "NONE"}
+_BRANCH_FORMS: dict[str, tuple[int, int | None]] = {}
+for _condition in _CONDITIONS.values():
+    if PY312 or not PY311:
+        _op = dis.opmap[f"POP_JUMP_IF_{_condition}"]
+        _BRANCH_FORMS[_condition] = (_op, None if PY312 else _op)
+    else:
+        _BRANCH_FORMS[_condition] = (
+            dis.opmap[f"POP_JUMP_FORWARD_IF_{_condition}"],
+            dis.opmap[f"POP_JUMP_BACKWARD_IF_{_condition}"],
+        )
+
+_THREADED_JUMPS = _UNCONDITIONAL_JUMPS | frozenset(_CONDITIONS)
+_THREADED_JUMP = re.compile(b"[%s]" % re.escape(bytes(sorted(_THREADED_JUMPS))))
+
+# The limits CPython's own folding keeps to (see Python/ast_opt.c): an
+# operation that could build something bigger is left to run, rather than
+# computed here and carried around as a constant.
+_MAX_INT_SIZE = 128  # bits
+_MAX_COLLECTION_SIZE = 256
+_MAX_STR_SIZE = 4096
+_SIZED_FUNCS = frozenset({operator.mul, operator.pow, operator.lshift, operator.mod})
+
+_NO_VALUE = object()
+
+# A constant push directly followed by an operation on it: what
+# fold_constants() needs at least one of to have anything to do, short of a
+# BUILD_TUPLE 0, which folds with no operand at all.
+_FOLDABLE_OPS = {*_UNARY_FUNCS, *_BRANCH_TESTS, _COMPARE_OP, _BUILD_TUPLE}
+_FOLDABLE_OPS.update({_BINARY_OP} if PY311 else _BINARY_OPCODES)
+_FOLD_CANDIDATE = re.compile(
+    b"[%s][%s]" % (re.escape(bytes(sorted(_CONST_PUSH_OPS))), re.escape(bytes(sorted(_FOLDABLE_OPS))))
+)
+
+
+def _is_constant(value: t.Any) -> bool:
+    if type(value) in (tuple, frozenset):
+        return all(_is_constant(item) for item in value)
+    return type(value) in _CONSTANT_TYPES
+
+
+def _too_big(func: t.Callable[..., t.Any], left: t.Any, right: t.Any) -> bool:
+    if func is operator.mul:
+        if isinstance(left, int) and isinstance(right, int):
+            return left.bit_length() + right.bit_length() > _MAX_INT_SIZE and bool(left) and bool(right)
+        if isinstance(right, int):
+            left, right = right, left
+        if isinstance(left, int) and isinstance(right, (str, bytes)):
+            return left * len(right) > _MAX_STR_SIZE
+        if isinstance(left, int) and isinstance(right, (tuple, frozenset)):
+            return left * len(right) > _MAX_COLLECTION_SIZE
+    elif func is operator.pow:
+        if isinstance(left, int) and isinstance(right, int) and right > 0:
+            return left.bit_length() * right > _MAX_INT_SIZE
+    elif func is operator.lshift:
+        if isinstance(left, int) and isinstance(right, int):
+            return right > _MAX_INT_SIZE or left.bit_length() + right > _MAX_INT_SIZE
+    elif func is operator.mod:
+        # Formatting, whose output can be as big as a width asks for.
+        return isinstance(left, (str, bytes))
+    return False
+
+
+def _evaluate(func: t.Callable[..., t.Any], args: t.Sequence[t.Any]) -> t.Any:
+    """``func(*args)``, or ``_NO_VALUE`` if that is better left to run time.
+
+    An operation that raises, or warns (``~True`` is deprecated), is left
+    alone, so that it still does so when the code runs.
+    """
+    if func in _SIZED_FUNCS and _too_big(func, *args):
+        return _NO_VALUE
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            value = func(*args)
+    except Exception:
+        return _NO_VALUE
+    return value if _is_constant(value) else _NO_VALUE
+
+
+def _operation(instr: Instr) -> tuple[int, t.Callable[..., t.Any]] | None:
+    """How many values ``instr`` pops and the function computing what it pushes."""
+    op = instr.op
+    unary = _UNARY_FUNCS.get(op)
+    if unary is not None:
+        return 1, unary
+    if op == _BUILD_TUPLE:
+        return instr.arg, lambda *items: items
+    if op == _COMPARE_OP:
+        arg = instr.arg
+        if PY313:
+            index, cast = arg >> 5, bool(arg & 16)
+        elif PY312:
+            index, cast = arg >> 4, False
+        else:
+            index, cast = arg, False
+        if index >= len(_COMPARE_FUNCS):
+            return None
+        compare = _COMPARE_FUNCS[index]
+        return 2, (lambda left, right: bool(compare(left, right))) if cast else compare
+    binary = (_BINARY_ARGS.get(instr.arg) if op == _BINARY_OP else None) if PY311 else _BINARY_OPCODES.get(op)
+    if binary is not None:
+        return 2, binary
+    return None
+
+
+def _instr_at(op: str, arg: t.Any, at: Instr) -> Instr:
+    """A new instruction with the source position of ``at``."""
+    return Instr(op, arg, lineno=at.lineno, end_lineno=at.end_lineno, col_offset=at.col_offset, end_col=at.end_col)
+
+
+def _jump_name(*, forward: bool) -> str:
+    if forward:
+        return "JUMP_FORWARD"
+    return "JUMP_BACKWARD" if PY311 else "JUMP_ABSOLUTE"
+
+
+def _jump(target: Label, at: Instr, *, forward: bool) -> Instr:
+    """An unconditional jump to ``target``, in the form its direction wants."""
+    return _instr_at(_jump_name(forward=forward), target, at)
+
+
+def _branch(condition: str, *, forward: bool) -> int | None:
+    """The conditional jump on ``condition`` going that way, if there is one."""
+    forward_op, backward_op = _BRANCH_FORMS[condition]
+    return forward_op if forward else backward_op
+
+
+def _may_fold(bc: Bytecode) -> bool:
+    cols = bc.as_arrays()
+    ops = cols.op.tobytes()
+    if _FOLD_CANDIDATE.search(ops):
+        return True
+    i = ops.find(_BUILD_TUPLE)
+    while i >= 0:
+        if cols.arg[i] == 0:
+            return True
+        i = ops.find(_BUILD_TUPLE, i + 1)
+    return False
+
+
+def _targets(bc: Bytecode) -> set[Label]:
+    # The labels something jumps or unwinds to. Any other label is only a
+    # name for a position, and doesn't stop instructions being merged across
+    # it; the edit moves it along with them.
+    targets = {instr.arg for instr in bc.instrs if isinstance(instr.arg, Label)}
+    for entry in bc.exc_entries:
+        targets.update((entry.start, entry.stop, entry.handler))
+    return targets
+
+
+def _drop_empty_entries(bc: Bytecode) -> None:
+    # An exception entry whose start and stop now resolve to the same place
+    # protects nothing.
+    if not bc.exc_entries:
+        return
+    positions = bc.label_positions()
+    live = [entry for entry in bc.exc_entries if positions[entry.start] < positions[entry.stop]]
+    if len(live) < len(bc.exc_entries):
+        bc.exc_entries = live
+
+
+def _delete(bc: Bytecode, indices: t.Sequence[int]) -> None:
+    """Delete the instructions at ``indices``, ascending, a run at a time."""
+    with bc.edit() as edit:
+        k = 0
+        while k < len(indices):
+            start = stop = indices[k]
+            while k < len(indices) and indices[k] == stop:
+                stop += 1
+                k += 1
+            edit.delete(start, stop)
+    _drop_empty_entries(bc)
+
+
+def remove_nops(bc: Bytecode) -> int:
+    """Remove the ``NOP`` instructions nothing needs; returns how many.
+
+    A ``NOP`` is kept only for its line number: the line event a tracer sees
+    for a line the compiler emitted no other code for, such as ``try:``. One
+    without a line number, or with the line of the instruction after it, or
+    (unless it is a jump target) of the one before it, is removed.
+    """
+    if _NOP not in bc.as_arrays().op:
+        return 0
+    instrs = bc.instrs
+    targets = _targets(bc)
+    dead: list[int] = []
+    prev_line = None
+    for i, instr in enumerate(instrs):
+        if instr.op == _NOP:
+            line = instr.lineno
+            next_line = instrs[i + 1].lineno if i + 1 < len(instrs) else None
+            if line < 0 or line == next_line or (line == prev_line and targets.isdisjoint(instr.labels)):
+                dead.append(i)
+                continue
+        prev_line = instr.lineno
+    if dead:
+        _delete(bc, dead)
+    return len(dead)
+
+
+class _Push(t.NamedTuple):
+    start: int  # instrs[start:stop] push value, and nothing else
+    stop: int
+    value: t.Any
+    at: Instr | None  # the operation folded into it, or None for a plain push
+
+
+def fold_constants(bc: Bytecode) -> int:
+    """Evaluate operations on constants ahead of time; returns how many were.
+
+    An operation whose operands are all pushed by ``LOAD_CONST`` is replaced by
+    a ``LOAD_CONST`` of its result, which can be the operand of the next: one
+    pass folds a whole expression. A conditional jump on a constant becomes an
+    unconditional jump, or goes. Operations on anything but plain constants,
+    those that raise or warn, and those whose result would be large are left
+    alone. No operand but the first may be a jump target.
+    """
+    if not _may_fold(bc):
+        return 0
+    instrs = bc.instrs
+    targets = _targets(bc)
+    run: list[_Push] = []  # the constant pushes immediately before instrs[i]
+    replacements: list[tuple[int, int, list[Instr]]] = []
+    positions: dict[Label, int] | None = None
+    folded = 0
+
+    def flush() -> None:
+        for push in run:
+            if push.at is not None:
+                replacements.append((push.start, push.stop, [_instr_at("LOAD_CONST", push.value, push.at)]))
+        run.clear()
+
+    for i, instr in enumerate(instrs):
+        if instr.labels and not targets.isdisjoint(instr.labels):
+            flush()
+        op = instr.op
+        if op in _CONST_PUSH_OPS and _is_constant(instr.arg):
+            run.append(_Push(i, i + 1, instr.arg, None))
+            continue
+
+        operation = _operation(instr)
+        if operation is not None and 0 <= operation[0] <= len(run):
+            count, func = operation
+            operands = run[len(run) - count :]
+            value = _evaluate(func, [push.value for push in operands])
+            if value is not _NO_VALUE:
+                start = operands[0].start if operands else i
+                del run[len(run) - count :]
+                # A branch folded away inside the operands is part of this now.
+                while replacements and replacements[-1][0] >= start:
+                    replacements.pop()
+                run.append(_Push(start, i + 1, value, instr))
+                folded += 1
+                continue
+
+        test = _BRANCH_TESTS.get(op)
+        if (
+            test is not None
+            and run
+            and isinstance(instr.arg, Label)
+            and (op not in _BOOL_BRANCHES or type(run[-1].value) is bool)
+        ):
+            push = run.pop()
+            # As for an operation: a branch folded away since the constant
+            # was pushed is part of this one's range now.
+            while replacements and replacements[-1][0] >= push.start:
+                replacements.pop()
+            if test(push.value):
+                if positions is None:
+                    positions = bc.label_positions()
+                flush()
+                replacements.append((push.start, i + 1, [_jump(instr.arg, instr, forward=positions[instr.arg] > i)]))
+            else:
+                # Never taken: the code after it carries on from the pushes
+                # before the constant.
+                replacements.append((push.start, i + 1, []))
+            folded += 1
+            continue
+
+        flush()
+    flush()
+
+    if replacements:
+        with bc.edit() as edit:
+            for start, stop, new in sorted(replacements, key=operator.itemgetter(0)):
+                edit.replace(start, stop, new)
+        _drop_empty_entries(bc)
+    return folded
+
+
+def remove_unreachable(bc: Bytecode) -> int:
+    """Remove the instructions no path reaches; returns how many.
+
+    Reachability is what :meth:`Bytecode.stack_depths` finds, following jumps,
+    fall-through and exception handlers. An exception entry whose protected
+    instructions are all unreachable is removed too, and with it the handler,
+    if nothing else reaches it.
+    """
+    depths = bc.stack_depths()
+    if -1 not in depths:
+        return 0
+    # A handler counts as reached whether or not the code it protects is, so
+    # entries protecting only unreachable code go first, and the rest is
+    # looked at again without them.
+    while bc.exc_entries:
+        positions = bc.label_positions()
+        live = [
+            entry
+            for entry in bc.exc_entries
+            if any(depths[i] >= 0 for i in range(positions[entry.start], positions[entry.stop]))
+        ]
+        if len(live) == len(bc.exc_entries):
+            break
+        bc.exc_entries = live
+        depths = bc.stack_depths()
+
+    dead = [i for i, depth in enumerate(depths) if depth < 0]
+    if dead:
+        _delete(bc, dead)
+    return len(dead)
+
+
+def _keeps_lines(skipped: Instr, before: Instr | None, after: Instr | None, *, forward: bool) -> bool:
+    """Whether going from ``before`` to ``after`` without the jump ``skipped``
+    between them gives a tracer the same line events.
+
+    It does if ``skipped`` has no line, or the line of ``before``, or of
+    ``after`` if ``skipped`` goes forward. Landing after a backward jump is a
+    line event even on the same line, so ``before`` is None when ``skipped``
+    is reached by one.
+    """
+    line = skipped.lineno
+    return (
+        line < 0
+        or (before is not None and line == before.lineno)
+        or (forward and after is not None and line == after.lineno)
+    )
+
+
+def thread_jumps(bc: Bytecode) -> int:
+    """Shorten the paths jumps take; returns how many jumps were changed.
+
+    A jump to an unconditional jump is sent on to where that one goes, as far
+    as the chain leads. A jump to the instruction after it is removed, or for
+    a conditional jump, leaves a ``POP_TOP`` of what it tested. A conditional
+    jump over an unconditional one becomes the inverse conditional jump to
+    where the unconditional one went. Each is done only where the opcode for
+    the new direction exists (conditional jumps only go forward from 3.12)
+    and the jump left out has no line event of its own to give; a jump to
+    the next instruction that has becomes a ``NOP``, which
+    :func:`remove_nops` then keeps.
+    """
+    jumps = [match.start() for match in _THREADED_JUMP.finditer(bc.as_arrays().op.tobytes())]
+    if not jumps:
+        return 0
+    instrs = bc.instrs
+    n = len(instrs)
+    positions = bc.label_positions()
+    changed = 0
+
+    def at(label: Label) -> Instr | None:
+        k = positions[label]
+        return instrs[k] if k < n else None
+
+    for i in jumps:
+        instr = instrs[i]
+        op = instr.op
+        if not isinstance(instr.arg, Label):
+            continue
+        target = instr.arg
+        seen = {i}
+        came_from = i
+        while (k := positions[target]) < n and k not in seen:
+            hop = instrs[k]
+            if hop.op not in _UNCONDITIONAL_JUMPS or not isinstance(hop.arg, Label):
+                break
+            before = instr if k > came_from else None
+            if not _keeps_lines(hop, before, at(hop.arg), forward=positions[hop.arg] > k):
+                break
+            seen.add(k)
+            came_from = k
+            target = hop.arg
+        if target == instr.arg:
+            continue
+        forward = positions[target] > i
+        if op in _UNCONDITIONAL_JUMPS:
+            instr.op = _jump_name(forward=forward)
+        else:
+            new_op = _branch(_CONDITIONS[op], forward=forward)
+            if new_op is None:
+                continue
+            instr.op = new_op
+        instr.arg = target
+        changed += 1
+
+    # The ops above only changed for their other-direction forms, so the
+    # jumps are where they were.
+    targets: set[Label] | None = None
+    dead: list[int] = []
+    nops = False
+    for i in jumps:
+        instr = instrs[i]
+        op = instr.op
+        if not isinstance(instr.arg, Label) or (dead and dead[-1] == i):
+            continue
+        k = positions[instr.arg]
+        if k == i + 1:
+            if op in _UNCONDITIONAL_JUMPS:
+                instr.op, instr.arg = _NOP, 0
+                nops = True
+            else:
+                instr.op, instr.arg = _POP_TOP, 0
+            changed += 1
+        elif k == i + 2 and op in _CONDITIONS:
+            # POP_JUMP_IF_FALSE L1; JUMP L2; L1: is POP_JUMP_IF_TRUE L2; L1:
+            over = instrs[i + 1]
+            if over.op in _UNCONDITIONAL_JUMPS and isinstance(over.arg, Label) and positions[over.arg] != i + 1:
+                if targets is None:
+                    targets = _targets(bc)
+                dest = positions[over.arg]
+                new_op = _branch(_INVERSE_CONDITIONS[_CONDITIONS[op]], forward=dest > i)
+                if (
+                    new_op is not None
+                    and targets.isdisjoint(over.labels)
+                    and _keeps_lines(over, instr, at(over.arg), forward=dest > i + 1)
+                ):
+                    instr.op, instr.arg = new_op, over.arg
+                    dead.append(i + 1)
+                    changed += 1
+
+    if dead:
+        _delete(bc, dead)
+    if nops:
+        remove_nops(bc)
+    return changed
+
+
+def optimize(bc: Bytecode) -> Bytecode:
+    """Run every pass on ``bc`` and the ``Bytecode`` objects nested in its consts.
+
+    The passes are repeated until none of them changes anything, since each
+    can leave work for the others. ``bc`` is changed in place and returned, so
+    that a code object can be optimized with
+    ``optimize(Bytecode.from_code(co)).to_code()``.
+    """
+    seen: set[int] = set()
+    pending = [bc]
+    while pending:
+        code = pending.pop()
+        if id(code) in seen:
+            continue
+        seen.add(id(code))
+        while remove_nops(code) + fold_constants(code) + thread_jumps(code) + remove_unreachable(code):
+            pass
+        pending.extend(const for const in code.consts if isinstance(const, Bytecode))
+    return bc
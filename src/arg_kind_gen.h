@@ -0,0 +1,18 @@
+// Auto-generated for CPython 3.11
+enum class ArgKind : uint8_t { INT=0, CONST=1, LOCAL=2, FREE=3 };
+static inline ArgKind arg_kind(uint8_t op) noexcept {
+    switch (op) {
+    case 100: return ArgKind::CONST;
+    case 172: return ArgKind::CONST;
+    case 124: return ArgKind::LOCAL;
+    case 125: return ArgKind::LOCAL;
+    case 126: return ArgKind::LOCAL;
+    case 135: return ArgKind::FREE;
+    case 136: return ArgKind::FREE;
+    case 137: return ArgKind::FREE;
+    case 138: return ArgKind::FREE;
+    case 139: return ArgKind::FREE;
+    case 148: return ArgKind::FREE;
+    default: return ArgKind::INT;
+    }
+}
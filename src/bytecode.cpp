@@ -6,14 +6,20 @@
 #include "jump_opcodes_gen.h"
 #include "stackdepth_opcodes_gen.h"
 
+#include <algorithm>
 #include <cassert>
+#include <memory>
 #include <stdexcept>
 
 // ── Helpers ──────────────────────────────────────────────────────────────────
+// consts, names and varnames are interned through the Bytecode's hash
+// indexes (see tableindex.h), and on 3.11+ variables resolve through a
+// LocalsplusLayout; these linear scans are what's left for cellvars and
+// freevars before 3.11, which are only ever a handful of entries long.
 
 // Search lst for obj (identity then equality).  Returns index, or -1 if absent.
 // Does NOT append — callers that need append use find_or_add().
-static Py_ssize_t find_only(PyObject* lst, PyObject* obj)
+[[maybe_unused]] static Py_ssize_t find_only(PyObject* lst, PyObject* obj)
 {
     Py_ssize_t n = PyList_GET_SIZE(lst);
     for (Py_ssize_t i = 0; i < n; ++i) {
@@ -30,7 +36,7 @@ static Py_ssize_t find_only(PyObject* lst, PyObject* obj)
 // Append if absent.  Returns the index, or -1 on error.
 // Type-strict equality (same type required) prevents conflating distinct
 // constants like 0 (int) and False (bool), or 1 and True.
-static Py_ssize_t find_or_add(PyObject* lst, PyObject* obj)
+[[maybe_unused]] static Py_ssize_t find_or_add(PyObject* lst, PyObject* obj)
 {
     Py_ssize_t n = PyList_GET_SIZE(lst);
     PyTypeObject* obj_type = Py_TYPE(obj);
@@ -67,50 +73,116 @@ static Py_ssize_t find_or_add(PyObject* lst, PyObject* obj)
 #endif
 
 #if UNIFIED_LOCALSPLUS
-// The localsplus index of `name`, or -1 if it is in none of the tables.
-static Py_ssize_t localsplus_find(const CodeMeta& meta, PyObject* name)
-{
-    Py_ssize_t i = find_only(meta.varnames, name);
-    if (i >= 0) return i;
-
-    Py_ssize_t slot   = PyList_GET_SIZE(meta.varnames);
-    Py_ssize_t ncells = PyList_GET_SIZE(meta.cellvars);
-    for (Py_ssize_t c = 0; c < ncells; ++c) {
-        PyObject* cell = PyList_GET_ITEM(meta.cellvars, c);
-        if (find_only(meta.varnames, cell) >= 0) continue;  // shares an argument's slot
-        if (cell == name) return slot;
-        int eq = PyObject_RichCompareBool(cell, name, Py_EQ);
-        if (eq < 0) PyErr_Clear();
-        else if (eq) return slot;
-        ++slot;
+// The localsplus layout of a code object, computed once per from_code() /
+// to_code() call rather than rescanned per variable instruction: slot -> name
+// for decoding, and a hash index name -> slot for encoding. A name that
+// appears more than once resolves to its lowest slot, so varnames win over
+// cells and cells over frees, as in the frame itself.
+class LocalsplusLayout {
+public:
+    explicit LocalsplusLayout(const CodeMeta& meta)
+    {
+        Py_ssize_t nvars  = PyList_GET_SIZE(meta.varnames);
+        Py_ssize_t ncells = PyList_GET_SIZE(meta.cellvars);
+        Py_ssize_t nfree  = PyList_GET_SIZE(meta.freevars);
+        names_.reserve(static_cast<size_t>(nvars + ncells + nfree));
+        closure_.reserve(static_cast<size_t>(nvars + ncells + nfree));
+        hashes_.reserve(static_cast<size_t>(nvars + ncells + nfree));
+
+        for (Py_ssize_t i = 0; i < nvars; ++i)
+            add(PyList_GET_ITEM(meta.varnames, i), false);
+        for (Py_ssize_t c = 0; c < ncells; ++c) {
+            PyObject* cell = PyList_GET_ITEM(meta.cellvars, c);
+            Py_ssize_t existing = find(cell);
+            if (existing >= 0 && existing < nvars) {  // shares an argument's slot
+                closure_[static_cast<size_t>(existing)] = true;
+                continue;
+            }
+            add(cell, true);
+        }
+        for (Py_ssize_t f = 0; f < nfree; ++f)
+            add(PyList_GET_ITEM(meta.freevars, f), true);
     }
 
-    Py_ssize_t f = find_only(meta.freevars, name);
-    return f >= 0 ? slot + f : -1;
-}
+    // Record a name the caller has just appended to one of the tables, so
+    // membership tests see it. Its slot is only right for a free variable
+    // (freevars come last); a new local shifts every cell and free after it,
+    // and the layout must be rebuilt before slots are used again.
+    void append(PyObject* name, bool closure) { add(name, closure); }
 
-// The name at localsplus index `idx` (borrowed), or nullptr if out of range.
-static PyObject* localsplus_name(const CodeMeta& meta, Py_ssize_t idx)
-{
-    if (idx < 0) return nullptr;
-
-    Py_ssize_t nlocals = PyList_GET_SIZE(meta.varnames);
-    if (idx < nlocals) return PyList_GET_ITEM(meta.varnames, idx);
-
-    Py_ssize_t slot   = nlocals;
-    Py_ssize_t ncells = PyList_GET_SIZE(meta.cellvars);
-    for (Py_ssize_t c = 0; c < ncells; ++c) {
-        PyObject* cell = PyList_GET_ITEM(meta.cellvars, c);
-        if (find_only(meta.varnames, cell) >= 0) continue;
-        if (slot == idx) return cell;
-        ++slot;
+    // The localsplus index of `name`, or -1 if it is in none of the tables.
+    Py_ssize_t find(PyObject* name) const
+    {
+        Py_hash_t h = PyObject_Hash(name);
+        if (h == -1 && PyErr_Occurred()) { PyErr_Clear(); return -1; }
+        auto matches = [&](Py_ssize_t slot) {
+            PyObject* cand = names_[static_cast<size_t>(slot)];
+            if (cand == name) return true;
+            int eq = PyObject_RichCompareBool(cand, name, Py_EQ);
+            if (eq < 0) PyErr_Clear();
+            return eq > 0;
+        };
+        if (by_hash_.empty()) {
+            for (size_t slot = 0; slot < hashes_.size(); ++slot)
+                if (hashes_[slot] == h && matches(static_cast<Py_ssize_t>(slot)))
+                    return static_cast<Py_ssize_t>(slot);
+            return -1;
+        }
+        Py_ssize_t best = -1;
+        auto [lo, hi] = by_hash_.equal_range(h);
+        for (auto it = lo; it != hi; ++it) {
+            Py_ssize_t slot = it->second;
+            if (best >= 0 && slot > best) continue;
+            if (matches(slot)) best = slot;
+        }
+        return best;
     }
 
-    Py_ssize_t f = idx - slot;
-    if (f >= 0 && f < PyList_GET_SIZE(meta.freevars))
-        return PyList_GET_ITEM(meta.freevars, f);
-    return nullptr;
-}
+    // Whether `name` is a cell or free variable (and not only a plain local).
+    bool is_closure(PyObject* name) const
+    {
+        Py_ssize_t slot = find(name);
+        return slot >= 0 && closure_[static_cast<size_t>(slot)];
+    }
+
+    // The name at localsplus index `idx` (borrowed), or nullptr if out of range.
+    PyObject* name(Py_ssize_t idx) const noexcept
+    {
+        if (idx < 0 || static_cast<size_t>(idx) >= names_.size()) return nullptr;
+        return names_[static_cast<size_t>(idx)];
+    }
+
+private:
+    // Up to this many names a linear scan of hashes_ beats hashing into by_hash_.
+    static constexpr size_t LINEAR_MAX = 16;
+
+    void add(PyObject* name, bool closure)
+    {
+        Py_ssize_t slot = static_cast<Py_ssize_t>(names_.size());
+        names_.push_back(name);
+        closure_.push_back(closure);
+        Py_hash_t h = PyObject_Hash(name);
+        if (h == -1 && PyErr_Occurred()) {
+            PyErr_Clear();
+            h = -1;  // never matches: no hash is -1
+        }
+        hashes_.push_back(h);
+        if (!by_hash_.empty()) {
+            if (h != -1) by_hash_.emplace(h, slot);
+        } else if (hashes_.size() > LINEAR_MAX) {
+            by_hash_.reserve(hashes_.capacity());
+            for (size_t k = 0; k < hashes_.size(); ++k)
+                if (hashes_[k] != -1) by_hash_.emplace(hashes_[k], static_cast<Py_ssize_t>(k));
+        }
+    }
+
+    std::vector<PyObject*> names_;                        // borrowed from meta's lists
+    std::vector<bool>      closure_;                      // slot holds a cell or free
+    std::vector<Py_hash_t> hashes_;                       // -1 for a name that can't be hashed
+    std::unordered_multimap<Py_hash_t, Py_ssize_t> by_hash_;  // once there are more than LINEAR_MAX
+};
+#else
+class LocalsplusLayout {};  // for Bytecode::ArgLookup, which never makes one
 #endif
 
 static inline uint8_t extended_args_needed(uint32_t arg) noexcept
@@ -200,6 +272,10 @@ Bytecode Bytecode::from_code(PyCodeObject* co)
     int skip_cache   = 0;  // CACHE entries remaining to skip after current instr
     uint32_t ext_start = 0;
 
+#if UNIFIED_LOCALSPLUS
+    const LocalsplusLayout localsplus(bc.meta);
+#endif
+
     for (Py_ssize_t i = 0; i < nbytes; i += INSTR_BYTES) {
         uint8_t op      = raw[i];
         uint8_t raw_arg = raw[i + 1];
@@ -241,7 +317,7 @@ Bytecode Bytecode::from_code(PyCodeObject* co)
         case ArgKind::LOCAL:
         case ArgKind::FREE: {
 #if UNIFIED_LOCALSPLUS
-            PyObject* nm = localsplus_name(bc.meta, arg);
+            PyObject* nm = localsplus.name(arg);
             if (nm) {
                 bc.instrs.emplace_back(op, nm);
             } else {
@@ -292,20 +368,31 @@ Bytecode Bytecode::from_code(PyCodeObject* co)
 
     // ── Shared byte-offset → instruction-index map ────────────────────────
     // Built once from idx_to_off, reused below for both jump-target
-    // resolution and exception-table boundary resolution. A virtual entry
-    // at nbytes covers targets landing exactly one-past-the-end.
-    std::unordered_map<uint32_t, size_t> off_to_idx;
+    // resolution and exception-table boundary resolution. Offsets are
+    // word-aligned and bounded by nbytes, so this is a flat array indexed by
+    // word; the extra slot at the end covers targets landing exactly
+    // one-past-the-end. Offsets that start no instruction stay npos.
+    constexpr uint32_t npos = UINT32_MAX;
+    const size_t n_words = static_cast<size_t>(nbytes / INSTR_BYTES);
+    std::vector<uint32_t> off_to_idx(n_words + 1, npos);
     for (size_t k = 0; k < idx_to_off.size(); ++k)
-        off_to_idx[idx_to_off[k]] = k;
-    off_to_idx[static_cast<uint32_t>(nbytes)] = idx_to_off.size();
+        off_to_idx[idx_to_off[k] / INSTR_BYTES] = static_cast<uint32_t>(k);
+    off_to_idx[n_words] = static_cast<uint32_t>(idx_to_off.size());
+
+    auto find_idx = [&](uint32_t off) -> uint32_t {
+        if (off % INSTR_BYTES || off / INSTR_BYTES > n_words) return npos;
+        return off_to_idx[off / INSTR_BYTES];
+    };
 
     // ── Jump targets → Labels ──────────────────────────────────────────────
     // Every jump instruction's raw integer offset is replaced with a Label
     // attached directly to its target instruction (or end_labels), using
     // the exact offsets computed above — no heuristics, no separate
-    // symbolification pass needed later.
+    // symbolification pass needed later. Labels are shared per target
+    // offset, again through a flat per-word array (-1 = none yet), which the
+    // exception table below reuses too.
+    std::vector<int> off_to_label(n_words + 1, -1);
     {
-        std::unordered_map<uint32_t, Label> offset_to_label;
         for (size_t k = 0; k < bc.instrs.size(); ++k) {
             Instr& instr = bc.instrs[k];
             if (!is_jump_opcode(instr.op)) continue;
@@ -323,20 +410,25 @@ Bytecode Bytecode::from_code(PyCodeObject* co)
                 target = idx_to_nextoff[k] - ARG_TO_BYTE_OFFSET(arg_val);
             }
 
-            auto lit = offset_to_label.find(target);
-            if (lit != offset_to_label.end()) {
-                instr.arg = lit->second;
+            uint32_t idx = find_idx(target);
+            if (idx == npos) {
+                // Malformed bytecode; give it a label of its own that
+                // nothing carries, defensively.
+                instr.arg = bc.new_label();
+                continue;
+            }
+
+            int& slot = off_to_label[target / INSTR_BYTES];
+            if (slot >= 0) {
+                instr.arg = Label{slot};
                 continue;
             }
 
             Label lbl = bc.new_label();
-            offset_to_label[target] = lbl;
+            slot = lbl.id;
             instr.arg = lbl;
-
-            auto it = off_to_idx.find(target);
-            if (it == off_to_idx.end()) continue;  // malformed bytecode; skip defensively
-            if (it->second < bc.instrs.size())
-                bc.instrs[it->second].labels.push_back(lbl);
+            if (idx < bc.instrs.size())
+                bc.instrs[idx].labels.push_back(lbl);
             else
                 bc.end_labels.push_back(lbl);
         }
@@ -347,15 +439,31 @@ Bytecode Bytecode::from_code(PyCodeObject* co)
     {
         auto raw_entries = decode_exctable(co);
 
-        // Per-offset label cache: reuse labels when two entries share a
-        // boundary (including boundaries already labeled by a jump above).
-        std::unordered_map<uint32_t, Label> off_to_label;
+        // Reuse labels when two entries share a boundary (including
+        // boundaries already labeled by a jump above). A boundary that
+        // starts no instruction still gets a label, just not attached
+        // anywhere.
+        std::unordered_map<uint32_t, Label> unattached;
 
         auto get_or_create_label = [&](uint32_t byte_off) -> Label {
-            auto it = off_to_label.find(byte_off);
-            if (it != off_to_label.end()) return it->second;
+            uint32_t idx = find_idx(byte_off);
+            if (idx == npos) {
+                auto it = unattached.find(byte_off);
+                if (it != unattached.end()) return it->second;
+                Label lbl = bc.new_label();
+                unattached[byte_off] = lbl;
+                return lbl;
+            }
+            int& slot = off_to_label[byte_off / INSTR_BYTES];
+            if (slot >= 0) return Label{slot};
             Label lbl = bc.new_label();
-            off_to_label[byte_off] = lbl;
+            slot = lbl.id;
+            // Attach it directly to its target instruction (or to
+            // end_labels for the one-past-the-end sentinel index).
+            if (idx < bc.instrs.size())
+                bc.instrs[idx].labels.push_back(lbl);
+            else
+                bc.end_labels.push_back(lbl);
             return lbl;
         };
 
@@ -368,17 +476,6 @@ Bytecode Bytecode::from_code(PyCodeObject* co)
             el.lasti = e.lasti;
             bc.exc_labeled.push_back(el);
         }
-
-        // Attach each label directly to its target instruction (or to
-        // end_labels for the one-past-the-end sentinel index).
-        for (auto& [off, lbl] : off_to_label) {
-            auto it = off_to_idx.find(off);
-            if (it == off_to_idx.end()) continue;
-            if (it->second < bc.instrs.size())
-                bc.instrs[it->second].labels.push_back(lbl);
-            else
-                bc.end_labels.push_back(lbl);
-        }
     }
 #endif
 
@@ -394,22 +491,60 @@ Bytecode Bytecode::from_code(PyCodeObject* co)
 // Jump targets are already resolved to Labels by from_code() itself (see
 // above) — there's no separate symbolification step to run later.
 
-std::unordered_map<int, size_t> Bytecode::label_index_map() const
+LabelIndex::LabelIndex(const std::vector<Instr>& instrs, const std::vector<Label>& end_labels)
 {
-    std::unordered_map<int, size_t> m;
+    size_t count = end_labels.size();
+    int64_t lo = INT64_MAX, hi = INT64_MIN;
+    auto widen = [&](const Label& lbl) {
+        lo = std::min<int64_t>(lo, lbl.id);
+        hi = std::max<int64_t>(hi, lbl.id);
+    };
+    for (const auto& instr : instrs) {
+        count += instr.labels.size();
+        for (const auto& lbl : instr.labels) widen(lbl);
+    }
+    for (const auto& lbl : end_labels) widen(lbl);
+    if (count == 0) return;
+    reserve(count, lo, hi);
     for (size_t i = 0; i < instrs.size(); ++i)
         for (const auto& lbl : instrs[i].labels)
-            m[lbl.id] = i;
+            set(lbl.id, i);
     for (const auto& lbl : end_labels)
-        m[lbl.id] = instrs.size();
-    return m;
+        set(lbl.id, instrs.size());
+}
+
+LabelIndex::LabelIndex(const std::vector<std::pair<int, size_t>>& placed)
+{
+    if (placed.empty()) return;
+    int64_t lo = INT64_MAX, hi = INT64_MIN;
+    for (const auto& [id, idx] : placed) {
+        lo = std::min<int64_t>(lo, id);
+        hi = std::max<int64_t>(hi, id);
+    }
+    reserve(placed.size(), lo, hi);
+    for (const auto& [id, idx] : placed) set(id, idx);
+}
+
+void LabelIndex::reserve(size_t count, int64_t lo, int64_t hi)
+{
+    // Allow some slack for ids that were allocated and then dropped by edits.
+    uint64_t span = static_cast<uint64_t>(hi - lo) + 1;
+    dense_ = span <= 2 * static_cast<uint64_t>(count) + 256;
+    base_  = lo;
+    if (dense_) flat_.assign(static_cast<size_t>(span), npos);
+    else        sparse_.reserve(count);
+}
+
+LabelIndex Bytecode::label_index_map() const
+{
+    return LabelIndex(instrs, end_labels);
 }
 
 // ════════════════════════════════════════════════════════════════════════════
 // to_code — assemble a Bytecode back into a PyCodeObject
 // ════════════════════════════════════════════════════════════════════════════
 
-PyObject* Bytecode::to_code() const
+bool Bytecode::encode(EncodedCode& out, std::vector<int>* depths, bool release_gil) const
 {
     // ── Reject opcodes that cannot appear in an assembled code object ───────
     // The INSTRUMENTED_* family and ENTER_EXECUTOR are written into co_code by
@@ -421,7 +556,7 @@ PyObject* Bytecode::to_code() const
             PyErr_Format(PyExc_ValueError,
                 "opcode %d is internal to the interpreter and cannot be assembled",
                 static_cast<int>(instr.op));
-            return nullptr;
+            return false;
         }
     }
 
@@ -440,8 +575,8 @@ PyObject* Bytecode::to_code() const
 #if HAS_EXCEPTION_TABLE
         , exc_local
 #endif
-    );
-    if (stacksize < 0) return nullptr;  // exception already set
+        , depths);
+    if (stacksize < 0) return false;  // exception already set
 
     // ── Build initial slot list ───────────────────────────────────────────
     // For integer args, set n_extended upfront — these are fixed values that
@@ -465,7 +600,14 @@ PyObject* Bytecode::to_code() const
     // Variable names are interned first and indexed second, in two separate
     // sweeps: adding a name to co_varnames shifts the localsplus index of every
     // cell and free variable after it, so no index is meaningful until every
-    // name is in place.
+    // name is in place. The layout is therefore computed once for the first
+    // sweep (where only membership matters) and, if that sweep added any
+    // locals, once more for the second.
+    TableIndex::Batch consts_batch(consts_index), varnames_batch(varnames_index);
+#if UNIFIED_LOCALSPLUS
+    auto localsplus = std::make_unique<LocalsplusLayout>(meta);
+    bool localsplus_stale = false;
+#endif
     for (auto& slot : slots) {
         if (slot.instr.op == 0) continue;
         if (!std::holds_alternative<PyObject*>(slot.instr.arg)) continue;
@@ -478,24 +620,42 @@ PyObject* Bytecode::to_code() const
             // 3.13 LOAD_CLOSURE is classified this way, and from 3.14 so is
             // LOAD_DEREF — so it only becomes a new plain local if it is in
             // none of the tables.
-            if (localsplus_find(meta, pv) < 0 && find_or_add(meta.varnames, pv) < 0) return nullptr;
+            if (localsplus->find(pv) < 0) {
+                Py_ssize_t n = PyList_GET_SIZE(meta.varnames);
+                Py_ssize_t idx = varnames_index.find_or_add(meta.varnames, pv);
+                if (idx < 0) return false;
+                if (idx == n) {
+                    localsplus->append(pv, false);
+                    localsplus_stale = true;
+                }
+            }
 #else
-            if (find_or_add(meta.varnames, pv) < 0) return nullptr;
+            if (varnames_index.find_or_add(meta.varnames, pv) < 0) return false;
 #endif
             break;
         case ArgKind::FREE:
             // Never append to cellvars: a name in neither table is a free
             // variable, and making it a cell would silently change what the
             // code object closes over.
+#if UNIFIED_LOCALSPLUS
+            if (!localsplus->is_closure(pv)) {
+                if (PyList_Append(meta.freevars, pv) < 0) return false;
+                localsplus->append(pv, true);
+            }
+#else
             if (find_only(meta.cellvars, pv) < 0 && find_only(meta.freevars, pv) < 0
                 && find_or_add(meta.freevars, pv) < 0)
-                return nullptr;
+                return false;
+#endif
             break;
         default:
             break;
         }
     }
 
+#if UNIFIED_LOCALSPLUS
+    if (localsplus_stale) localsplus = std::make_unique<LocalsplusLayout>(meta);
+#endif
     for (auto& slot : slots) {
         if (slot.instr.op == 0) continue;
         if (!std::holds_alternative<PyObject*>(slot.instr.arg)) continue;
@@ -505,15 +665,15 @@ PyObject* Bytecode::to_code() const
         ArgKind kind = arg_kind(slot.instr.op);
         switch (kind) {
         case ArgKind::CONST:
-            idx = find_or_add(meta.consts, pv);
+            idx = consts_index.find_or_add(meta.consts, pv);
             break;
         case ArgKind::LOCAL:
         case ArgKind::FREE:
 #if UNIFIED_LOCALSPLUS
-            idx = localsplus_find(meta, pv);
+            idx = localsplus->find(pv);
 #else
             if (kind == ArgKind::LOCAL) {
-                idx = find_only(meta.varnames, pv);
+                idx = varnames_index.find(meta.varnames, pv);
             } else {
                 idx = find_only(meta.cellvars, pv);
                 if (idx < 0) {
@@ -531,7 +691,7 @@ PyObject* Bytecode::to_code() const
             // fail loudly rather than encode a bogus index.
             if (!PyErr_Occurred())
                 PyErr_Format(PyExc_ValueError, "cannot resolve variable argument %R", pv);
-            return nullptr;
+            return false;
         }
 
         // Replace PyObject* arg with resolved integer index and update n_extended.
@@ -539,226 +699,303 @@ PyObject* Bytecode::to_code() const
         slot.n_extended = extended_args_needed(static_cast<uint32_t>(idx));
     }
 
-    // ── Relaxation: label maps rebuilt each iteration ─────────────────────
+    // ── Relaxation ────────────────────────────────────────────────────────
     // Every slot is a real instruction now (no zero-width anchors) — a
     // label's byte offset is simply the offset of the instruction it's
-    // attached to. end_labels resolve to total_bytes, the one-past-the-end
-    // position, computed fresh each iteration below.
-
-    uint32_t total_bytes = 0;
-
-    auto compute_label_map = [&]() {
-        std::unordered_map<int,uint32_t> m;
-        for (const auto& slot : slots)
-            for (const auto& lbl : slot.instr.labels)
-                m[lbl.id] = slot.offset;
-        for (const auto& lbl : end_labels)
-            m[lbl.id] = total_bytes;
-        return m;
+    // attached to, so each jump is resolved once, up front, to the index of
+    // its target slot (slots.size() for end_labels, i.e. total_bytes).
+    struct JumpSlot {
+        size_t slot;    // index of the jump in `slots`
+        size_t target;  // index of the slot its label is attached to
     };
+    std::vector<JumpSlot> jumps;
+    for (size_t i = 0; i < slots.size(); ++i) {
+        if (auto* lbl = std::get_if<Label>(&slots[i].instr.arg)) {
+            size_t target = label_idx.find(lbl->id);
+            if (target == LabelIndex::npos) {
+                PyErr_Format(PyExc_ValueError, "unresolved label id %d", lbl->id);
+                return false;
+            }
+            jumps.push_back(JumpSlot{i, target});
+        }
+    }
 
-    // ── Relaxation ────────────────────────────────────────────────────────
-    bool changed = true;
+#if HAS_EXCEPTION_TABLE
+    // The slots each exception table entry's labels are attached to; their
+    // byte offsets are read off the final layout.
+    struct ExcSlots {
+        size_t start, stop, handler;
+        int    depth;
+        bool   lasti;
+    };
+    std::vector<ExcSlots> exc_slots;
+    exc_slots.reserve(exc_local.size());
+    for (const auto& el : exc_local) {
+        for (const Label* lbl : {&el.start_lbl, &el.stop_lbl, &el.handler_lbl}) {
+            if (label_idx.find(lbl->id) == LabelIndex::npos) {
+                PyErr_Format(PyExc_ValueError,
+                    "exception table label id=%d not found", lbl->id);
+                return false;
+            }
+        }
+        exc_slots.push_back(ExcSlots{label_idx.find(el.start_lbl.id),
+                                     label_idx.find(el.stop_lbl.id),
+                                     label_idx.find(el.handler_lbl.id), el.depth, el.lasti});
+    }
+#endif
+
+    // ── Layout and emission ───────────────────────────────────────────────
+    // From here until the bytes objects are made, only the locals above are
+    // touched: no Python object, nothing of `this`. With `release_gil` that
+    // part runs with the GIL released, so other threads can run meanwhile.
+    const int firstlineno = meta.firstlineno;
+    std::vector<uint8_t> code, linetable;
+#if HAS_EXCEPTION_TABLE
+    std::vector<uint8_t> exctable;
+#endif
+    auto lay_out_and_emit = [&]() {
+        uint32_t total_bytes = 0;
+        auto offset_of = [&](size_t idx) {
+            return idx < slots.size() ? slots[idx].offset : total_bytes;
+        };
 
-    while (changed) {
-        changed = false;
+        // The encoded arg of a jump under the current layout. For relative jumps
+        // (FWD/BWD) this is the *distance* to/from the next instruction, not the
+        // target's absolute offset — using the absolute offset would silently
+        // under-grow EXTENDED_ARG for any backward jump whose target offset is
+        // small but whose distance is large (e.g. a big module-level code object
+        // jumping back near its start from near its end).
+        auto jump_arg = [&](const JumpSlot& j) -> uint32_t {
+            const InstrSlot& slot = slots[j.slot];
+            uint32_t target_byte = offset_of(j.target);
+            JumpKind jk = jump_kind(slot.instr.op);
+            if (jk == JumpKind::ABS || jk == JumpKind::NONE)
+                return BYTE_OFFSET_TO_ARG(target_byte);
+            uint32_t ncache  = static_cast<uint32_t>(instr_cache_size(slot.instr.op));
+            uint32_t next_by = slot.offset
+                             + static_cast<uint32_t>(slot.n_extended + 1) * INSTR_BYTES
+                             + ncache * INSTR_BYTES;
+            uint32_t diff_by = (jk == JumpKind::FWD) ? (target_byte - next_by)
+                                                     : (next_by - target_byte);
+            return BYTE_OFFSET_TO_ARG(diff_by);
+        };
+
+        // The slots whose size determines a jump's arg: for a forward jump the
+        // ones strictly between it and its target, for a backward jump the target
+        // up to and including the jump itself, and for an absolute one everything
+        // before the target. A jump only needs rechecking if one of these grew.
+        auto span_of = [&](const JumpSlot& j) -> std::pair<size_t, size_t> {
+            switch (jump_kind(slots[j.slot].instr.op)) {
+            case JumpKind::FWD:
+                return {std::min(j.slot + 1, j.target), std::max(j.slot + 1, j.target)};
+            case JumpKind::BWD:
+                return {std::min(j.target, j.slot + 1), std::max(j.target, j.slot + 1)};
+            default:
+                return {0, j.target};
+            }
+        };
 
-        // Assign offsets (including CACHE entries in the byte count so that
+        // grown_before[i]: how many slots before i grew in the last round; a
+        // span [lo, hi) contains a grown slot iff the counts at its ends differ.
+        std::vector<uint32_t> grown_before(slots.size() + 1, 0);
+        std::vector<uint8_t>  grew(slots.size(), 0);
+        std::vector<size_t>   pending(jumps.size());
+        for (size_t k = 0; k < jumps.size(); ++k) pending[k] = k;
+
+        // Lay out every slot (including CACHE entries in the byte count so that
         // jump args resolve to the correct CACHE-inclusive positions).
-        uint32_t off = 0;
-        for (auto& slot : slots) {
-            slot.offset = off;
-            off += static_cast<uint32_t>(slot.n_extended + 1) * INSTR_BYTES;
+        auto layout = [&]() {
+            uint32_t off = 0, grown = 0;
+            for (size_t i = 0; i < slots.size(); ++i) {
+                grown_before[i] = grown;
+                grown += grew[i];
+                grew[i] = 0;
+                InstrSlot& slot = slots[i];
+                slot.offset = off;
+                off += static_cast<uint32_t>(slot.n_extended + 1) * INSTR_BYTES;
 #if HAS_CACHE_ENTRIES
-            off += static_cast<uint32_t>(instr_cache_size(slot.instr.op)) * INSTR_BYTES;
+                off += static_cast<uint32_t>(instr_cache_size(slot.instr.op)) * INSTR_BYTES;
 #endif
-        }
-        total_bytes = off;
-
-        auto lmap = compute_label_map();
-
-        // Check and grow n_extended for jump instructions. Must mirror the
-        // emit loop's arg computation exactly: for relative jumps (FWD/BWD)
-        // the encoded arg is the *distance* to/from the next instruction,
-        // not the target's absolute offset — using the absolute offset
-        // here would silently under-grow EXTENDED_ARG for any backward
-        // jump whose target offset is small but whose distance is large
-        // (e.g. a big module-level code object jumping back near its start
-        // from near its end).
-        for (auto& slot : slots) {
-            if (auto* lbl = std::get_if<Label>(&slot.instr.arg)) {
-                auto it = lmap.find(lbl->id);
-                if (it == lmap.end()) {
-                    PyErr_Format(PyExc_ValueError, "unresolved label id %d", lbl->id);
-                    return nullptr;
-                }
-                uint32_t target_byte = it->second;
-                JumpKind jk = jump_kind(slot.instr.op);
-                uint32_t arg_val;
-                if (jk == JumpKind::ABS || jk == JumpKind::NONE) {
-                    arg_val = BYTE_OFFSET_TO_ARG(target_byte);
-                } else {
-                    uint32_t ncache  = static_cast<uint32_t>(instr_cache_size(slot.instr.op));
-                    uint32_t next_by = slot.offset
-                                     + static_cast<uint32_t>(slot.n_extended + 1) * INSTR_BYTES
-                                     + ncache * INSTR_BYTES;
-                    uint32_t diff_by = (jk == JumpKind::FWD)
-                                     ? (target_byte - next_by)
-                                     : (next_by - target_byte);
-                    arg_val = BYTE_OFFSET_TO_ARG(diff_by);
+            }
+            grown_before[slots.size()] = grown;
+            total_bytes = off;
+        };
+
+        // Every round grows at least one jump's EXTENDED_ARG prefix, and a prefix
+        // never grows past 3, so this terminates. The first round checks every
+        // jump; later ones only those whose span crosses a slot that just grew,
+        // and only jumps that can still grow are carried from round to round.
+        layout();
+        std::vector<size_t> next;
+        bool first = true;
+        while (!pending.empty()) {
+            bool changed = false;
+            next.clear();
+            for (size_t k : pending) {
+                const JumpSlot& j = jumps[k];
+                InstrSlot& slot = slots[j.slot];
+                if (!first) {
+                    auto [lo, hi] = span_of(j);
+                    if (grown_before[hi] == grown_before[lo]) {
+                        next.push_back(k);
+                        continue;
+                    }
                 }
-                uint8_t needed = extended_args_needed(arg_val);
+                uint8_t needed = extended_args_needed(jump_arg(j));
                 if (needed > slot.n_extended) {
                     slot.n_extended = needed;
+                    grew[j.slot] = 1;
                     changed = true;
                 }
+                if (slot.n_extended < 3) next.push_back(k);
             }
+            if (!changed) break;
+            pending.swap(next);
+            first = false;
+            layout();
         }
-    }
 
-    auto lmap = compute_label_map();
-
-    // ── Emit bytecode words ───────────────────────────────────────────────
-    // total_bytes accounts only for logical instructions; CACHE entries are
-    // appended below and don't participate in the relaxation layout.
-    std::vector<uint8_t> code;
-    code.reserve(total_bytes);
-
-    for (const auto& slot : slots) {
-        // Resolve arg value.
-        // PyObject* args were already resolved to integer indices in the pre-pass.
-        uint32_t arg_val = 0;
-        if (auto* i = std::get_if<int>(&slot.instr.arg)) {
-            arg_val = static_cast<uint32_t>(*i);
-        } else if (auto* lbl = std::get_if<Label>(&slot.instr.arg)) {
-            uint32_t target_byte = lmap.at(lbl->id);
-            JumpKind jk = jump_kind(slot.instr.op);
-            if (jk == JumpKind::ABS || jk == JumpKind::NONE) {
-                arg_val = BYTE_OFFSET_TO_ARG(target_byte);
-            } else {
-                // Relative jump: arg = |target - next_instr| in word units.
-                uint32_t ncache   = static_cast<uint32_t>(instr_cache_size(slot.instr.op));
-                uint32_t next_by  = slot.offset
-                                  + static_cast<uint32_t>(slot.n_extended + 1) * INSTR_BYTES
-                                  + ncache * INSTR_BYTES;
-                uint32_t diff_by  = (jk == JumpKind::FWD)
-                                  ? (target_byte - next_by)
-                                  : (next_by - target_byte);
-                arg_val = BYTE_OFFSET_TO_ARG(diff_by);
+        // ── Emit bytecode words ───────────────────────────────────────────
+        // total_bytes accounts only for logical instructions; CACHE entries are
+        // appended below and don't participate in the relaxation layout.
+        code.reserve(total_bytes);
+
+        size_t next_jump = 0;
+        for (size_t i = 0; i < slots.size(); ++i) {
+            const InstrSlot& slot = slots[i];
+            // Resolve arg value.
+            // PyObject* args were already resolved to integer indices in the pre-pass.
+            uint32_t arg_val = 0;
+            if (auto* iv = std::get_if<int>(&slot.instr.arg)) {
+                arg_val = static_cast<uint32_t>(*iv);
+            } else if (next_jump < jumps.size() && jumps[next_jump].slot == i) {
+                arg_val = jump_arg(jumps[next_jump++]);
             }
-        }
-        // PyObject* args should be resolved to indices before to_code().
-
-        // Emit EXTENDED_ARG prefixes (most-significant first).
-        uint8_t shifts = slot.n_extended;
-        while (shifts > 0) {
-            uint8_t ext_arg = static_cast<uint8_t>(arg_val >> (shifts * 8));
-            code.push_back(EXTENDED_ARG);
-            code.push_back(ext_arg);
-            --shifts;
-        }
-        code.push_back(slot.instr.op);
-        code.push_back(static_cast<uint8_t>(arg_val & 0xFF));
+            // PyObject* args should be resolved to indices before to_code().
+
+            // Emit EXTENDED_ARG prefixes (most-significant first).
+            uint8_t shifts = slot.n_extended;
+            while (shifts > 0) {
+                uint8_t ext_arg = static_cast<uint8_t>(arg_val >> (shifts * 8));
+                code.push_back(EXTENDED_ARG);
+                code.push_back(ext_arg);
+                --shifts;
+            }
+            code.push_back(slot.instr.op);
+            code.push_back(static_cast<uint8_t>(arg_val & 0xFF));
 
 #if HAS_CACHE_ENTRIES
-        // Re-insert CACHE (opcode 0, arg 0) entries stripped during from_code().
-        int ncache = instr_cache_size(slot.instr.op);
-        for (int c = 0; c < ncache; ++c) {
-            code.push_back(0);  // CACHE opcode
-            code.push_back(0);
-        }
+            // Re-insert CACHE (opcode 0, arg 0) entries stripped during from_code().
+            int ncache = instr_cache_size(slot.instr.op);
+            for (int c = 0; c < ncache; ++c) {
+                code.push_back(0);  // CACHE opcode
+                code.push_back(0);
+            }
 #endif
-    }
-
-    // ── Encode location table ─────────────────────────────────────────────
-    // The location table has one entry per *word* in the code stream
-    // (including CACHE words and EXTENDED_ARG words).
-    // Expand each logical slot into: EXTENDED_ARG words + 1 instruction + ncache words.
-    std::vector<InstrSlot> real_slots;
-    real_slots.reserve(slots.size() * 4);
-    for (const auto& slot : slots) {
-        // Virtual slots for EXTENDED_ARG prefix words (same location as instruction).
-        // slot.offset is the start of the EXTENDED_ARG chain.
-        for (uint8_t e = 0; e < slot.n_extended; ++e) {
-            InstrSlot es{Instr(EXTENDED_ARG, 0), 0, 0};
-            es.instr.loc  = slot.instr.loc;
-            es.n_extended = 0;
-            es.offset     = slot.offset + static_cast<uint32_t>(e) * INSTR_BYTES;
-            real_slots.push_back(es);
         }
 
-        // The instruction itself (positioned after its EXTENDED_ARGs).
-        InstrSlot main_slot = slot;
-        main_slot.n_extended = 0;
-        main_slot.offset = slot.offset + slot.n_extended * INSTR_BYTES;
-        real_slots.push_back(main_slot);
+        // ── Encode location table ─────────────────────────────────────────
+        // The location table has one entry per *word* in the code stream
+        // (including CACHE words and EXTENDED_ARG words).
+        // Expand each logical slot into: EXTENDED_ARG words + 1 instruction + ncache words.
+        std::vector<InstrSlot> real_slots;
+        real_slots.reserve(slots.size() * 4);
+        for (const auto& slot : slots) {
+            // Virtual slots for EXTENDED_ARG prefix words (same location as instruction).
+            // slot.offset is the start of the EXTENDED_ARG chain.
+            for (uint8_t e = 0; e < slot.n_extended; ++e) {
+                InstrSlot es{Instr(EXTENDED_ARG, 0), 0, 0};
+                es.instr.loc  = slot.instr.loc;
+                es.n_extended = 0;
+                es.offset     = slot.offset + static_cast<uint32_t>(e) * INSTR_BYTES;
+                real_slots.push_back(es);
+            }
+
+            // The instruction itself (positioned after its EXTENDED_ARGs).
+            InstrSlot main_slot = slot;
+            main_slot.n_extended = 0;
+            main_slot.offset = slot.offset + slot.n_extended * INSTR_BYTES;
+            real_slots.push_back(main_slot);
 
 #if HAS_CACHE_ENTRIES
-        int ncache = instr_cache_size(slot.instr.op);
-        for (int c = 0; c < ncache; ++c) {
-            InstrSlot cs{Instr(0, 0), 0, 0};
-            cs.instr.loc  = slot.instr.loc;
-            cs.n_extended = 0;
-            cs.offset     = main_slot.offset + static_cast<uint32_t>(1 + c) * INSTR_BYTES;
-            real_slots.push_back(cs);
-        }
+            int ncache = instr_cache_size(slot.instr.op);
+            for (int c = 0; c < ncache; ++c) {
+                InstrSlot cs{Instr(0, 0), 0, 0};
+                cs.instr.loc  = slot.instr.loc;
+                cs.n_extended = 0;
+                cs.offset     = main_slot.offset + static_cast<uint32_t>(1 + c) * INSTR_BYTES;
+                real_slots.push_back(cs);
+            }
 #endif
-    }
+        }
 
-    PyObject* linetable = encode_linetable(real_slots, meta.firstlineno);
-    if (!linetable) return nullptr;
+        encode_linetable(real_slots, firstlineno, linetable);
 
 #if HAS_EXCEPTION_TABLE
-    // Resolve ExcEntryL labels → byte offsets using the now-final lmap.
-    std::vector<ExcEntry> exc_resolved;
-    exc_resolved.reserve(exc_local.size());
-    for (const auto& el : exc_local) {
-        auto resolve = [&](const Label& lbl) -> uint32_t {
-            auto it = lmap.find(lbl.id);
-            if (it == lmap.end()) {
-                PyErr_Format(PyExc_ValueError,
-                    "exception table label id=%d not found", lbl.id);
-                return static_cast<uint32_t>(-1);
-            }
-            return it->second;
-        };
-        ExcEntry e;
-        e.start_offset   = resolve(el.start_lbl);
-        e.stop_offset    = resolve(el.stop_lbl);
-        e.handler_offset = resolve(el.handler_lbl);
-        // Any unresolved label leaves a ValueError set; bail out on any -1.
-        if (e.start_offset   == static_cast<uint32_t>(-1) ||
-            e.stop_offset    == static_cast<uint32_t>(-1) ||
-            e.handler_offset == static_cast<uint32_t>(-1)) {
-            Py_DECREF(linetable);
-            return nullptr;
+        std::vector<ExcEntry> exc_resolved;
+        exc_resolved.reserve(exc_slots.size());
+        for (const auto& e : exc_slots)
+            exc_resolved.push_back(ExcEntry{offset_of(e.start), offset_of(e.stop),
+                                            offset_of(e.handler), e.depth, e.lasti});
+        encode_exctable(exc_resolved, exctable);
+#endif
+    };
+
+    bool ok = true;
+    auto run = [&]() {
+        try {
+            lay_out_and_emit();
+        } catch (const std::bad_alloc&) {
+            ok = false;
         }
-        e.depth = el.depth;
-        e.lasti = el.lasti;
-        exc_resolved.push_back(e);
+    };
+    if (release_gil) {
+        Py_BEGIN_ALLOW_THREADS
+        run();
+        Py_END_ALLOW_THREADS
+    } else {
+        run();
+    }
+    if (!ok) {
+        PyErr_NoMemory();
+        return false;
     }
-    PyObject* exctable = encode_exctable(exc_resolved);
-    if (!exctable) { Py_DECREF(linetable); return nullptr; }
-#endif
 
-    // ── Build PyCodeObject ────────────────────────────────────────────────
-    PyObject* code_bytes = PyBytes_FromStringAndSize(
-        reinterpret_cast<const char*>(code.data()),
-        static_cast<Py_ssize_t>(code.size()));
-    if (!code_bytes) {
-        Py_DECREF(linetable);
+    // ── Hand the encoding over ────────────────────────────────────────────
+    auto as_bytes = [](const std::vector<uint8_t>& v) {
+        return PyBytes_FromStringAndSize(reinterpret_cast<const char*>(v.data()),
+                                         static_cast<Py_ssize_t>(v.size()));
+    };
+    EncodedCode enc;
+    if (!(enc.code = as_bytes(code)) || !(enc.linetable = as_bytes(linetable)))
+        return false;
 #if HAS_EXCEPTION_TABLE
-        Py_DECREF(exctable);
+    if (!(enc.exctable = as_bytes(exctable))) return false;
 #endif
-        return nullptr;
-    }
+    enc.stacksize = stacksize;
+    out = std::move(enc);
+    return true;
+}
+
+PyObject* Bytecode::to_code() const
+{
+    EncodedCode enc;
+    if (!encode(enc)) return nullptr;
+    return build_code(enc);
+}
+
+// ════════════════════════════════════════════════════════════════════════════
+// build_code — wrap an encoding in a PyCodeObject
+// ════════════════════════════════════════════════════════════════════════════
 
+PyObject* Bytecode::build_code(const EncodedCode& enc, PyObject* consts) const
+{
     // co_nlocals must equal len(co_varnames); recompute in case new locals were added.
     const_cast<CodeMeta&>(meta).nlocals =
         static_cast<int>(PyList_GET_SIZE(meta.varnames));
 
     // PY_CODE_NEW_FN expects tuples for the table arguments.
-    PyObject* consts_t   = PyList_AsTuple(meta.consts);
+    PyObject* consts_t   = consts ? Py_NewRef(consts) : PyList_AsTuple(meta.consts);
     PyObject* names_t    = PyList_AsTuple(meta.names);
     PyObject* varnames_t = PyList_AsTuple(meta.varnames);
     PyObject* freevars_t = PyList_AsTuple(meta.freevars);
@@ -771,10 +1008,6 @@ PyObject* Bytecode::to_code() const
 
     if (!consts_t || !names_t || !varnames_t || !freevars_t || !cellvars_t) {
         cleanup_tuples();
-        Py_DECREF(code_bytes); Py_DECREF(linetable);
-#if HAS_EXCEPTION_TABLE
-        Py_DECREF(exctable);
-#endif
         return nullptr;
     }
 
@@ -786,9 +1019,9 @@ PyObject* Bytecode::to_code() const
         meta.posonlyargcount,
         meta.kwonlyargcount,
         meta.nlocals,
-        stacksize,
+        enc.stacksize,
         meta.flags,
-        code_bytes,
+        enc.code,
         consts_t,
         names_t,
         varnames_t,
@@ -798,17 +1031,17 @@ PyObject* Bytecode::to_code() const
         meta.name,
         meta.qualname,
         meta.firstlineno,
-        linetable,
-        exctable);
+        enc.linetable,
+        enc.exctable);
 #else  // 3.10
     result = (PyObject*)PyCode_NewWithPosOnlyArgs(
         meta.argcount,
         meta.posonlyargcount,
         meta.kwonlyargcount,
         meta.nlocals,
-        stacksize,
+        enc.stacksize,
         meta.flags,
-        code_bytes,
+        enc.code,
         consts_t,
         names_t,
         varnames_t,
@@ -817,17 +1050,10 @@ PyObject* Bytecode::to_code() const
         meta.filename,
         meta.name,
         meta.firstlineno,
-        linetable);  // lnotab on 3.10
+        enc.linetable);  // lnotab on 3.10
 #endif
 
     cleanup_tuples();
-
-    Py_DECREF(code_bytes);
-    Py_DECREF(linetable);
-#if HAS_EXCEPTION_TABLE
-    Py_DECREF(exctable);
-#endif
-
     return result;
 }
 
@@ -837,3 +1063,78 @@ Label Bytecode::new_label()
 {
     return Label{next_label_id++};
 }
+
+// ════════════════════════════════════════════════════════════════════════════
+// ArgLookup — where an object arg sits in the tables
+// ════════════════════════════════════════════════════════════════════════════
+
+Bytecode::ArgLookup::ArgLookup(const Bytecode& bc)
+    : bc_(bc), consts_batch_(bc.consts_index), varnames_batch_(bc.varnames_index)
+{
+}
+
+Bytecode::ArgLookup::~ArgLookup() = default;
+
+int32_t Bytecode::ArgLookup::find(uint8_t op, PyObject* obj)
+{
+    size_t table;
+    switch (arg_kind(op)) {
+    case ArgKind::CONST: table = 0; break;
+    case ArgKind::LOCAL: table = 1; break;
+    case ArgKind::FREE:  table = 2; break;
+    default:             return -1;
+    }
+    auto& slot = recent_[table][(reinterpret_cast<uintptr_t>(obj) >> 4) % 64];
+    if (slot.first != obj) slot = {obj, lookup(op, obj)};
+    return slot.second;
+}
+
+int32_t Bytecode::ArgLookup::lookup(uint8_t op, PyObject* obj)
+{
+    const CodeMeta& meta = bc_.meta;
+    Py_ssize_t idx = -1;
+    ArgKind kind = arg_kind(op);
+    switch (kind) {
+    case ArgKind::CONST:
+        idx = bc_.consts_index.find(meta.consts, obj);
+        break;
+    case ArgKind::LOCAL:
+    case ArgKind::FREE:
+#if UNIFIED_LOCALSPLUS
+        if (!localsplus_) localsplus_ = std::make_unique<LocalsplusLayout>(meta);
+        idx = localsplus_->find(obj);
+#else
+        if (kind == ArgKind::LOCAL) {
+            idx = bc_.varnames_index.find(meta.varnames, obj);
+        } else {
+            idx = find_only(meta.cellvars, obj);
+            if (idx < 0) {
+                Py_ssize_t fi = find_only(meta.freevars, obj);
+                if (fi >= 0) idx = PyList_GET_SIZE(meta.cellvars) + fi;
+            }
+        }
+#endif
+        break;
+    default:
+        break;
+    }
+    return static_cast<int32_t>(idx);
+}
+
+// ════════════════════════════════════════════════════════════════════════════
+// stack_depths — each instruction's entry depth, as encode() computes it
+// ════════════════════════════════════════════════════════════════════════════
+
+bool Bytecode::stack_depths(std::vector<int>& out) const
+{
+    auto label_idx = label_index_map();
+#if HAS_EXCEPTION_TABLE
+    // As in encode(): EXC_DEPTH_AUTO entries are resolved on a copy.
+    auto exc_local = exc_labeled;
+#endif
+    return compute_stacksize(instrs, label_idx
+#if HAS_EXCEPTION_TABLE
+        , exc_local
+#endif
+        , &out) >= 0;
+}
@@ -3,7 +3,10 @@
 #include "compat.h"
 #include "instr.h"
 #include "exctable.h"
+#include "labelindex.h"
+#include "tableindex.h"
 
+#include <memory>
 #include <vector>
 #include <unordered_map>
 #include <stdexcept>
@@ -57,6 +60,45 @@ struct CodeMeta {
     }
 };
 
+// Bytecode.to_code() releases the GIL while encoding code objects of at least
+// this many instructions (see Bytecode::encode()). Below that, releasing the
+// GIL and taking it back costs more than other threads would gain.
+constexpr size_t ENCODE_RELEASE_GIL_MIN = 256;
+
+// ── EncodedCode ───────────────────────────────────────────────────────────────
+// What to_code() derives from the instruction stream: everything a code object
+// needs apart from the tables and the metadata. Kept separately so a caller
+// that has only changed metadata can build a new code object around a
+// previous encoding (see Bytecode::build_code()).
+struct EncodedCode {
+    PyObject* code      = nullptr;  // owned bytes: co_code
+    PyObject* linetable = nullptr;  // owned bytes: co_linetable (co_lnotab on 3.10)
+    PyObject* exctable  = nullptr;  // owned bytes: co_exceptiontable; unused before 3.11
+    int       stacksize = 0;
+
+    EncodedCode() = default;
+    EncodedCode(const EncodedCode&) = delete;
+    EncodedCode& operator=(const EncodedCode&) = delete;
+    EncodedCode(EncodedCode&& o) noexcept { *this = std::move(o); }
+    EncodedCode& operator=(EncodedCode&& o) noexcept {
+        if (this != &o) {
+            clear();
+            code = o.code; linetable = o.linetable; exctable = o.exctable;
+            stacksize = o.stacksize;
+            o.code = o.linetable = o.exctable = nullptr;
+        }
+        return *this;
+    }
+    ~EncodedCode() { clear(); }
+
+    void clear() noexcept {
+        Py_CLEAR(code); Py_CLEAR(linetable); Py_CLEAR(exctable);
+        stacksize = 0;
+    }
+};
+
+class LocalsplusLayout;
+
 // ── Bytecode ──────────────────────────────────────────────────────────────────
 // A mutable, label-aware instruction sequence.
 //
@@ -93,6 +135,14 @@ public:
     // Next label id to allocate.
     int next_label_id = 0;
 
+    // Hash indexes used to intern values into meta.consts / names / varnames
+    // (see tableindex.h). Mutable: to_code() is const but appends to the
+    // tables it interns into. Constants compare type-strictly, so 0/False and
+    // 1/True stay distinct; names are plain strings.
+    mutable TableIndex consts_index{true};
+    mutable TableIndex names_index{false};
+    mutable TableIndex varnames_index{false};
+
     // ── Construction ─────────────────────────────────────────────────────────
     static Bytecode from_code(PyCodeObject* co);
 
@@ -102,13 +152,54 @@ public:
     // or NULL with a Python exception set.
     PyObject* to_code() const;
 
+    // The two halves of to_code(). encode() interns arguments into the tables
+    // (so it may append to them) and fills `out`; build_code() wraps an
+    // encoding in a code object with the current tables and metadata. Both
+    // return false / NULL with a Python exception set on failure.
+    // `consts`, if given, is a tuple used as co_consts in place of
+    // meta.consts, item for item (e.g. with nested code already built).
+    // `depths`, if given, gets each instruction's entry stack depth from the
+    // same pass that computes co_stacksize (see compute_stacksize()).
+    // With `release_gil`, encode() lets go of the GIL while it lays out and
+    // emits the code and tables, which reads nothing but its own copies (see
+    // ENCODE_RELEASE_GIL_MIN).
+    bool      encode(EncodedCode& out, std::vector<int>* depths = nullptr,
+                     bool release_gil = false) const;
+    PyObject* build_code(const EncodedCode& enc, PyObject* consts = nullptr) const;
+
+    // ── Inspection ───────────────────────────────────────────────────────────
+    // Where an op's object arg sits in the tables: its index in co_consts or
+    // in the localsplus, or -1 for anything else and for an object in none of
+    // them. Only looks, never adds. Lookups made through one ArgLookup share
+    // a TableIndex::Batch, so they must not run other Python code in between.
+    class ArgLookup {
+    public:
+        explicit ArgLookup(const Bytecode& bc);
+        ~ArgLookup();
+        int32_t find(uint8_t op, PyObject* obj);
+
+    private:
+        int32_t lookup(uint8_t op, PyObject* obj);
+
+        const Bytecode&                   bc_;
+        TableIndex::Batch                 consts_batch_, varnames_batch_;
+        std::unique_ptr<LocalsplusLayout> localsplus_;  // built on first use
+        // Recent answers by address, per table (consts, locals, frees): the
+        // same few objects come up over and over.
+        std::pair<PyObject*, int32_t>     recent_[3][64] = {};
+    };
+
+    // The stack depth each instruction is entered at, as encode() computes
+    // it, without encoding. False with a Python exception set on failure.
+    bool stack_depths(std::vector<int>& out) const;
+
     // ── Label helpers ─────────────────────────────────────────────────────────
     Label new_label();
 
     // Recompute label id -> current index in `instrs` in one O(n) pass, by
     // scanning each instruction's `.labels`. Labels in `end_labels` map to
     // instrs.size() (one past the last real instruction).
-    std::unordered_map<int, size_t> label_index_map() const;
+    LabelIndex label_index_map() const;
 
 private:
     // Inline relaxation loop used by to_code() — not exposed as a static method.
@@ -0,0 +1,18 @@
+// Auto-generated for CPython 3.11
+static inline int instr_cache_size(uint8_t op) noexcept {
+    switch (op) {
+    case 25: return 4;  // BINARY_SUBSCR
+    case 60: return 1;  // STORE_SUBSCR
+    case 92: return 1;  // UNPACK_SEQUENCE
+    case 95: return 4;  // STORE_ATTR
+    case 106: return 4;  // LOAD_ATTR
+    case 107: return 2;  // COMPARE_OP
+    case 116: return 5;  // LOAD_GLOBAL
+    case 122: return 1;  // BINARY_OP
+    case 160: return 10;  // LOAD_METHOD
+    case 166: return 1;  // PRECALL
+    case 171: return 4;  // CALL
+    default: return 0;
+    }
+}
+#define HAS_CACHE_ENTRIES 1
@@ -72,3 +72,48 @@
 #else
 #  define PY_CODE_NEW_FN PyCode_NewWithPosOnlyArgs
 #endif
+
+// ── Critical sections ────────────────────────────────────────────────────────
+// On a free-threaded build (3.13t+) these hold an object's per-object lock
+// for the enclosing scope; with a GIL they are empty. Scoped rather than the
+// Py_BEGIN/END_CRITICAL_SECTION macro pair, so an early return can't leave an
+// object locked. Like the GIL, a critical section is suspended while its
+// thread blocks on another lock, so nesting them never deadlocks.
+#ifdef Py_GIL_DISABLED
+class CriticalSection {
+public:
+    template <typename T>
+    explicit CriticalSection(T* op) { PyCriticalSection_Begin(&cs_, reinterpret_cast<PyObject*>(op)); }
+    ~CriticalSection() { PyCriticalSection_End(&cs_); }
+    CriticalSection(const CriticalSection&) = delete;
+    CriticalSection& operator=(const CriticalSection&) = delete;
+private:
+    PyCriticalSection cs_;
+};
+
+class CriticalSection2 {
+public:
+    template <typename T, typename U>
+    CriticalSection2(T* a, U* b)
+    {
+        PyCriticalSection2_Begin(&cs_, reinterpret_cast<PyObject*>(a), reinterpret_cast<PyObject*>(b));
+    }
+    ~CriticalSection2() { PyCriticalSection2_End(&cs_); }
+    CriticalSection2(const CriticalSection2&) = delete;
+    CriticalSection2& operator=(const CriticalSection2&) = delete;
+private:
+    PyCriticalSection2 cs_;
+};
+#else
+class CriticalSection {
+public:
+    template <typename T>
+    explicit CriticalSection(T*) noexcept {}
+};
+
+class CriticalSection2 {
+public:
+    template <typename T, typename U>
+    CriticalSection2(T*, U*) noexcept {}
+};
+#endif
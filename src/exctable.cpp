@@ -67,9 +67,9 @@ static void write_varint(std::vector<uint8_t>& out, unsigned int val,
     }
 }
 
-PyObject* encode_exctable(const std::vector<ExcEntry>& entries)
+void encode_exctable(const std::vector<ExcEntry>& entries, std::vector<uint8_t>& out)
 {
-    std::vector<uint8_t> out;
+    out.clear();
     out.reserve(entries.size() * 8);
 
     for (const auto& e : entries) {
@@ -84,10 +84,6 @@ PyObject* encode_exctable(const std::vector<ExcEntry>& entries)
         write_varint(out, handler);
         write_varint(out, dl);
     }
-
-    return PyBytes_FromStringAndSize(
-        reinterpret_cast<const char*>(out.data()),
-        static_cast<Py_ssize_t>(out.size()));
 }
 
 #endif  // HAS_EXCEPTION_TABLE
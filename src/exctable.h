@@ -39,7 +39,8 @@ struct ExcEntryL {
 // Decode co_exceptiontable into raw ExcEntry list.
 std::vector<ExcEntry> decode_exctable(PyCodeObject* co);
 
-// Encode resolved ExcEntry list to bytes.  Returns new ref or NULL.
-PyObject* encode_exctable(const std::vector<ExcEntry>& entries);
+// Encode resolved ExcEntry list into `out`, replacing its contents. Touches no
+// Python object, so it can run without the GIL.
+void encode_exctable(const std::vector<ExcEntry>& entries, std::vector<uint8_t>& out);
 
 #endif  // HAS_EXCEPTION_TABLE
@@ -0,0 +1,25 @@
+// Auto-generated for CPython 3.11
+enum class JumpKind : uint8_t { NONE=0, ABS=1, FWD=2, BWD=3 };
+static inline JumpKind jump_kind(uint8_t op) noexcept {
+    switch (op) {
+    case 93: return JumpKind::FWD;
+    case 110: return JumpKind::FWD;
+    case 111: return JumpKind::FWD;
+    case 112: return JumpKind::FWD;
+    case 114: return JumpKind::FWD;
+    case 115: return JumpKind::FWD;
+    case 123: return JumpKind::FWD;
+    case 128: return JumpKind::FWD;
+    case 129: return JumpKind::FWD;
+    case 134: return JumpKind::BWD;
+    case 140: return JumpKind::BWD;
+    case 173: return JumpKind::BWD;
+    case 174: return JumpKind::BWD;
+    case 175: return JumpKind::BWD;
+    case 176: return JumpKind::BWD;
+    default: return JumpKind::NONE;
+    }
+}
+static inline bool is_jump_opcode(uint8_t op) noexcept {
+    return jump_kind(op) != JumpKind::NONE;
+}
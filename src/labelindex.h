@@ -0,0 +1,55 @@
+#pragma once
+
+#include "instr.h"
+
+#include <cstdint>
+#include <vector>
+#include <unordered_map>
+
+// ── LabelIndex ───────────────────────────────────────────────────────────────
+// Label id -> index in a Bytecode's `instrs`, as built by
+// Bytecode::label_index_map(). Labels in `end_labels` map to instrs.size().
+//
+// Ids handed out by new_label() are dense and start at 0, so the common case
+// is a flat vector indexed by id - base. Hand-built Labels can carry any int,
+// though; when the ids are too spread out for a vector to be sensible the
+// index falls back to a hash map. Either way a lookup never allocates.
+//
+// If the same id is attached in more than one place, the last one wins —
+// instrs in order, then end_labels — as with the plain map this replaces.
+class LabelIndex {
+public:
+    static constexpr size_t npos = SIZE_MAX;
+
+    LabelIndex(const std::vector<Instr>& instrs, const std::vector<Label>& end_labels);
+
+    // From (id, index) pairs, in order, for instructions held somewhere
+    // other than a Bytecode's `instrs`.
+    explicit LabelIndex(const std::vector<std::pair<int, size_t>>& placed);
+
+    // Index of the instruction `id` is attached to, or npos if it isn't.
+    size_t find(int id) const noexcept
+    {
+        if (dense_) {
+            int64_t k = static_cast<int64_t>(id) - base_;
+            if (k < 0 || static_cast<uint64_t>(k) >= flat_.size()) return npos;
+            return flat_[static_cast<size_t>(k)];
+        }
+        auto it = sparse_.find(id);
+        return it == sparse_.end() ? npos : it->second;
+    }
+
+private:
+    // Size the index for `count` labels with ids in [lo, hi].
+    void reserve(size_t count, int64_t lo, int64_t hi);
+    void set(int id, size_t idx)
+    {
+        if (dense_) flat_[static_cast<size_t>(id - base_)] = idx;
+        else        sparse_[id] = idx;
+    }
+
+    int64_t                         base_  = 0;
+    bool                            dense_ = true;
+    std::vector<size_t>             flat_;
+    std::unordered_map<int, size_t> sparse_;
+};
@@ -73,7 +73,8 @@ std::vector<Location> decode_lnotab(const uint8_t* lnotab, Py_ssize_t len,
     return locs;
 }
 
-PyObject* encode_lnotab(const std::vector<InstrSlot>& slots, int firstlineno)
+void encode_lnotab(const std::vector<InstrSlot>& slots, int firstlineno,
+                   std::vector<uint8_t>& out)
 {
     // A (bdelta, ldelta) pair means: the line advances by ldelta, and that
     // new line applies starting at the CURRENT byte offset; bdelta is the
@@ -107,7 +108,7 @@ PyObject* encode_lnotab(const std::vector<InstrSlot>& slots, int firstlineno)
         ? 0
         : (slots.back().offset + INSTR_BYTES);
 
-    std::vector<uint8_t> out;
+    out.clear();
     out.reserve(bps.size() * 2);
 
     int prev_line = firstlineno;
@@ -155,10 +156,6 @@ PyObject* encode_lnotab(const std::vector<InstrSlot>& slots, int firstlineno)
             bdelta = (bdelta > 255) ? bdelta - 255 : 0;
         }
     }
-
-    return PyBytes_FromStringAndSize(
-        reinterpret_cast<const char*>(out.data()),
-        static_cast<Py_ssize_t>(out.size()));
 }
 
 std::vector<Location> decode_linetable(PyCodeObject* co,
@@ -176,9 +173,10 @@ std::vector<Location> decode_linetable(PyCodeObject* co,
         raw, nbytes);
 }
 
-PyObject* encode_linetable(const std::vector<InstrSlot>& slots, int firstlineno)
+void encode_linetable(const std::vector<InstrSlot>& slots, int firstlineno,
+                      std::vector<uint8_t>& out)
 {
-    return encode_lnotab(slots, firstlineno);
+    encode_lnotab(slots, firstlineno, out);
 }
 
 // ════════════════════════════════════════════════════════════════════════════
@@ -371,9 +369,32 @@ static void write_signed_varint(std::vector<uint8_t>& out, int val)
 
 // ── encode ───────────────────────────────────────────────────────────────────
 
-PyObject* encode_linetable(const std::vector<InstrSlot>& slots, int firstlineno)
+// A Location reduced to the fields its entry actually stores. Without a line
+// nothing else is kept (NONE), and without a column only the line is (NO_COLUMNS),
+// so two Locations that differ only in fields their entry drops encode the same
+// and belong to one run. This is what lets code built from `Instr(lineno=n)`,
+// whose end line is unset, share entries with decoded line-only instructions.
+// An end line that is unset or before the start line is taken to be the start
+// line; LONG can't store a negative end-line delta.
+static Location encoded_location(const Location& loc)
 {
-    std::vector<uint8_t> out;
+    if (loc.lineno < 0) return Location{};
+    if (loc.col_offset < 0) return Location{loc.lineno, loc.lineno, -1, -1};
+    Location out = loc;
+    if (out.end_lineno < out.lineno) out.end_lineno = out.lineno;
+    return out;
+}
+
+static bool same_location(const Location& a, const Location& b)
+{
+    return a.lineno == b.lineno && a.end_lineno == b.end_lineno &&
+           a.col_offset == b.col_offset && a.end_col == b.end_col;
+}
+
+void encode_linetable(const std::vector<InstrSlot>& slots, int firstlineno,
+                      std::vector<uint8_t>& out)
+{
+    out.clear();
     out.reserve(slots.size() * 2);
 
     int cur_lineno = firstlineno;
@@ -381,19 +402,15 @@ PyObject* encode_linetable(const std::vector<InstrSlot>& slots, int firstlineno)
     const size_t n = slots.size();
 
     while (i < n) {
-        const Location& loc = slots[i].instr.loc;
+        const Location loc = encoded_location(slots[i].instr.loc);
 
-        // Count how many consecutive instructions share this location.
+        // Count how many consecutive code units share this entry, up to the
+        // 8 an entry can cover. A longer run continues in the next entry,
+        // which then has a line delta of 0 and takes the shortest form.
         size_t run = 1;
-        while (i + run < n && run < 8) {
-            const Location& next = slots[i + run].instr.loc;
-            if (next.lineno     != loc.lineno     ||
-                next.end_lineno != loc.end_lineno  ||
-                next.col_offset != loc.col_offset  ||
-                next.end_col    != loc.end_col)
-                break;
+        while (i + run < n && run < 8 &&
+               same_location(encoded_location(slots[i + run].instr.loc), loc))
             ++run;
-        }
         uint8_t length_bits = static_cast<uint8_t>(run - 1); // 0–7
 
         // Bit 7 (MSB) of the header byte is a mandatory entry-boundary marker
@@ -458,10 +475,6 @@ PyObject* encode_linetable(const std::vector<InstrSlot>& slots, int firstlineno)
 
         i += run;
     }
-
-    return PyBytes_FromStringAndSize(
-        reinterpret_cast<const char*>(out.data()),
-        static_cast<Py_ssize_t>(out.size()));
 }
 
 #endif  // HAS_NEW_LINETABLE
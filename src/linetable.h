@@ -14,11 +14,11 @@
 std::vector<Location> decode_linetable(PyCodeObject* co,
                                        const uint8_t* raw, Py_ssize_t nbytes);
 
-// Encode a vector of Location (one per logical instruction) back into the
-// format expected by the running interpreter.  Returns a new bytes object, or
-// NULL on error.  The caller is responsible for DECREF.
-PyObject* encode_linetable(const std::vector<InstrSlot>& slots,
-                           int firstlineno);
+// Encode the location of each slot (one per code unit) into the format
+// expected by the running interpreter, replacing the contents of `out`.
+// Touches no Python object, so it can run without the GIL.
+void encode_linetable(const std::vector<InstrSlot>& slots, int firstlineno,
+                      std::vector<uint8_t>& out);
 
 #if !HAS_NEW_LINETABLE
 // Helpers specific to the old lnotab (3.10) format, exposed for testing.
@@ -26,5 +26,6 @@ PyObject* encode_linetable(const std::vector<InstrSlot>& slots,
 std::vector<Location> decode_lnotab(const uint8_t* lnotab, Py_ssize_t len,
                                     int firstlineno,
                                     const uint8_t* raw, Py_ssize_t nbytes);
-PyObject* encode_lnotab(const std::vector<InstrSlot>& slots, int firstlineno);
+void encode_lnotab(const std::vector<InstrSlot>& slots, int firstlineno,
+                   std::vector<uint8_t>& out);
 #endif
@@ -1,16 +1,118 @@
 #include "bytecode.h"
+#include "pattern.h"
 #include "arg_kind_gen.h"
+#include "cache_sizes_gen.h"
 #include "opcode_names_gen.h"
-
+#include <marshal.h>
+
+#include <algorithm>
+#include <array>
+#include <atomic>
+#include <bitset>
+#include <climits>
+#include <cstring>
+#include <memory>
+#include <mutex>
+#include <new>
 #include <stdexcept>
+#include <unordered_map>
+
+// ════════════════════════════════════════════════════════════════════════════
+// Module state
+// ════════════════════════════════════════════════════════════════════════════
+// Every interpreter that imports spasm._core gets a module object of its own,
+// holding its own copy of each type and cache, so nothing here is shared
+// between interpreters (PEP 684). None of the types can be subclassed, so the
+// type of any object of ours leads back to its module's state; functions
+// handed no such object take the state as an argument.
+
+struct ModuleState {
+    PyTypeObject* label_type;
+    PyTypeObject* instr_type;
+    PyTypeObject* instrlist_type;
+    PyTypeObject* exc_entry_type;
+    PyTypeObject* step_type;
+    PyTypeObject* pattern_type;
+    PyTypeObject* bytecode_type;
+    PyTypeObject* edit_type;
+    PyTypeObject* instr_arrays_type;
+    PyTypeObject* pattern_match_type;
+    std::atomic<PyObject*> array_type{nullptr};  // array.array, imported on first use
+    std::atomic<PyObject*> zero_columns[2] = {}; // array('B', [0]), array('i', [0]): never handed out
+    // Opname strings seen before, by identity (see resolve_opcode).
+    std::atomic<PyObject*> opnames[256];        // owned: the interned name of each opcode
+    std::atomic<uint16_t>  opname_slots[256];   // hashed name address -> opcode + 1
+#ifdef Py_GIL_DISABLED
+    std::atomic<uint64_t> clock{0};  // see Mutation clock below
+#else
+    uint64_t clock = 0;
+#endif
+};
+
+static inline ModuleState* type_state(PyTypeObject* type)
+{
+    return static_cast<ModuleState*>(PyType_GetModuleState(type));
+}
+
+template <typename T>
+static inline ModuleState* state_of(T* obj)
+{
+    return type_state(Py_TYPE(obj));
+}
+
+// tp_dealloc's last step: instances of a heap type own a reference to it.
+template <typename T>
+static void free_object(T* self)
+{
+    PyTypeObject* type = Py_TYPE(self);
+    type->tp_free(self);
+    Py_DECREF(type);
+}
 
 // ════════════════════════════════════════════════════════════════════════════
-// Forward declarations
+// Mutation clock
 // ════════════════════════════════════════════════════════════════════════════
+// Every Instr and ExcEntry carries a stamp from this clock, taken when it is
+// created and again whenever it is changed, so an (object, stamp) pair names
+// one exact state of one object even if the object is freed and its address
+// reused. Bytecode.to_code() records those pairs to tell whether anything
+// changed since its last call (see ToCodeCache below). Objects never leave
+// their interpreter, so the clock is per module state.
+
+#ifdef Py_GIL_DISABLED
+static inline uint64_t next_stamp(ModuleState* st) noexcept
+{
+    return st->clock.fetch_add(1, std::memory_order_relaxed) + 1;
+}
+#else
+static inline uint64_t next_stamp(ModuleState* st) noexcept
+{
+    return ++st->clock;
+}
+#endif
+
+// ════════════════════════════════════════════════════════════════════════════
+// Locking
+// ════════════════════════════════════════════════════════════════════════════
+// On a free-threaded build every method and property of a mutable type runs
+// in a critical section on its object (see compat.h), which gives the same
+// guarantee the GIL does: each call sees and leaves the object in a
+// consistent state. The functions themselves are written unlocked, and
+// LOCKED(fn) is the wrapper that goes in the type's tables, as Argument
+// Clinic's @critical_section does for CPython's own types.
+
+template <auto Fn> struct Locked;
+
+template <typename R, typename Self, typename... Args, R (*Fn)(Self*, Args...)>
+struct Locked<Fn> {
+    static R call(Self* self, Args... args)
+    {
+        CriticalSection cs(self);
+        return Fn(self, args...);
+    }
+};
 
-extern PyTypeObject PyLabelType;
-extern PyTypeObject PyInstrType;
-extern PyTypeObject PyBytecodeType;
+#define LOCKED(fn) (Locked<fn>::call)
 
 // ════════════════════════════════════════════════════════════════════════════
 // Label type
@@ -30,6 +132,64 @@ static PyObject* PyLabel_new(PyTypeObject* type, PyObject* args, PyObject* /*kw*
     return reinterpret_cast<PyObject*>(self);
 }
 
+// ── Vectorcall ────────────────────────────────────────────────────────────
+// Label(...) and Instr(...) are called in tight loops, so each type has a
+// tp_vectorcall that handles the usual calls straight from the argument
+// array. Anything else (wrong arity, an argument of an unexpected type)
+// goes through the ordinary type call, arguments packed up as tp_new and
+// tp_init expect, so it fails with the messages it always has.
+
+static PyObject* call_type_generic(PyObject* type, PyObject* const* args, size_t nargsf,
+                                   PyObject* kwnames)
+{
+    Py_ssize_t nargs = PyVectorcall_NARGS(nargsf);
+    PyObject* tuple = PyTuple_New(nargs);
+    if (!tuple) return nullptr;
+    for (Py_ssize_t i = 0; i < nargs; ++i) {
+        Py_INCREF(args[i]);
+        PyTuple_SET_ITEM(tuple, i, args[i]);
+    }
+    PyObject* kw = nullptr;
+    Py_ssize_t nkw = kwnames ? PyTuple_GET_SIZE(kwnames) : 0;
+    if (nkw > 0 && !(kw = PyDict_New())) { Py_DECREF(tuple); return nullptr; }
+    for (Py_ssize_t i = 0; i < nkw; ++i) {
+        if (PyDict_SetItem(kw, PyTuple_GET_ITEM(kwnames, i), args[nargs + i]) < 0) {
+            Py_DECREF(tuple);
+            Py_DECREF(kw);
+            return nullptr;
+        }
+    }
+    PyObject* result = PyType_Type.tp_call(type, tuple, kw);
+    Py_DECREF(tuple);
+    Py_XDECREF(kw);
+    return result;
+}
+
+// An exact int in C int range, read without raising; false for anything else.
+static bool small_int_arg(PyObject* v, int& out)
+{
+    if (!PyLong_CheckExact(v)) return false;
+    int overflow;
+    long n = PyLong_AsLongAndOverflow(v, &overflow);
+    if (overflow || n < INT_MIN || n > INT_MAX) return false;
+    out = static_cast<int>(n);
+    return true;
+}
+
+// Label(id)
+static PyObject* PyLabel_vectorcall(PyObject* type, PyObject* const* args, size_t nargsf,
+                                    PyObject* kwnames)
+{
+    int id;
+    if (PyVectorcall_NARGS(nargsf) != 1 || (kwnames && PyTuple_GET_SIZE(kwnames)) ||
+        !small_int_arg(args[0], id))
+        return call_type_generic(type, args, nargsf, kwnames);
+    auto* tp = reinterpret_cast<PyTypeObject*>(type);
+    auto* self = reinterpret_cast<PyLabelObject*>(tp->tp_alloc(tp, 0));
+    if (self) self->id = id;
+    return reinterpret_cast<PyObject*>(self);
+}
+
 static PyObject* PyLabel_repr(PyLabelObject* self)
 {
     return PyUnicode_FromFormat("<Label id=%d>", self->id);
@@ -47,8 +207,10 @@ static PyGetSetDef PyLabel_getset[] = {
 
 static PyObject* PyLabel_richcmp(PyObject* a, PyObject* b, int op)
 {
-    if (!PyObject_TypeCheck(a, &PyLabelType) || !PyObject_TypeCheck(b, &PyLabelType))
-        Py_RETURN_NOTIMPLEMENTED;
+    // `a` is always the Label whose slot this is.
+    if (Py_TYPE(b) != Py_TYPE(a)) Py_RETURN_NOTIMPLEMENTED;
+    // Labels are shared per Bytecode, so most comparisons are of one object.
+    if (a == b && (op == Py_EQ || op == Py_NE)) return PyBool_FromLong(op == Py_EQ);
     int ia = reinterpret_cast<PyLabelObject*>(a)->id;
     int ib = reinterpret_cast<PyLabelObject*>(b)->id;
     bool result = false;
@@ -65,44 +227,214 @@ static Py_hash_t PyLabel_hash(PyLabelObject* self)
     return static_cast<Py_hash_t>(self->id);
 }
 
-PyTypeObject PyLabelType = {
-    .ob_base      = PyVarObject_HEAD_INIT(nullptr, 0)
-    .tp_name      = "spasm._core.Label",
-    .tp_basicsize = sizeof(PyLabelObject),
-    .tp_repr      = (reprfunc)PyLabel_repr,
-    .tp_hash      = (hashfunc)PyLabel_hash,
-    .tp_flags     = Py_TPFLAGS_DEFAULT,
-    .tp_doc       = "Symbolic jump target.",
-    .tp_richcompare = PyLabel_richcmp,
-    .tp_getset    = PyLabel_getset,
-    .tp_new       = PyLabel_new,
+static PyType_Slot PyLabel_slots[] = {
+    {Py_tp_repr,        (void*)PyLabel_repr},
+    {Py_tp_hash,        (void*)PyLabel_hash},
+    {Py_tp_doc,         (void*)"Symbolic jump target."},
+    {Py_tp_richcompare, (void*)PyLabel_richcmp},
+    {Py_tp_getset,      PyLabel_getset},
+    {Py_tp_new,         (void*)PyLabel_new},
+    {0, nullptr},
+};
+
+static PyType_Spec PyLabel_spec = {
+    .name      = "spasm._core.Label",
+    .basicsize = sizeof(PyLabelObject),
+    .flags     = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_IMMUTABLETYPE,
+    .slots     = PyLabel_slots,
+};
+
+static PyObject* new_label_object(ModuleState* st, int id)
+{
+    PyTypeObject* type = st->label_type;
+    auto* lobj = reinterpret_cast<PyLabelObject*>(type->tp_alloc(type, 0));
+    if (lobj) lobj->id = id;
+    return reinterpret_cast<PyObject*>(lobj);
+}
+
+// ── LabelCache ────────────────────────────────────────────────────────────
+// One Label object per id for a Bytecode. from_code(), InstrList entries as
+// they are materialized, new_label() and label_positions() all hand out the
+// cached object, so a label is the same object everywhere it appears and
+// comparing two of them is an identity check. Refcounted, since the InstrList
+// a lazy decode produces can outlive its Bytecode.
+//
+// Ids handed out by new_label() are dense and start at 0, so they go in a
+// flat vector; anything else (negative, or far past the end) in a hash map.
+//
+// The cache is shared by objects that lock separately (a Bytecode and its
+// InstrList), so on a free-threaded build it has a mutex of its own. It holds
+// a reference to the Label type, so its module state outlives it.
+
+class LabelCache {
+public:
+    static LabelCache* create(ModuleState* st) noexcept
+    {
+        auto* cache = new (std::nothrow) LabelCache(st);
+        if (cache) Py_INCREF(st->label_type);
+        return cache;
+    }
+
+    void incref() noexcept { refs_.fetch_add(1, std::memory_order_relaxed); }
+    void decref() noexcept
+    {
+        if (refs_.fetch_sub(1, std::memory_order_acq_rel) == 1) delete this;
+    }
+
+    // New reference to the Label for `id`, or nullptr with an exception set.
+    PyObject* get(int id)
+    {
+#ifdef Py_GIL_DISABLED
+        // Nothing that can run the collector or block on a Python lock is
+        // done under the mutex, so the Label is allocated outside it and
+        // dropped again if another thread stored one for `id` meanwhile.
+        {
+            std::lock_guard<std::mutex> lock(mutex_);
+            PyObject** slot = slot_for(id);
+            if (!slot) return nullptr;
+            if (*slot) { Py_INCREF(*slot); return *slot; }
+        }
+        PyObject* fresh = new_label_object(st_, id);
+        if (!fresh) return nullptr;
+        std::lock_guard<std::mutex> lock(mutex_);
+        PyObject** slot = slot_for(id);
+        if (!slot) { Py_DECREF(fresh); return nullptr; }
+        if (*slot) Py_DECREF(fresh);
+        else *slot = fresh;
+#else
+        PyObject** slot = slot_for(id);
+        if (!slot) return nullptr;
+        if (!*slot && !(*slot = new_label_object(st_, id))) return nullptr;
+#endif
+        Py_INCREF(*slot);
+        return *slot;
+    }
+
+private:
+    static constexpr size_t kFlatSlack = 1024;
+
+    explicit LabelCache(ModuleState* st) noexcept : st_(st) {}
+    ~LabelCache()
+    {
+        for (PyObject* o : flat_) Py_XDECREF(o);
+        for (auto& kv : sparse_) Py_DECREF(kv.second);
+        Py_DECREF(st_->label_type);
+    }
+
+    // Where the Label for `id` goes, or nullptr with an exception set.
+    PyObject** slot_for(int id)
+    {
+        try {
+            if (id >= 0 && static_cast<size_t>(id) < flat_.size() + kFlatSlack) {
+                if (static_cast<size_t>(id) >= flat_.size())
+                    flat_.resize(static_cast<size_t>(id) + 1, nullptr);
+                return &flat_[static_cast<size_t>(id)];
+            }
+            return &sparse_[id];
+        } catch (const std::bad_alloc&) {
+            PyErr_NoMemory();
+            return nullptr;
+        }
+    }
+
+#ifdef Py_GIL_DISABLED
+    std::mutex mutex_;
+#endif
+    ModuleState* st_;
+    std::atomic<size_t> refs_{1};
+    std::vector<PyObject*> flat_;            // owned; index = id
+    std::unordered_map<int, PyObject*> sparse_;  // owned
 };
 
+// The Label for `id` from `cache`, or a fresh one without a cache.
+static PyObject* label_from(ModuleState* st, LabelCache* cache, int id)
+{
+    return cache ? cache->get(id) : new_label_object(st, id);
+}
+
 // ════════════════════════════════════════════════════════════════════════════
 // Instr type
 // ════════════════════════════════════════════════════════════════════════════
 
+// `arg` is a tagged union. An int oparg and a Label from a LabelCache are
+// kept inline and only become Python objects when `.arg` is read (a Label
+// read back is the cache's, so it is the same object every time); anything
+// else is held as the object it was given as. `labels` stays NULL until an
+// instruction is given labels or its list is asked for, since most never are.
+//
+// An int is only kept inline while `op` takes no constant: an int given to
+// LOAD_CONST is the constant itself and has to stay an object.
+
+enum class InstrArg : uint8_t { INT, LABEL, OBJECT };
+
 struct PyInstrObject {
     PyObject_HEAD
     uint8_t   op;
-    PyObject* arg;      // owned: int | Label | arbitrary Python object
+    InstrArg  arg_tag;
+    int       arg_int;        // INT: the oparg; LABEL: the Label's id
+    union {
+        PyObject*   arg_obj;  // OBJECT: owned
+        LabelCache* arg_from; // LABEL: owned reference to where the Label comes from
+    };
     int       lineno;
     int       end_lineno;
     int       col_offset;
     int       end_col;
-    PyObject* labels;   // owned: list of Label — jump targets landing here
+    PyObject* labels;   // owned: list of Label — jump targets landing here — or NULL
+    uint64_t  stamp;    // mutation clock at creation / last change
 };
 
+static void instr_clear_arg(PyInstrObject* self)
+{
+    if (self->arg_tag == InstrArg::OBJECT) Py_CLEAR(self->arg_obj);
+    else if (self->arg_tag == InstrArg::LABEL) self->arg_from->decref();
+    self->arg_tag = InstrArg::INT;
+    self->arg_int = 0;
+}
+
+// Make `v` the arg, inline if it is an int that can be. Takes a new reference.
+static void instr_store_arg(PyInstrObject* self, PyObject* v)
+{
+    instr_clear_arg(self);
+    if (PyLong_CheckExact(v) && arg_kind(self->op) != ArgKind::CONST) {
+        int overflow;
+        long n = PyLong_AsLongAndOverflow(v, &overflow);
+        if (!overflow && n >= INT_MIN && n <= INT_MAX) {
+            self->arg_int = static_cast<int>(n);
+            Py_DECREF(v);
+            return;
+        }
+    }
+    self->arg_tag = InstrArg::OBJECT;
+    self->arg_obj = v;
+}
+
+// New reference to the arg as a Python object.
+static PyObject* instr_arg(PyInstrObject* self)
+{
+    switch (self->arg_tag) {
+    case InstrArg::INT:   return PyLong_FromLong(self->arg_int);
+    case InstrArg::LABEL: return self->arg_from->get(self->arg_int);
+    default:              Py_INCREF(self->arg_obj); return self->arg_obj;
+    }
+}
+
+static Py_ssize_t instr_label_count(PyInstrObject* self)
+{
+    return self->labels ? PyList_GET_SIZE(self->labels) : 0;
+}
+
 static void PyInstr_dealloc(PyInstrObject* self)
 {
-    Py_XDECREF(self->arg);
+    instr_clear_arg(self);
     Py_XDECREF(self->labels);
-    Py_TYPE(self)->tp_free(self);
+    free_object(self);
 }
 
 // Validate that v is a list of Label objects; return a new-reference copy,
 // or NULL with a Python exception set. `field_name` is used in error messages.
-static PyObject* check_labels_list(PyObject* v, const char* field_name = "labels")
+static PyObject* check_labels_list(ModuleState* st, PyObject* v,
+                                   const char* field_name = "labels")
 {
     if (!v || !PyList_Check(v)) {
         PyErr_Format(PyExc_TypeError, "%s must be a list of Label", field_name);
@@ -110,7 +442,7 @@ static PyObject* check_labels_list(PyObject* v, const char* field_name = "labels
     }
     Py_ssize_t n = PyList_GET_SIZE(v);
     for (Py_ssize_t i = 0; i < n; ++i) {
-        if (!PyObject_TypeCheck(PyList_GET_ITEM(v, i), &PyLabelType)) {
+        if (!PyObject_TypeCheck(PyList_GET_ITEM(v, i), st->label_type)) {
             PyErr_Format(PyExc_TypeError,
                 "%s[%zd] is not a Label (got %s)", field_name, i,
                 Py_TYPE(PyList_GET_ITEM(v, i))->tp_name);
@@ -121,13 +453,49 @@ static PyObject* check_labels_list(PyObject* v, const char* field_name = "labels
     return v;
 }
 
+// ── Opname lookups ────────────────────────────────────────────────────────
+// Opnames nearly always come from string literals or dis.opname, which are
+// interned, so the same few objects are looked up over and over. An interned
+// name is remembered against its opcode the first time, and found again by
+// its address: a slot hashed from the address says which opcode it may be,
+// and that opcode's remembered name says whether it is. A slot may be
+// overwritten by another name at any time, but a remembered name never
+// changes, so a lookup can be wrong only in missing.
+
+static size_t opname_slot(PyObject* name)
+{
+    auto p = reinterpret_cast<uintptr_t>(name);
+    return ((p >> 4) ^ (p >> 12)) & 255;
+}
+
+static int cached_opcode(ModuleState* st, PyObject* name)
+{
+    int op = st->opname_slots[opname_slot(name)].load(std::memory_order_relaxed) - 1;
+    if (op >= 0 && st->opnames[op].load(std::memory_order_acquire) == name) return op;
+    return -1;
+}
+
+static void remember_opcode(ModuleState* st, PyObject* name, int op)
+{
+    if (!PyUnicode_CheckExact(name) || !PyUnicode_CHECK_INTERNED(name)) return;
+    PyObject* expected = nullptr;
+    if (st->opnames[op].compare_exchange_strong(expected, name, std::memory_order_release,
+                                                std::memory_order_acquire))
+        Py_INCREF(name);
+    else if (expected != name)
+        return;
+    st->opname_slots[opname_slot(name)].store(static_cast<uint16_t>(op + 1),
+                                              std::memory_order_relaxed);
+}
+
 // Resolve an opcode given either as an int (0..255) or an opname string
 // (e.g. "LOAD_FAST", matching dis.opmap). Returns -1 with a Python
 // exception set on failure.
-static int resolve_opcode(PyObject* op_obj)
+static int resolve_opcode(ModuleState* st, PyObject* op_obj)
 {
     int op;
     if (PyUnicode_Check(op_obj)) {
+        if ((op = cached_opcode(st, op_obj)) >= 0) return op;
         const char* name = PyUnicode_AsUTF8(op_obj);
         if (!name) return -1;
         const auto& table = opcode_name_table();
@@ -137,6 +505,7 @@ static int resolve_opcode(PyObject* op_obj)
             return -1;
         }
         op = it->second;
+        if (op >= 0 && op <= 255) remember_opcode(st, op_obj, op);
     } else {
         long v = PyLong_AsLong(op_obj);
         if (v == -1 && PyErr_Occurred()) return -1;
@@ -149,6 +518,42 @@ static int resolve_opcode(PyObject* op_obj)
     return op;
 }
 
+// Set every field of `self` from constructor arguments; `arg` and `labels`
+// may be NULL for their defaults. Shared by __init__ and the vectorcall.
+static int instr_setup(PyInstrObject* self, ModuleState* st, PyObject* op_obj, PyObject* arg,
+                       int lineno, int end_lineno, int col_offset, int end_col,
+                       PyObject* labels)
+{
+    int op = resolve_opcode(st, op_obj);
+    if (op < 0) return -1;
+
+    PyObject* labels_list = nullptr;
+    if (labels != nullptr) {
+        PyObject* seq = PySequence_List(labels);
+        if (!seq) return -1;
+        labels_list = check_labels_list(st, seq);
+        Py_DECREF(seq);
+        if (!labels_list) return -1;
+    }
+    if (arg) {
+        Py_INCREF(arg);
+    } else if (!(arg = PyLong_FromLong(0))) {
+        Py_XDECREF(labels_list);
+        return -1;
+    }
+
+    self->op = static_cast<uint8_t>(op);
+    instr_store_arg(self, arg);
+    Py_XSETREF(self->labels, labels_list);
+
+    self->lineno      = lineno;
+    self->end_lineno  = end_lineno;
+    self->col_offset  = col_offset;
+    self->end_col     = end_col;
+    self->stamp       = next_stamp(st);
+    return 0;
+}
+
 // Instr(op, arg=0, *, lineno=-1, end_lineno=-1, col_offset=-1, end_col=-1,
 //       labels=())
 // `op` may be an int (0..255) or an opname string (e.g. "LOAD_FAST").
@@ -169,39 +574,8 @@ static int PyInstr_init(PyInstrObject* self, PyObject* args, PyObject* kw)
             const_cast<char**>(kwlist),
             &op_obj, &arg, &lineno, &end_lineno, &col_offset, &end_col, &labels))
         return -1;
-
-    int op = resolve_opcode(op_obj);
-    if (op < 0) return -1;
-
-    PyObject* labels_list;
-    if (labels == nullptr) {
-        labels_list = PyList_New(0);
-        if (!labels_list) return -1;
-    } else {
-        PyObject* seq = PySequence_List(labels);
-        if (!seq) return -1;
-        labels_list = check_labels_list(seq);
-        Py_DECREF(seq);
-        if (!labels_list) return -1;
-    }
-
-    Py_XDECREF(self->arg);
-    if (arg == nullptr) {
-        self->arg = PyLong_FromLong(0);
-    } else {
-        Py_INCREF(arg);
-        self->arg = arg;
-    }
-
-    Py_XDECREF(self->labels);
-    self->labels = labels_list;
-
-    self->op          = static_cast<uint8_t>(op);
-    self->lineno      = lineno;
-    self->end_lineno  = end_lineno;
-    self->col_offset  = col_offset;
-    self->end_col     = end_col;
-    return 0;
+    return instr_setup(self, state_of(self), op_obj, arg,
+                       lineno, end_lineno, col_offset, end_col, labels);
 }
 
 static PyObject* PyInstr_new(PyTypeObject* type, PyObject* /*args*/, PyObject* /*kw*/)
@@ -210,36 +584,77 @@ static PyObject* PyInstr_new(PyTypeObject* type, PyObject* /*args*/, PyObject* /
     if (!self) return nullptr;
 
     self->op         = 0;
-    self->arg        = PyLong_FromLong(0);
+    self->arg_tag    = InstrArg::INT;
+    self->arg_int    = 0;
     self->lineno     = -1;
     self->end_lineno = -1;
     self->col_offset = -1;
     self->end_col    = -1;
-    self->labels     = PyList_New(0);
+    self->labels     = nullptr;
+    self->stamp      = next_stamp(type_state(type));
+    return reinterpret_cast<PyObject*>(self);
+}
+
+// Instr(op, arg=0, *, lineno=-1, end_lineno=-1, col_offset=-1, end_col=-1,
+//       labels=()), with the keywords matched by name and the ints read
+// without PyArg_ParseTupleAndKeywords.
+static PyObject* PyInstr_vectorcall(PyObject* type, PyObject* const* args, size_t nargsf,
+                                    PyObject* kwnames)
+{
+    Py_ssize_t nargs = PyVectorcall_NARGS(nargsf);
+    if (nargs < 1 || nargs > 2) return call_type_generic(type, args, nargsf, kwnames);
+
+    int pos[4] = {-1, -1, -1, -1};  // lineno, end_lineno, col_offset, end_col
+    PyObject* labels = nullptr;
+    static const char* const names[] = {"lineno", "end_lineno", "col_offset", "end_col"};
+    Py_ssize_t nkw = kwnames ? PyTuple_GET_SIZE(kwnames) : 0;
+    for (Py_ssize_t i = 0; i < nkw; ++i) {
+        PyObject* key = PyTuple_GET_ITEM(kwnames, i);
+        PyObject* value = args[nargs + i];
+        int k = 0;
+        while (k < 4 && PyUnicode_CompareWithASCIIString(key, names[k]) != 0) ++k;
+        if (k < 4 && small_int_arg(value, pos[k])) continue;
+        if (k == 4 && !labels && PyUnicode_CompareWithASCIIString(key, "labels") == 0) {
+            labels = value;
+            continue;
+        }
+        return call_type_generic(type, args, nargsf, kwnames);
+    }
 
-    if (!self->arg || !self->labels) {
+    auto* tp = reinterpret_cast<PyTypeObject*>(type);
+    PyObject* self = PyInstr_new(tp, nullptr, nullptr);
+    if (!self) return nullptr;
+    if (instr_setup(reinterpret_cast<PyInstrObject*>(self), type_state(tp), args[0],
+                    nargs > 1 ? args[1] : nullptr, pos[0], pos[1], pos[2], pos[3], labels) < 0) {
         Py_DECREF(self);
         return nullptr;
     }
-    return reinterpret_cast<PyObject*>(self);
+    return self;
 }
 
 static PyObject* PyInstr_repr(PyInstrObject* self)
 {
-    if (PyList_GET_SIZE(self->labels) > 0)
-        return PyUnicode_FromFormat("Instr(%d, %R, labels=%R)",
-                                     (int)self->op, self->arg, self->labels);
-    return PyUnicode_FromFormat("Instr(%d, %R)", (int)self->op, self->arg);
+    PyObject* arg = instr_arg(self);
+    if (!arg) return nullptr;
+    PyObject* result;
+    if (instr_label_count(self) > 0)
+        result = PyUnicode_FromFormat("Instr(%d, %R, labels=%R)",
+                                      (int)self->op, arg, self->labels);
+    else
+        result = PyUnicode_FromFormat("Instr(%d, %R)", (int)self->op, arg);
+    Py_DECREF(arg);
+    return result;
 }
 
 // ── getset ────────────────────────────────────────────────────────────────
+// Every setter moves the stamp on (see the mutation clock above).
 
 #define INSTR_INT_GETSET(field) \
     static PyObject* PyInstr_get_##field(PyInstrObject* s, void*) { return PyLong_FromLong(s->field); } \
     static int       PyInstr_set_##field(PyInstrObject* s, PyObject* v, void*) { \
         int n = static_cast<int>(PyLong_AsLong(v)); \
         if (n == -1 && PyErr_Occurred()) return -1; \
-        s->field = n; return 0; }
+        s->field = n; s->stamp = next_stamp(state_of(s)); return 0; }
 
 INSTR_INT_GETSET(lineno)
 INSTR_INT_GETSET(end_lineno)
@@ -253,110 +668,136 @@ static PyObject* PyInstr_get_op(PyInstrObject* self, void*)
 static int PyInstr_set_op(PyInstrObject* self, PyObject* v, void*)
 {
     if (!v) { PyErr_SetString(PyExc_TypeError, "cannot delete op"); return -1; }
-    int op = resolve_opcode(v);
+    int op = resolve_opcode(state_of(self), v);
     if (op < 0) return -1;
+    if (self->arg_tag == InstrArg::INT && arg_kind(static_cast<uint8_t>(op)) == ArgKind::CONST) {
+        // The int becomes the constant; see the note on PyInstrObject.
+        PyObject* arg = PyLong_FromLong(self->arg_int);
+        if (!arg) return -1;
+        self->arg_tag = InstrArg::OBJECT;
+        self->arg_obj = arg;
+    }
     self->op = static_cast<uint8_t>(op);
+    self->stamp = next_stamp(state_of(self));
     return 0;
 }
 static PyObject* PyInstr_get_arg(PyInstrObject* self, void*)
 {
-    Py_INCREF(self->arg);
-    return self->arg;
+    return instr_arg(self);
 }
 static int PyInstr_set_arg(PyInstrObject* self, PyObject* v, void*)
 {
     if (!v) { PyErr_SetString(PyExc_TypeError, "cannot delete arg"); return -1; }
     Py_INCREF(v);
-    Py_DECREF(self->arg);
-    self->arg = v;
+    instr_store_arg(self, v);
+    self->stamp = next_stamp(state_of(self));
     return 0;
 }
 
+// The list is handed out as is, and may be edited in place from then on
+// without any setter running, so reading it counts as a change.
 static PyObject* PyInstr_get_labels(PyInstrObject* self, void*)
 {
+    if (!self->labels && !(self->labels = PyList_New(0))) return nullptr;
+    self->stamp = next_stamp(state_of(self));
     Py_INCREF(self->labels);
     return self->labels;
 }
 static int PyInstr_set_labels(PyInstrObject* self, PyObject* v, void*)
 {
-    PyObject* checked = check_labels_list(v);
+    PyObject* checked = check_labels_list(state_of(self), v);
     if (!checked) return -1;
-    Py_DECREF(self->labels);
-    self->labels = checked;
+    Py_XSETREF(self->labels, checked);
+    self->stamp = next_stamp(state_of(self));
     return 0;
 }
 
 static PyGetSetDef PyInstr_getset[] = {
-    {"op",          (getter)PyInstr_get_op,          (setter)PyInstr_set_op,          "opcode byte (settable as an int or an opname string, e.g. \"LOAD_FAST\")", nullptr},
-    {"arg",         (getter)PyInstr_get_arg,          (setter)PyInstr_set_arg,         "argument",        nullptr},
-    {"lineno",      (getter)PyInstr_get_lineno,       (setter)PyInstr_set_lineno,      "line number",     nullptr},
-    {"end_lineno",  (getter)PyInstr_get_end_lineno,   (setter)PyInstr_set_end_lineno,  "end line number", nullptr},
-    {"col_offset",  (getter)PyInstr_get_col_offset,   (setter)PyInstr_set_col_offset,  "column offset",   nullptr},
-    {"end_col",     (getter)PyInstr_get_end_col,      (setter)PyInstr_set_end_col,     "end column",      nullptr},
-    {"labels",      (getter)PyInstr_get_labels,       (setter)PyInstr_set_labels,
+    {"op",          (getter)LOCKED(PyInstr_get_op),          (setter)LOCKED(PyInstr_set_op),          "opcode byte (settable as an int or an opname string, e.g. \"LOAD_FAST\")", nullptr},
+    {"arg",         (getter)LOCKED(PyInstr_get_arg),          (setter)LOCKED(PyInstr_set_arg),         "argument",        nullptr},
+    {"lineno",      (getter)LOCKED(PyInstr_get_lineno),       (setter)LOCKED(PyInstr_set_lineno),      "line number",     nullptr},
+    {"end_lineno",  (getter)LOCKED(PyInstr_get_end_lineno),   (setter)LOCKED(PyInstr_set_end_lineno),  "end line number", nullptr},
+    {"col_offset",  (getter)LOCKED(PyInstr_get_col_offset),   (setter)LOCKED(PyInstr_set_col_offset),  "column offset",   nullptr},
+    {"end_col",     (getter)LOCKED(PyInstr_get_end_col),      (setter)LOCKED(PyInstr_set_end_col),     "end column",      nullptr},
+    {"labels",      (getter)LOCKED(PyInstr_get_labels),       (setter)LOCKED(PyInstr_set_labels),
      "List of Label objects that are jump targets landing on this instruction.", nullptr},
     {nullptr},
 };
 
-PyTypeObject PyInstrType = {
-    .ob_base      = PyVarObject_HEAD_INIT(nullptr, 0)
-    .tp_name      = "spasm._core.Instr",
-    .tp_basicsize = sizeof(PyInstrObject),
-    .tp_dealloc   = (destructor)PyInstr_dealloc,
-    .tp_repr      = (reprfunc)PyInstr_repr,
-    .tp_flags     = Py_TPFLAGS_DEFAULT,
-    .tp_doc       = "A single bytecode instruction. op may be an int or an "
-                    "opname string (e.g. \"LOAD_FAST\", matching dis.opmap). "
-                    "labels is a list of Label objects that are jump targets "
-                    "landing on this instruction.",
-    .tp_getset    = PyInstr_getset,
-    .tp_init      = (initproc)PyInstr_init,
-    .tp_new       = PyInstr_new,
+static PyType_Slot PyInstr_slots[] = {
+    {Py_tp_dealloc, (void*)PyInstr_dealloc},
+    {Py_tp_repr,    (void*)LOCKED(PyInstr_repr)},
+    {Py_tp_doc,     (void*)
+        "A single bytecode instruction. op may be an int or an "
+        "opname string (e.g. \"LOAD_FAST\", matching dis.opmap). "
+        "labels is a list of Label objects that are jump targets "
+        "landing on this instruction."},
+    {Py_tp_getset,  PyInstr_getset},
+    {Py_tp_init,    (void*)LOCKED(PyInstr_init)},
+    {Py_tp_new,     (void*)PyInstr_new},
+    {0, nullptr},
+};
+
+static PyType_Spec PyInstr_spec = {
+    .name      = "spasm._core.Instr",
+    .basicsize = sizeof(PyInstrObject),
+    .flags     = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_IMMUTABLETYPE,
+    .slots     = PyInstr_slots,
 };
 
 // ════════════════════════════════════════════════════════════════════════════
 // Instr <-> C++ conversion helpers
 // ════════════════════════════════════════════════════════════════════════════
 
-// Create a PyInstrObject from a C++ Instr.
-static PyObject* pyinstr_from_cpp(const Instr& ci)
+// Create a PyInstrObject from a C++ Instr, taking its Labels from `labels`.
+static PyObject* pyinstr_from_cpp(ModuleState* st, const Instr& ci, LabelCache* labels)
 {
     auto* obj = reinterpret_cast<PyInstrObject*>(
-        PyInstrType.tp_alloc(&PyInstrType, 0));
+        st->instr_type->tp_alloc(st->instr_type, 0));
     if (!obj) return nullptr;
 
     obj->op          = ci.op;
+    obj->stamp       = next_stamp(st);
     obj->lineno      = ci.loc.lineno;
     obj->end_lineno  = ci.loc.end_lineno;
     obj->col_offset  = ci.loc.col_offset;
     obj->end_col     = ci.loc.end_col;
 
+    // tp_alloc left the arg an inline 0 and the labels NULL.
     if (auto* iv = std::get_if<int>(&ci.arg)) {
-        obj->arg = PyLong_FromLong(*iv);
+        if (arg_kind(ci.op) != ArgKind::CONST) {
+            obj->arg_int = *iv;
+        } else if ((obj->arg_obj = PyLong_FromLong(*iv))) {
+            obj->arg_tag = InstrArg::OBJECT;
+        } else {
+            Py_DECREF(obj);
+            return nullptr;
+        }
     } else if (auto* lv = std::get_if<Label>(&ci.arg)) {
-        auto* lobj = reinterpret_cast<PyLabelObject*>(
-            PyLabelType.tp_alloc(&PyLabelType, 0));
-        if (!lobj) { Py_DECREF(obj); return nullptr; }
-        lobj->id = lv->id;
-        obj->arg = reinterpret_cast<PyObject*>(lobj);
+        if (labels) {
+            labels->incref();
+            obj->arg_tag  = InstrArg::LABEL;
+            obj->arg_int  = lv->id;
+            obj->arg_from = labels;
+        } else if ((obj->arg_obj = new_label_object(st, lv->id))) {
+            obj->arg_tag = InstrArg::OBJECT;
+        } else {
+            Py_DECREF(obj);
+            return nullptr;
+        }
     } else if (auto* pv = std::get_if<PyObject*>(&ci.arg)) {
-        obj->arg = *pv;
-        Py_INCREF(obj->arg);
-    } else {
-        obj->arg = PyLong_FromLong(0);
+        Py_INCREF(*pv);
+        obj->arg_tag = InstrArg::OBJECT;
+        obj->arg_obj = *pv;
     }
 
-    if (!obj->arg) { Py_DECREF(obj); return nullptr; }
-
+    if (ci.labels.empty()) return reinterpret_cast<PyObject*>(obj);
     obj->labels = PyList_New(static_cast<Py_ssize_t>(ci.labels.size()));
     if (!obj->labels) { Py_DECREF(obj); return nullptr; }
     for (size_t i = 0; i < ci.labels.size(); ++i) {
-        auto* lobj = reinterpret_cast<PyLabelObject*>(
-            PyLabelType.tp_alloc(&PyLabelType, 0));
+        PyObject* lobj = label_from(st, labels, ci.labels[i].id);
         if (!lobj) { Py_DECREF(obj); return nullptr; }
-        lobj->id = ci.labels[i].id;
-        PyList_SET_ITEM(obj->labels, static_cast<Py_ssize_t>(i),
-                         reinterpret_cast<PyObject*>(lobj));
+        PyList_SET_ITEM(obj->labels, static_cast<Py_ssize_t>(i), lobj);
     }
 
     return reinterpret_cast<PyObject*>(obj);
@@ -364,20 +805,30 @@ static PyObject* pyinstr_from_cpp(const Instr& ci)
 
 // Convert a PyInstrObject back to a C++ Instr.
 // Returns false and sets a Python exception on failure.
-static bool pyinstr_to_cpp(PyInstrObject* obj, Instr& out)
+static bool pyinstr_to_cpp(ModuleState* st, PyInstrObject* obj, Instr& out)
 {
     out.op = obj->op;
     out.loc = Location{obj->lineno, obj->end_lineno, obj->col_offset, obj->end_col};
 
     out.labels.clear();
-    Py_ssize_t nlbl = PyList_GET_SIZE(obj->labels);
+    Py_ssize_t nlbl = instr_label_count(obj);
     out.labels.reserve(static_cast<size_t>(nlbl));
     for (Py_ssize_t i = 0; i < nlbl; ++i)
         out.labels.push_back(Label{
             reinterpret_cast<PyLabelObject*>(PyList_GET_ITEM(obj->labels, i))->id});
 
-    if (PyObject_TypeCheck(obj->arg, &PyLabelType)) {
-        out.arg = Label{reinterpret_cast<PyLabelObject*>(obj->arg)->id};
+    // An inline int never goes with an op that takes a constant.
+    if (obj->arg_tag == InstrArg::INT) {
+        out.arg = obj->arg_int;
+        return true;
+    }
+    if (obj->arg_tag == InstrArg::LABEL) {
+        out.arg = Label{obj->arg_int};
+        return true;
+    }
+    PyObject* arg = obj->arg_obj;
+    if (PyObject_TypeCheck(arg, st->label_type)) {
+        out.arg = Label{reinterpret_cast<PyLabelObject*>(arg)->id};
         return true;
     }
 
@@ -385,14 +836,14 @@ static bool pyinstr_to_cpp(PyInstrObject* obj, Instr& out)
     switch (ak) {
     case ArgKind::CONST:
         // Any Python object (including int) may be a constant value.
-        out.arg = obj->arg;
+        out.arg = arg;
         return true;
     case ArgKind::LOCAL:
     case ArgKind::FREE:
         // Abstract only when arg is a str; integers are raw opargs (packed ops
         // or out-of-bounds fallbacks — must be emitted as-is).
-        if (PyUnicode_Check(obj->arg)) {
-            out.arg = obj->arg;
+        if (PyUnicode_Check(arg)) {
+            out.arg = arg;
             return true;
         }
         break;
@@ -400,534 +851,4236 @@ static bool pyinstr_to_cpp(PyInstrObject* obj, Instr& out)
         break;
     }
 
-    if (PyLong_Check(obj->arg)) {
-        long v = PyLong_AsLong(obj->arg);
+    if (PyLong_Check(arg)) {
+        long v = PyLong_AsLong(arg);
         if (v == -1 && PyErr_Occurred()) return false;
         out.arg = static_cast<int>(v);
     } else {
-        out.arg = obj->arg;
+        out.arg = arg;
     }
     return true;
 }
 
 // ════════════════════════════════════════════════════════════════════════════
-// ExcEntry type  (3.11+ only, but always compiled — just has no entries on <3.11)
+// InstrList type
 // ════════════════════════════════════════════════════════════════════════════
+// The `instrs` of a Bytecode decoded with from_code(co, lazy=True): a mutable
+// sequence backed by the decoded C++ instructions, which only creates the
+// Instr object for an entry the first time Python asks for it. From then on
+// that Instr *is* the entry — every later access hands out the same object,
+// and edits made through it are what to_code() sees. Entries that are never
+// looked at cost no Python objects at all.
+//
+// Decoded instructions borrow their object arguments (constants, names) from
+// the code object's tables, so the list keeps that code object alive. It
+// shares its Bytecode's LabelCache, so materialized entries use the same
+// Label objects as the rest of it.
+//
+// The decoded instructions live in the list's LazyColumns, a column per
+// field, so an entry nobody has looked at costs a row index and a few bytes
+// of columns rather than a whole Instr. Rows are only ever appended, and an
+// entry keeps its row as others are inserted or removed around it.
+//
+// A location usually sits on one line with columns below 65535, and then
+// fits in 8 bytes; any other goes to a side table. Object arguments are
+// mostly the same few names and constants over and over, so instructions
+// share an objs slot with an earlier one using the same object where a
+// small cache of recent ones finds it.
+
+struct PackedLocation {
+    int32_t  lineno;      // < -1: -2 - the index of the whole Location in `wide`
+    uint16_t col_offset;  // + 1, so that -1 is 0
+    uint16_t end_col;     // + 1
+};
+
+struct LazyColumns {
+    enum : uint8_t { NO_ARG, INT, LABEL, OBJECT, LABELED = 0x80 };
+
+    // Recently added object arguments and their index in objs, by address.
+    using Recent = std::array<std::pair<PyObject*, int32_t>, 256>;
+
+    std::vector<uint8_t>        op;
+    std::vector<uint8_t>        kind;  // NO_ARG..OBJECT, | LABELED if the row has labels
+    std::vector<int32_t>        arg;   // the int, the Label id, or an index into objs
+    std::vector<PackedLocation> loc;
+    std::vector<PyObject*>      objs;  // borrowed from the list's owner
+    std::vector<Location>       wide;  // locations that don't pack
+    std::vector<std::pair<uint32_t, int>> labels;  // (row, Label id), by row
+
+    // Append `ci` as a new row and return it.
+    uint32_t add(const Instr& ci, Recent& recent)
+    {
+        auto row = static_cast<uint32_t>(op.size());
+        uint8_t k = NO_ARG;
+        int32_t a = 0;
+        if (auto* iv = std::get_if<int>(&ci.arg)) {
+            k = INT;
+            a = *iv;
+        } else if (auto* lv = std::get_if<Label>(&ci.arg)) {
+            k = LABEL;
+            a = lv->id;
+        } else if (auto* ov = std::get_if<PyObject*>(&ci.arg)) {
+            k = OBJECT;
+            auto& slot = recent[(reinterpret_cast<uintptr_t>(*ov) >> 4) % recent.size()];
+            if (slot.first != *ov) {
+                slot = {*ov, static_cast<int32_t>(objs.size())};
+                objs.push_back(*ov);
+            }
+            a = slot.second;
+        }
+        const Location& l = ci.loc;
+        auto packs = [](int col) { return col >= -1 && col < 0xFFFF; };
+        if (l.lineno >= -1 && l.end_lineno == l.lineno && packs(l.col_offset) && packs(l.end_col)) {
+            loc.push_back({l.lineno, static_cast<uint16_t>(l.col_offset + 1),
+                           static_cast<uint16_t>(l.end_col + 1)});
+        } else {
+            loc.push_back({-2 - static_cast<int32_t>(wide.size()), 0, 0});
+            wide.push_back(l);
+        }
+        for (const Label& lbl : ci.labels) labels.emplace_back(row, lbl.id);
+        op.push_back(ci.op);
+        kind.push_back(ci.labels.empty() ? k : static_cast<uint8_t>(k | LABELED));
+        arg.push_back(a);
+        return row;
+    }
 
-extern PyTypeObject PyExcEntryType;
+    uint8_t arg_kind(uint32_t row) const { return kind[row] & ~LABELED; }
+    bool labeled(uint32_t row) const { return kind[row] & LABELED; }
 
-struct PyExcEntryObject {
+    Location location(uint32_t row) const
+    {
+        const PackedLocation& p = loc[row];
+        if (p.lineno < -1) return wide[static_cast<size_t>(-2 - p.lineno)];
+        return Location{p.lineno, p.lineno, p.col_offset - 1, p.end_col - 1};
+    }
+
+    template <class F>
+    void for_each_label(uint32_t row, F&& f) const
+    {
+        if (!labeled(row)) return;
+        auto it = std::lower_bound(labels.begin(), labels.end(), std::pair<uint32_t, int>(row, INT_MIN));
+        for (; it != labels.end() && it->first == row; ++it) f(it->second);
+    }
+
+    void clear_labels(uint32_t row)
+    {
+        if (!labeled(row)) return;
+        auto first = std::lower_bound(labels.begin(), labels.end(), std::pair<uint32_t, int>(row, INT_MIN));
+        auto last = first;
+        while (last != labels.end() && last->first == row) ++last;
+        labels.erase(first, last);
+        kind[row] &= ~LABELED;
+    }
+
+    Instr get(uint32_t row) const
+    {
+        Instr ci(op[row]);
+        switch (arg_kind(row)) {
+        case INT:    ci.arg = static_cast<int>(arg[row]); break;
+        case LABEL:  ci.arg = Label{arg[row]}; break;
+        case OBJECT: ci.arg = objs[static_cast<size_t>(arg[row])]; break;
+        default:     break;
+        }
+        ci.loc = location(row);
+        for_each_label(row, [&](int id) { ci.labels.push_back(Label{id}); });
+        return ci;
+    }
+
+    size_t bytes() const
+    {
+        return op.capacity() + kind.capacity() + arg.capacity() * sizeof(int32_t)
+             + loc.capacity() * sizeof(PackedLocation) + objs.capacity() * sizeof(PyObject*)
+             + wide.capacity() * sizeof(Location) + labels.capacity() * sizeof(labels[0]);
+    }
+};
+
+struct LazyInstr {
+    PyObject* obj = nullptr;  // owned Instr, once there is one
+    union {
+        uint32_t row;         // without obj: the decoded instruction, in the list's columns
+        uint64_t born = 0;    // with obj: its stamp when it was created from that row
+    };
+
+    LazyInstr() = default;
+    explicit LazyInstr(PyObject* instr) noexcept : obj(instr) {}
+    static LazyInstr decoded(uint32_t row) noexcept
+    {
+        LazyInstr li;
+        li.row = row;
+        return li;
+    }
+};
+
+struct PyInstrListObject {
     PyObject_HEAD
-    PyObject* start;    // Label — inclusive start of try block
-    PyObject* stop;     // Label — exclusive end of try block
-    PyObject* handler;  // Label — exception handler target
-    int       depth;    // stack depth at start of protected region, or
-                         // EXC_DEPTH_AUTO for to_code() to compute it
-    int       lasti;    // bool: push lasti
+    std::vector<LazyInstr>* items;
+    LazyColumns* cols;
+    PyObject* owner;          // owned: the code object `cols` borrows from
+    LabelCache* labels;       // owned reference
+    uint64_t  version;        // mutation clock at creation / last insert or removal
 };
 
-static void PyExcEntry_dealloc(PyExcEntryObject* self)
+static void PyInstrList_dealloc(PyInstrListObject* self)
 {
-    Py_XDECREF(self->start);
-    Py_XDECREF(self->stop);
-    Py_XDECREF(self->handler);
-    Py_TYPE(self)->tp_free(self);
+    if (self->items) {
+        for (auto& li : *self->items) Py_XDECREF(li.obj);
+        delete self->items;
+    }
+    delete self->cols;
+    Py_XDECREF(self->owner);
+    if (self->labels) self->labels->decref();
+    free_object(self);
 }
 
-// ExcEntry(start, stop, handler, depth=EXC_DEPTH_AUTO, lasti=False)
-static int PyExcEntry_init(PyExcEntryObject* self, PyObject* args, PyObject* kw)
+static PyObject* instrlist_new(ModuleState* st, std::vector<Instr>&& decoded, PyObject* owner,
+                               LabelCache* labels)
 {
-    static const char* kwlist[] = {"start", "stop", "handler", "depth", "lasti", nullptr};
-    PyObject* start = nullptr, *stop = nullptr, *handler = nullptr;
-    int depth = EXC_DEPTH_AUTO, lasti = 0;
-    if (!PyArg_ParseTupleAndKeywords(args, kw, "O!O!O!|ii",
-            const_cast<char**>(kwlist),
-            &PyLabelType, &start, &PyLabelType, &stop, &PyLabelType, &handler,
-            &depth, &lasti))
-        return -1;
-    Py_INCREF(start); Py_XDECREF(self->start); self->start = start;
-    Py_INCREF(stop);  Py_XDECREF(self->stop);  self->stop  = stop;
-    Py_INCREF(handler); Py_XDECREF(self->handler); self->handler = handler;
-    self->depth = depth;
-    self->lasti = lasti;
-    return 0;
+    auto* self = reinterpret_cast<PyInstrListObject*>(
+        st->instrlist_type->tp_alloc(st->instrlist_type, 0));
+    if (!self) return nullptr;
+    try {
+        self->items = new std::vector<LazyInstr>();
+        self->cols = new LazyColumns();
+        self->items->reserve(decoded.size());
+        self->cols->op.reserve(decoded.size());
+        self->cols->kind.reserve(decoded.size());
+        self->cols->arg.reserve(decoded.size());
+        self->cols->loc.reserve(decoded.size());
+        LazyColumns::Recent recent{};
+        for (const Instr& ci : decoded)
+            self->items->push_back(LazyInstr::decoded(self->cols->add(ci, recent)));
+    } catch (const std::bad_alloc&) {
+        Py_DECREF(self);
+        return PyErr_NoMemory();
+    }
+    Py_XINCREF(owner);
+    self->owner = owner;
+    if (labels) labels->incref();
+    self->labels = labels;
+    self->version = next_stamp(st);
+    return reinterpret_cast<PyObject*>(self);
 }
 
-static PyObject* PyExcEntry_new(PyTypeObject* type, PyObject*, PyObject*)
+static Py_ssize_t instrlist_size(PyInstrListObject* self)
 {
-    auto* self = reinterpret_cast<PyExcEntryObject*>(type->tp_alloc(type, 0));
-    if (self) { self->start = self->stop = self->handler = nullptr;
-                self->depth = EXC_DEPTH_AUTO; self->lasti = 0; }
-    return reinterpret_cast<PyObject*>(self);
+    return static_cast<Py_ssize_t>(self->items->size());
 }
 
-static PyObject* PyExcEntry_repr(PyExcEntryObject* self)
+// The Instr for entry i (borrowed), creating it on first access.
+static PyObject* instrlist_materialize(PyInstrListObject* self, Py_ssize_t i)
 {
-    return PyUnicode_FromFormat("ExcEntry(start=%R, stop=%R, handler=%R, depth=%d, lasti=%d)",
-                                self->start, self->stop, self->handler,
-                                self->depth, self->lasti);
+    LazyInstr& li = (*self->items)[static_cast<size_t>(i)];
+    if (!li.obj) {
+        PyObject* obj = pyinstr_from_cpp(state_of(self), self->cols->get(li.row), self->labels);
+        if (!obj) return nullptr;
+        li.obj = obj;
+        li.born = reinterpret_cast<PyInstrObject*>(obj)->stamp;
+    }
+    return li.obj;
 }
 
-#define EXCENTRY_OBJ_GETSET(field, doc)                                           \
-    static PyObject* PyExcEntry_get_##field(PyExcEntryObject* s, void*) {         \
-        Py_INCREF(s->field); return s->field; }                                   \
-    static int PyExcEntry_set_##field(PyExcEntryObject* s, PyObject* v, void*) {  \
-        if (!v || !PyObject_TypeCheck(v, &PyLabelType)) {                         \
-            PyErr_SetString(PyExc_TypeError, #field " must be a Label"); return -1;} \
-        Py_INCREF(v); Py_DECREF(s->field); s->field = v; return 0; }
+// Entry i as a C++ Instr, for assembly. Never materializes anything.
+static bool instrlist_entry_to_cpp(ModuleState* st, PyInstrListObject* self, Py_ssize_t i,
+                                   Instr& out)
+{
+    const LazyInstr& li = (*self->items)[static_cast<size_t>(i)];
+    if (li.obj) return pyinstr_to_cpp(st, reinterpret_cast<PyInstrObject*>(li.obj), out);
+    out = self->cols->get(li.row);
+    return true;
+}
 
-EXCENTRY_OBJ_GETSET(start,   "Inclusive start Label.")
-EXCENTRY_OBJ_GETSET(stop,    "Exclusive stop Label.")
-EXCENTRY_OBJ_GETSET(handler, "Handler target Label.")
-#undef EXCENTRY_OBJ_GETSET
+// New entries for the Instr objects in `iterable`, or false with a Python
+// exception set if it isn't one or holds anything else.
+static bool instrlist_entries(ModuleState* st, PyObject* iterable, std::vector<LazyInstr>& out)
+{
+    PyObject* seq = PySequence_Fast(iterable, "can only assign an iterable of Instr");
+    if (!seq) return false;
+    Py_ssize_t n = PySequence_Fast_GET_SIZE(seq);
+    out.reserve(static_cast<size_t>(n));
+    for (Py_ssize_t i = 0; i < n; ++i) {
+        PyObject* item = PySequence_Fast_GET_ITEM(seq, i);
+        if (!PyObject_TypeCheck(item, st->instr_type)) {
+            PyErr_Format(PyExc_TypeError, "instrs can only hold Instr (got %s)",
+                         Py_TYPE(item)->tp_name);
+            for (auto& li : out) Py_DECREF(li.obj);
+            out.clear();
+            Py_DECREF(seq);
+            return false;
+        }
+        Py_INCREF(item);
+        out.push_back(LazyInstr(item));
+    }
+    Py_DECREF(seq);
+    return true;
+}
 
-static PyObject* PyExcEntry_get_depth(PyExcEntryObject* s, void*)
+// Replace entries [start, stop) with `repl`. References to the Instrs that
+// were there are only dropped once the list is consistent again, since that
+// can run arbitrary Python code.
+static void instrlist_splice(PyInstrListObject* self, Py_ssize_t start, Py_ssize_t stop,
+                             std::vector<LazyInstr>&& repl)
+{
+    auto& items = *self->items;
+    std::vector<PyObject*> dropped;
+    for (Py_ssize_t i = start; i < stop; ++i)
+        if (items[static_cast<size_t>(i)].obj) dropped.push_back(items[static_cast<size_t>(i)].obj);
+    auto first = items.begin() + start;
+    items.erase(first, items.begin() + stop);
+    items.insert(items.begin() + start,
+                 std::make_move_iterator(repl.begin()), std::make_move_iterator(repl.end()));
+    self->version = next_stamp(state_of(self));
+    for (PyObject* o : dropped) Py_DECREF(o);
+}
+
+static bool instrlist_check_instr(ModuleState* st, PyObject* v)
+{
+    if (PyObject_TypeCheck(v, st->instr_type)) return true;
+    PyErr_Format(PyExc_TypeError, "instrs can only hold Instr (got %s)", Py_TYPE(v)->tp_name);
+    return false;
+}
+
+static Py_ssize_t PyInstrList_length(PyInstrListObject* self)
+{
+    return instrlist_size(self);
+}
+
+static PyObject* PyInstrList_item(PyInstrListObject* self, Py_ssize_t i)
+{
+    if (i < 0 || i >= instrlist_size(self)) {
+        PyErr_SetString(PyExc_IndexError, "instrs index out of range");
+        return nullptr;
+    }
+    PyObject* obj = instrlist_materialize(self, i);
+    Py_XINCREF(obj);
+    return obj;
+}
+
+static PyObject* PyInstrList_subscript(PyInstrListObject* self, PyObject* key)
+{
+    if (PyIndex_Check(key)) {
+        Py_ssize_t i = PyNumber_AsSsize_t(key, PyExc_IndexError);
+        if (i == -1 && PyErr_Occurred()) return nullptr;
+        if (i < 0) i += instrlist_size(self);
+        return PyInstrList_item(self, i);
+    }
+    if (!PySlice_Check(key)) {
+        PyErr_Format(PyExc_TypeError, "instrs indices must be integers or slices, not %s",
+                     Py_TYPE(key)->tp_name);
+        return nullptr;
+    }
+    Py_ssize_t start, stop, step;
+    if (PySlice_Unpack(key, &start, &stop, &step) < 0) return nullptr;
+    Py_ssize_t len = PySlice_AdjustIndices(instrlist_size(self), &start, &stop, step);
+    PyObject* out = PyList_New(len);
+    if (!out) return nullptr;
+    for (Py_ssize_t k = 0, i = start; k < len; ++k, i += step) {
+        PyObject* obj = instrlist_materialize(self, i);
+        if (!obj) { Py_DECREF(out); return nullptr; }
+        Py_INCREF(obj);
+        PyList_SET_ITEM(out, k, obj);
+    }
+    return out;
+}
+
+static int PyInstrList_ass_subscript(PyInstrListObject* self, PyObject* key, PyObject* value)
+{
+    Py_ssize_t size = instrlist_size(self);
+    if (PyIndex_Check(key)) {
+        Py_ssize_t i = PyNumber_AsSsize_t(key, PyExc_IndexError);
+        if (i == -1 && PyErr_Occurred()) return -1;
+        if (i < 0) i += size;
+        if (i < 0 || i >= size) {
+            PyErr_SetString(PyExc_IndexError, "instrs assignment index out of range");
+            return -1;
+        }
+        std::vector<LazyInstr> repl;
+        if (value) {
+            if (!instrlist_check_instr(state_of(self), value)) return -1;
+            Py_INCREF(value);
+            repl.push_back(LazyInstr(value));
+        }
+        instrlist_splice(self, i, i + 1, std::move(repl));
+        return 0;
+    }
+    if (!PySlice_Check(key)) {
+        PyErr_Format(PyExc_TypeError, "instrs indices must be integers or slices, not %s",
+                     Py_TYPE(key)->tp_name);
+        return -1;
+    }
+
+    Py_ssize_t start, stop, step;
+    if (PySlice_Unpack(key, &start, &stop, &step) < 0) return -1;
+    Py_ssize_t len = PySlice_AdjustIndices(size, &start, &stop, step);
+
+    std::vector<LazyInstr> repl;
+    if (value && !instrlist_entries(state_of(self), value, repl)) return -1;
+
+    if (step == 1) {
+        instrlist_splice(self, start, std::max(start, stop), std::move(repl));
+        return 0;
+    }
+
+    // Extended slice: deletion, or a same-length replacement.
+    if (!value) {
+        // Walk backwards so earlier indices stay valid.
+        for (Py_ssize_t k = len - 1; k >= 0; --k) {
+            Py_ssize_t i = start + k * step;
+            instrlist_splice(self, i, i + 1, {});
+        }
+        return 0;
+    }
+    if (static_cast<Py_ssize_t>(repl.size()) != len) {
+        PyErr_Format(PyExc_ValueError,
+            "attempt to assign sequence of size %zd to extended slice of size %zd",
+            static_cast<Py_ssize_t>(repl.size()), len);
+        for (auto& li : repl) Py_DECREF(li.obj);
+        return -1;
+    }
+    std::vector<PyObject*> dropped;
+    for (Py_ssize_t k = 0, i = start; k < len; ++k, i += step) {
+        LazyInstr& li = (*self->items)[static_cast<size_t>(i)];
+        if (li.obj) dropped.push_back(li.obj);
+        li = std::move(repl[static_cast<size_t>(k)]);
+    }
+    self->version = next_stamp(state_of(self));
+    for (PyObject* o : dropped) Py_DECREF(o);
+    return 0;
+}
+
+// Only entries that already have an Instr can compare equal to anything:
+// Instr compares by identity, and an entry nobody has looked at has none.
+static Py_ssize_t instrlist_find(PyInstrListObject* self, PyObject* v, Py_ssize_t start = 0,
+                                 Py_ssize_t stop = PY_SSIZE_T_MAX)
+{
+    for (Py_ssize_t i = start; i < std::min(stop, instrlist_size(self)); ++i) {
+        PyObject* obj = (*self->items)[static_cast<size_t>(i)].obj;
+        if (!obj) continue;
+        int eq = PyObject_RichCompareBool(obj, v, Py_EQ);
+        if (eq < 0) return -2;
+        if (eq) return i;
+    }
+    return -1;
+}
+
+static int PyInstrList_contains(PyInstrListObject* self, PyObject* v)
+{
+    Py_ssize_t i = instrlist_find(self, v);
+    return i == -2 ? -1 : i >= 0;
+}
+
+static PyObject* PyInstrList_append(PyInstrListObject* self, PyObject* v)
+{
+    ModuleState* st = state_of(self);
+    if (!instrlist_check_instr(st, v)) return nullptr;
+    Py_INCREF(v);
+    self->items->push_back(LazyInstr(v));
+    self->version = next_stamp(st);
+    Py_RETURN_NONE;
+}
+
+static PyObject* PyInstrList_insert(PyInstrListObject* self, PyObject* const* args, Py_ssize_t nargs)
+{
+    if (nargs != 2) {
+        PyErr_SetString(PyExc_TypeError, "insert() takes exactly 2 arguments");
+        return nullptr;
+    }
+    Py_ssize_t i = PyNumber_AsSsize_t(args[0], PyExc_IndexError);
+    if (i == -1 && PyErr_Occurred()) return nullptr;
+    ModuleState* st = state_of(self);
+    if (!instrlist_check_instr(st, args[1])) return nullptr;
+    Py_ssize_t size = instrlist_size(self);
+    if (i < 0) i = std::max<Py_ssize_t>(0, i + size);
+    if (i > size) i = size;
+    Py_INCREF(args[1]);
+    self->items->insert(self->items->begin() + i, LazyInstr(args[1]));
+    self->version = next_stamp(st);
+    Py_RETURN_NONE;
+}
+
+static PyObject* PyInstrList_extend(PyInstrListObject* self, PyObject* iterable)
+{
+    std::vector<LazyInstr> repl;
+    if (!instrlist_entries(state_of(self), iterable, repl)) return nullptr;
+    Py_ssize_t size = instrlist_size(self);
+    instrlist_splice(self, size, size, std::move(repl));
+    Py_RETURN_NONE;
+}
+
+static PyObject* PyInstrList_inplace_concat(PyInstrListObject* self, PyObject* other)
+{
+    PyObject* r = PyInstrList_extend(self, other);
+    if (!r) return nullptr;
+    Py_DECREF(r);
+    Py_INCREF(self);
+    return reinterpret_cast<PyObject*>(self);
+}
+
+static PyObject* PyInstrList_pop(PyInstrListObject* self, PyObject* const* args, Py_ssize_t nargs)
+{
+    Py_ssize_t size = instrlist_size(self);
+    Py_ssize_t i = -1;
+    if (nargs > 1) {
+        PyErr_SetString(PyExc_TypeError, "pop() takes at most 1 argument");
+        return nullptr;
+    }
+    if (nargs == 1) {
+        i = PyNumber_AsSsize_t(args[0], PyExc_IndexError);
+        if (i == -1 && PyErr_Occurred()) return nullptr;
+    }
+    if (i < 0) i += size;
+    if (i < 0 || i >= size) {
+        PyErr_SetString(PyExc_IndexError, size ? "pop index out of range" : "pop from empty instrs");
+        return nullptr;
+    }
+    PyObject* obj = instrlist_materialize(self, i);
+    if (!obj) return nullptr;
+    Py_INCREF(obj);
+    instrlist_splice(self, i, i + 1, {});
+    return obj;
+}
+
+// index(instr, start=0, stop=len): as list.index().
+static PyObject* PyInstrList_index(PyInstrListObject* self, PyObject* const* args, Py_ssize_t nargs)
+{
+    if (nargs < 1 || nargs > 3) {
+        PyErr_SetString(PyExc_TypeError, "index() takes from 1 to 3 arguments");
+        return nullptr;
+    }
+    Py_ssize_t size = instrlist_size(self);
+    Py_ssize_t start = 0, stop = size;
+    if (nargs > 1 && (start = PyNumber_AsSsize_t(args[1], nullptr)) == -1 && PyErr_Occurred()) return nullptr;
+    if (nargs > 2 && (stop = PyNumber_AsSsize_t(args[2], nullptr)) == -1 && PyErr_Occurred()) return nullptr;
+    PySlice_AdjustIndices(size, &start, &stop, 1);
+    Py_ssize_t i = instrlist_find(self, args[0], start, stop);
+    if (i == -2) return nullptr;
+    if (i < 0) {
+        PyErr_SetString(PyExc_ValueError, "Instr is not in instrs");
+        return nullptr;
+    }
+    return PyLong_FromSsize_t(i);
+}
+
+static PyObject* PyInstrList_count(PyInstrListObject* self, PyObject* v)
+{
+    Py_ssize_t n = 0;
+    for (Py_ssize_t i = 0; (i = instrlist_find(self, v, i, instrlist_size(self))) >= 0; ++i) ++n;
+    if (PyErr_Occurred()) return nullptr;
+    return PyLong_FromSsize_t(n);
+}
+
+// Reorders the entries without creating any Instr.
+static PyObject* PyInstrList_reverse(PyInstrListObject* self, PyObject*)
+{
+    std::reverse(self->items->begin(), self->items->end());
+    self->version = next_stamp(state_of(self));
+    Py_RETURN_NONE;
+}
+
+// Every entry's Instr, in a new list: for what a list of Instr does, such as
+// `+`, `*` and comparison.
+static PyObject* instrlist_as_list(PyInstrListObject* self)
+{
+    PyObject* slice = PySlice_New(nullptr, nullptr, nullptr);
+    if (!slice) return nullptr;
+    PyObject* lst = PyInstrList_subscript(self, slice);
+    Py_DECREF(slice);
+    return lst;
+}
+
+static PyObject* PyInstrList_reversed(PyInstrListObject* self, PyObject*)
+{
+    PyObject* lst = instrlist_as_list(self);
+    if (!lst) return nullptr;
+    if (PyList_Reverse(lst) < 0) { Py_DECREF(lst); return nullptr; }
+    PyObject* it = PyObject_GetIter(lst);
+    Py_DECREF(lst);
+    return it;
+}
+
+// A list or InstrList as a list, or nullptr without an exception for anything
+// else, which `+` and comparison don't take.
+static PyObject* instrlist_operand(ModuleState* st, PyObject* v)
+{
+    if (PyList_Check(v)) return Py_NewRef(v);
+    if (PyObject_TypeCheck(v, st->instrlist_type))
+        return instrlist_as_list(reinterpret_cast<PyInstrListObject*>(v));
+    return nullptr;
+}
+
+// Equal to a list or InstrList holding the same Instr objects, as a list is.
+static PyObject* PyInstrList_richcompare(PyInstrListObject* self, PyObject* other, int op)
+{
+    if (op != Py_EQ && op != Py_NE) Py_RETURN_NOTIMPLEMENTED;
+    PyObject* rhs = instrlist_operand(state_of(self), other);
+    if (!rhs) {
+        if (PyErr_Occurred()) return nullptr;
+        Py_RETURN_NOTIMPLEMENTED;
+    }
+    PyObject* lhs = instrlist_as_list(self);
+    PyObject* r = lhs ? PyObject_RichCompare(lhs, rhs, op) : nullptr;
+    Py_XDECREF(lhs);
+    Py_DECREF(rhs);
+    return r;
+}
+
+// `instrs + other` and `instrs * n` give a plain list, like a slice does: an
+// InstrList only exists as the instrs of a Bytecode.
+static PyObject* PyInstrList_concat(PyInstrListObject* self, PyObject* other)
+{
+    PyObject* rhs = instrlist_operand(state_of(self), other);
+    if (!rhs) {
+        if (!PyErr_Occurred())
+            PyErr_Format(PyExc_TypeError, "can only concatenate list or InstrList (not \"%s\") to InstrList",
+                         Py_TYPE(other)->tp_name);
+        return nullptr;
+    }
+    PyObject* lhs = instrlist_as_list(self);
+    PyObject* r = lhs ? PySequence_Concat(lhs, rhs) : nullptr;
+    Py_XDECREF(lhs);
+    Py_DECREF(rhs);
+    return r;
+}
+
+static PyObject* PyInstrList_repeat(PyInstrListObject* self, Py_ssize_t n)
+{
+    PyObject* lst = instrlist_as_list(self);
+    if (!lst) return nullptr;
+    PyObject* r = PySequence_Repeat(lst, n);
+    Py_DECREF(lst);
+    return r;
+}
+
+static PyObject* PyInstrList_remove(PyInstrListObject* self, PyObject* v)
+{
+    Py_ssize_t i = instrlist_find(self, v);
+    if (i == -2) return nullptr;
+    if (i < 0) {
+        PyErr_SetString(PyExc_ValueError, "Instr is not in instrs");
+        return nullptr;
+    }
+    instrlist_splice(self, i, i + 1, {});
+    Py_RETURN_NONE;
+}
+
+static PyObject* PyInstrList_clear(PyInstrListObject* self, PyObject*)
+{
+    instrlist_splice(self, 0, instrlist_size(self), {});
+    Py_RETURN_NONE;
+}
+
+// opcodes() -> bytes: the op of every entry, without creating any Instr.
+static PyObject* PyInstrList_opcodes(PyInstrListObject* self, PyObject*)
+{
+    Py_ssize_t n = instrlist_size(self);
+    PyObject* out = PyBytes_FromStringAndSize(nullptr, n);
+    if (!out) return nullptr;
+    auto* buf = reinterpret_cast<uint8_t*>(PyBytes_AS_STRING(out));
+    for (Py_ssize_t i = 0; i < n; ++i) {
+        const LazyInstr& li = (*self->items)[static_cast<size_t>(i)];
+        buf[i] = li.obj ? reinterpret_cast<PyInstrObject*>(li.obj)->op : self->cols->op[li.row];
+    }
+    return out;
+}
+
+static PyObject* PyInstrList_repr(PyInstrListObject* self)
+{
+    PyObject* lst = instrlist_as_list(self);
+    if (!lst) return nullptr;
+    PyObject* r = PyUnicode_FromFormat("InstrList(%R)", lst);
+    Py_DECREF(lst);
+    return r;
+}
+
+// Native storage only: the entries and the columns behind them.
+// Materialized Instr objects are separate objects of their own.
+static PyObject* PyInstrList_sizeof(PyInstrListObject* self, PyObject*)
+{
+    size_t n = static_cast<size_t>(Py_TYPE(self)->tp_basicsize);
+    if (self->items) {
+        n += sizeof(std::vector<LazyInstr>) + self->items->capacity() * sizeof(LazyInstr);
+    }
+    if (self->cols) n += sizeof(LazyColumns) + self->cols->bytes();
+    return PyLong_FromSize_t(n);
+}
+
+static PyMethodDef PyInstrList_methods[] = {
+    {"append",  (PyCFunction)LOCKED(PyInstrList_append),  METH_O,       "Append an Instr."},
+    {"insert",  (PyCFunction)(void(*)(void))LOCKED(PyInstrList_insert), METH_FASTCALL,
+     "insert(index, instr): insert an Instr before index."},
+    {"extend",  (PyCFunction)LOCKED(PyInstrList_extend),  METH_O,       "Append every Instr from an iterable."},
+    {"pop",     (PyCFunction)(void(*)(void))LOCKED(PyInstrList_pop),    METH_FASTCALL,
+     "pop(index=-1) -> Instr: remove and return the Instr at index."},
+    {"index",   (PyCFunction)(void(*)(void))LOCKED(PyInstrList_index),  METH_FASTCALL,
+     "index(instr, start=0, stop=len) -> int: position of instr."},
+    {"count",   (PyCFunction)LOCKED(PyInstrList_count),   METH_O,       "count(instr) -> int: occurrences of instr."},
+    {"remove",  (PyCFunction)LOCKED(PyInstrList_remove),  METH_O,       "Remove the first occurrence of an Instr."},
+    {"reverse", (PyCFunction)LOCKED(PyInstrList_reverse), METH_NOARGS,  "Reverse the instructions in place."},
+    {"clear",   (PyCFunction)LOCKED(PyInstrList_clear),   METH_NOARGS,  "Remove every instruction."},
+    {"__reversed__", (PyCFunction)LOCKED(PyInstrList_reversed), METH_NOARGS,
+     "Iterator over the instructions, last first."},
+    {"opcodes", (PyCFunction)LOCKED(PyInstrList_opcodes), METH_NOARGS,
+     "opcodes() -> bytes: the opcode of every instruction, in order, without "
+     "creating any Instr objects."},
+    {"__sizeof__", (PyCFunction)LOCKED(PyInstrList_sizeof), METH_NOARGS,
+     "Size of the list and its entries in memory, in bytes."},
+    {nullptr},
+};
+
+static PyType_Slot PyInstrList_slots[] = {
+    {Py_tp_dealloc,        (void*)PyInstrList_dealloc},
+    {Py_tp_repr,           (void*)LOCKED(PyInstrList_repr)},
+    {Py_tp_doc,            (void*)
+        "The instrs of a Bytecode decoded with from_code(co, lazy=True): "
+        "a mutable sequence of Instr that only creates the Instr for "
+        "an entry when it is first accessed."},
+    {Py_tp_methods,        PyInstrList_methods},
+    {Py_tp_richcompare,    (void*)LOCKED(PyInstrList_richcompare)},
+    {Py_tp_hash,           (void*)PyObject_HashNotImplemented},
+    {Py_sq_length,         (void*)LOCKED(PyInstrList_length)},
+    {Py_sq_item,           (void*)LOCKED(PyInstrList_item)},
+    {Py_sq_contains,       (void*)LOCKED(PyInstrList_contains)},
+    {Py_sq_concat,         (void*)LOCKED(PyInstrList_concat)},
+    {Py_sq_repeat,         (void*)LOCKED(PyInstrList_repeat)},
+    {Py_sq_inplace_concat, (void*)LOCKED(PyInstrList_inplace_concat)},
+    {Py_mp_length,         (void*)LOCKED(PyInstrList_length)},
+    {Py_mp_subscript,      (void*)LOCKED(PyInstrList_subscript)},
+    {Py_mp_ass_subscript,  (void*)LOCKED(PyInstrList_ass_subscript)},
+    {0, nullptr},
+};
+
+static PyType_Spec PyInstrList_spec = {
+    .name      = "spasm._core.InstrList",
+    .basicsize = sizeof(PyInstrListObject),
+    .flags     = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_SEQUENCE | Py_TPFLAGS_IMMUTABLETYPE |
+                 Py_TPFLAGS_DISALLOW_INSTANTIATION,
+    .slots     = PyInstrList_slots,
+};
+
+// ════════════════════════════════════════════════════════════════════════════
+// ExcEntry type  (3.11+ only, but always compiled — just has no entries on <3.11)
+// ════════════════════════════════════════════════════════════════════════════
+
+struct PyExcEntryObject {
+    PyObject_HEAD
+    PyObject* start;    // Label — inclusive start of try block
+    PyObject* stop;     // Label — exclusive end of try block
+    PyObject* handler;  // Label — exception handler target
+    int       depth;    // stack depth at start of protected region, or
+                         // EXC_DEPTH_AUTO for to_code() to compute it
+    int       lasti;    // bool: push lasti
+    uint64_t  stamp;    // mutation clock at creation / last change
+};
+
+static void PyExcEntry_dealloc(PyExcEntryObject* self)
+{
+    Py_XDECREF(self->start);
+    Py_XDECREF(self->stop);
+    Py_XDECREF(self->handler);
+    free_object(self);
+}
+
+// ExcEntry(start, stop, handler, depth=EXC_DEPTH_AUTO, lasti=False)
+static int PyExcEntry_init(PyExcEntryObject* self, PyObject* args, PyObject* kw)
+{
+    static const char* kwlist[] = {"start", "stop", "handler", "depth", "lasti", nullptr};
+    PyObject* start = nullptr, *stop = nullptr, *handler = nullptr;
+    int depth = EXC_DEPTH_AUTO, lasti = 0;
+    ModuleState* st = state_of(self);
+    if (!PyArg_ParseTupleAndKeywords(args, kw, "O!O!O!|ii",
+            const_cast<char**>(kwlist),
+            st->label_type, &start, st->label_type, &stop, st->label_type, &handler,
+            &depth, &lasti))
+        return -1;
+    Py_INCREF(start); Py_XDECREF(self->start); self->start = start;
+    Py_INCREF(stop);  Py_XDECREF(self->stop);  self->stop  = stop;
+    Py_INCREF(handler); Py_XDECREF(self->handler); self->handler = handler;
+    self->depth = depth;
+    self->lasti = lasti;
+    self->stamp = next_stamp(st);
+    return 0;
+}
+
+static PyObject* PyExcEntry_new(PyTypeObject* type, PyObject*, PyObject*)
+{
+    auto* self = reinterpret_cast<PyExcEntryObject*>(type->tp_alloc(type, 0));
+    if (self) { self->start = self->stop = self->handler = nullptr;
+                self->depth = EXC_DEPTH_AUTO; self->lasti = 0;
+                self->stamp = next_stamp(type_state(type)); }
+    return reinterpret_cast<PyObject*>(self);
+}
+
+static PyObject* PyExcEntry_repr(PyExcEntryObject* self)
+{
+    return PyUnicode_FromFormat("ExcEntry(start=%R, stop=%R, handler=%R, depth=%d, lasti=%d)",
+                                self->start, self->stop, self->handler,
+                                self->depth, self->lasti);
+}
+
+#define EXCENTRY_OBJ_GETSET(field, doc)                                           \
+    static PyObject* PyExcEntry_get_##field(PyExcEntryObject* s, void*) {         \
+        Py_INCREF(s->field); return s->field; }                                   \
+    static int PyExcEntry_set_##field(PyExcEntryObject* s, PyObject* v, void*) {  \
+        if (!v || !PyObject_TypeCheck(v, state_of(s)->label_type)) {              \
+            PyErr_SetString(PyExc_TypeError, #field " must be a Label"); return -1;} \
+        Py_INCREF(v); Py_DECREF(s->field); s->field = v;                          \
+        s->stamp = next_stamp(state_of(s)); return 0; }
+
+EXCENTRY_OBJ_GETSET(start,   "Inclusive start Label.")
+EXCENTRY_OBJ_GETSET(stop,    "Exclusive stop Label.")
+EXCENTRY_OBJ_GETSET(handler, "Handler target Label.")
+#undef EXCENTRY_OBJ_GETSET
+
+static PyObject* PyExcEntry_get_depth(PyExcEntryObject* s, void*)
     { return PyLong_FromLong(s->depth); }
 static int PyExcEntry_set_depth(PyExcEntryObject* s, PyObject* v, void*)
     { long n = PyLong_AsLong(v); if (n == -1 && PyErr_Occurred()) return -1;
-      s->depth = static_cast<int>(n); return 0; }
+      s->depth = static_cast<int>(n); s->stamp = next_stamp(state_of(s)); return 0; }
 
 static PyObject* PyExcEntry_get_lasti(PyExcEntryObject* s, void*)
     { return PyBool_FromLong(s->lasti); }
 static int PyExcEntry_set_lasti(PyExcEntryObject* s, PyObject* v, void*)
-    { s->lasti = PyObject_IsTrue(v); return 0; }
+    { int b = PyObject_IsTrue(v); if (b < 0) return -1;
+      s->lasti = b; s->stamp = next_stamp(state_of(s)); return 0; }
 
 static PyGetSetDef PyExcEntry_getset[] = {
-    {"start",   (getter)PyExcEntry_get_start,   (setter)PyExcEntry_set_start,   "inclusive start Label", nullptr},
-    {"stop",    (getter)PyExcEntry_get_stop,     (setter)PyExcEntry_set_stop,    "exclusive stop Label",  nullptr},
-    {"handler", (getter)PyExcEntry_get_handler,  (setter)PyExcEntry_set_handler, "handler Label",         nullptr},
-    {"depth",   (getter)PyExcEntry_get_depth,     (setter)PyExcEntry_set_depth,   "stack depth",           nullptr},
-    {"lasti",   (getter)PyExcEntry_get_lasti,    (setter)PyExcEntry_set_lasti,   "push lasti",            nullptr},
+    {"start",   (getter)LOCKED(PyExcEntry_get_start),   (setter)LOCKED(PyExcEntry_set_start),   "inclusive start Label", nullptr},
+    {"stop",    (getter)LOCKED(PyExcEntry_get_stop),     (setter)LOCKED(PyExcEntry_set_stop),    "exclusive stop Label",  nullptr},
+    {"handler", (getter)LOCKED(PyExcEntry_get_handler),  (setter)LOCKED(PyExcEntry_set_handler), "handler Label",         nullptr},
+    {"depth",   (getter)LOCKED(PyExcEntry_get_depth),     (setter)LOCKED(PyExcEntry_set_depth),   "stack depth",           nullptr},
+    {"lasti",   (getter)LOCKED(PyExcEntry_get_lasti),    (setter)LOCKED(PyExcEntry_set_lasti),   "push lasti",            nullptr},
     {nullptr},
 };
 
-PyTypeObject PyExcEntryType = {
-    .ob_base      = PyVarObject_HEAD_INIT(nullptr, 0)
-    .tp_name      = "spasm._core.ExcEntry",
-    .tp_basicsize = sizeof(PyExcEntryObject),
-    .tp_dealloc   = (destructor)PyExcEntry_dealloc,
-    .tp_repr      = (reprfunc)PyExcEntry_repr,
-    .tp_flags     = Py_TPFLAGS_DEFAULT,
-    .tp_doc       = "One exception table entry (labels, depth, lasti).",
-    .tp_getset    = PyExcEntry_getset,
-    .tp_init      = (initproc)PyExcEntry_init,
-    .tp_new       = PyExcEntry_new,
+static PyType_Slot PyExcEntry_slots[] = {
+    {Py_tp_dealloc, (void*)PyExcEntry_dealloc},
+    {Py_tp_repr,    (void*)LOCKED(PyExcEntry_repr)},
+    {Py_tp_doc,     (void*)"One exception table entry (labels, depth, lasti)."},
+    {Py_tp_getset,  PyExcEntry_getset},
+    {Py_tp_init,    (void*)LOCKED(PyExcEntry_init)},
+    {Py_tp_new,     (void*)PyExcEntry_new},
+    {0, nullptr},
+};
+
+static PyType_Spec PyExcEntry_spec = {
+    .name      = "spasm._core.ExcEntry",
+    .basicsize = sizeof(PyExcEntryObject),
+    .flags     = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_IMMUTABLETYPE,
+    .slots     = PyExcEntry_slots,
 };
 
 // ════════════════════════════════════════════════════════════════════════════
-// Bytecode type
+// Step and Pattern types
 // ════════════════════════════════════════════════════════════════════════════
+// Python handles on the matcher in pattern.h. Both are immutable once built:
+// a Pattern is compiled from its Steps when it is created and can then be
+// matched against any number of Bytecode objects (Bytecode.find_pattern()).
 
-struct PyBytecodeObject {
+extern PyTypeObject PyStepType;
+extern PyTypeObject PyPatternType;
+
+struct PyStepObject {
     PyObject_HEAD
-    Bytecode* bc;            // owns CodeMeta + exc_labeled; instrs synced on demand
-    PyObject* py_instrs;     // Python list of PyInstrObject — canonical instruction store
-    PyObject* py_exc_entries; // Python list of PyExcEntryObject
-    PyObject* py_end_labels; // Python list of Label — targets one-past-the-last-instruction
+    PatternStep step;     // capture is unset (-1) until a Pattern numbers it
+    PyObject*   capture;  // owned: str, or None
 };
 
-static void PyBytecode_dealloc(PyBytecodeObject* self)
+static void PyStep_dealloc(PyStepObject* self)
 {
-    Py_XDECREF(self->py_instrs);
-    Py_XDECREF(self->py_exc_entries);
-    Py_XDECREF(self->py_end_labels);
-    delete self->bc;
-    Py_TYPE(self)->tp_free(self);
+    Py_XDECREF(self->capture);
+    free_object(self);
 }
 
-// ── construction from scratch ──────────────────────────────────────────────
-// Bytecode() builds an empty template: no instructions, empty consts/names/
-// varnames/freevars/cellvars, argcount=0, flags=0, firstlineno=1,
-// filename="<string>", name/qualname="<bytecode>". Callers fill in .instrs
-// (optionally via the constructor's `instrs` argument) and whichever
-// metadata their code needs before calling .to_code(). co_stacksize is
-// always computed automatically by .to_code() — there's no property for it.
+// Fill `ops` from None (any opcode), one opcode (int or opname) or an
+// iterable of them. Returns false with a Python exception set on failure.
+static bool parse_step_ops(ModuleState* st, PyObject* spec, std::bitset<256>& ops)
+{
+    if (spec == Py_None) {
+        ops.set();
+        return true;
+    }
+    if (PyUnicode_Check(spec) || PyLong_Check(spec)) {
+        int op = resolve_opcode(st, spec);
+        if (op < 0) return false;
+        ops.set(static_cast<size_t>(op));
+        return true;
+    }
+    PyObject* it = PyObject_GetIter(spec);
+    if (!it) return false;
+    while (PyObject* item = PyIter_Next(it)) {
+        int op = resolve_opcode(st, item);
+        Py_DECREF(item);
+        if (op < 0) { Py_DECREF(it); return false; }
+        ops.set(static_cast<size_t>(op));
+    }
+    Py_DECREF(it);
+    if (PyErr_Occurred()) return false;
+    if (ops.none()) {
+        PyErr_SetString(PyExc_ValueError, "Step needs at least one opcode (or None for any)");
+        return false;
+    }
+    return true;
+}
 
-static PyObject* PyBytecode_new(PyTypeObject* type, PyObject* /*args*/, PyObject* /*kw*/)
+// Step(ops=None, *, min_count=1, max_count=1, unlabeled=False, capture=None)
+// `ops` is an opcode, an iterable of opcodes (ints or opnames), or None for
+// any opcode. `max_count=None` repeats without bound.
+static PyObject* PyStep_new(PyTypeObject* type, PyObject* args, PyObject* kw)
 {
-    auto* self = reinterpret_cast<PyBytecodeObject*>(type->tp_alloc(type, 0));
+    static const char* kwlist[] = {"ops", "min_count", "max_count", "unlabeled", "capture", nullptr};
+    PyObject* ops = Py_None;
+    PyObject* max_obj = nullptr;
+    PyObject* capture = Py_None;
+    int min = 1, unlabeled = 0;
+    if (!PyArg_ParseTupleAndKeywords(args, kw, "|O$iOpO", const_cast<char**>(kwlist),
+                                     &ops, &min, &max_obj, &unlabeled, &capture))
+        return nullptr;
+
+    int max = 1;
+    if (max_obj == Py_None) {
+        max = -1;
+    } else if (max_obj) {
+        long v = PyLong_AsLong(max_obj);
+        if (v == -1 && PyErr_Occurred()) return nullptr;
+        max = static_cast<int>(std::min(v, static_cast<long>(INT32_MAX)));
+        if (v < 1) {
+            PyErr_SetString(PyExc_ValueError, "Step max_count must be at least 1, or None");
+            return nullptr;
+        }
+    }
+    if (min < 0 || (max >= 0 && min > max)) {
+        PyErr_SetString(PyExc_ValueError, "Step needs 0 <= min_count <= max_count");
+        return nullptr;
+    }
+    if (capture != Py_None && !PyUnicode_Check(capture)) {
+        PyErr_SetString(PyExc_TypeError, "Step capture must be a str or None");
+        return nullptr;
+    }
+
+    auto* self = reinterpret_cast<PyStepObject*>(type->tp_alloc(type, 0));
     if (!self) return nullptr;
+    new (&self->step) PatternStep();
+    Py_INCREF(capture);
+    self->capture = capture;
+    if (!parse_step_ops(state_of(self), ops, self->step.ops)) {
+        Py_DECREF(self);
+        return nullptr;
+    }
+    self->step.min       = min;
+    self->step.max       = max;
+    self->step.unlabeled = unlabeled != 0;
+    return reinterpret_cast<PyObject*>(self);
+}
 
-    self->bc = new Bytecode();
-    self->bc->meta.firstlineno = 1;
-    self->bc->meta.consts   = PyList_New(0);
-    self->bc->meta.names    = PyList_New(0);
-    self->bc->meta.varnames = PyList_New(0);
-    self->bc->meta.freevars = PyList_New(0);
-    self->bc->meta.cellvars = PyList_New(0);
-    self->bc->meta.filename = PyUnicode_FromString("<string>");
+static PyObject* PyStep_get_ops(PyStepObject* self, void*)
+{
+    PyObject* result = PyFrozenSet_New(nullptr);
+    if (!result) return nullptr;
+    for (int op = 0; op < 256; ++op) {
+        if (!self->step.ops.test(static_cast<size_t>(op))) continue;
+        PyObject* v = PyLong_FromLong(op);
+        if (!v || PySet_Add(result, v) < 0) {
+            Py_XDECREF(v);
+            Py_DECREF(result);
+            return nullptr;
+        }
+        Py_DECREF(v);
+    }
+    return result;
+}
+
+static PyObject* PyStep_get_min(PyStepObject* self, void*)
+    { return PyLong_FromLong(self->step.min); }
+static PyObject* PyStep_get_max(PyStepObject* self, void*)
+    { if (self->step.max < 0) Py_RETURN_NONE; return PyLong_FromLong(self->step.max); }
+static PyObject* PyStep_get_unlabeled(PyStepObject* self, void*)
+    { return PyBool_FromLong(self->step.unlabeled); }
+static PyObject* PyStep_get_capture(PyStepObject* self, void*)
+    { Py_INCREF(self->capture); return self->capture; }
+
+static PyGetSetDef PyStep_getset[] = {
+    {"ops",       (getter)PyStep_get_ops,       nullptr, "frozenset of accepted opcodes", nullptr},
+    {"min_count", (getter)PyStep_get_min,       nullptr, "fewest repetitions",            nullptr},
+    {"max_count", (getter)PyStep_get_max,       nullptr, "most repetitions, or None",     nullptr},
+    {"unlabeled", (getter)PyStep_get_unlabeled, nullptr, "reject labeled instructions",   nullptr},
+    {"capture",   (getter)PyStep_get_capture,   nullptr, "capture name, or None",         nullptr},
+    {nullptr},
+};
+
+static PyType_Slot PyStep_slots[] = {
+    {Py_tp_dealloc, (void*)PyStep_dealloc},
+    {Py_tp_doc,     (void*)
+        "Step(ops=None, *, min_count=1, max_count=1, unlabeled=False, capture=None): "
+        "one element of a Pattern, matching between min_count and max_count "
+        "consecutive instructions whose opcode is in ops."},
+    {Py_tp_getset,  PyStep_getset},
+    {Py_tp_new,     (void*)PyStep_new},
+    {0, nullptr},
+};
+
+static PyType_Spec PyStep_spec = {
+    .name      = "spasm._core.Step",
+    .basicsize = sizeof(PyStepObject),
+    .flags     = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_IMMUTABLETYPE,
+    .slots     = PyStep_slots,
+};
+
+struct PyPatternObject {
+    PyObject_HEAD
+    InstrPattern* pattern;  // owned
+    PyObject*     steps;    // owned: tuple of Step
+    PyObject*     captures; // owned: tuple of str, in capture slot order
+};
+
+static void PyPattern_dealloc(PyPatternObject* self)
+{
+    delete self->pattern;
+    Py_XDECREF(self->steps);
+    Py_XDECREF(self->captures);
+    free_object(self);
+}
+
+// Pattern(steps): compile an iterable of Step. Capture names must be unique.
+static PyObject* PyPattern_new(PyTypeObject* type, PyObject* args, PyObject* kw)
+{
+    static const char* kwlist[] = {"steps", nullptr};
+    PyObject* steps_arg;
+    if (!PyArg_ParseTupleAndKeywords(args, kw, "O", const_cast<char**>(kwlist), &steps_arg))
+        return nullptr;
+
+    PyObject* steps = PySequence_Tuple(steps_arg);
+    if (!steps) return nullptr;
+    Py_ssize_t n = PyTuple_GET_SIZE(steps);
+    if (n == 0) {
+        Py_DECREF(steps);
+        PyErr_SetString(PyExc_ValueError, "Pattern needs at least one Step");
+        return nullptr;
+    }
+
+    auto* self = reinterpret_cast<PyPatternObject*>(type->tp_alloc(type, 0));
+    if (!self) { Py_DECREF(steps); return nullptr; }
+    self->steps = steps;
+    self->captures = PyList_New(0);
+    if (!self->captures) { Py_DECREF(self); return nullptr; }
+    try {
+        self->pattern = new InstrPattern();
+        self->pattern->steps.reserve(static_cast<size_t>(n));
+    } catch (const std::bad_alloc&) {
+        Py_DECREF(self);
+        return PyErr_NoMemory();
+    }
+
+    for (Py_ssize_t i = 0; i < n; ++i) {
+        PyObject* item = PyTuple_GET_ITEM(steps, i);
+        if (!PyObject_TypeCheck(item, type_state(type)->step_type)) {
+            PyErr_Format(PyExc_TypeError, "steps[%zd] is not a Step (got %s)",
+                         i, Py_TYPE(item)->tp_name);
+            Py_DECREF(self);
+            return nullptr;
+        }
+        auto* st = reinterpret_cast<PyStepObject*>(item);
+        PatternStep step = st->step;
+        if (st->capture != Py_None) {
+            int seen = PySequence_Contains(self->captures, st->capture);
+            if (seen != 0) {
+                if (seen > 0)
+                    PyErr_Format(PyExc_ValueError, "duplicate capture name %R", st->capture);
+                Py_DECREF(self);
+                return nullptr;
+            }
+            step.capture = static_cast<int>(PyList_GET_SIZE(self->captures));
+            if (PyList_Append(self->captures, st->capture) < 0) {
+                Py_DECREF(self);
+                return nullptr;
+            }
+        }
+        self->pattern->steps.push_back(step);
+    }
+    self->pattern->n_captures = static_cast<size_t>(PyList_GET_SIZE(self->captures));
+
+    PyObject* captures = PyList_AsTuple(self->captures);
+    Py_SETREF(self->captures, captures);
+    if (!captures) { Py_DECREF(self); return nullptr; }
+    return reinterpret_cast<PyObject*>(self);
+}
+
+static PyObject* PyPattern_get_steps(PyPatternObject* self, void*)
+    { Py_INCREF(self->steps); return self->steps; }
+static PyObject* PyPattern_get_captures(PyPatternObject* self, void*)
+    { Py_INCREF(self->captures); return self->captures; }
+
+static PyGetSetDef PyPattern_getset[] = {
+    {"steps",    (getter)PyPattern_get_steps,    nullptr, "tuple of Step",                  nullptr},
+    {"captures", (getter)PyPattern_get_captures, nullptr, "capture names, in step order",   nullptr},
+    {nullptr},
+};
+
+static PyType_Slot PyPattern_slots[] = {
+    {Py_tp_dealloc, (void*)PyPattern_dealloc},
+    {Py_tp_doc,     (void*)
+        "Pattern(steps): a compiled sequence of Steps, matched "
+        "against instructions by Bytecode.find_pattern()."},
+    {Py_tp_getset,  PyPattern_getset},
+    {Py_tp_new,     (void*)PyPattern_new},
+    {0, nullptr},
+};
+
+static PyType_Spec PyPattern_spec = {
+    .name      = "spasm._core.Pattern",
+    .basicsize = sizeof(PyPatternObject),
+    .flags     = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_IMMUTABLETYPE,
+    .slots     = PyPattern_slots,
+};
+
+// ════════════════════════════════════════════════════════════════════════════
+// Bytecode type
+// ════════════════════════════════════════════════════════════════════════════
+
+// ── ToCodeCache ──────────────────────────────────────────────────────────
+// The last code object to_code() returned, with its encoding and a record of
+// the state it was built from. Objects are recorded by address (borrowed):
+// Instr and ExcEntry addresses come with a stamp from the mutation clock, so
+// a freed-and-reused address never matches. Table items and metadata strings
+// are held by the record, so their addresses can't be reused while it stands.
+
+struct ToCodeCache {
+    PyObject*   code = nullptr;     // owned; null in a record of depths only
+    EncodedCode encoded;
+
+    PyObject* instrs = nullptr;     // identity only; InstrList only
+    uint64_t  instrs_version = 0;   // InstrList only
+    std::vector<PyObject*> instr_objs;  // list only
+    std::vector<uint64_t>  instr_stamps; // 0: an InstrList entry not yet materialised
+    // (position, Label id) for every label on the instructions, in order: a
+    // `labels` list handed out before the record was taken can still be
+    // edited in place without changing its Instr's stamp.
+    std::vector<std::pair<size_t, int>> instr_labels;
+
+    PyObject* exc_entries = nullptr;
+    std::vector<PyObject*> exc_objs;
+    std::vector<uint64_t>  exc_stamps;
+
+    std::vector<int> end_ids;
+
+    // consts, names, varnames, freevars, cellvars
+    PyObject* tables[5] = {};       // identity only
+    PyObject* table_items[5] = {};  // owned tuples: the items at record time
+
+    PyObject* filename = nullptr;   // owned
+    PyObject* name     = nullptr;   // owned
+    PyObject* qualname = nullptr;   // owned
+    int argcount = 0, flags = 0, firstlineno = 0;
+
+    PyObject* built_consts = nullptr;  // owned: see built_consts(); null if none
+
+    // The stack depth each instruction is entered at (see stack_depths()),
+    // while `has_depths`: from the encode that made `code`, or computed on
+    // their own, in which case `code` may be null. Valid for as long as the
+    // instructions, exception entries and end labels match the record.
+    std::vector<int> depths;
+    bool has_depths = false;
+
+    // `code` was made by code.replace() on a decoded code object (see
+    // DecodedFrom below) and `encoded` is empty: a change to metadata only
+    // goes through code.replace() again.
+    bool replaced = false;
+
+    ~ToCodeCache() {
+        Py_XDECREF(code);
+        Py_XDECREF(built_consts);
+        for (PyObject* t : table_items) Py_XDECREF(t);
+        Py_XDECREF(filename); Py_XDECREF(name); Py_XDECREF(qualname);
+    }
+};
+
+// What from_code() made of a code object, by the stamps of the Instrs and
+// ExcEntries it created: every new object takes the next stamp, so the decoded
+// instructions carry `n_instrs` consecutive stamps from `instrs` on (or, when
+// lazy, sit in the InstrList `instrs_list` at version `instrs`) until changed.
+// A plain struct: PyBytecodeObject is zeroed by tp_alloc, not constructed.
+struct DecodedFrom {
+    PyObject*  code;          // owned; null if there is nothing to pass through
+    PyObject*  instrs_list;   // identity only; null if instrs is a list
+    uint64_t   instrs;        // first Instr stamp, or the InstrList's version
+    Py_ssize_t n_instrs;
+    uint64_t   exc_entries;   // first ExcEntry stamp
+    Py_ssize_t n_exc_entries;
+    int        end_label;     // id of the one end label, or -1
+};
+
+struct PyBytecodeObject {
+    PyObject_HEAD
+    Bytecode* bc;            // owns CodeMeta + exc_labeled; instrs synced on demand
+    PyObject* py_instrs;     // Python list of PyInstrObject — canonical instruction store
+    PyObject* py_exc_entries; // Python list of PyExcEntryObject
+    PyObject* py_end_labels; // Python list of Label — targets one-past-the-last-instruction
+    ToCodeCache* cache;      // null until the first successful to_code()
+    DecodedFrom decoded;     // code is null unless from_code() made this, until to_code()
+    LabelCache* labels;      // owned reference; null until a Label is first needed
+};
+
+static LabelCache* bytecode_labels(PyBytecodeObject* self)
+{
+    if (!self->labels && !(self->labels = LabelCache::create(state_of(self)))) PyErr_NoMemory();
+    return self->labels;
+}
+
+static void PyBytecode_dealloc(PyBytecodeObject* self)
+{
+    Py_XDECREF(self->py_instrs);
+    Py_XDECREF(self->py_exc_entries);
+    Py_XDECREF(self->py_end_labels);
+    delete self->cache;
+    Py_XDECREF(self->decoded.code);
+    if (self->labels) self->labels->decref();
+    delete self->bc;
+    free_object(self);
+}
+
+// ── construction from scratch ──────────────────────────────────────────────
+// Bytecode() builds an empty template: no instructions, empty consts/names/
+// varnames/freevars/cellvars, argcount=0, flags=0, firstlineno=1,
+// filename="<string>", name/qualname="<bytecode>". Callers fill in .instrs
+// (optionally via the constructor's `instrs` argument) and whichever
+// metadata their code needs before calling .to_code(). co_stacksize is
+// always computed automatically by .to_code() — there's no property for it.
+
+static PyObject* PyBytecode_new(PyTypeObject* type, PyObject* /*args*/, PyObject* /*kw*/)
+{
+    auto* self = reinterpret_cast<PyBytecodeObject*>(type->tp_alloc(type, 0));
+    if (!self) return nullptr;
+
+    self->bc = new Bytecode();
+    self->bc->meta.firstlineno = 1;
+    self->bc->meta.consts   = PyList_New(0);
+    self->bc->meta.names    = PyList_New(0);
+    self->bc->meta.varnames = PyList_New(0);
+    self->bc->meta.freevars = PyList_New(0);
+    self->bc->meta.cellvars = PyList_New(0);
+    self->bc->meta.filename = PyUnicode_FromString("<string>");
     self->bc->meta.name     = PyUnicode_FromString("<bytecode>");
     Py_XINCREF(self->bc->meta.name);
     self->bc->meta.qualname = self->bc->meta.name;
 
-    self->py_instrs      = PyList_New(0);
-    self->py_exc_entries = PyList_New(0);
-    self->py_end_labels  = PyList_New(0);
+    self->py_instrs      = PyList_New(0);
+    self->py_exc_entries = PyList_New(0);
+    self->py_end_labels  = PyList_New(0);
+
+    if (!self->bc->meta.consts || !self->bc->meta.names || !self->bc->meta.varnames ||
+        !self->bc->meta.freevars || !self->bc->meta.cellvars ||
+        !self->bc->meta.filename || !self->bc->meta.name ||
+        !self->py_instrs || !self->py_exc_entries || !self->py_end_labels) {
+        Py_DECREF(self);
+        return nullptr;
+    }
+
+    return reinterpret_cast<PyObject*>(self);
+}
+
+// Bytecode(instrs=())
+static int PyBytecode_init(PyBytecodeObject* self, PyObject* args, PyObject* kw)
+{
+    static const char* kwlist[] = {"instrs", nullptr};
+    PyObject* instrs = nullptr;
+    if (!PyArg_ParseTupleAndKeywords(args, kw, "|O", const_cast<char**>(kwlist), &instrs))
+        return -1;
+    if (instrs == nullptr) return 0;
+
+    PyObject* lst = PySequence_List(instrs);
+    if (!lst) return -1;
+
+    Py_ssize_t n = PyList_GET_SIZE(lst);
+    for (Py_ssize_t i = 0; i < n; ++i) {
+        PyObject* item = PyList_GET_ITEM(lst, i);
+        if (!PyObject_TypeCheck(item, state_of(self)->instr_type)) {
+            PyErr_Format(PyExc_TypeError,
+                "instrs[%zd] is not an Instr (got %s)", i, Py_TYPE(item)->tp_name);
+            Py_DECREF(lst);
+            return -1;
+        }
+    }
+
+    Py_DECREF(self->py_instrs);
+    self->py_instrs = lst;
+    return 0;
+}
+
+// ── from_code ─────────────────────────────────────────────────────────────
+
+// Replace every code object in consts with a Bytecode decoded from it, and
+// point the decoded instructions that load one at its Bytecode instead.
+// Those args borrow from the code object's tables until then, so this runs
+// before anything takes a reference to them. On success `nested` holds a new
+// tuple of the Bytecodes (empty if there were none), for a lazy InstrList to
+// keep them alive by.
+static PyObject* bytecode_from_code(ModuleState* st, PyObject* code_obj, bool lazy,
+                                    bool recursive);
+static bool decode_nested(PyBytecodeObject* self, bool lazy, PyObject*& nested)
+{
+    std::unordered_map<PyObject*, PyObject*> sub;  // code -> Bytecode, owned by consts
+    PyObject* consts = self->bc->meta.consts;
+    for (Py_ssize_t i = 0; i < PyList_GET_SIZE(consts); ++i) {
+        PyObject* c = PyList_GET_ITEM(consts, i);
+        if (!PyCode_Check(c)) continue;
+        PyObject* child;
+        auto it = sub.find(c);
+        if (it != sub.end()) {
+            child = it->second;
+            Py_INCREF(child);
+        } else {
+            if (Py_EnterRecursiveCall(" while decoding nested code")) return false;
+            child = bytecode_from_code(state_of(self), c, lazy, true);
+            Py_LeaveRecursiveCall();
+            if (!child) return false;
+            sub.emplace(c, child);
+        }
+        // The code object itself stays alive in the parent's co_consts.
+        PyList_SetItem(consts, i, child);
+    }
+    self->bc->consts_index.invalidate();
+
+    nested = PyTuple_New(static_cast<Py_ssize_t>(sub.size()));
+    if (!nested) return false;
+    Py_ssize_t k = 0;
+    for (auto& [code, child] : sub) {
+        Py_INCREF(child);
+        PyTuple_SET_ITEM(nested, k++, child);
+    }
+    if (!sub.empty())
+        for (Instr& ci : self->bc->instrs)
+            if (auto* pv = std::get_if<PyObject*>(&ci.arg)) {
+                auto it = sub.find(*pv);
+                if (it != sub.end()) *pv = it->second;
+            }
+    return true;
+}
+
+static PyObject* bytecode_from_code(ModuleState* st, PyObject* code_obj, bool lazy,
+                                    bool recursive)
+{
+    auto* self = reinterpret_cast<PyBytecodeObject*>(
+        st->bytecode_type->tp_alloc(st->bytecode_type, 0));
+    if (!self) return nullptr;
+
+    try {
+        self->bc = new Bytecode(
+            Bytecode::from_code(reinterpret_cast<PyCodeObject*>(code_obj)));
+    } catch (const std::exception& e) {
+        PyErr_SetString(PyExc_RuntimeError, e.what());
+        Py_DECREF(self);
+        return nullptr;
+    }
+
+    LabelCache* labels = bytecode_labels(self);
+    if (!labels) { Py_DECREF(self); return nullptr; }
+
+    PyObject* nested = nullptr;
+    if (recursive && !decode_nested(self, lazy, nested)) {
+        Py_XDECREF(nested);
+        Py_DECREF(self);
+        return nullptr;
+    }
+
+    if (lazy) {
+        // Hand the decoded instructions to an InstrList as they are. Their
+        // args borrow from the code object, and from any nested Bytecodes.
+        PyObject* owner = code_obj;
+        if (nested && PyTuple_GET_SIZE(nested) > 0)
+            owner = PyTuple_Pack(2, code_obj, nested);
+        else
+            Py_INCREF(owner);
+        Py_XDECREF(nested);
+        if (!owner) { Py_DECREF(self); return nullptr; }
+        self->py_instrs = instrlist_new(st, std::move(self->bc->instrs), owner, labels);
+        Py_DECREF(owner);
+        if (!self->py_instrs) { Py_DECREF(self); return nullptr; }
+    } else {
+        Py_XDECREF(nested);
+        // Convert C++ instrs → Python list of PyInstrObject.
+        self->py_instrs = PyList_New(
+            static_cast<Py_ssize_t>(self->bc->instrs.size()));
+        if (!self->py_instrs) { Py_DECREF(self); return nullptr; }
+
+        for (size_t i = 0; i < self->bc->instrs.size(); ++i) {
+            PyObject* pi = pyinstr_from_cpp(st, self->bc->instrs[i], labels);
+            if (!pi) { Py_DECREF(self); return nullptr; }
+            PyList_SET_ITEM(self->py_instrs, static_cast<Py_ssize_t>(i), pi);
+        }
+    }
+
+    // C++ instrs no longer needed; py_instrs is canonical from here.
+    self->bc->instrs.clear();
+    self->bc->instrs.shrink_to_fit();
+
+    // Convert end_labels → Python list of Label.
+    self->py_end_labels = PyList_New(
+        static_cast<Py_ssize_t>(self->bc->end_labels.size()));
+    if (!self->py_end_labels) { Py_DECREF(self); return nullptr; }
+    for (size_t i = 0; i < self->bc->end_labels.size(); ++i) {
+        PyObject* lobj = labels->get(self->bc->end_labels[i].id);
+        if (!lobj) { Py_DECREF(self); return nullptr; }
+        PyList_SET_ITEM(self->py_end_labels, static_cast<Py_ssize_t>(i), lobj);
+    }
+
+    // Convert exc_labeled → Python list of PyExcEntryObject. Its Label
+    // fields were already attached to the matching py_instrs entries (or
+    // py_end_labels) above, via bc->instrs[i].labels / bc->end_labels.
+#if HAS_EXCEPTION_TABLE
+    self->py_exc_entries = PyList_New(
+        static_cast<Py_ssize_t>(self->bc->exc_labeled.size()));
+    if (!self->py_exc_entries) { Py_DECREF(self); return nullptr; }
+
+    for (size_t i = 0; i < self->bc->exc_labeled.size(); ++i) {
+        const ExcEntryL& el = self->bc->exc_labeled[i];
+
+        PyObject* start   = labels->get(el.start_lbl.id);
+        PyObject* stop    = labels->get(el.stop_lbl.id);
+        PyObject* handler = labels->get(el.handler_lbl.id);
+        if (!start || !stop || !handler) {
+            Py_XDECREF(start); Py_XDECREF(stop); Py_XDECREF(handler);
+            Py_DECREF(self); return nullptr;
+        }
+
+        auto* ee = reinterpret_cast<PyExcEntryObject*>(
+            st->exc_entry_type->tp_alloc(st->exc_entry_type, 0));
+        if (!ee) {
+            Py_DECREF(start); Py_DECREF(stop); Py_DECREF(handler);
+            Py_DECREF(self); return nullptr;
+        }
+        ee->start   = start;
+        ee->stop    = stop;
+        ee->handler = handler;
+        ee->depth   = el.depth;
+        ee->lasti   = el.lasti ? 1 : 0;
+        ee->stamp   = next_stamp(st);
+        PyList_SET_ITEM(self->py_exc_entries,
+                        static_cast<Py_ssize_t>(i),
+                        reinterpret_cast<PyObject*>(ee));
+    }
+#else
+    self->py_exc_entries = PyList_New(0);
+    if (!self->py_exc_entries) { Py_DECREF(self); return nullptr; }
+#endif
+
+    // Remember what was decoded, for to_code() to pass a change to metadata
+    // only through code.replace() (see DecodedFrom).
+    DecodedFrom& d = self->decoded;
+    d.end_label = -1;
+    Py_ssize_t n_end = PyList_GET_SIZE(self->py_end_labels);
+    if (n_end == 1)
+        d.end_label = reinterpret_cast<PyLabelObject*>(
+            PyList_GET_ITEM(self->py_end_labels, 0))->id;
+    d.n_instrs = lazy ? 0 : PyList_GET_SIZE(self->py_instrs);
+    d.n_exc_entries = PyList_GET_SIZE(self->py_exc_entries);
+    bool consecutive = n_end <= 1;
+    if (lazy) {
+        d.instrs_list = self->py_instrs;
+        d.instrs = reinterpret_cast<PyInstrListObject*>(self->py_instrs)->version;
+    } else if (d.n_instrs > 0) {
+        d.instrs = reinterpret_cast<PyInstrObject*>(
+            PyList_GET_ITEM(self->py_instrs, 0))->stamp;
+        consecutive &= reinterpret_cast<PyInstrObject*>(
+            PyList_GET_ITEM(self->py_instrs, d.n_instrs - 1))->stamp ==
+            d.instrs + static_cast<uint64_t>(d.n_instrs - 1);
+    }
+    if (d.n_exc_entries > 0) {
+        d.exc_entries = reinterpret_cast<PyExcEntryObject*>(
+            PyList_GET_ITEM(self->py_exc_entries, 0))->stamp;
+        consecutive &= reinterpret_cast<PyExcEntryObject*>(
+            PyList_GET_ITEM(self->py_exc_entries, d.n_exc_entries - 1))->stamp ==
+            d.exc_entries + static_cast<uint64_t>(d.n_exc_entries - 1);
+    }
+    if (consecutive) d.code = Py_NewRef(code_obj);
+
+    return reinterpret_cast<PyObject*>(self);
+}
+
+// from_code(code, *, lazy=False, recursive=False)
+// With lazy=True, .instrs is an InstrList over the decoded instructions
+// rather than a list of Instr built up front (see InstrList above). With
+// recursive=True, nested code objects in consts (functions, lambdas,
+// comprehensions, class bodies) are decoded too, in the same mode, and
+// appear in consts and instruction args as Bytecode objects.
+static PyObject* PyBytecode_from_code(PyObject* type, PyObject* args, PyObject* kw)
+{
+    static const char* kwlist[] = {"code", "lazy", "recursive", nullptr};
+    PyObject* code_obj;
+    int lazy = 0, recursive = 0;
+    if (!PyArg_ParseTupleAndKeywords(args, kw, "O!|$pp", const_cast<char**>(kwlist),
+                                     &PyCode_Type, &code_obj, &lazy, &recursive))
+        return nullptr;
+    return bytecode_from_code(type_state(reinterpret_cast<PyTypeObject*>(type)), code_obj,
+                              lazy != 0, recursive != 0);
+}
+
+// ── to_code ───────────────────────────────────────────────────────────────
+
+// Sync py_instrs (a list of Instr, or an InstrList) → bc->instrs.
+static bool sync_instrs(PyBytecodeObject* self)
+{
+    ModuleState* st = state_of(self);
+    self->bc->instrs.clear();
+
+    if (PyObject_TypeCheck(self->py_instrs, st->instrlist_type)) {
+        auto* il = reinterpret_cast<PyInstrListObject*>(self->py_instrs);
+        Py_ssize_t n = instrlist_size(il);
+        self->bc->instrs.reserve(static_cast<size_t>(n));
+        for (Py_ssize_t i = 0; i < n; ++i) {
+            Instr ci(0);
+            if (!instrlist_entry_to_cpp(st, il, i, ci)) return false;
+            self->bc->instrs.push_back(std::move(ci));
+        }
+        return true;
+    }
+
+    if (!PyList_Check(self->py_instrs)) {
+        PyErr_SetString(PyExc_TypeError, "instrs must be a list");
+        return false;
+    }
+    Py_ssize_t n = PyList_GET_SIZE(self->py_instrs);
+    self->bc->instrs.reserve(static_cast<size_t>(n));
+    for (Py_ssize_t i = 0; i < n; ++i) {
+        PyObject* item = PyList_GET_ITEM(self->py_instrs, i);
+        if (!PyObject_TypeCheck(item, st->instr_type)) {
+            PyErr_Format(PyExc_TypeError,
+                "instrs[%zd] is not an Instr (got %s)", i,
+                Py_TYPE(item)->tp_name);
+            return false;
+        }
+        Instr ci(0);
+        if (!pyinstr_to_cpp(st, reinterpret_cast<PyInstrObject*>(item), ci)) return false;
+        self->bc->instrs.push_back(std::move(ci));
+    }
+    return true;
+}
+
+// Sync py_end_labels → bc->end_labels.
+static bool sync_end_labels(PyBytecodeObject* self)
+{
+    ModuleState* st = state_of(self);
+    if (!PyList_Check(self->py_end_labels)) {
+        PyErr_SetString(PyExc_TypeError, "end_labels must be a list");
+        return false;
+    }
+    self->bc->end_labels.clear();
+    Py_ssize_t nel = PyList_GET_SIZE(self->py_end_labels);
+    self->bc->end_labels.reserve(static_cast<size_t>(nel));
+    for (Py_ssize_t i = 0; i < nel; ++i) {
+        PyObject* item = PyList_GET_ITEM(self->py_end_labels, i);
+        if (!PyObject_TypeCheck(item, st->label_type)) {
+            PyErr_Format(PyExc_TypeError,
+                "end_labels[%zd] is not a Label (got %s)", i,
+                Py_TYPE(item)->tp_name);
+            return false;
+        }
+        self->bc->end_labels.push_back(
+            Label{reinterpret_cast<PyLabelObject*>(item)->id});
+    }
+    return true;
+}
+
+// Sync py_exc_entries → bc->exc_labeled.
+static bool sync_exc_entries(PyBytecodeObject* self)
+{
+#if HAS_EXCEPTION_TABLE
+    ModuleState* st = state_of(self);
+    self->bc->exc_labeled.clear();
+    Py_ssize_t ne = PyList_GET_SIZE(self->py_exc_entries);
+    self->bc->exc_labeled.reserve(static_cast<size_t>(ne));
+    for (Py_ssize_t i = 0; i < ne; ++i) {
+        PyObject* item = PyList_GET_ITEM(self->py_exc_entries, i);
+        if (!PyObject_TypeCheck(item, st->exc_entry_type)) {
+            PyErr_Format(PyExc_TypeError,
+                "exc_entries[%zd] is not an ExcEntry (got %s)", i,
+                Py_TYPE(item)->tp_name);
+            return false;
+        }
+        auto* ee = reinterpret_cast<PyExcEntryObject*>(item);
+        ExcEntryL el;
+        el.start_lbl   = Label{reinterpret_cast<PyLabelObject*>(ee->start)->id};
+        el.stop_lbl    = Label{reinterpret_cast<PyLabelObject*>(ee->stop)->id};
+        el.handler_lbl = Label{reinterpret_cast<PyLabelObject*>(ee->handler)->id};
+        el.depth = ee->depth;
+        el.lasti = ee->lasti != 0;
+        self->bc->exc_labeled.push_back(el);
+    }
+#else
+    (void)self;
+#endif
+    return true;
+}
+
+// ── to_code cache ─────────────────────────────────────────────────────────
+// to_code() is called repeatedly on the same Bytecode by instrumentation
+// that patches a function and re-emits it; most of those calls either change
+// nothing or only touch metadata. Each call is classified against the record
+// in ToCodeCache:
+//   HIT  — nothing changed: return the cached code object.
+//   META — only name/qualname/filename/flags/argcount changed, or consts/names
+//          only grew at the end: reuse the cached encoding, rebuild the code
+//          object around it.
+//   MISS — anything else: sync, encode and build from scratch.
+
+enum class CacheState { MISS, META, HIT };
+
+static void bytecode_tables(Bytecode* bc, PyObject* (&out)[5])
+{
+    out[0] = bc->meta.consts;   out[1] = bc->meta.names;
+    out[2] = bc->meta.varnames; out[3] = bc->meta.freevars;
+    out[4] = bc->meta.cellvars;
+}
+
+// 0: unchanged; 1: only appended to; -1: anything else.
+static int table_delta(PyObject* list, PyObject* was, PyObject* items)
+{
+    if (list != was) return -1;
+    Py_ssize_t n = PyList_GET_SIZE(list), m = PyTuple_GET_SIZE(items);
+    if (n < m) return -1;
+    for (Py_ssize_t i = 0; i < m; ++i)
+        if (PyList_GET_ITEM(list, i) != PyTuple_GET_ITEM(items, i)) return -1;
+    return n == m ? 0 : 1;
+}
+
+// Call `f(id)` for each Label on an instruction, or on an InstrList entry not
+// yet materialised; false if an Instr's list holds something else.
+template <class F>
+static bool for_each_label_id(ModuleState* st, PyObject* instr, F&& f)
+{
+    PyObject* labels = reinterpret_cast<PyInstrObject*>(instr)->labels;
+    for (Py_ssize_t j = 0; labels && j < PyList_GET_SIZE(labels); ++j) {
+        PyObject* lbl = PyList_GET_ITEM(labels, j);
+        if (!PyObject_TypeCheck(lbl, st->label_type)) return false;
+        f(reinterpret_cast<PyLabelObject*>(lbl)->id);
+    }
+    return true;
+}
+
+// An InstrList entry together with the columns it reads from.
+struct LazyEntry {
+    const LazyColumns& cols;
+    const LazyInstr&   li;
+};
+
+template <class F>
+static bool for_each_label_id(ModuleState* st, const LazyEntry& e, F&& f)
+{
+    if (e.li.obj) return for_each_label_id(st, e.li.obj, f);
+    e.cols.for_each_label(e.li.row, f);
+    return true;
+}
+
+// Whether the instruction at `pos` carries the labels recorded for it, from
+// c.instr_labels[k] on; advances `k` past them.
+template <class I>
+static bool labels_unchanged(ModuleState* st, const I& instr, size_t pos, const ToCodeCache& c, size_t& k)
+{
+    bool same = true;
+    if (!for_each_label_id(st, instr, [&](int id) {
+            same = same && k < c.instr_labels.size() && c.instr_labels[k] == std::make_pair(pos, id);
+            ++k;
+        }))
+        return false;
+    return same;
+}
+
+// A plain list is compared item by item, so a new list holding the same
+// unchanged Instrs still matches; an InstrList has to be the same one.
+static bool instrs_unchanged(PyBytecodeObject* self, const ToCodeCache& c)
+{
+    ModuleState* st = state_of(self);
+    size_t k = 0;
+    if (PyObject_TypeCheck(self->py_instrs, st->instrlist_type)) {
+        auto* il = reinterpret_cast<PyInstrListObject*>(self->py_instrs);
+        if (self->py_instrs != c.instrs || il->version != c.instrs_version ||
+            il->items->size() != c.instr_stamps.size())
+            return false;
+        for (size_t i = 0; i < c.instr_stamps.size(); ++i) {
+            const LazyInstr& li = (*il->items)[i];
+            uint64_t was = c.instr_stamps[i];
+            if (!labels_unchanged(st, LazyEntry{*il->cols, li}, i, c, k)) return false;
+            if (!li.obj) {
+                if (was != 0) return false;
+                continue;
+            }
+            // An entry materialised since the record was taken is unchanged
+            // as long as its Instr still carries the stamp it was born with.
+            uint64_t now = reinterpret_cast<PyInstrObject*>(li.obj)->stamp;
+            if (now != was && !(was == 0 && now == li.born)) return false;
+        }
+        return k == c.instr_labels.size();
+    }
+
+    if (!PyList_Check(self->py_instrs)) return false;
+    size_t n = static_cast<size_t>(PyList_GET_SIZE(self->py_instrs));
+    if (n != c.instr_objs.size() || n != c.instr_stamps.size()) return false;
+    for (size_t i = 0; i < n; ++i) {
+        PyObject* item = PyList_GET_ITEM(self->py_instrs, static_cast<Py_ssize_t>(i));
+        if (item != c.instr_objs[i] || !PyObject_TypeCheck(item, st->instr_type) ||
+            reinterpret_cast<PyInstrObject*>(item)->stamp != c.instr_stamps[i] ||
+            !labels_unchanged(st, item, i, c, k))
+            return false;
+    }
+    return k == c.instr_labels.size();
+}
+
+static bool exc_entries_unchanged(PyBytecodeObject* self, const ToCodeCache& c)
+{
+    ModuleState* st = state_of(self);
+    if (self->py_exc_entries != c.exc_entries) return false;
+    size_t n = static_cast<size_t>(PyList_GET_SIZE(self->py_exc_entries));
+    if (n != c.exc_objs.size()) return false;
+    for (size_t i = 0; i < n; ++i) {
+        PyObject* item = PyList_GET_ITEM(self->py_exc_entries, static_cast<Py_ssize_t>(i));
+        if (item != c.exc_objs[i] || !PyObject_TypeCheck(item, st->exc_entry_type) ||
+            reinterpret_cast<PyExcEntryObject*>(item)->stamp != c.exc_stamps[i])
+            return false;
+    }
+    return true;
+}
+
+static bool end_labels_unchanged(PyBytecodeObject* self, const ToCodeCache& c)
+{
+    ModuleState* st = state_of(self);
+    if (!PyList_Check(self->py_end_labels)) return false;
+    size_t n = static_cast<size_t>(PyList_GET_SIZE(self->py_end_labels));
+    if (n != c.end_ids.size()) return false;
+    for (size_t i = 0; i < n; ++i) {
+        PyObject* item = PyList_GET_ITEM(self->py_end_labels, static_cast<Py_ssize_t>(i));
+        if (!PyObject_TypeCheck(item, st->label_type) ||
+            reinterpret_cast<PyLabelObject*>(item)->id != c.end_ids[i])
+            return false;
+    }
+    return true;
+}
+
+// Whether everything the stack depths follow from is as recorded.
+static bool flow_unchanged(PyBytecodeObject* self, const ToCodeCache& c)
+{
+    return instrs_unchanged(self, c) && exc_entries_unchanged(self, c) &&
+           end_labels_unchanged(self, c);
+}
+
+static CacheState tocode_cache_state(PyBytecodeObject* self)
+{
+    const ToCodeCache* c = self->cache;
+    if (!c || !c->code) return CacheState::MISS;
+    const CodeMeta& m = self->bc->meta;
+
+    if (m.firstlineno != c->firstlineno || !flow_unchanged(self, *c))
+        return CacheState::MISS;
+
+    // Instruction args are resolved against the tables by value, so an
+    // existing entry moving or going away changes the encoding; new entries
+    // at the end of consts/names don't. The localsplus tables have to match
+    // exactly.
+    PyObject* tables[5];
+    bytecode_tables(self->bc, tables);
+    bool grew = false;
+    for (int t = 0; t < 5; ++t) {
+        int d = table_delta(tables[t], c->tables[t], c->table_items[t]);
+        if (d < 0 || (d > 0 && t >= 2)) return CacheState::MISS;
+        grew |= d > 0;
+    }
+
+    if (grew || m.filename != c->filename || m.name != c->name ||
+        m.qualname != c->qualname || m.argcount != c->argcount ||
+        m.flags != c->flags)
+        return CacheState::META;
+    return CacheState::HIT;
+}
+
+// Nested Bytecode constants (from from_code(recursive=True), or added by
+// hand) are built bottom-up, each through its own to_code(), so a subtree
+// that hasn't changed comes straight back from its cache. They are built
+// before their parent is locked, never under its lock (see to_code() below),
+// and handed to it here.
+struct NestedCodes {
+    std::vector<std::pair<PyObject*, PyObject*>> codes;  // owned: a Bytecode, then its code
+    bool missing = false;  // consts held a Bytecode that isn't in codes
+
+    NestedCodes() = default;
+    NestedCodes(const NestedCodes&) = delete;
+    NestedCodes& operator=(const NestedCodes&) = delete;
+    ~NestedCodes()
+    {
+        for (auto& [bc, co] : codes) {
+            Py_DECREF(bc);
+            Py_XDECREF(co);
+        }
+    }
+
+    PyObject* find(PyObject* bc) const
+    {
+        for (const auto& [b, co] : codes)
+            if (b == bc) return co;
+        return nullptr;
+    }
+};
+
+// Returns a new tuple of consts with the nested Bytecodes replaced by their
+// code objects from `nested`, Py_None if consts holds no Bytecode, or
+// nullptr: with an exception set, or with nested.missing set if one hasn't
+// been built.
+static PyObject* built_consts(PyBytecodeObject* self, NestedCodes* nested)
+{
+    ModuleState* st = state_of(self);
+    PyObject* consts = self->bc->meta.consts;
+    PyObject* out = nullptr;
+    for (Py_ssize_t i = 0; i < PyList_GET_SIZE(consts); ++i) {
+        PyObject* c = PyList_GET_ITEM(consts, i);
+        if (!PyObject_TypeCheck(c, st->bytecode_type)) continue;
+        PyObject* co = nested->find(c);
+        if (!co) {
+            nested->missing = true;
+            Py_XDECREF(out);
+            return nullptr;
+        }
+        if (!out && !(out = PyList_AsTuple(consts))) return nullptr;
+        Py_INCREF(co);
+        PyTuple_SET_ITEM(out, i, co);
+        Py_DECREF(c);  // the tuple's reference from PyList_AsTuple
+    }
+    if (!out) Py_RETURN_NONE;
+    return out;
+}
+
+// Take a reference to each distinct Bytecode in consts, to be built.
+static bool collect_nested(PyBytecodeObject* self, NestedCodes* nested)
+{
+    ModuleState* st = state_of(self);
+    PyObject* consts = self->bc->meta.consts;
+    try {
+        for (Py_ssize_t i = 0; i < PyList_GET_SIZE(consts); ++i) {
+            PyObject* c = PyList_GET_ITEM(consts, i);
+            if (!PyObject_TypeCheck(c, st->bytecode_type)) continue;
+            if (std::any_of(nested->codes.begin(), nested->codes.end(),
+                            [c](const auto& e) { return e.first == c; }))
+                continue;
+            nested->codes.emplace_back(c, nullptr);
+            Py_INCREF(c);
+        }
+    } catch (const std::bad_alloc&) {
+        PyErr_NoMemory();
+        return false;
+    }
+    return true;
+}
+
+// Whether `built`, from built_consts(), still stands for consts: the other
+// constants are the same objects, and the Bytecodes at the same positions.
+// Py_None always does, since nothing ran to make it.
+static bool built_matches_consts(PyBytecodeObject* self, PyObject* built)
+{
+    if (built == Py_None) return true;
+    ModuleState* st = state_of(self);
+    PyObject* consts = self->bc->meta.consts;
+    Py_ssize_t n = PyList_GET_SIZE(consts);
+    if (n != PyTuple_GET_SIZE(built)) return false;
+    for (Py_ssize_t i = 0; i < n; ++i) {
+        PyObject* c = PyList_GET_ITEM(consts, i);
+        if (c != PyTuple_GET_ITEM(built, i) && !PyObject_TypeCheck(c, st->bytecode_type))
+            return false;
+    }
+    return true;
+}
+
+static bool same_built_consts(PyObject* built, PyObject* was)
+{
+    if (built == Py_None || !was) return built == Py_None && !was;
+    Py_ssize_t n = PyTuple_GET_SIZE(built);
+    if (n != PyTuple_GET_SIZE(was)) return false;
+    for (Py_ssize_t i = 0; i < n; ++i)
+        if (PyTuple_GET_ITEM(built, i) != PyTuple_GET_ITEM(was, i)) return false;
+    return true;
+}
+
+// Record the state `code` was built from (null: a record for the stack
+// depths only). Called with bc->instrs synced or not; reads only the
+// Python-side objects. Recorded depths are kept only if still valid.
+// Record into `c` what an encoding follows from: the tables, and the
+// instructions, exception entries and end labels by identity and stamp.
+static bool record_inputs(PyBytecodeObject* self, ToCodeCache& c)
+{
+    ModuleState* st = state_of(self);
+    PyObject* tables[5];
+    bytecode_tables(self->bc, tables);
+    PyObject* items[5] = {};
+    for (int t = 0; t < 5; ++t) {
+        items[t] = PyList_AsTuple(tables[t]);
+        if (!items[t]) {
+            for (PyObject* o : items) Py_XDECREF(o);
+            return false;
+        }
+    }
+    for (int t = 0; t < 5; ++t) {
+        c.tables[t] = tables[t];
+        Py_XSETREF(c.table_items[t], items[t]);
+    }
+
+    c.instrs = self->py_instrs;
+    c.instr_objs.clear();
+    c.instr_stamps.clear();
+    c.instr_labels.clear();
+    if (PyObject_TypeCheck(self->py_instrs, st->instrlist_type)) {
+        auto* il = reinterpret_cast<PyInstrListObject*>(self->py_instrs);
+        c.instrs_version = il->version;
+        c.instr_stamps.reserve(il->items->size());
+        for (size_t i = 0; i < il->items->size(); ++i) {
+            const LazyInstr& li = (*il->items)[i];
+            c.instr_stamps.push_back(
+                li.obj ? reinterpret_cast<PyInstrObject*>(li.obj)->stamp : 0);
+            for_each_label_id(st, LazyEntry{*il->cols, li},
+                              [&](int id) { c.instr_labels.emplace_back(i, id); });
+        }
+    } else {
+        Py_ssize_t n = PyList_GET_SIZE(self->py_instrs);
+        c.instr_objs.reserve(static_cast<size_t>(n));
+        c.instr_stamps.reserve(static_cast<size_t>(n));
+        for (Py_ssize_t i = 0; i < n; ++i) {
+            PyObject* item = PyList_GET_ITEM(self->py_instrs, i);
+            c.instr_objs.push_back(item);
+            c.instr_stamps.push_back(reinterpret_cast<PyInstrObject*>(item)->stamp);
+            for_each_label_id(st, item, [&](int id) {
+                c.instr_labels.emplace_back(static_cast<size_t>(i), id);
+            });
+        }
+    }
+
+    c.exc_entries = self->py_exc_entries;
+    c.exc_objs.clear();
+    c.exc_stamps.clear();
+    for (Py_ssize_t i = 0; i < PyList_GET_SIZE(self->py_exc_entries); ++i) {
+        PyObject* item = PyList_GET_ITEM(self->py_exc_entries, i);
+        c.exc_objs.push_back(item);
+        c.exc_stamps.push_back(reinterpret_cast<PyExcEntryObject*>(item)->stamp);
+    }
+
+    c.end_ids.clear();
+    for (Py_ssize_t i = 0; i < PyList_GET_SIZE(self->py_end_labels); ++i)
+        c.end_ids.push_back(
+            reinterpret_cast<PyLabelObject*>(PyList_GET_ITEM(self->py_end_labels, i))->id);
+    return true;
+}
+
+static bool tocode_cache_store(PyBytecodeObject* self, PyObject* code,
+                               EncodedCode* encoded, PyObject* built)
+{
+    if (!self->cache) {
+        self->cache = new (std::nothrow) ToCodeCache;
+        if (!self->cache) { PyErr_NoMemory(); return false; }
+    }
+    ToCodeCache& c = *self->cache;
+    bool keep_depths = c.has_depths && flow_unchanged(self, c);
+    if (!record_inputs(self, c)) return false;
+
+    Py_XINCREF(code);
+    Py_XSETREF(c.code, code);
+    if (encoded) c.encoded = std::move(*encoded);
+    else if (!code) c.encoded.clear();
+    c.has_depths = keep_depths;
+    PyObject* keep = built == Py_None ? nullptr : built;
+    Py_XINCREF(keep);
+    Py_XSETREF(c.built_consts, keep);
+
+    const CodeMeta& m = self->bc->meta;
+    Py_INCREF(m.filename); Py_XSETREF(c.filename, m.filename);
+    Py_INCREF(m.name);     Py_XSETREF(c.name, m.name);
+    Py_INCREF(m.qualname); Py_XSETREF(c.qualname, m.qualname);
+    c.argcount = m.argcount;
+    c.flags = m.flags;
+    c.firstlineno = m.firstlineno;
+    return true;
+}
+
+// `base` with this Bytecode's metadata and consts/names: the bytecode, line
+// table and exception table stay as they are.
+static PyObject* replace_code_meta(PyBytecodeObject* self, PyObject* base, PyObject* built)
+{
+    const CodeMeta& m = self->bc->meta;
+    PyObject* consts = built != Py_None ? Py_NewRef(built) : PyList_AsTuple(m.consts);
+    PyObject* names = PyList_AsTuple(m.names);
+    PyObject* argcount = PyLong_FromLong(m.argcount);
+    PyObject* flags = PyLong_FromLong(m.flags);
+    PyObject* kw = nullptr;
+    if (consts && names && argcount && flags)
+        kw = Py_BuildValue("{sOsOsOsOsOsO}",
+                           "co_consts", consts, "co_names", names,
+                           "co_argcount", argcount, "co_flags", flags,
+                           "co_filename", m.filename, "co_name", m.name);
+#if PY_VERSION_HEX >= PY_311
+    if (kw && PyDict_SetItemString(kw, "co_qualname", m.qualname) < 0) Py_CLEAR(kw);
+#endif
+    Py_XDECREF(consts); Py_XDECREF(names); Py_XDECREF(argcount); Py_XDECREF(flags);
+    if (!kw) return nullptr;
+
+    PyObject* replace = PyObject_GetAttrString(base, "replace");
+    PyObject* result = nullptr;
+    if (replace) {
+        PyObject* no_args = PyTuple_New(0);
+        if (no_args) result = PyObject_Call(replace, no_args, kw);
+        Py_XDECREF(no_args);
+        Py_DECREF(replace);
+    }
+    Py_DECREF(kw);
+    return result;
+}
+
+// Whether `items` (a list or tuple) holds the items of `was` (a tuple), then
+// nothing more if `exact`. Decoding takes the code's own objects, so this is
+// by identity, and 0.0 isn't taken for -0.0.
+static bool extends_tuple(PyObject* items, PyObject* was, bool exact)
+{
+    Py_ssize_t m = PyTuple_GET_SIZE(was);
+    Py_ssize_t n = PySequence_Fast_GET_SIZE(items);
+    PyObject** item = PySequence_Fast_ITEMS(items);
+    if (exact ? n != m : n < m) return false;
+    for (Py_ssize_t i = 0; i < m; ++i)
+        if (item[i] != PyTuple_GET_ITEM(was, i)) return false;
+    return true;
+}
+
+// Whether the instructions, exception entries and end labels are still the
+// ones from_code() made (see DecodedFrom).
+static bool decoded_unchanged(PyBytecodeObject* self)
+{
+    ModuleState* st = state_of(self);
+    const DecodedFrom& d = self->decoded;
+    if (d.instrs_list) {
+        if (self->py_instrs != d.instrs_list) return false;
+        auto* il = reinterpret_cast<PyInstrListObject*>(self->py_instrs);
+        if (il->version != d.instrs) return false;
+        for (const LazyInstr& li : *il->items)
+            if (li.obj && reinterpret_cast<PyInstrObject*>(li.obj)->stamp != li.born)
+                return false;
+    } else {
+        if (!PyList_Check(self->py_instrs) || PyList_GET_SIZE(self->py_instrs) != d.n_instrs)
+            return false;
+        for (Py_ssize_t i = 0; i < d.n_instrs; ++i) {
+            PyObject* item = PyList_GET_ITEM(self->py_instrs, i);
+            if (!PyObject_TypeCheck(item, st->instr_type) ||
+                reinterpret_cast<PyInstrObject*>(item)->stamp != d.instrs + static_cast<uint64_t>(i))
+                return false;
+        }
+    }
+
+    if (PyList_GET_SIZE(self->py_exc_entries) != d.n_exc_entries) return false;
+    for (Py_ssize_t i = 0; i < d.n_exc_entries; ++i) {
+        PyObject* item = PyList_GET_ITEM(self->py_exc_entries, i);
+        if (!PyObject_TypeCheck(item, st->exc_entry_type) ||
+            reinterpret_cast<PyExcEntryObject*>(item)->stamp != d.exc_entries + static_cast<uint64_t>(i))
+            return false;
+    }
+
+    if (!PyList_Check(self->py_end_labels)) return false;
+    Py_ssize_t n_end = PyList_GET_SIZE(self->py_end_labels);
+    if (n_end != (d.end_label >= 0 ? 1 : 0)) return false;
+    if (n_end) {
+        PyObject* item = PyList_GET_ITEM(self->py_end_labels, 0);
+        if (!PyObject_TypeCheck(item, st->label_type) ||
+            reinterpret_cast<PyLabelObject*>(item)->id != d.end_label)
+            return false;
+    }
+    return true;
+}
+
+// The first to_code() after from_code(): if only metadata changed, or consts
+// and names were only appended to, the decoded code object through
+// code.replace(). Py_None if that doesn't apply (nothing changed at all
+// included, so that from_code(co).to_code() still runs the encoder), nullptr
+// with an exception set on error.
+static PyObject* pass_through_decoded(PyBytecodeObject* self, PyObject* decoded, PyObject* built)
+{
+    PyCodeObject* code = reinterpret_cast<PyCodeObject*>(decoded);
+    const CodeMeta& m = self->bc->meta;
+    if (m.firstlineno != code->co_firstlineno || !built_matches_consts(self, built) ||
+        !decoded_unchanged(self))
+        Py_RETURN_NONE;
+
+    // The consts and names must extend the code's; the local tables must be
+    // the same.
+    static const char* const attrs[5] = {
+        "co_consts", "co_names", "co_varnames", "co_freevars", "co_cellvars"};
+    PyObject* tables[5];
+    bytecode_tables(self->bc, tables);
+    if (built != Py_None) tables[0] = built;
+    bool grew = false;
+    for (int t = 0; t < 5; ++t) {
+        PyObject* was = PyObject_GetAttrString(decoded, attrs[t]);
+        if (!was) return nullptr;
+        bool ok = PyTuple_Check(was) && extends_tuple(tables[t], was, t >= 2);
+        grew |= ok && Py_SIZE(tables[t]) > PyTuple_GET_SIZE(was);
+        Py_DECREF(was);
+        if (!ok) Py_RETURN_NONE;
+    }
+
+    PyObject* meta[3] = {};
+    static const char* const meta_attrs[3] = {"co_filename", "co_name", "co_qualname"};
+    PyObject* now[3] = {m.filename, m.name, m.qualname};
+    bool same = !grew && m.argcount == code->co_argcount && m.flags == code->co_flags;
+    for (int i = 0; same && i < (PY_VERSION_HEX >= PY_311 ? 3 : 2); ++i) {
+        meta[i] = PyObject_GetAttrString(decoded, meta_attrs[i]);
+        if (!meta[i]) {
+            for (PyObject* o : meta) Py_XDECREF(o);
+            return nullptr;
+        }
+        int eq = PyObject_RichCompareBool(meta[i], now[i], Py_EQ);
+        if (eq < 0) {
+            for (PyObject* o : meta) Py_XDECREF(o);
+            return nullptr;
+        }
+        same = eq > 0;
+    }
+    for (PyObject* o : meta) Py_XDECREF(o);
+    if (same) Py_RETURN_NONE;
+    return replace_code_meta(self, decoded, built);
+}
+
+// Whether everything record_inputs() took down is as it was, save that
+// tables may have been appended to. False with RuntimeError set if not.
+static bool inputs_unchanged(PyBytecodeObject* self, const ToCodeCache& c)
+{
+    PyObject* tables[5];
+    bytecode_tables(self->bc, tables);
+    bool same = flow_unchanged(self, c);
+    for (int t = 0; same && t < 5; ++t)
+        same = table_delta(tables[t], c.tables[t], c.table_items[t]) >= 0;
+    if (!same)
+        PyErr_SetString(PyExc_RuntimeError, "Bytecode changed while to_code() was encoding it");
+    return same;
+}
+
+// Nested code is built before anything is taken from this Bytecode's cache
+// or tables: building it may let go of the GIL (see above), and another
+// thread may change or build this Bytecode meanwhile. Whatever was looked at
+// before is looked at again afterwards.
+// The part of to_code() that runs locked, given the nested code. Returns
+// nullptr with nested->missing set if consts turned out to hold a Bytecode
+// that wasn't built.
+static PyObject* bytecode_to_code(PyBytecodeObject* self, NestedCodes* nested)
+{
+    CacheState state = tocode_cache_state(self);
+    PyObject* built = nullptr;
+    if (state != CacheState::MISS) {
+        if (!(built = built_consts(self, nested))) return nullptr;
+        if (built != Py_None)
+            state = built_matches_consts(self, built) ? tocode_cache_state(self) : CacheState::MISS;
+    }
+    if (state != CacheState::MISS) {
+        PyObject* result;
+        if (state == CacheState::HIT && same_built_consts(built, self->cache->built_consts)) {
+            result = self->cache->code;
+            Py_INCREF(result);
+        } else if (self->cache->replaced) {
+            result = replace_code_meta(self, self->cache->code, built);
+            if (result && !tocode_cache_store(self, result, nullptr, built)) Py_CLEAR(result);
+        } else {
+            result = self->bc->build_code(self->cache->encoded,
+                                          built == Py_None ? nullptr : built);
+            if (result && !tocode_cache_store(self, result, nullptr, built)) Py_CLEAR(result);
+        }
+        Py_DECREF(built);
+        return result;
+    }
+    Py_CLEAR(built);
+
+    if (self->decoded.code) {
+        if (!(built = built_consts(self, nested))) return nullptr;
+        // Taken off the Bytecode first: only one call gets to try it.
+        PyObject* decoded = self->decoded.code;
+        self->decoded.code = nullptr;
+        PyObject* result = pass_through_decoded(self, decoded, built);
+        Py_DECREF(decoded);
+        if (result && result != Py_None) {
+            if (tocode_cache_store(self, result, nullptr, built))
+                self->cache->replaced = true;
+            else
+                Py_CLEAR(result);
+        }
+        Py_CLEAR(built);
+        if (result != Py_None) return result;
+        Py_DECREF(result);
+    }
+
+    // Sync py_instrs / py_end_labels → bc->instrs / bc->end_labels for assembly.
+    if (!sync_instrs(self) || !sync_end_labels(self)) {
+        self->bc->instrs.clear();
+        return nullptr;
+    }
+
+    if (!sync_exc_entries(self)) {
+        self->bc->instrs.clear();
+        return nullptr;
+    }
+
+    // A large encoding lets go of the GIL part way (see Bytecode::encode()),
+    // and other threads may change this Bytecode meanwhile. What it is
+    // encoded from is recorded first, and checked again once it is done.
+#ifdef Py_GIL_DISABLED
+    // Other threads run alongside anyway; detaching would only suspend the
+    // lock on this Bytecode.
+    const bool release_gil = false;
+#else
+    const bool release_gil = self->bc->instrs.size() >= ENCODE_RELEASE_GIL_MIN;
+#endif
+    std::unique_ptr<ToCodeCache> inputs;
+    if (release_gil) {
+        inputs.reset(new (std::nothrow) ToCodeCache);
+        if (!inputs) PyErr_NoMemory();
+        if (!inputs || !record_inputs(self, *inputs)) {
+            self->bc->instrs.clear();
+            self->bc->end_labels.clear();
+            return nullptr;
+        }
+    }
+
+    // Nested consts are looked up after encoding, which may have added some.
+    EncodedCode encoded;
+    std::vector<int> depths;
+    PyObject* result = nullptr;
+    if (self->bc->encode(encoded, &depths, release_gil) && (built = built_consts(self, nested)) &&
+        (!inputs || inputs_unchanged(self, *inputs)))
+        result = self->bc->build_code(encoded, built == Py_None ? nullptr : built);
+    self->bc->instrs.clear();
+    self->bc->end_labels.clear();
+    if (self->cache) self->cache->has_depths = false;  // replaced below
+    if (result && !tocode_cache_store(self, result, &encoded, built)) Py_CLEAR(result);
+    if (result) {
+        self->cache->replaced = false;
+        self->cache->depths = std::move(depths);
+        self->cache->has_depths = true;
+    }
+    Py_XDECREF(built);
+    return result;
+}
+
+// to_code(). Not LOCKED: the nested Bytecodes are built first, each by its
+// own to_code(), and this one is locked only after, so no critical section is
+// ever held while another is taken. A Bytecode that turns up in consts in
+// between (from another thread, or added by the encode) is built in turn and
+// the locked part run again.
+static PyObject* PyBytecode_to_code(PyBytecodeObject* self, PyObject*)
+{
+    if (Py_EnterRecursiveCall(" while building nested code")) return nullptr;
+    PyObject* result = nullptr;
+    for (bool again = true; again;) {
+        NestedCodes nested;
+        if (!LOCKED(collect_nested)(self, &nested)) break;
+        bool ok = true;
+        for (auto& [bc, co] : nested.codes)
+            if (!(co = PyBytecode_to_code(reinterpret_cast<PyBytecodeObject*>(bc), nullptr))) {
+                ok = false;
+                break;
+            }
+        if (!ok) break;
+        result = LOCKED(bytecode_to_code)(self, &nested);
+        again = !result && nested.missing;
+    }
+    Py_LeaveRecursiveCall();
+    return result;
+}
+
+// ── instrs property ───────────────────────────────────────────────────────
+
+static PyObject* PyBytecode_get_instrs(PyBytecodeObject* self, void*)
+{
+    Py_INCREF(self->py_instrs);
+    return self->py_instrs;
+}
+
+// ── exc_entries property ──────────────────────────────────────────────────
+
+static PyObject* PyBytecode_get_exc_entries(PyBytecodeObject* self, void*)
+{
+    Py_INCREF(self->py_exc_entries);
+    return self->py_exc_entries;
+}
+
+static int PyBytecode_set_exc_entries(PyBytecodeObject* self, PyObject* v, void*)
+{
+    if (!v || !PyList_Check(v)) {
+        PyErr_SetString(PyExc_TypeError, "exc_entries must be a list");
+        return -1;
+    }
+    Py_INCREF(v);
+    Py_DECREF(self->py_exc_entries);
+    self->py_exc_entries = v;
+    return 0;
+}
+
+static int PyBytecode_set_instrs(PyBytecodeObject* self, PyObject* v, void*)
+{
+    ModuleState* st = state_of(self);
+    if (!v || !(PyList_Check(v) || PyObject_TypeCheck(v, st->instrlist_type))) {
+        PyErr_SetString(PyExc_TypeError, "instrs must be a list");
+        return -1;
+    }
+    Py_INCREF(v);
+    Py_DECREF(self->py_instrs);
+    self->py_instrs = v;
+    return 0;
+}
+
+// ── end_labels property ───────────────────────────────────────────────────
+// Labels targeting the position one-past-the-last-instruction — e.g. an
+// exception table range that runs to the very end of the code with nothing
+// after it. There's no instruction to attach these to, hence the separate
+// list (mirrors Bytecode::end_labels on the C++ side).
+
+static PyObject* PyBytecode_get_end_labels(PyBytecodeObject* self, void*)
+{
+    Py_INCREF(self->py_end_labels);
+    return self->py_end_labels;
+}
+static int PyBytecode_set_end_labels(PyBytecodeObject* self, PyObject* v, void*)
+{
+    ModuleState* st = state_of(self);
+    PyObject* checked = check_labels_list(st, v, "end_labels");
+    if (!checked) return -1;
+    Py_DECREF(self->py_end_labels);
+    self->py_end_labels = checked;
+    return 0;
+}
+
+// ── new_label ─────────────────────────────────────────────────────────────
+
+static PyObject* PyBytecode_new_label(PyBytecodeObject* self, PyObject*)
+{
+    LabelCache* labels = bytecode_labels(self);
+    if (!labels) return nullptr;
+    return labels->get(self->bc->new_label().id);
+}
+
+// ── copy ──────────────────────────────────────────────────────────────────
+// copy() and copy_into() clone the instructions, exception entries and end
+// labels in one pass over the synced C++ instructions, giving every label a
+// new id on the way: shifted by a fixed offset for copy(), or freshly
+// allocated in the target Bytecode for copy_into(), so the clone can be
+// spliced into it without colliding with the labels it already has.
+
+// Label id -> id in the copy. With a target, each distinct id gets the next
+// id the target hands out, in order of first appearance.
+class LabelRemap {
+public:
+    LabelRemap(Bytecode* target, int offset, int dense_ids)
+        : target_(target), offset_(offset)
+    {
+        if (target_) flat_.assign(static_cast<size_t>(std::max(dense_ids, 0)), -1);
+    }
+
+    int operator()(int id)
+    {
+        if (!target_) return id + offset_;
+        if (id >= 0 && static_cast<size_t>(id) < flat_.size()) {
+            int& slot = flat_[static_cast<size_t>(id)];
+            if (slot < 0) slot = target_->new_label().id;
+            return slot;
+        }
+        auto [it, fresh] = sparse_.try_emplace(id, 0);
+        if (fresh) it->second = target_->new_label().id;
+        return it->second;
+    }
+
+private:
+    Bytecode*                    target_;
+    int                          offset_;
+    std::vector<int>             flat_;    // ids below the source's next_label_id
+    std::unordered_map<int, int> sparse_;  // anything else (hand-built Labels)
+};
+
+struct ClonedCode {
+    PyObject* instrs      = nullptr;  // list of Instr
+    PyObject* exc_entries = nullptr;  // list of ExcEntry
+    PyObject* end_labels  = nullptr;  // list of Label
+
+    ~ClonedCode() { Py_XDECREF(instrs); Py_XDECREF(exc_entries); Py_XDECREF(end_labels); }
+};
+
+// An InstrList with the same entries as `src`, without materializing any.
+// Entries not yet materialized keep borrowing from src's owner, which the
+// clone shares; materialized ones are read back from their Instr, whose
+// object arguments the clone then holds itself.
+static PyObject* instrlist_clone(PyInstrListObject* src, LabelRemap& remap, LabelCache* labels)
+{
+    ModuleState* st = state_of(src);
+    auto* self = reinterpret_cast<PyInstrListObject*>(
+        st->instrlist_type->tp_alloc(st->instrlist_type, 0));
+    if (!self) return nullptr;
+    PyObject* held = nullptr;  // object args taken from materialized entries
+    try {
+        self->items = new std::vector<LazyInstr>();
+        self->cols = new LazyColumns();
+        self->items->reserve(src->items->size());
+        LazyColumns::Recent recent{};
+        for (const LazyInstr& li : *src->items) {
+            Instr ci(0);
+            if (li.obj) {
+                if (!pyinstr_to_cpp(st, reinterpret_cast<PyInstrObject*>(li.obj), ci)) {
+                    Py_XDECREF(held);
+                    Py_DECREF(self);
+                    return nullptr;
+                }
+                if (auto* ov = std::get_if<PyObject*>(&ci.arg)) {
+                    if (!held && !(held = PyList_New(0))) { Py_DECREF(self); return nullptr; }
+                    if (PyList_Append(held, *ov) < 0) {
+                        Py_DECREF(held);
+                        Py_DECREF(self);
+                        return nullptr;
+                    }
+                }
+            } else {
+                ci = src->cols->get(li.row);
+            }
+            if (auto* lv = std::get_if<Label>(&ci.arg)) lv->id = remap(lv->id);
+            for (Label& l : ci.labels) l.id = remap(l.id);
+            self->items->push_back(LazyInstr::decoded(self->cols->add(ci, recent)));
+        }
+    } catch (const std::bad_alloc&) {
+        Py_XDECREF(held);
+        Py_DECREF(self);
+        return PyErr_NoMemory();
+    }
+    if (held) {
+        self->owner = src->owner ? PyTuple_Pack(2, src->owner, held) : held;
+        if (src->owner) Py_DECREF(held);
+        if (!self->owner) { Py_DECREF(self); return nullptr; }
+    } else {
+        Py_XINCREF(src->owner);
+        self->owner = src->owner;
+    }
+    labels->incref();
+    self->labels = labels;
+    self->version = next_stamp(st);
+    return reinterpret_cast<PyObject*>(self);
+}
+
+// A new ExcEntry over the Labels with these ids.
+static PyObject* new_exc_entry(ModuleState* st, LabelCache* labels, int start, int stop,
+                               int handler, int depth, bool lasti)
+{
+    auto* ee = reinterpret_cast<PyExcEntryObject*>(
+        st->exc_entry_type->tp_alloc(st->exc_entry_type, 0));
+    if (!ee) return nullptr;
+    ee->start   = label_from(st, labels, start);
+    ee->stop    = label_from(st, labels, stop);
+    ee->handler = label_from(st, labels, handler);
+    ee->depth   = depth;
+    ee->lasti   = lasti;
+    ee->stamp   = next_stamp(st);
+    if (!ee->start || !ee->stop || !ee->handler) {
+        Py_DECREF(ee);
+        return nullptr;
+    }
+    return reinterpret_cast<PyObject*>(ee);
+}
+
+static bool clone_code(PyBytecodeObject* self, LabelRemap& remap, LabelCache* labels,
+                       bool lazy, ClonedCode& out)
+{
+    ModuleState* st = state_of(self);
+    const bool from_list = !(lazy && PyObject_TypeCheck(self->py_instrs, st->instrlist_type));
+    bool ok = (from_list ? sync_instrs(self) : true) && sync_end_labels(self);
+    if (ok && !from_list) {
+        out.instrs = instrlist_clone(reinterpret_cast<PyInstrListObject*>(self->py_instrs),
+                                     remap, labels);
+        ok = out.instrs != nullptr;
+    }
+    if (ok) {
+        std::vector<Instr>& instrs = self->bc->instrs;
+        for (Instr& ci : instrs) {
+            if (auto* lv = std::get_if<Label>(&ci.arg)) lv->id = remap(lv->id);
+            for (Label& l : ci.labels) l.id = remap(l.id);
+        }
+        if (!from_list) {
+            // Cloned above.
+        } else if (lazy) {
+            // The entries borrow their object arguments from wherever the
+            // source got them; the clone owns them through a list of its own
+            // rather than keeping the source, or its code object, alive.
+            PyObject* owner = PyList_New(0);
+            ok = owner != nullptr;
+            for (size_t i = 0; ok && i < instrs.size(); ++i)
+                if (auto* ov = std::get_if<PyObject*>(&instrs[i].arg))
+                    ok = PyList_Append(owner, *ov) == 0;
+            ok = ok && (out.instrs = instrlist_new(st, std::move(instrs), owner, labels));
+            Py_XDECREF(owner);
+        } else {
+            ok = (out.instrs = PyList_New(static_cast<Py_ssize_t>(instrs.size()))) != nullptr;
+            for (size_t i = 0; ok && i < instrs.size(); ++i) {
+                PyObject* obj = pyinstr_from_cpp(st, instrs[i], labels);
+                if (!obj) { ok = false; break; }
+                PyList_SET_ITEM(out.instrs, static_cast<Py_ssize_t>(i), obj);
+            }
+        }
+        const std::vector<Label>& ends = self->bc->end_labels;
+        ok = ok && (out.end_labels = PyList_New(static_cast<Py_ssize_t>(ends.size())));
+        for (size_t i = 0; ok && i < ends.size(); ++i) {
+            PyObject* lbl = label_from(st, labels, remap(ends[i].id));
+            if (!lbl) { ok = false; break; }
+            PyList_SET_ITEM(out.end_labels, static_cast<Py_ssize_t>(i), lbl);
+        }
+    }
+    self->bc->instrs.clear();
+    self->bc->end_labels.clear();
+    if (!ok) return false;
+
+    if (!PyList_Check(self->py_exc_entries)) {
+        PyErr_SetString(PyExc_TypeError, "exc_entries must be a list");
+        return false;
+    }
+    Py_ssize_t n = PyList_GET_SIZE(self->py_exc_entries);
+    if (!(out.exc_entries = PyList_New(n))) return false;
+    for (Py_ssize_t i = 0; i < n; ++i) {
+        PyObject* item = PyList_GET_ITEM(self->py_exc_entries, i);
+        if (!PyObject_TypeCheck(item, st->exc_entry_type)) {
+            PyErr_Format(PyExc_TypeError, "exc_entries[%zd] is not an ExcEntry (got %s)",
+                         i, Py_TYPE(item)->tp_name);
+            return false;
+        }
+        auto* src = reinterpret_cast<PyExcEntryObject*>(item);
+        auto id = [](PyObject* lbl) { return reinterpret_cast<PyLabelObject*>(lbl)->id; };
+        // In order: the remap hands out fresh ids as it first sees each one.
+        int start = remap(id(src->start));
+        int stop = remap(id(src->stop));
+        int handler = remap(id(src->handler));
+        PyObject* ee = new_exc_entry(st, labels, start, stop, handler, src->depth,
+                                     src->lasti != 0);
+        if (!ee) return false;
+        PyList_SET_ITEM(out.exc_entries, i, ee);
+    }
+    return true;
+}
+
+// copy(*, label_offset=0, lazy=None) -> Bytecode
+static PyObject* PyBytecode_copy(PyBytecodeObject* self, PyObject* args, PyObject* kw)
+{
+    ModuleState* st = state_of(self);
+    static const char* kwlist[] = {"label_offset", "lazy", nullptr};
+    int offset = 0;
+    PyObject* lazy_obj = Py_None;
+    if (!PyArg_ParseTupleAndKeywords(args, kw, "|$iO", const_cast<char**>(kwlist),
+                                     &offset, &lazy_obj))
+        return nullptr;
+    int lazy = lazy_obj == Py_None ? PyObject_TypeCheck(self->py_instrs, st->instrlist_type)
+                                   : PyObject_IsTrue(lazy_obj);
+    if (lazy < 0) return nullptr;
+    if (offset < 0) {
+        PyErr_SetString(PyExc_ValueError, "label_offset must not be negative");
+        return nullptr;
+    }
+
+    auto* copy = reinterpret_cast<PyBytecodeObject*>(
+        PyBytecode_new(st->bytecode_type, nullptr, nullptr));
+    if (!copy) return nullptr;
+    LabelCache* labels = bytecode_labels(copy);
+    LabelRemap remap(nullptr, offset, 0);
+    ClonedCode cloned;
+    if (!labels || !clone_code(self, remap, labels, lazy != 0, cloned)) {
+        Py_DECREF(copy);
+        return nullptr;
+    }
+    Py_SETREF(copy->py_instrs, cloned.instrs);
+    Py_SETREF(copy->py_exc_entries, cloned.exc_entries);
+    Py_SETREF(copy->py_end_labels, cloned.end_labels);
+    cloned.instrs = cloned.exc_entries = cloned.end_labels = nullptr;
+
+    const CodeMeta& src = self->bc->meta;
+    CodeMeta& dst = copy->bc->meta;
+    // Tables are new lists holding the same items.
+    for (auto [from, to] : {std::pair{src.consts, &dst.consts}, {src.names, &dst.names},
+                            {src.varnames, &dst.varnames}, {src.freevars, &dst.freevars},
+                            {src.cellvars, &dst.cellvars}}) {
+        PyObject* lst = PySequence_List(from);
+        if (!lst) { Py_DECREF(copy); return nullptr; }
+        Py_SETREF(*to, lst);
+    }
+    Py_INCREF(src.filename); Py_SETREF(dst.filename, src.filename);
+    Py_INCREF(src.name);     Py_SETREF(dst.name, src.name);
+    Py_INCREF(src.qualname); Py_SETREF(dst.qualname, src.qualname);
+    dst.argcount        = src.argcount;
+    dst.posonlyargcount = src.posonlyargcount;
+    dst.kwonlyargcount  = src.kwonlyargcount;
+    dst.nlocals         = src.nlocals;
+    dst.flags           = src.flags;
+    dst.firstlineno     = src.firstlineno;
+    copy->bc->next_label_id = self->bc->next_label_id + offset;
+    return reinterpret_cast<PyObject*>(copy);
+}
+
+// copy_into(other) -> (instrs, exc_entries, end_labels)
+static PyObject* PyBytecode_copy_into(PyBytecodeObject* self, PyObject* arg)
+{
+    ModuleState* st = state_of(self);
+    if (!PyObject_TypeCheck(arg, st->bytecode_type)) {
+        PyErr_Format(PyExc_TypeError, "copy_into() expects a Bytecode (got %s)",
+                     Py_TYPE(arg)->tp_name);
+        return nullptr;
+    }
+    auto* other = reinterpret_cast<PyBytecodeObject*>(arg);
+    CriticalSection2 cs(self, other);  // fresh labels are taken from other
+    LabelCache* labels = bytecode_labels(other);
+    if (!labels) return nullptr;
+    ClonedCode cloned;
+    try {
+        LabelRemap remap(other->bc, 0, self->bc->next_label_id);
+        if (!clone_code(self, remap, labels, false, cloned)) return nullptr;
+    } catch (const std::bad_alloc&) {
+        return PyErr_NoMemory();
+    }
+    return PyTuple_Pack(3, cloned.instrs, cloned.exc_entries, cloned.end_labels);
+}
+
+// ── to_bytes / from_bytes ─────────────────────────────────────────────────
+// A Bytecode as it stands — labels, symbolic arguments and EXC_DEPTH_AUTO
+// entries included — in a compact, versioned format, for caching between
+// build steps or handing to another process. Fixed-size integers are
+// little-endian; varints are LEB128, signed ones zigzag-encoded first, so the
+// small values nearly every field holds take a byte each:
+//
+//   header       "SPBC", u16 format version, u16 Python major.minor (the
+//                opcodes are that version's), u32 flags (bit 0: lazy
+//                instrs), u32 code count
+//   then for each code, the first being the Bytecode serialized:
+//   meta         signed varints argcount, posonlyargcount, kwonlyargcount,
+//                nlocals, flags, firstlineno, next_label_id
+//   counts       varints instrs, instr labels, end labels, exception entries
+//   instrs       u8 op, u8 arg kind, then signed varints: the arg (an int, a
+//                Label id or an index into the code's args; left out if
+//                there is none), lineno less the previous instruction's,
+//                end_lineno less lineno, col_offset, end_col
+//   instr labels varint instr index less the previous one's, signed varint
+//                Label id, in order
+//   end labels   signed varint Label id
+//   exc entries  signed varints start, stop, handler, depth, lasti
+//   and last:
+//   objects      u32 length, then marshal data for a list holding, for each
+//                code, [consts, names, varnames, freevars, cellvars,
+//                filename, name, qualname, args, nested_at]
+//
+// The codes are the Bytecode and every Bytecode nested in it, however deep
+// (from_code(recursive=True)), each once. marshal can't hold a Bytecode, so
+// they are marshalled as None, and `nested_at` has a [where, index, code]
+// for each place one goes back, `where` being 0 for consts and 1 for args.
+// Marshalling every table at once shares the strings they have in common.
+// An object used as the argument of several instructions is in args once.
+//
+// The packed parts are checked as they are read; the marshal data is only as
+// safe as marshal is, so like marshal this is not for data from an untrusted
+// source.
+
+constexpr char       SERIAL_MAGIC[4]  = {'S', 'P', 'B', 'C'};
+constexpr uint16_t   SERIAL_VERSION   = 1;
+constexpr uint32_t   SERIAL_LAZY      = 1;
+constexpr size_t     SERIAL_MIN_CODE  = 11;  // bytes in the smallest record
+constexpr size_t     SERIAL_MIN_INSTR = 6;
+constexpr size_t     SERIAL_MIN_LABEL = 2;
+constexpr size_t     SERIAL_MIN_EXC   = 5;
+constexpr Py_ssize_t SERIAL_TABLES    = 10;  // per code in the objects
+
+enum : uint8_t { SERIAL_INT, SERIAL_LABEL_ID, SERIAL_OBJECT, SERIAL_NO_ARG };
+
+class ByteWriter {
+public:
+    std::vector<uint8_t> out;
+
+    void u8(uint8_t v) { out.push_back(v); }
+    void u16(uint16_t v) { u8(static_cast<uint8_t>(v)); u8(static_cast<uint8_t>(v >> 8)); }
+    void u32(uint32_t v) { u16(static_cast<uint16_t>(v)); u16(static_cast<uint16_t>(v >> 16)); }
+    void var(uint32_t v)
+    {
+        for (; v >= 0x80; v >>= 7) u8(static_cast<uint8_t>(v | 0x80));
+        u8(static_cast<uint8_t>(v));
+    }
+    void svar(int v) { var(static_cast<uint32_t>(v) << 1 ^ (v < 0 ? 0xFFFFFFFFu : 0)); }
+    void raw(const void* p, size_t n)
+    {
+        auto* b = static_cast<const uint8_t*>(p);
+        out.insert(out.end(), b, b + n);
+    }
+};
+
+// Reads fail, rather than run past the end, on truncated data.
+class ByteReader {
+public:
+    ByteReader(const uint8_t* p, size_t n) : p_(p), end_(p + n) {}
+
+    size_t left() const { return static_cast<size_t>(end_ - p_); }
+    bool raw(const uint8_t*& p, size_t n)
+    {
+        if (left() < n) return false;
+        p = p_;
+        p_ += n;
+        return true;
+    }
+    bool u16(uint16_t& v)
+    {
+        const uint8_t* p;
+        if (!raw(p, 2)) return false;
+        v = static_cast<uint16_t>(p[0] | p[1] << 8);
+        return true;
+    }
+    bool u32(uint32_t& v)
+    {
+        const uint8_t* p;
+        if (!raw(p, 4)) return false;
+        v = static_cast<uint32_t>(p[0]) | static_cast<uint32_t>(p[1]) << 8 |
+            static_cast<uint32_t>(p[2]) << 16 | static_cast<uint32_t>(p[3]) << 24;
+        return true;
+    }
+    bool var(uint32_t& v)
+    {
+        v = 0;
+        for (int shift = 0; shift < 35; shift += 7) {
+            if (p_ == end_) return false;
+            uint8_t b = *p_++;
+            if (shift == 28 && b > 0x0F) return false;  // more than 32 bits
+            v |= static_cast<uint32_t>(b & 0x7F) << shift;
+            if (!(b & 0x80)) return true;
+        }
+        return false;
+    }
+    bool svar(int& v)
+    {
+        uint32_t u;
+        if (!var(u)) return false;
+        v = static_cast<int>(u >> 1 ^ (u & 1 ? 0xFFFFFFFFu : 0));
+        return true;
+    }
+
+private:
+    const uint8_t* p_;
+    const uint8_t* end_;
+};
+
+// Wrapping, so any pair of ints gets there and back.
+static int serial_delta(int to, int from)
+{
+    return static_cast<int>(static_cast<uint32_t>(to) - static_cast<uint32_t>(from));
+}
+
+static int serial_undelta(int from, int delta)
+{
+    return static_cast<int>(static_cast<uint32_t>(from) + static_cast<uint32_t>(delta));
+}
+
+// to_bytes() for a Bytecode and the ones nested in it, written out one after
+// another as they are found.
+class SerialWriter {
+public:
+    ByteWriter packed;
+    PyObject*  tables = nullptr;  // list: the objects, one entry per code
+    std::vector<PyObject*> codes;  // owned
+    bool       lazy = false;      // the root's instrs are an InstrList
+
+    explicit SerialWriter(ModuleState* st) : st_(st) {}
+    ~SerialWriter()
+    {
+        Py_XDECREF(tables);
+        for (PyObject* c : codes) Py_DECREF(c);
+    }
+
+    // Each code is locked while it is written, and only then: the caller
+    // holds no lock, so no critical section is ever nested in another.
+    bool write_all(PyBytecodeObject* root)
+    {
+        if (!(tables = PyList_New(0))) return false;
+        Py_INCREF(root);
+        codes.push_back(reinterpret_cast<PyObject*>(root));
+        index_[codes.back()] = 0;
+        for (size_t k = 0; k < codes.size(); ++k) {
+            auto* bc = reinterpret_cast<PyBytecodeObject*>(codes[k]);
+            CriticalSection cs(bc);
+            if (k == 0) lazy = PyObject_TypeCheck(bc->py_instrs, st_->instrlist_type);
+            if (!write(bc)) return false;
+        }
+        return true;
+    }
+
+private:
+    ModuleState* st_;
+    std::unordered_map<PyObject*, uint32_t> index_;  // into codes
+
+    // What goes in the marshal data for `obj` at consts or args[index]: the
+    // object itself, or None for a Bytecode, noted in `nested_at`. New
+    // reference, or NULL with an exception set.
+    PyObject* take(PyObject* obj, int where, Py_ssize_t index, PyObject* nested_at)
+    {
+        if (!PyObject_TypeCheck(obj, st_->bytecode_type)) {
+            Py_INCREF(obj);
+            return obj;
+        }
+        auto [it, fresh] = index_.try_emplace(obj, static_cast<uint32_t>(codes.size()));
+        if (fresh) {
+            Py_INCREF(obj);
+            codes.push_back(obj);
+        }
+        PyObject* at = Py_BuildValue("[inI]", where, index, it->second);
+        if (!at) return nullptr;
+        int r = PyList_Append(nested_at, at);
+        Py_DECREF(at);
+        if (r < 0) return nullptr;
+        Py_RETURN_NONE;
+    }
+
+    bool write(PyBytecodeObject* self);
+};
+
+bool SerialWriter::write(PyBytecodeObject* self)
+{
+    const CodeMeta& m = self->bc->meta;
+    if (!sync_end_labels(self)) return false;
+    std::vector<Label> ends = std::move(self->bc->end_labels);
+    self->bc->end_labels.clear();
+    if (!PyList_Check(self->py_exc_entries)) {
+        PyErr_SetString(PyExc_TypeError, "exc_entries must be a list");
+        return false;
+    }
+    const bool lazy = PyObject_TypeCheck(self->py_instrs, st_->instrlist_type);
+    if (!lazy && !PyList_Check(self->py_instrs)) {
+        PyErr_SetString(PyExc_TypeError, "instrs must be a list");
+        return false;
+    }
+    auto* il = lazy ? reinterpret_cast<PyInstrListObject*>(self->py_instrs) : nullptr;
+
+    PyObject* args = PyList_New(0);
+    PyObject* nested_at = PyList_New(0);
+    PyObject* consts = PyList_New(0);
+    struct Release {
+        PyObject *a, *b, *c;
+        ~Release() { Py_XDECREF(a); Py_XDECREF(b); Py_XDECREF(c); }
+    } release{args, nested_at, consts};
+    if (!args || !nested_at || !consts) return false;
+    std::unordered_map<PyObject*, int> arg_index;
+    auto object_index = [&](PyObject* obj) -> int {
+        auto [it, fresh] = arg_index.try_emplace(obj, static_cast<int>(PyList_GET_SIZE(args)));
+        if (!fresh) return it->second;
+        PyObject* item = take(obj, 1, it->second, nested_at);
+        if (!item) return -1;
+        int r = PyList_Append(args, item);
+        Py_DECREF(item);
+        return r < 0 ? -1 : it->second;
+    };
+
+    ByteWriter instrs, labels;
+    uint32_t n_instrs = 0, n_labels = 0, labelled_at = 0;
+    int prev_lineno = 0;
+    auto add_label = [&](int id) {
+        labels.var(n_instrs - labelled_at);
+        labels.svar(id);
+        labelled_at = n_instrs;
+        ++n_labels;
+    };
+    for (Py_ssize_t i = 0; i < (il ? instrlist_size(il) : PyList_GET_SIZE(self->py_instrs)); ++i) {
+        PyObject* obj = il ? (*il->items)[static_cast<size_t>(i)].obj
+                           : PyList_GET_ITEM(self->py_instrs, i);
+        uint8_t op, kind = SERIAL_INT;
+        int arg = 0;
+        Location loc;
+        if (obj) {
+            if (!PyObject_TypeCheck(obj, st_->instr_type)) {
+                PyErr_Format(PyExc_TypeError, "instrs[%zd] is not an Instr (got %s)",
+                             i, Py_TYPE(obj)->tp_name);
+                return false;
+            }
+            auto* pi = reinterpret_cast<PyInstrObject*>(obj);
+            op = pi->op;
+            loc = Location{pi->lineno, pi->end_lineno, pi->col_offset, pi->end_col};
+            if (pi->arg_tag != InstrArg::OBJECT) {
+                kind = pi->arg_tag == InstrArg::LABEL ? SERIAL_LABEL_ID : SERIAL_INT;
+                arg = pi->arg_int;
+            } else if (PyObject_TypeCheck(pi->arg_obj, st_->label_type)) {
+                kind = SERIAL_LABEL_ID;
+                arg = reinterpret_cast<PyLabelObject*>(pi->arg_obj)->id;
+            } else {
+                kind = SERIAL_OBJECT;
+                if ((arg = object_index(pi->arg_obj)) < 0) return false;
+            }
+            for (Py_ssize_t j = 0; j < instr_label_count(pi); ++j)
+                add_label(reinterpret_cast<PyLabelObject*>(PyList_GET_ITEM(pi->labels, j))->id);
+        } else {
+            const LazyColumns& cols = *il->cols;
+            uint32_t row = (*il->items)[static_cast<size_t>(i)].row;
+            op = cols.op[row];
+            loc = cols.location(row);
+            kind = SERIAL_NO_ARG;
+            switch (cols.arg_kind(row)) {
+            case LazyColumns::INT:
+                kind = SERIAL_INT;
+                arg = cols.arg[row];
+                break;
+            case LazyColumns::LABEL:
+                kind = SERIAL_LABEL_ID;
+                arg = cols.arg[row];
+                break;
+            case LazyColumns::OBJECT:
+                kind = SERIAL_OBJECT;
+                if ((arg = object_index(cols.objs[static_cast<size_t>(cols.arg[row])])) < 0) return false;
+                break;
+            default:
+                break;
+            }
+            cols.for_each_label(row, add_label);
+        }
+        instrs.u8(op);
+        instrs.u8(kind);
+        if (kind != SERIAL_NO_ARG) instrs.svar(arg);
+        instrs.svar(serial_delta(loc.lineno, prev_lineno));
+        instrs.svar(serial_delta(loc.end_lineno, loc.lineno));
+        instrs.svar(loc.col_offset);
+        instrs.svar(loc.end_col);
+        prev_lineno = loc.lineno;
+        ++n_instrs;
+    }
+
+    ByteWriter excs;
+    Py_ssize_t n_exc = PyList_GET_SIZE(self->py_exc_entries);
+    for (Py_ssize_t i = 0; i < n_exc; ++i) {
+        PyObject* item = PyList_GET_ITEM(self->py_exc_entries, i);
+        if (!PyObject_TypeCheck(item, st_->exc_entry_type)) {
+            PyErr_Format(PyExc_TypeError, "exc_entries[%zd] is not an ExcEntry (got %s)",
+                         i, Py_TYPE(item)->tp_name);
+            return false;
+        }
+        auto* ee = reinterpret_cast<PyExcEntryObject*>(item);
+        for (PyObject* lbl : {ee->start, ee->stop, ee->handler})
+            excs.svar(reinterpret_cast<PyLabelObject*>(lbl)->id);
+        excs.svar(ee->depth);
+        excs.svar(ee->lasti);
+    }
 
-    if (!self->bc->meta.consts || !self->bc->meta.names || !self->bc->meta.varnames ||
-        !self->bc->meta.freevars || !self->bc->meta.cellvars ||
-        !self->bc->meta.filename || !self->bc->meta.name ||
-        !self->py_instrs || !self->py_exc_entries || !self->py_end_labels) {
-        Py_DECREF(self);
-        return nullptr;
+    for (Py_ssize_t i = 0; i < PyList_GET_SIZE(m.consts); ++i) {
+        PyObject* item = take(PyList_GET_ITEM(m.consts, i), 0, i, nested_at);
+        int r = item ? PyList_Append(consts, item) : -1;
+        Py_XDECREF(item);
+        if (r < 0) return false;
     }
+    PyObject* entry = Py_BuildValue("[OOOOOOOOOO]", consts, m.names, m.varnames, m.freevars,
+                                    m.cellvars, m.filename, m.name, m.qualname, args, nested_at);
+    int r = entry ? PyList_Append(tables, entry) : -1;
+    Py_XDECREF(entry);
+    if (r < 0) return false;
+
+    for (int v : {m.argcount, m.posonlyargcount, m.kwonlyargcount, m.nlocals, m.flags,
+                  m.firstlineno, self->bc->next_label_id})
+        packed.svar(v);
+    packed.var(n_instrs);
+    packed.var(n_labels);
+    packed.var(static_cast<uint32_t>(ends.size()));
+    packed.var(static_cast<uint32_t>(n_exc));
+    packed.raw(instrs.out.data(), instrs.out.size());
+    packed.raw(labels.out.data(), labels.out.size());
+    for (const Label& l : ends) packed.svar(l.id);
+    packed.raw(excs.out.data(), excs.out.size());
+    return true;
+}
 
-    return reinterpret_cast<PyObject*>(self);
+// to_bytes() -> bytes. Not LOCKED: the writer locks each code as it goes.
+static PyObject* PyBytecode_to_bytes(PyBytecodeObject* self, PyObject*)
+{
+    try {
+        SerialWriter w(state_of(self));
+        if (!w.write_all(self)) return nullptr;
+        PyObject* marshalled = PyMarshal_WriteObjectToString(w.tables, Py_MARSHAL_VERSION);
+        if (!marshalled) return nullptr;
+        ByteWriter out;
+        out.raw(SERIAL_MAGIC, sizeof SERIAL_MAGIC);
+        out.u16(SERIAL_VERSION);
+        out.u16(static_cast<uint16_t>(PY_VERSION_HEX >> 16));
+        out.u32(w.lazy ? SERIAL_LAZY : 0);
+        out.u32(static_cast<uint32_t>(w.codes.size()));
+        out.raw(w.packed.out.data(), w.packed.out.size());
+        out.u32(static_cast<uint32_t>(PyBytes_GET_SIZE(marshalled)));
+        out.raw(PyBytes_AS_STRING(marshalled), static_cast<size_t>(PyBytes_GET_SIZE(marshalled)));
+        Py_DECREF(marshalled);
+        return PyBytes_FromStringAndSize(reinterpret_cast<const char*>(out.out.data()),
+                                         static_cast<Py_ssize_t>(out.out.size()));
+    } catch (const std::bad_alloc&) {
+        return PyErr_NoMemory();
+    }
 }
 
-// Bytecode(instrs=())
-static int PyBytecode_init(PyBytecodeObject* self, PyObject* args, PyObject* kw)
+// One code's packed part, as read. Object arguments are indices into its
+// args until the marshal data is read.
+struct SerialCode {
+    int meta[7];
+    std::vector<Instr>                instrs;
+    std::vector<uint32_t>             with_object;
+    std::vector<int>                  ends;
+    std::vector<std::array<int, 5>>   excs;
+};
+
+static bool read_serial_code(ByteReader& r, SerialCode& c)
 {
-    static const char* kwlist[] = {"instrs", nullptr};
-    PyObject* instrs = nullptr;
-    if (!PyArg_ParseTupleAndKeywords(args, kw, "|O", const_cast<char**>(kwlist), &instrs))
-        return -1;
-    if (instrs == nullptr) return 0;
+    for (int& v : c.meta)
+        if (!r.svar(v)) return false;
+    uint32_t n_instrs, n_labels, n_ends, n_exc;
+    if (!r.var(n_instrs) || !r.var(n_labels) || !r.var(n_ends) || !r.var(n_exc)) return false;
+    // Checked against what is there before anything is allocated for them.
+    uint64_t least = uint64_t{n_instrs} * SERIAL_MIN_INSTR + uint64_t{n_labels} * SERIAL_MIN_LABEL +
+                     n_ends + uint64_t{n_exc} * SERIAL_MIN_EXC;
+    if (least > r.left()) return false;
+
+    c.instrs.reserve(n_instrs);
+    int lineno = 0;
+    for (uint32_t i = 0; i < n_instrs; ++i) {
+        const uint8_t* head;
+        int arg = 0, line_delta, end_delta;
+        if (!r.raw(head, 2)) return false;
+        Instr& ci = c.instrs.emplace_back(head[0]);
+        if ((head[1] != SERIAL_NO_ARG && !r.svar(arg)) || !r.svar(line_delta) ||
+            !r.svar(end_delta) || !r.svar(ci.loc.col_offset) || !r.svar(ci.loc.end_col))
+            return false;
+        lineno = serial_undelta(lineno, line_delta);
+        ci.loc.lineno = lineno;
+        ci.loc.end_lineno = serial_undelta(lineno, end_delta);
+        switch (head[1]) {
+        case SERIAL_NO_ARG:   break;
+        case SERIAL_INT:      ci.arg = arg; break;
+        case SERIAL_LABEL_ID: ci.arg = Label{arg}; break;
+        case SERIAL_OBJECT:   ci.arg = arg; c.with_object.push_back(i); break;
+        default:              return false;
+        }
+    }
+    for (uint32_t k = 0, i = 0; k < n_labels; ++k) {
+        uint32_t skip;
+        int id;
+        if (!r.var(skip) || !r.svar(id) || skip >= n_instrs - i) return false;
+        i += skip;
+        c.instrs[i].labels.push_back(Label{id});
+    }
+    c.ends.resize(n_ends);
+    for (int& id : c.ends)
+        if (!r.svar(id)) return false;
+    c.excs.resize(n_exc);
+    for (auto& e : c.excs)
+        for (int& v : e)
+            if (!r.svar(v)) return false;
+    return true;
+}
 
-    PyObject* lst = PySequence_List(instrs);
-    if (!lst) return -1;
+static PyObject* serial_corrupt()
+{
+    PyErr_SetString(PyExc_ValueError, "truncated or corrupt Bytecode data");
+    return nullptr;
+}
 
-    Py_ssize_t n = PyList_GET_SIZE(lst);
-    for (Py_ssize_t i = 0; i < n; ++i) {
-        PyObject* item = PyList_GET_ITEM(lst, i);
-        if (!PyObject_TypeCheck(item, &PyInstrType)) {
-            PyErr_Format(PyExc_TypeError,
-                "instrs[%zd] is not an Instr (got %s)", i, Py_TYPE(item)->tp_name);
-            Py_DECREF(lst);
-            return -1;
+// The marshalled objects, checked for the shape to_bytes() gives them.
+static bool serial_objects_valid(PyObject* o, size_t n_codes)
+{
+    if (!PyList_CheckExact(o) || static_cast<size_t>(PyList_GET_SIZE(o)) != n_codes) return false;
+    for (size_t k = 0; k < n_codes; ++k) {
+        PyObject* entry = PyList_GET_ITEM(o, static_cast<Py_ssize_t>(k));
+        if (!PyList_CheckExact(entry) || PyList_GET_SIZE(entry) != SERIAL_TABLES) return false;
+        for (Py_ssize_t i = 0; i < SERIAL_TABLES; ++i) {
+            PyObject* item = PyList_GET_ITEM(entry, i);
+            // filename, name and qualname are str; the rest are lists.
+            if (i >= 5 && i <= 7 ? !PyUnicode_CheckExact(item) : !PyList_CheckExact(item)) return false;
+        }
+        for (Py_ssize_t t = 1; t <= 4; ++t) {  // names, varnames, freevars, cellvars
+            PyObject* table = PyList_GET_ITEM(entry, t);
+            for (Py_ssize_t i = 0; i < PyList_GET_SIZE(table); ++i)
+                if (!PyUnicode_CheckExact(PyList_GET_ITEM(table, i))) return false;
+        }
+        PyObject* nested_at = PyList_GET_ITEM(entry, 9);
+        for (Py_ssize_t i = 0; i < PyList_GET_SIZE(nested_at); ++i) {
+            PyObject* at = PyList_GET_ITEM(nested_at, i);
+            if (!PyList_CheckExact(at) || PyList_GET_SIZE(at) != 3) return false;
+            Py_ssize_t v[3];
+            for (int j = 0; j < 3; ++j) {
+                PyObject* n = PyList_GET_ITEM(at, j);
+                v[j] = PyLong_CheckExact(n) ? PyLong_AsSsize_t(n) : -1;
+                if (v[j] < 0) { PyErr_Clear(); return false; }
+            }
+            if (v[0] > 1 || v[1] >= PyList_GET_SIZE(PyList_GET_ITEM(entry, v[0] ? 8 : 0)) ||
+                static_cast<size_t>(v[2]) >= n_codes)
+                return false;
         }
     }
+    return true;
+}
 
-    Py_DECREF(self->py_instrs);
-    self->py_instrs = lst;
-    return 0;
+// A Bytecode for one code's objects and packed part. Its instructions borrow
+// their object arguments from `entry`'s args, which must by now hold the
+// nested Bytecodes they load.
+static bool bytecode_from_serial(ModuleState* st, PyBytecodeObject* self, PyObject* entry,
+                                      SerialCode& c, bool lazy)
+{
+    CodeMeta& m = self->bc->meta;
+    PyObject** tables[] = {&m.consts, &m.names, &m.varnames, &m.freevars, &m.cellvars,
+                           &m.filename, &m.name, &m.qualname};
+    for (Py_ssize_t t = 0; t < 8; ++t) {
+        Py_INCREF(PyList_GET_ITEM(entry, t));
+        Py_SETREF(*tables[t], PyList_GET_ITEM(entry, t));
+    }
+    m.argcount        = c.meta[0];
+    m.posonlyargcount = c.meta[1];
+    m.kwonlyargcount  = c.meta[2];
+    m.nlocals         = c.meta[3];
+    m.flags           = c.meta[4];
+    m.firstlineno     = c.meta[5];
+    self->bc->next_label_id = c.meta[6];
+
+    PyObject* args = PyList_GET_ITEM(entry, 8);
+    for (uint32_t i : c.with_object) {
+        int k = std::get<int>(c.instrs[i].arg);
+        if (k < 0 || k >= PyList_GET_SIZE(args)) {
+            serial_corrupt();
+            return false;
+        }
+        c.instrs[i].arg = PyList_GET_ITEM(args, k);
+    }
+
+    LabelCache* labels = bytecode_labels(self);
+    if (!labels) return false;
+    PyObject* py_instrs;
+    if (lazy) {
+        py_instrs = instrlist_new(st, std::move(c.instrs), args, labels);
+    } else if ((py_instrs = PyList_New(static_cast<Py_ssize_t>(c.instrs.size())))) {
+        for (size_t i = 0; i < c.instrs.size(); ++i) {
+            PyObject* obj = pyinstr_from_cpp(st, c.instrs[i], labels);
+            if (!obj) { Py_CLEAR(py_instrs); break; }
+            PyList_SET_ITEM(py_instrs, static_cast<Py_ssize_t>(i), obj);
+        }
+    }
+    if (!py_instrs) return false;
+    Py_SETREF(self->py_instrs, py_instrs);
+
+    for (int id : c.ends) {
+        PyObject* lbl = label_from(st, labels, id);
+        int r = lbl ? PyList_Append(self->py_end_labels, lbl) : -1;
+        Py_XDECREF(lbl);
+        if (r < 0) return false;
+    }
+    for (const auto& v : c.excs) {
+        PyObject* ee = new_exc_entry(st, labels, v[0], v[1], v[2], v[3], v[4] != 0);
+        int r = ee ? PyList_Append(self->py_exc_entries, ee) : -1;
+        Py_XDECREF(ee);
+        if (r < 0) return false;
+    }
+    return true;
 }
 
-// ── from_code ─────────────────────────────────────────────────────────────
+// The Bytecode serialized in `data`; lazy < 0 for as it was.
+static PyObject* bytecode_from_bytes(ModuleState* st, const uint8_t* data, size_t size, int lazy)
+{
+    ByteReader r(data, size);
+    const uint8_t* magic;
+    if (!r.raw(magic, sizeof SERIAL_MAGIC) || memcmp(magic, SERIAL_MAGIC, sizeof SERIAL_MAGIC)) {
+        PyErr_SetString(PyExc_ValueError, "not serialized Bytecode data");
+        return nullptr;
+    }
+    uint16_t version, python;
+    uint32_t flags, n_codes;
+    if (!r.u16(version) || !r.u16(python) || !r.u32(flags)) return serial_corrupt();
+    if (version != SERIAL_VERSION) {
+        PyErr_Format(PyExc_ValueError, "Bytecode data has format version %u; this reads %u",
+                     version, SERIAL_VERSION);
+        return nullptr;
+    }
+    if (python != (PY_VERSION_HEX >> 16)) {
+        PyErr_Format(PyExc_ValueError, "Bytecode data is for Python %u.%u, not %u.%u",
+                     python >> 8, python & 0xFF, PY_MAJOR_VERSION, PY_MINOR_VERSION);
+        return nullptr;
+    }
+    if (lazy < 0) lazy = (flags & SERIAL_LAZY) != 0;
+    if (!r.u32(n_codes) || n_codes == 0 || uint64_t{n_codes} * SERIAL_MIN_CODE > r.left())
+        return serial_corrupt();
+
+    std::vector<SerialCode> codes(n_codes);
+    for (SerialCode& c : codes)
+        if (!read_serial_code(r, c)) return serial_corrupt();
+    const uint8_t* obj_p;
+    uint32_t obj_len;
+    if (!r.u32(obj_len) || !r.raw(obj_p, obj_len) || r.left() != 0) return serial_corrupt();
+    PyObject* objects = PyMarshal_ReadObjectFromString(reinterpret_cast<const char*>(obj_p),
+                                                       static_cast<Py_ssize_t>(obj_len));
+    if (!objects) {
+        PyErr_Clear();
+        return serial_corrupt();
+    }
+    // Every Bytecode is made before any is filled in, so each can be put
+    // where it's nested; `made` owns them meanwhile.
+    PyObject* made = PyList_New(static_cast<Py_ssize_t>(n_codes));
+    struct Release {
+        PyObject *a, *b;
+        ~Release() { Py_XDECREF(a); Py_XDECREF(b); }
+    } release{objects, made};
+    if (!made) return nullptr;
+    if (!serial_objects_valid(objects, n_codes)) return serial_corrupt();
+    for (uint32_t k = 0; k < n_codes; ++k) {
+        PyObject* bc = PyBytecode_new(st->bytecode_type, nullptr, nullptr);
+        if (!bc) return nullptr;
+        PyList_SET_ITEM(made, k, bc);
+    }
+    for (uint32_t k = 0; k < n_codes; ++k) {
+        PyObject* entry = PyList_GET_ITEM(objects, k);
+        PyObject* nested_at = PyList_GET_ITEM(entry, 9);
+        for (Py_ssize_t i = 0; i < PyList_GET_SIZE(nested_at); ++i) {
+            PyObject* at = PyList_GET_ITEM(nested_at, i);
+            PyObject* into = PyList_GET_ITEM(entry, PyLong_AsSsize_t(PyList_GET_ITEM(at, 0)) ? 8 : 0);
+            PyObject* bc = PyList_GET_ITEM(made, PyLong_AsSsize_t(PyList_GET_ITEM(at, 2)));
+            Py_INCREF(bc);
+            PyList_SetItem(into, PyLong_AsSsize_t(PyList_GET_ITEM(at, 1)), bc);
+        }
+    }
+    for (uint32_t k = 0; k < n_codes; ++k) {
+        auto* bc = reinterpret_cast<PyBytecodeObject*>(PyList_GET_ITEM(made, k));
+        if (!bytecode_from_serial(st, bc, PyList_GET_ITEM(objects, k), codes[k], lazy != 0))
+            return nullptr;
+    }
+    PyObject* result = PyList_GET_ITEM(made, 0);
+    Py_INCREF(result);
+    return result;
+}
 
-static PyObject* PyBytecode_from_code(PyObject* /*cls*/, PyObject* args)
+// from_bytes(data, *, lazy=None) -> Bytecode
+static PyObject* PyBytecode_from_bytes(PyObject* type, PyObject* args, PyObject* kw)
 {
-    PyObject* code_obj;
-    if (!PyArg_ParseTuple(args, "O!", &PyCode_Type, &code_obj))
+    static const char* kwlist[] = {"data", "lazy", nullptr};
+    Py_buffer view;
+    PyObject* lazy_obj = Py_None;
+    if (!PyArg_ParseTupleAndKeywords(args, kw, "y*|$O", const_cast<char**>(kwlist),
+                                     &view, &lazy_obj))
         return nullptr;
+    int lazy = lazy_obj == Py_None ? -1 : PyObject_IsTrue(lazy_obj);
+    PyObject* result = nullptr;
+    if (lazy_obj == Py_None || lazy >= 0) {
+        try {
+            result = bytecode_from_bytes(type_state(reinterpret_cast<PyTypeObject*>(type)),
+                                         static_cast<const uint8_t*>(view.buf),
+                                         static_cast<size_t>(view.len), lazy);
+        } catch (const std::bad_alloc&) {
+            result = PyErr_NoMemory();
+        }
+    }
+    PyBuffer_Release(&view);
+    return result;
+}
 
-    auto* self = reinterpret_cast<PyBytecodeObject*>(
-        PyBytecodeType.tp_alloc(&PyBytecodeType, 0));
-    if (!self) return nullptr;
+// Pickled as Bytecode.from_bytes(self.to_bytes()).
+static PyObject* PyBytecode_reduce(PyBytecodeObject* self, PyObject*)
+{
+    PyObject* data = PyBytecode_to_bytes(self, nullptr);
+    if (!data) return nullptr;
+    PyObject* from_bytes = PyObject_GetAttrString(reinterpret_cast<PyObject*>(Py_TYPE(self)),
+                                                  "from_bytes");
+    if (!from_bytes) { Py_DECREF(data); return nullptr; }
+    return Py_BuildValue("N(N)", from_bytes, data);
+}
 
-    try {
-        self->bc = new Bytecode(
-            Bytecode::from_code(reinterpret_cast<PyCodeObject*>(code_obj)));
-    } catch (const std::exception& e) {
-        PyErr_SetString(PyExc_RuntimeError, e.what());
-        Py_DECREF(self);
+// ── label_positions ───────────────────────────────────────────────────────
+// Recompute label -> current index in .instrs in one O(n) pass, by scanning
+// each instruction's .labels. Labels in .end_labels map to len(.instrs)
+// (one past the last instruction). Jump targets are already Labels by the
+// time a Bytecode reaches Python code (from_code() resolves them during
+// decode), so this is purely an inspection/lookup helper for code that
+// needs to know where a label currently points after edits — there is no
+// separate "symbolify" step to run first.
+
+static PyObject* PyBytecode_label_positions(PyBytecodeObject* self, PyObject*)
+{
+    ModuleState* st = state_of(self);
+    auto* il = PyObject_TypeCheck(self->py_instrs, st->instrlist_type)
+             ? reinterpret_cast<PyInstrListObject*>(self->py_instrs) : nullptr;
+    if (!il && !PyList_Check(self->py_instrs)) {
+        PyErr_SetString(PyExc_TypeError, "instrs must be a list");
         return nullptr;
     }
 
-    // Convert C++ instrs → Python list of PyInstrObject.
-    self->py_instrs = PyList_New(
-        static_cast<Py_ssize_t>(self->bc->instrs.size()));
-    if (!self->py_instrs) { Py_DECREF(self); return nullptr; }
+    PyObject* result = PyDict_New();
+    if (!result) return nullptr;
 
-    for (size_t i = 0; i < self->bc->instrs.size(); ++i) {
-        PyObject* pi = pyinstr_from_cpp(self->bc->instrs[i]);
-        if (!pi) { Py_DECREF(self); return nullptr; }
-        PyList_SET_ITEM(self->py_instrs, static_cast<Py_ssize_t>(i), pi);
-    }
+    auto add = [&](PyObject* lbl, Py_ssize_t i) -> bool {
+        PyObject* idx = PyLong_FromSsize_t(i);
+        if (!idx || PyDict_SetItem(result, lbl, idx) < 0) {
+            Py_XDECREF(idx);
+            return false;
+        }
+        Py_DECREF(idx);
+        return true;
+    };
 
-    // C++ instrs no longer needed; py_instrs is canonical from here.
-    self->bc->instrs.clear();
-    self->bc->instrs.shrink_to_fit();
+    Py_ssize_t n = il ? instrlist_size(il) : PyList_GET_SIZE(self->py_instrs);
+    for (Py_ssize_t i = 0; i < n; ++i) {
+        PyObject* item = il ? (*il->items)[static_cast<size_t>(i)].obj
+                            : PyList_GET_ITEM(self->py_instrs, i);
+        if (!item) {
+            // An InstrList entry nobody has looked at yet.
+            bool ok = true;
+            il->cols->for_each_label((*il->items)[static_cast<size_t>(i)].row, [&](int id) {
+                PyObject* lbl = ok ? label_from(st, il->labels, id) : nullptr;
+                ok = lbl && add(lbl, i);
+                Py_XDECREF(lbl);
+            });
+            if (!ok) { Py_DECREF(result); return nullptr; }
+            continue;
+        }
+        auto* pi = reinterpret_cast<PyInstrObject*>(item);
+        Py_ssize_t nl = instr_label_count(pi);
+        for (Py_ssize_t j = 0; j < nl; ++j) {
+            if (!add(PyList_GET_ITEM(pi->labels, j), i)) {
+                Py_DECREF(result);
+                return nullptr;
+            }
+        }
+    }
 
-    // Convert end_labels → Python list of Label.
-    self->py_end_labels = PyList_New(
-        static_cast<Py_ssize_t>(self->bc->end_labels.size()));
-    if (!self->py_end_labels) { Py_DECREF(self); return nullptr; }
-    for (size_t i = 0; i < self->bc->end_labels.size(); ++i) {
-        auto* lobj = reinterpret_cast<PyLabelObject*>(
-            PyLabelType.tp_alloc(&PyLabelType, 0));
-        if (!lobj) { Py_DECREF(self); return nullptr; }
-        lobj->id = self->bc->end_labels[i].id;
-        PyList_SET_ITEM(self->py_end_labels, static_cast<Py_ssize_t>(i),
-                         reinterpret_cast<PyObject*>(lobj));
+    if (PyList_Check(self->py_end_labels)) {
+        Py_ssize_t ne = PyList_GET_SIZE(self->py_end_labels);
+        if (ne > 0) {
+            PyObject* idx = PyLong_FromSsize_t(n);
+            if (!idx) { Py_DECREF(result); return nullptr; }
+            for (Py_ssize_t j = 0; j < ne; ++j) {
+                PyObject* lbl = PyList_GET_ITEM(self->py_end_labels, j);
+                if (PyDict_SetItem(result, lbl, idx) < 0) {
+                    Py_DECREF(idx);
+                    Py_DECREF(result);
+                    return nullptr;
+                }
+            }
+            Py_DECREF(idx);
+        }
     }
 
-    // Convert exc_labeled → Python list of PyExcEntryObject. Its Label
-    // fields were already attached to the matching py_instrs entries (or
-    // py_end_labels) above, via bc->instrs[i].labels / bc->end_labels.
-#if HAS_EXCEPTION_TABLE
-    self->py_exc_entries = PyList_New(
-        static_cast<Py_ssize_t>(self->bc->exc_labeled.size()));
-    if (!self->py_exc_entries) { Py_DECREF(self); return nullptr; }
+    return result;
+}
 
-    for (size_t i = 0; i < self->bc->exc_labeled.size(); ++i) {
-        const ExcEntryL& el = self->bc->exc_labeled[i];
+// ── as_arrays ─────────────────────────────────────────────────────────────
+// The instruction stream as array.array columns (see InstrColumns), for
+// analysis passes that scan whole code objects: one call instead of an
+// attribute lookup per instruction. The columns support the buffer protocol,
+// so numpy.frombuffer() wraps them without a copy. A snapshot: later edits to
+// the Bytecode don't show up in it.
+
+static PyStructSequence_Field InstrArrays_fields[] = {
+    {"op",     "array('B'): opcodes"},
+    {"arg",    "array('i'): int args; object args as the table index they "
+               "resolve to; -1 for jumps, and for objects in none of the tables"},
+    {"target", "array('i'): index of each jump's target instruction "
+               "(len(instrs) for end_labels); -1 elsewhere"},
+    {"lineno", "array('i'): line numbers; -1 where there is none"},
+    {"cache",  "array('B'): inline cache entries after each instruction"},
+    {nullptr, nullptr},
+};
 
-        auto make_label = [](int id) -> PyObject* {
-            auto* lobj = reinterpret_cast<PyLabelObject*>(
-                PyLabelType.tp_alloc(&PyLabelType, 0));
-            if (lobj) lobj->id = id;
-            return reinterpret_cast<PyObject*>(lobj);
-        };
+static PyStructSequence_Desc InstrArrays_desc = {
+    "spasm._core.InstrArrays",
+    "Bytecode.as_arrays() result: one array per instruction field.",
+    InstrArrays_fields,
+    5,
+};
 
-        PyObject* start   = make_label(el.start_lbl.id);
-        PyObject* stop    = make_label(el.stop_lbl.id);
-        PyObject* handler = make_label(el.handler_lbl.id);
-        if (!start || !stop || !handler) {
-            Py_XDECREF(start); Py_XDECREF(stop); Py_XDECREF(handler);
-            Py_DECREF(self); return nullptr;
-        }
+// Publish `fresh` in `slot` unless another thread got there first; either
+// way, the one that is there (borrowed).
+static PyObject* publish(std::atomic<PyObject*>& slot, PyObject* fresh)
+{
+    PyObject* seen = nullptr;
+    if (slot.compare_exchange_strong(seen, fresh, std::memory_order_acq_rel)) return fresh;
+    Py_DECREF(fresh);
+    return seen;
+}
 
-        auto* ee = reinterpret_cast<PyExcEntryObject*>(
-            PyExcEntryType.tp_alloc(&PyExcEntryType, 0));
-        if (!ee) {
-            Py_DECREF(start); Py_DECREF(stop); Py_DECREF(handler);
-            Py_DECREF(self); return nullptr;
-        }
-        ee->start   = start;
-        ee->stop    = stop;
-        ee->handler = handler;
-        ee->depth   = el.depth;
-        ee->lasti   = el.lasti ? 1 : 0;
-        PyList_SET_ITEM(self->py_exc_entries,
-                        static_cast<Py_ssize_t>(i),
-                        reinterpret_cast<PyObject*>(ee));
+// array.array, imported on first use, along with the one-item arrays that
+// column_array() repeats. Threads that race to import it keep whichever was
+// published first.
+static PyObject* array_type(ModuleState* st)
+{
+    PyObject* type = st->array_type.load(std::memory_order_acquire);
+    if (type) return type;
+    PyObject* array_mod = PyImport_ImportModule("array");
+    if (!array_mod) return nullptr;
+    PyObject* fresh = PyObject_GetAttrString(array_mod, "array");
+    Py_DECREF(array_mod);
+    if (!fresh) return nullptr;
+    const char* typecodes[] = {"B", "i"};
+    for (size_t k = 0; k < 2; ++k) {
+        PyObject* zero = PyObject_CallFunction(fresh, "s(i)", typecodes[k], 0);
+        if (!zero) { Py_DECREF(fresh); return nullptr; }
+        publish(st->zero_columns[k], zero);
     }
-#else
-    self->py_exc_entries = PyList_New(0);
-    if (!self->py_exc_entries) { Py_DECREF(self); return nullptr; }
-#endif
+    return publish(st->array_type, fresh);
+}
 
-    return reinterpret_cast<PyObject*>(self);
+// A column of n zeroed items, 'B' or 'i', with a writable view of it in
+// `view`. Callers check array_type() before anything else, so the import
+// (which can run any code) never happens part way through building the
+// columns.
+static PyObject* column_array(ModuleState* st, char typecode, Py_ssize_t n, Py_buffer& view)
+{
+    PyObject* zero = st->zero_columns[typecode == 'i'].load(std::memory_order_acquire);
+    PyObject* arr = PySequence_Repeat(zero, n);
+    if (arr && PyObject_GetBuffer(arr, &view, PyBUF_WRITABLE) < 0) Py_CLEAR(arr);
+    return arr;
 }
 
-// ── to_code ───────────────────────────────────────────────────────────────
+template <typename T>
+static PyObject* column_array(ModuleState* st, char typecode, const std::vector<T>& v)
+{
+    Py_buffer view;
+    PyObject* arr = column_array(st, typecode, static_cast<Py_ssize_t>(v.size()), view);
+    if (!arr) return nullptr;
+    if (!v.empty()) std::memcpy(view.buf, v.data(), v.size() * sizeof(T));
+    PyBuffer_Release(&view);
+    return arr;
+}
 
-static PyObject* PyBytecode_to_code(PyBytecodeObject* self, PyObject*)
+// Read straight from `instrs`, Instr objects and lazy entries alike, into
+// the arrays' own buffers. Object args are looked up in the tables last:
+// that can run __eq__, which could change `instrs` under a loop over it.
+static PyObject* PyBytecode_as_arrays(PyBytecodeObject* self, PyObject*)
 {
-    if (!PyList_Check(self->py_instrs)) {
+    static_assert(sizeof(int) == sizeof(int32_t), "array('i') must hold int32_t");
+    ModuleState* st = state_of(self);
+    if (!array_type(st)) return nullptr;
+    auto* il = PyObject_TypeCheck(self->py_instrs, st->instrlist_type)
+             ? reinterpret_cast<PyInstrListObject*>(self->py_instrs) : nullptr;
+    if (!il && !PyList_Check(self->py_instrs)) {
         PyErr_SetString(PyExc_TypeError, "instrs must be a list");
         return nullptr;
     }
+    Py_ssize_t n = il ? instrlist_size(il) : PyList_GET_SIZE(self->py_instrs);
+    auto instr_at = [&](Py_ssize_t i) -> PyInstrObject* {
+        PyObject* item = il ? (*il->items)[static_cast<size_t>(i)].obj
+                            : PyList_GET_ITEM(self->py_instrs, i);
+        return reinterpret_cast<PyInstrObject*>(item);
+    };
 
-    // Sync py_instrs → bc->instrs for assembly.
-    Py_ssize_t n = PyList_GET_SIZE(self->py_instrs);
-    self->bc->instrs.clear();
-    self->bc->instrs.reserve(static_cast<size_t>(n));
-
-    for (Py_ssize_t i = 0; i < n; ++i) {
-        PyObject* item = PyList_GET_ITEM(self->py_instrs, i);
-        if (!PyObject_TypeCheck(item, &PyInstrType)) {
-            PyErr_Format(PyExc_TypeError,
-                "instrs[%zd] is not an Instr (got %s)", i,
-                Py_TYPE(item)->tp_name);
-            self->bc->instrs.clear();
-            return nullptr;
+    std::vector<std::pair<int, size_t>> placed;
+    std::vector<std::pair<Py_ssize_t, PyObject*>> objects;  // owned
+    try {
+        for (Py_ssize_t i = 0; i < n; ++i) {
+            auto place = [&](int id) { placed.emplace_back(id, static_cast<size_t>(i)); };
+            PyInstrObject* pi = instr_at(i);
+            if (!pi) {
+                il->cols->for_each_label((*il->items)[static_cast<size_t>(i)].row, place);
+                continue;
+            }
+            if (!PyObject_TypeCheck(pi, st->instr_type)) {
+                PyErr_Format(PyExc_TypeError, "instrs[%zd] is not an Instr (got %s)",
+                             i, Py_TYPE(pi)->tp_name);
+                return nullptr;
+            }
+            for (Py_ssize_t j = 0; j < instr_label_count(pi); ++j)
+                place(reinterpret_cast<PyLabelObject*>(PyList_GET_ITEM(pi->labels, j))->id);
         }
-        Instr ci(0);
-        if (!pyinstr_to_cpp(reinterpret_cast<PyInstrObject*>(item), ci)) {
-            self->bc->instrs.clear();
-            return nullptr;
+        if (!sync_end_labels(self)) return nullptr;
+        for (const Label& lbl : self->bc->end_labels) placed.emplace_back(lbl.id, static_cast<size_t>(n));
+        self->bc->end_labels.clear();
+    } catch (const std::bad_alloc&) {
+        PyErr_NoMemory();
+        return nullptr;
+    }
+    const LabelIndex targets(placed);
+
+    PyObject* result = PyStructSequence_New(st->instr_arrays_type);
+    if (!result) return nullptr;
+    const char typecodes[] = {'B', 'i', 'i', 'i', 'B'};
+    Py_buffer views[5] = {};
+    PyObject* items[5] = {};
+    Py_ssize_t made = 0;
+    for (; made < 5; ++made)
+        if (!(items[made] = column_array(st, typecodes[made], n, views[made]))) break;
+    auto* op     = static_cast<uint8_t*>(views[0].buf);
+    auto* arg    = static_cast<int32_t*>(views[1].buf);
+    auto* target = static_cast<int32_t*>(views[2].buf);
+    auto* lineno = static_cast<int32_t*>(views[3].buf);
+    auto* cache  = static_cast<uint8_t*>(views[4].buf);
+
+    bool ok = made == 5;
+    try {
+        objects.reserve(static_cast<size_t>(n));
+        auto jump = [&](Py_ssize_t i, int id) {
+            size_t t = targets.find(id);
+            arg[i] = -1;
+            target[i] = t == LabelIndex::npos ? -1 : static_cast<int32_t>(t);
+        };
+        for (Py_ssize_t i = 0; ok && i < n; ++i) {
+            target[i] = -1;
+            PyInstrObject* pi = instr_at(i);
+            if (!pi) {
+                const LazyColumns& cols = *il->cols;
+                uint32_t row = (*il->items)[static_cast<size_t>(i)].row;
+                op[i] = cols.op[row];
+                lineno[i] = cols.location(row).lineno;
+                switch (cols.arg_kind(row)) {
+                case LazyColumns::INT:    arg[i] = cols.arg[row]; break;
+                case LazyColumns::LABEL:  jump(i, cols.arg[row]); break;
+                case LazyColumns::OBJECT: {
+                    PyObject* obj = cols.objs[static_cast<size_t>(cols.arg[row])];
+                    objects.emplace_back(i, Py_NewRef(obj));
+                    break;
+                }
+                default: break;
+                }
+            } else {
+                op[i] = pi->op;
+                lineno[i] = pi->lineno;
+                ArgKind ak = arg_kind(pi->op);
+                if (pi->arg_tag == InstrArg::INT) {
+                    arg[i] = pi->arg_int;
+                } else if (pi->arg_tag == InstrArg::LABEL) {
+                    jump(i, pi->arg_int);
+                } else if (PyObject_TypeCheck(pi->arg_obj, st->label_type)) {
+                    jump(i, reinterpret_cast<PyLabelObject*>(pi->arg_obj)->id);
+                } else if (PyLong_Check(pi->arg_obj) && ak != ArgKind::CONST) {
+                    // As pyinstr_to_cpp() has it: a raw oparg.
+                    long v = PyLong_AsLong(pi->arg_obj);
+                    if (v == -1 && PyErr_Occurred()) ok = false;
+                    arg[i] = static_cast<int32_t>(v);
+                } else {
+                    objects.emplace_back(i, Py_NewRef(pi->arg_obj));
+                }
+            }
+            cache[i] = static_cast<uint8_t>(instr_cache_size(op[i]));
         }
-        self->bc->instrs.push_back(ci);
+    } catch (const std::bad_alloc&) {
+        PyErr_NoMemory();
+        ok = false;
     }
+    if (ok) {
+        Bytecode::ArgLookup lookup(*self->bc);
+        for (auto& [i, obj] : objects) arg[i] = lookup.find(op[i], obj);
+    }
+    for (auto& [i, obj] : objects) Py_DECREF(obj);
+    for (Py_ssize_t k = 0; k < made; ++k) PyBuffer_Release(&views[k]);
+    if (!ok) {
+        for (PyObject* o : items) Py_XDECREF(o);
+        Py_DECREF(result);
+        return nullptr;
+    }
+    for (Py_ssize_t k = 0; k < 5; ++k) PyStructSequence_SET_ITEM(result, k, items[k]);
+    return result;
+}
 
-    // Sync py_end_labels → bc->end_labels for assembly.
-    if (!PyList_Check(self->py_end_labels)) {
-        PyErr_SetString(PyExc_TypeError, "end_labels must be a list");
+// ── stack_depths ──────────────────────────────────────────────────────────
+// The stack depth at entry to each instruction, from the same pass that
+// computes co_stacksize: to_code() keeps its result, and until the
+// instructions, exception entries or end labels change it is returned from
+// there rather than computed again.
+
+static PyObject* PyBytecode_stack_depths(PyBytecodeObject* self, PyObject*)
+{
+    ModuleState* st = state_of(self);
+    if (!array_type(st)) return nullptr;
+    if (!self->cache || !self->cache->has_depths || !flow_unchanged(self, *self->cache)) {
+        std::vector<int> depths;
+        bool ok = sync_instrs(self) && sync_end_labels(self) && sync_exc_entries(self);
+        if (ok) {
+            try {
+                ok = self->bc->stack_depths(depths);
+            } catch (const std::bad_alloc&) {
+                PyErr_NoMemory();
+                ok = false;
+            }
+        }
         self->bc->instrs.clear();
-        return nullptr;
+        self->bc->end_labels.clear();
+        if (!ok) return nullptr;
+        // A code object recorded for other instructions is of no more use.
+        if (tocode_cache_state(self) == CacheState::MISS &&
+            !tocode_cache_store(self, nullptr, nullptr, Py_None))
+            return nullptr;
+        self->cache->depths = std::move(depths);
+        self->cache->has_depths = true;
     }
-    self->bc->end_labels.clear();
-    Py_ssize_t nel = PyList_GET_SIZE(self->py_end_labels);
-    self->bc->end_labels.reserve(static_cast<size_t>(nel));
-    for (Py_ssize_t i = 0; i < nel; ++i) {
-        PyObject* item = PyList_GET_ITEM(self->py_end_labels, i);
-        if (!PyObject_TypeCheck(item, &PyLabelType)) {
-            PyErr_Format(PyExc_TypeError,
-                "end_labels[%zd] is not a Label (got %s)", i,
-                Py_TYPE(item)->tp_name);
-            self->bc->instrs.clear();
+
+    return column_array(st, 'i', self->cache->depths);
+}
+
+// ── find_pattern ──────────────────────────────────────────────────────────
+
+static PyStructSequence_Field PatternMatch_fields[] = {
+    {"start",    "index of the first matched instruction"},
+    {"end",      "index one past the last matched instruction"},
+    {"captures", "dict of capture name -> (start, end)"},
+    {nullptr, nullptr},
+};
+
+static PyStructSequence_Desc PatternMatch_desc = {
+    "spasm._core.PatternMatch",
+    "Bytecode.find_pattern() result: one match of a Pattern.",
+    PatternMatch_fields,
+    3,
+};
+
+static PyObject* pattern_match_object(ModuleState* st, const PatternMatch& m, PyObject* names)
+{
+    PyObject* result = PyStructSequence_New(st->pattern_match_type);
+    if (!result) return nullptr;
+    PyObject* captures = PyDict_New();
+    if (!captures) { Py_DECREF(result); return nullptr; }
+    PyStructSequence_SET_ITEM(result, 2, captures);
+    PyObject* start = PyLong_FromSize_t(m.start);
+    if (!start) { Py_DECREF(result); return nullptr; }
+    PyStructSequence_SET_ITEM(result, 0, start);
+    PyObject* end = PyLong_FromSize_t(m.end);
+    if (!end) { Py_DECREF(result); return nullptr; }
+    PyStructSequence_SET_ITEM(result, 1, end);
+
+    for (size_t k = 0; k < m.captures.size(); ++k) {
+        PyObject* span = Py_BuildValue("(nn)", static_cast<Py_ssize_t>(m.captures[k].first),
+                                       static_cast<Py_ssize_t>(m.captures[k].second));
+        if (!span || PyDict_SetItem(captures, PyTuple_GET_ITEM(names, k), span) < 0) {
+            Py_XDECREF(span);
+            Py_DECREF(result);
             return nullptr;
         }
-        self->bc->end_labels.push_back(
-            Label{reinterpret_cast<PyLabelObject*>(item)->id});
+        Py_DECREF(span);
     }
+    return result;
+}
 
-    // Sync py_exc_entries → bc->exc_labeled for assembly.
-#if HAS_EXCEPTION_TABLE
-    self->bc->exc_labeled.clear();
-    Py_ssize_t ne = PyList_GET_SIZE(self->py_exc_entries);
-    self->bc->exc_labeled.reserve(static_cast<size_t>(ne));
-    for (Py_ssize_t i = 0; i < ne; ++i) {
-        PyObject* item = PyList_GET_ITEM(self->py_exc_entries, i);
-        if (!PyObject_TypeCheck(item, &PyExcEntryType)) {
+// The opcode and labeled flag of every entry in py_instrs, read off the Instr
+// objects (or the decoded entries of an InstrList) without syncing them.
+static bool pattern_inputs(PyBytecodeObject* self, std::vector<PatternInput>& out)
+{
+    ModuleState* st = state_of(self);
+    auto* il = PyObject_TypeCheck(self->py_instrs, st->instrlist_type)
+             ? reinterpret_cast<PyInstrListObject*>(self->py_instrs) : nullptr;
+    if (!il && !PyList_Check(self->py_instrs)) {
+        PyErr_SetString(PyExc_TypeError, "instrs must be a list");
+        return false;
+    }
+    Py_ssize_t n = il ? instrlist_size(il) : PyList_GET_SIZE(self->py_instrs);
+    out.resize(static_cast<size_t>(n));
+    for (Py_ssize_t i = 0; i < n; ++i) {
+        PyObject* item = il ? (*il->items)[static_cast<size_t>(i)].obj
+                            : PyList_GET_ITEM(self->py_instrs, i);
+        if (!item) {
+            uint32_t row = (*il->items)[static_cast<size_t>(i)].row;
+            out[static_cast<size_t>(i)] = {il->cols->op[row], il->cols->labeled(row)};
+            continue;
+        }
+        if (!PyObject_TypeCheck(item, st->instr_type)) {
             PyErr_Format(PyExc_TypeError,
-                "exc_entries[%zd] is not an ExcEntry (got %s)", i,
-                Py_TYPE(item)->tp_name);
-            self->bc->instrs.clear();
-            return nullptr;
+                "instrs[%zd] is not an Instr (got %s)", i, Py_TYPE(item)->tp_name);
+            return false;
         }
-        auto* ee = reinterpret_cast<PyExcEntryObject*>(item);
-        ExcEntryL el;
-        el.start_lbl   = Label{reinterpret_cast<PyLabelObject*>(ee->start)->id};
-        el.stop_lbl    = Label{reinterpret_cast<PyLabelObject*>(ee->stop)->id};
-        el.handler_lbl = Label{reinterpret_cast<PyLabelObject*>(ee->handler)->id};
-        el.depth = ee->depth;
-        el.lasti = ee->lasti != 0;
-        self->bc->exc_labeled.push_back(el);
+        auto* pi = reinterpret_cast<PyInstrObject*>(item);
+        bool labeled = instr_label_count(pi) > 0;
+        out[static_cast<size_t>(i)] = {pi->op, labeled};
     }
-#endif
+    return true;
+}
 
-    PyObject* result = self->bc->to_code();
-    self->bc->instrs.clear();
-    self->bc->end_labels.clear();
+static PyObject* PyBytecode_find_pattern(PyBytecodeObject* self, PyObject* arg)
+{
+    ModuleState* st = state_of(self);
+    if (!PyObject_TypeCheck(arg, st->pattern_type)) {
+        PyErr_Format(PyExc_TypeError, "find_pattern() expects a Pattern (got %s)",
+                     Py_TYPE(arg)->tp_name);
+        return nullptr;
+    }
+    auto* pat = reinterpret_cast<PyPatternObject*>(arg);
+
+    std::vector<PatternMatch> matches;
+    try {
+        std::vector<PatternInput> inputs;
+        if (!pattern_inputs(self, inputs)) return nullptr;
+        matches = pat->pattern->find_all(inputs);
+    } catch (const std::bad_alloc&) {
+        return PyErr_NoMemory();
+    }
+
+    PyObject* result = PyList_New(static_cast<Py_ssize_t>(matches.size()));
+    if (!result) return nullptr;
+    for (size_t i = 0; i < matches.size(); ++i) {
+        PyObject* m = pattern_match_object(st, matches[i], pat->captures);
+        if (!m) { Py_DECREF(result); return nullptr; }
+        PyList_SET_ITEM(result, static_cast<Py_ssize_t>(i), m);
+    }
     return result;
 }
 
-// ── instrs property ───────────────────────────────────────────────────────
+// ── edit ──────────────────────────────────────────────────────────────────
+// Bytecode.edit() returns an Edit: a log of insertions, removals and label
+// moves, all addressed by index into .instrs as it was when the edit began,
+// applied together by commit() in one pass over the instructions. Building
+// the same result with list.insert()/del is quadratic in the number of edits.
+//
+// Labels on a removed instruction move to the next instruction the pass
+// emits after it (the first replacement, for replace()), or to end_labels if
+// nothing follows. Labels moved onto an instruction go in front of the ones
+// it already has.
+
+struct EditInsert {
+    Py_ssize_t key;     // 2 * index, +1 for insert_after
+    size_t     seq;     // recording order, for a stable sort
+    PyObject*  instrs;  // owned list of Instr
+};
 
-static PyObject* PyBytecode_get_instrs(PyBytecodeObject* self, void*)
+struct EditRemove {
+    Py_ssize_t start, stop;  // non-empty
+    PyObject*  repl;         // owned list of Instr, or null
+};
+
+struct EditMove {
+    Py_ssize_t src;
+    Py_ssize_t dst;          // index (size: end_labels), when dst_instr is null
+    PyObject*  dst_instr;    // owned Instr, or null
+};
+
+struct EditLog {
+    std::vector<EditInsert> inserts;
+    std::vector<EditRemove> removes;
+    std::vector<EditMove>   moves;
+
+    ~EditLog()
+    {
+        for (auto& e : inserts) Py_XDECREF(e.instrs);
+        for (auto& e : removes) Py_XDECREF(e.repl);
+        for (auto& e : moves)   Py_XDECREF(e.dst_instr);
+    }
+};
+
+extern PyTypeObject PyEditType;
+
+struct PyEditObject {
+    PyObject_HEAD
+    PyBytecodeObject* bc;       // owned
+    PyObject*         instrs;   // owned: bc's instrs when the edit began
+    Py_ssize_t        size;     // ... and their number
+    uint64_t          version;  // ... and, for an InstrList, its version
+    EditLog*          log;      // null once committed or discarded
+};
+
+static void PyEdit_dealloc(PyEditObject* self)
 {
-    Py_INCREF(self->py_instrs);
-    return self->py_instrs;
+    delete self->log;
+    Py_XDECREF(self->instrs);
+    Py_XDECREF(reinterpret_cast<PyObject*>(self->bc));
+    free_object(self);
 }
 
-// ── exc_entries property ──────────────────────────────────────────────────
+static PyObject* PyBytecode_edit(PyBytecodeObject* self, PyObject*)
+{
+    ModuleState* st = state_of(self);
+    auto* il = PyObject_TypeCheck(self->py_instrs, st->instrlist_type)
+             ? reinterpret_cast<PyInstrListObject*>(self->py_instrs) : nullptr;
+    if (!il && !PyList_Check(self->py_instrs)) {
+        PyErr_SetString(PyExc_TypeError, "instrs must be a list");
+        return nullptr;
+    }
+    auto* ed = reinterpret_cast<PyEditObject*>(st->edit_type->tp_alloc(st->edit_type, 0));
+    if (!ed) return nullptr;
+    try {
+        ed->log = new EditLog();
+    } catch (const std::bad_alloc&) {
+        Py_DECREF(ed);
+        return PyErr_NoMemory();
+    }
+    Py_INCREF(self);
+    ed->bc = self;
+    Py_INCREF(self->py_instrs);
+    ed->instrs = self->py_instrs;
+    ed->size = il ? instrlist_size(il) : PyList_GET_SIZE(self->py_instrs);
+    ed->version = il ? il->version : 0;
+    return reinterpret_cast<PyObject*>(ed);
+}
 
-static PyObject* PyBytecode_get_exc_entries(PyBytecodeObject* self, void*)
+static bool edit_check_open(PyEditObject* self)
 {
-    Py_INCREF(self->py_exc_entries);
-    return self->py_exc_entries;
+    if (self->log) return true;
+    PyErr_SetString(PyExc_RuntimeError, "this edit has already been committed or discarded");
+    return false;
 }
 
-static int PyBytecode_set_exc_entries(PyBytecodeObject* self, PyObject* v, void*)
+// `instrs` as a new list, checking that it only holds Instr.
+static PyObject* edit_instr_list(ModuleState* st, PyObject* instrs)
 {
-    if (!v || !PyList_Check(v)) {
-        PyErr_SetString(PyExc_TypeError, "exc_entries must be a list");
-        return -1;
+    PyObject* list = PySequence_List(instrs);
+    if (!list) return nullptr;
+    for (Py_ssize_t i = 0; i < PyList_GET_SIZE(list); ++i) {
+        if (!instrlist_check_instr(st, PyList_GET_ITEM(list, i))) {
+            Py_DECREF(list);
+            return nullptr;
+        }
     }
-    Py_INCREF(v);
-    Py_DECREF(self->py_exc_entries);
-    self->py_exc_entries = v;
-    return 0;
+    return list;
 }
 
-static int PyBytecode_set_instrs(PyBytecodeObject* self, PyObject* v, void*)
+static bool edit_check_index(PyEditObject* self, Py_ssize_t i, Py_ssize_t hi)
 {
-    if (!v || !PyList_Check(v)) {
-        PyErr_SetString(PyExc_TypeError, "instrs must be a list");
-        return -1;
-    }
-    Py_INCREF(v);
-    Py_DECREF(self->py_instrs);
-    self->py_instrs = v;
-    return 0;
+    if (i >= 0 && i <= hi) return true;
+    PyErr_Format(PyExc_IndexError, "edit index %zd out of range (instrs had %zd entries)",
+                 i, self->size);
+    return false;
 }
 
-// ── end_labels property ───────────────────────────────────────────────────
-// Labels targeting the position one-past-the-last-instruction — e.g. an
-// exception table range that runs to the very end of the code with nothing
-// after it. There's no instruction to attach these to, hence the separate
-// list (mirrors Bytecode::end_labels on the C++ side).
+static PyObject* edit_record_insert(PyEditObject* self, PyObject* args, bool after)
+{
+    Py_ssize_t index;
+    PyObject* instrs;
+    if (!PyArg_ParseTuple(args, after ? "nO:insert_after" : "nO:insert_before", &index, &instrs))
+        return nullptr;
+    if (!edit_check_open(self)) return nullptr;
+    // insert_before(len(instrs), ...) appends; insert_after needs an instruction.
+    if (!edit_check_index(self, index, after ? self->size - 1 : self->size)) return nullptr;
+    PyObject* list = edit_instr_list(state_of(self), instrs);
+    if (!list) return nullptr;
+    try {
+        self->log->inserts.push_back({2 * index + (after ? 1 : 0),
+                                      self->log->inserts.size(), list});
+    } catch (const std::bad_alloc&) {
+        Py_DECREF(list);
+        return PyErr_NoMemory();
+    }
+    Py_RETURN_NONE;
+}
 
-static PyObject* PyBytecode_get_end_labels(PyBytecodeObject* self, void*)
+// insert_before(index, instrs): put instrs in front of instrs[index].
+static PyObject* PyEdit_insert_before(PyEditObject* self, PyObject* args)
 {
-    Py_INCREF(self->py_end_labels);
-    return self->py_end_labels;
+    return edit_record_insert(self, args, false);
 }
-static int PyBytecode_set_end_labels(PyBytecodeObject* self, PyObject* v, void*)
+
+// insert_after(index, instrs): put instrs right after instrs[index].
+static PyObject* PyEdit_insert_after(PyEditObject* self, PyObject* args)
 {
-    PyObject* checked = check_labels_list(v, "end_labels");
-    if (!checked) return -1;
-    Py_DECREF(self->py_end_labels);
-    self->py_end_labels = checked;
-    return 0;
+    return edit_record_insert(self, args, true);
 }
 
-// ── new_label ─────────────────────────────────────────────────────────────
+static PyObject* edit_record_remove(PyEditObject* self, Py_ssize_t start, Py_ssize_t stop,
+                                    PyObject* instrs)
+{
+    if (!edit_check_open(self)) return nullptr;
+    if (!edit_check_index(self, start, self->size) || !edit_check_index(self, stop, self->size))
+        return nullptr;
+    if (stop < start) {
+        PyErr_SetString(PyExc_ValueError, "edit range has stop < start");
+        return nullptr;
+    }
+    PyObject* list = nullptr;
+    if (instrs && !(list = edit_instr_list(state_of(self), instrs))) return nullptr;
+    try {
+        if (start == stop) {
+            // Replacing nothing is inserting.
+            if (list) self->log->inserts.push_back({2 * start, self->log->inserts.size(), list});
+        } else {
+            self->log->removes.push_back({start, stop, list});
+        }
+    } catch (const std::bad_alloc&) {
+        Py_XDECREF(list);
+        return PyErr_NoMemory();
+    }
+    Py_RETURN_NONE;
+}
 
-static PyObject* PyBytecode_new_label(PyBytecodeObject* self, PyObject*)
+// replace(start, stop, instrs): put instrs in place of instrs[start:stop].
+static PyObject* PyEdit_replace(PyEditObject* self, PyObject* args)
 {
-    Label lbl = self->bc->new_label();
-    auto* obj = reinterpret_cast<PyLabelObject*>(
-        PyLabelType.tp_alloc(&PyLabelType, 0));
-    if (!obj) return nullptr;
-    obj->id = lbl.id;
-    return reinterpret_cast<PyObject*>(obj);
+    Py_ssize_t start, stop;
+    PyObject* instrs;
+    if (!PyArg_ParseTuple(args, "nnO:replace", &start, &stop, &instrs)) return nullptr;
+    return edit_record_remove(self, start, stop, instrs);
 }
 
-// ── label_positions ───────────────────────────────────────────────────────
-// Recompute label -> current index in .instrs in one O(n) pass, by scanning
-// each instruction's .labels. Labels in .end_labels map to len(.instrs)
-// (one past the last instruction). Jump targets are already Labels by the
-// time a Bytecode reaches Python code (from_code() resolves them during
-// decode), so this is purely an inspection/lookup helper for code that
-// needs to know where a label currently points after edits — there is no
-// separate "symbolify" step to run first.
+// delete(start, stop=start + 1): remove instrs[start:stop].
+static PyObject* PyEdit_delete(PyEditObject* self, PyObject* args)
+{
+    Py_ssize_t start, stop = -1;
+    if (!PyArg_ParseTuple(args, "n|n:delete", &start, &stop)) return nullptr;
+    if (stop == -1) stop = start + 1;
+    return edit_record_remove(self, start, stop, nullptr);
+}
 
-static PyObject* PyBytecode_label_positions(PyBytecodeObject* self, PyObject*)
+// move_labels(src, dst): move the labels on instrs[src] to instrs[dst]
+// (end_labels, for dst == len(instrs)), or to dst itself if it's an Instr —
+// typically one being inserted.
+static PyObject* PyEdit_move_labels(PyEditObject* self, PyObject* args)
 {
-    if (!PyList_Check(self->py_instrs)) {
-        PyErr_SetString(PyExc_TypeError, "instrs must be a list");
-        return nullptr;
+    ModuleState* st = state_of(self);
+    Py_ssize_t src;
+    PyObject* dst;
+    if (!PyArg_ParseTuple(args, "nO:move_labels", &src, &dst)) return nullptr;
+    if (!edit_check_open(self) || !edit_check_index(self, src, self->size - 1)) return nullptr;
+    EditMove mv{src, 0, nullptr};
+    if (PyObject_TypeCheck(dst, st->instr_type)) {
+        Py_INCREF(dst);
+        mv.dst_instr = dst;
+    } else {
+        mv.dst = PyNumber_AsSsize_t(dst, PyExc_IndexError);
+        if (mv.dst == -1 && PyErr_Occurred()) return nullptr;
+        if (!edit_check_index(self, mv.dst, self->size)) return nullptr;
     }
+    try {
+        self->log->moves.push_back(mv);
+    } catch (const std::bad_alloc&) {
+        Py_XDECREF(mv.dst_instr);
+        return PyErr_NoMemory();
+    }
+    Py_RETURN_NONE;
+}
 
-    PyObject* result = PyDict_New();
-    if (!result) return nullptr;
+// Apply a finished log to bc.instrs. Everything that can be rejected is
+// checked before anything is changed.
+class EditApplier {
+public:
+    EditApplier(PyEditObject* ed)
+        : ed_(ed), bc_(ed->bc), st_(state_of(ed)),
+          il_(PyObject_TypeCheck(ed->instrs, st_->instrlist_type)
+              ? reinterpret_cast<PyInstrListObject*>(ed->instrs) : nullptr),
+          n_(ed->size) {}
+
+    ~EditApplier() { Py_XDECREF(pending_); }
+
+    bool run()
+    {
+        if (!check_unchanged() || !order_log()) return false;
+        if (!(pending_ = PyList_New(0))) return false;
+        for (const EditMove& mv : ed_->log->moves)
+            if (!apply_move(mv)) return false;
+        return il_ ? rebuild_instrlist() : rebuild_list();
+    }
 
-    Py_ssize_t n = PyList_GET_SIZE(self->py_instrs);
-    for (Py_ssize_t i = 0; i < n; ++i) {
-        auto* pi = reinterpret_cast<PyInstrObject*>(PyList_GET_ITEM(self->py_instrs, i));
-        if (!PyList_Check(pi->labels)) continue;
-        Py_ssize_t nl = PyList_GET_SIZE(pi->labels);
-        for (Py_ssize_t j = 0; j < nl; ++j) {
-            PyObject* lbl = PyList_GET_ITEM(pi->labels, j);
-            PyObject* idx = PyLong_FromSsize_t(i);
-            if (!idx || PyDict_SetItem(result, lbl, idx) < 0) {
-                Py_XDECREF(idx);
-                Py_DECREF(result);
-                return nullptr;
+private:
+    PyEditObject*      ed_;
+    PyBytecodeObject*  bc_;
+    ModuleState*       st_;
+    PyInstrListObject* il_;
+    Py_ssize_t         n_;
+    PyObject*          pending_ = nullptr;  // labels waiting for the next instruction
+
+    bool check_unchanged()
+    {
+        bool same = bc_->py_instrs == ed_->instrs
+                 && (il_ ? instrlist_size(il_) == n_ && il_->version == ed_->version
+                         : PyList_GET_SIZE(ed_->instrs) == n_);
+        if (!same) {
+            PyErr_SetString(PyExc_RuntimeError, "instrs changed while the edit was open");
+            return false;
+        }
+        // An InstrList only ever holds Instr; a plain list is checked up
+        // front, so the pass itself can only fail for want of memory.
+        for (Py_ssize_t i = 0; !il_ && i < n_; ++i) {
+            PyObject* item = PyList_GET_ITEM(ed_->instrs, i);
+            if (!PyObject_TypeCheck(item, st_->instr_type)) {
+                PyErr_Format(PyExc_TypeError, "instrs[%zd] is not an Instr (got %s)",
+                             i, Py_TYPE(item)->tp_name);
+                return false;
             }
-            Py_DECREF(idx);
         }
+        return true;
     }
 
-    if (PyList_Check(self->py_end_labels)) {
-        Py_ssize_t ne = PyList_GET_SIZE(self->py_end_labels);
-        if (ne > 0) {
-            PyObject* idx = PyLong_FromSsize_t(n);
-            if (!idx) { Py_DECREF(result); return nullptr; }
-            for (Py_ssize_t j = 0; j < ne; ++j) {
-                PyObject* lbl = PyList_GET_ITEM(self->py_end_labels, j);
-                if (PyDict_SetItem(result, lbl, idx) < 0) {
-                    Py_DECREF(idx);
-                    Py_DECREF(result);
-                    return nullptr;
+    bool order_log()
+    {
+        auto& log = *ed_->log;
+        std::sort(log.inserts.begin(), log.inserts.end(),
+                  [](const EditInsert& a, const EditInsert& b) {
+                      return a.key != b.key ? a.key < b.key : a.seq < b.seq; });
+        std::sort(log.removes.begin(), log.removes.end(),
+                  [](const EditRemove& a, const EditRemove& b) { return a.start < b.start; });
+        for (size_t k = 1; k < log.removes.size(); ++k) {
+            if (log.removes[k].start < log.removes[k - 1].stop) {
+                PyErr_Format(PyExc_ValueError,
+                    "edit removes overlapping ranges [%zd, %zd) and [%zd, %zd)",
+                    log.removes[k - 1].start, log.removes[k - 1].stop,
+                    log.removes[k].start, log.removes[k].stop);
+                return false;
+            }
+        }
+        // An insertion point strictly inside a removed range has no place
+        // left to go; only before its first entry or after its last one does.
+        size_t r = 0;
+        for (const EditInsert& ins : log.inserts) {
+            while (r < log.removes.size() && 2 * log.removes[r].stop - 1 <= ins.key) ++r;
+            if (r == log.removes.size()) break;
+            const EditRemove& rm = log.removes[r];
+            if (2 * rm.start < ins.key) {
+                PyErr_Format(PyExc_ValueError,
+                    "edit inserts %s instrs[%zd], inside removed range [%zd, %zd)",
+                    ins.key & 1 ? "after" : "before", ins.key / 2, rm.start, rm.stop);
+                return false;
+            }
+        }
+        return true;
+    }
+
+    // The Instr at original index i (borrowed), materializing a lazy entry.
+    PyInstrObject* instr_at(Py_ssize_t i)
+    {
+        PyObject* obj = il_ ? instrlist_materialize(il_, i) : PyList_GET_ITEM(ed_->instrs, i);
+        return reinterpret_cast<PyInstrObject*>(obj);
+    }
+
+    // Move the labels on original entry i to the end of `out`, leaving it
+    // with none. A lazy entry gives up its label ids without materializing.
+    bool take_labels(Py_ssize_t i, PyObject* out)
+    {
+        if (il_ && !(*il_->items)[static_cast<size_t>(i)].obj) {
+            uint32_t row = (*il_->items)[static_cast<size_t>(i)].row;
+            bool ok = true;
+            il_->cols->for_each_label(row, [&](int id) {
+                PyObject* lbl = ok ? label_from(st_, il_->labels, id) : nullptr;
+                if (!lbl || PyList_Append(out, lbl) < 0) ok = false;
+                Py_XDECREF(lbl);
+            });
+            if (ok) il_->cols->clear_labels(row);
+            return ok;
+        }
+        PyInstrObject* instr = instr_at(i);
+        if (!instr) return false;
+        if (instr_label_count(instr) == 0) return true;
+        Py_ssize_t end = PyList_GET_SIZE(out);
+        if (PyList_SetSlice(out, end, end, instr->labels) < 0) return false;
+        Py_CLEAR(instr->labels);
+        instr->stamp = next_stamp(st_);
+        return true;
+    }
+
+    // Put `labels` in front of the ones `instr` already has.
+    bool give_labels(PyInstrObject* instr, PyObject* labels)
+    {
+        if (PyList_GET_SIZE(labels) == 0) return true;
+        PyObject* merged = instr->labels ? PySequence_Concat(labels, instr->labels)
+                                         : PyList_GetSlice(labels, 0, PyList_GET_SIZE(labels));
+        if (!merged) return false;
+        Py_XSETREF(instr->labels, merged);
+        instr->stamp = next_stamp(st_);
+        return true;
+    }
+
+    bool give_end_labels(PyObject* labels)
+    {
+        if (!PyList_Check(bc_->py_end_labels)) {
+            PyErr_SetString(PyExc_TypeError, "end_labels must be a list");
+            return false;
+        }
+        return PyList_SetSlice(bc_->py_end_labels, 0, 0, labels) == 0;
+    }
+
+    bool apply_move(const EditMove& mv)
+    {
+        PyObject* labels = PyList_New(0);
+        if (!labels) return false;
+        bool ok = take_labels(mv.src, labels);
+        if (ok) {
+            if (mv.dst_instr) {
+                ok = give_labels(reinterpret_cast<PyInstrObject*>(mv.dst_instr), labels);
+            } else if (mv.dst == n_) {
+                ok = give_end_labels(labels);
+            } else {
+                PyInstrObject* dst = instr_at(mv.dst);
+                ok = dst && give_labels(dst, labels);
+            }
+        }
+        Py_DECREF(labels);
+        return ok;
+    }
+
+    // Hand any pending labels to `instr`, the next instruction emitted.
+    bool flush_pending(PyInstrObject* instr)
+    {
+        if (PyList_GET_SIZE(pending_) == 0) return true;
+        if (!give_labels(instr, pending_)) return false;
+        return PyList_SetSlice(pending_, 0, PyList_GET_SIZE(pending_), nullptr) == 0;
+    }
+
+    // The single pass: walk the original entries, calling emit_new() for each
+    // inserted Instr and emit_kept() for each original one that stays.
+    template <typename EmitNew, typename EmitKept>
+    bool walk(EmitNew emit_new, EmitKept emit_kept)
+    {
+        const auto& log = *ed_->log;
+        size_t ins = 0, rem = 0;
+        auto emit_list = [&](PyObject* list) -> bool {
+            for (Py_ssize_t j = 0; j < PyList_GET_SIZE(list); ++j) {
+                auto* instr = reinterpret_cast<PyInstrObject*>(PyList_GET_ITEM(list, j));
+                if (!flush_pending(instr) || !emit_new(instr)) return false;
+            }
+            return true;
+        };
+        auto emit_inserts = [&](Py_ssize_t key) -> bool {
+            for (; ins < log.inserts.size() && log.inserts[ins].key == key; ++ins)
+                if (!emit_list(log.inserts[ins].instrs)) return false;
+            return true;
+        };
+
+        for (Py_ssize_t i = 0; i <= n_; ++i) {
+            if (!emit_inserts(2 * i)) return false;
+            if (i == n_) break;
+            while (rem < log.removes.size() && log.removes[rem].stop <= i) ++rem;
+            const EditRemove* r = rem < log.removes.size() && log.removes[rem].start <= i
+                                ? &log.removes[rem] : nullptr;
+            if (r) {
+                if (!take_labels(i, pending_)) return false;
+                if (i == r->stop - 1 && r->repl && !emit_list(r->repl)) return false;
+            } else {
+                if (PyList_GET_SIZE(pending_) > 0) {
+                    PyInstrObject* instr = instr_at(i);
+                    if (!instr || !flush_pending(instr)) return false;
                 }
+                if (!emit_kept(i)) return false;
             }
-            Py_DECREF(idx);
+            if (!emit_inserts(2 * i + 1)) return false;
         }
+        return PyList_GET_SIZE(pending_) == 0 || give_end_labels(pending_);
     }
 
-    return result;
+    bool rebuild_list()
+    {
+        PyObject* out = PyList_New(0);
+        if (!out) return false;
+        bool ok = walk(
+            [&](PyInstrObject* instr) {
+                return PyList_Append(out, reinterpret_cast<PyObject*>(instr)) == 0; },
+            [&](Py_ssize_t i) {
+                return PyList_Append(out, PyList_GET_ITEM(ed_->instrs, i)) == 0; });
+        ok = ok && PyList_SetSlice(ed_->instrs, 0, n_, out) == 0;
+        Py_DECREF(out);
+        return ok;
+    }
+
+    bool rebuild_instrlist()
+    {
+        // Record where each entry comes from first (an original index, or an
+        // inserted Instr), and only move entries once the walk succeeded.
+        std::vector<std::pair<Py_ssize_t, PyObject*>> plan;
+        plan.reserve(il_->items->size());
+        bool ok = walk(
+            [&](PyInstrObject* instr) {
+                plan.emplace_back(-1, reinterpret_cast<PyObject*>(instr));
+                return true; },
+            [&](Py_ssize_t i) {
+                plan.emplace_back(i, nullptr);
+                return true; });
+        if (!ok) return false;
+
+        auto& items = *il_->items;
+        std::vector<LazyInstr> out;
+        out.reserve(plan.size());
+        for (auto& [i, obj] : plan) {
+            if (obj) {
+                Py_INCREF(obj);
+                out.push_back(LazyInstr(obj));
+            } else {
+                out.push_back(std::move(items[static_cast<size_t>(i)]));
+                items[static_cast<size_t>(i)].obj = nullptr;
+            }
+        }
+        std::swap(items, out);
+        il_->version = next_stamp(st_);
+        // `out` now holds the old entries; only the removed ones still own an Instr.
+        for (auto& li : out) Py_XDECREF(li.obj);
+        return true;
+    }
+};
+
+static PyObject* edit_commit(PyEditObject* self)
+{
+    if (!edit_check_open(self)) return nullptr;
+    bool ok;
+    try {
+        ok = EditApplier(self).run();
+    } catch (const std::bad_alloc&) {
+        PyErr_NoMemory();
+        ok = false;
+    }
+    // A failed commit leaves the log in place, so the caller can see what
+    // went wrong (an overlap, say) and discard() it.
+    if (!ok) return nullptr;
+    delete self->log;
+    self->log = nullptr;
+    Py_RETURN_NONE;
+}
+
+// The edit is applied to its Bytecode, so both are locked.
+static PyObject* PyEdit_commit(PyEditObject* self, PyObject*)
+{
+    CriticalSection2 cs(self, self->bc);
+    return edit_commit(self);
+}
+
+// discard(): drop the recorded edits without applying them.
+static PyObject* PyEdit_discard(PyEditObject* self, PyObject*)
+{
+    delete self->log;
+    self->log = nullptr;
+    Py_RETURN_NONE;
+}
+
+static PyObject* PyEdit_enter(PyEditObject* self, PyObject*)
+{
+    if (!edit_check_open(self)) return nullptr;
+    Py_INCREF(self);
+    return reinterpret_cast<PyObject*>(self);
+}
+
+// Commit on a clean exit; discard if the block raised.
+static PyObject* PyEdit_exit(PyEditObject* self, PyObject* args)
+{
+    PyObject *type, *value, *tb;
+    if (!PyArg_ParseTuple(args, "OOO:__exit__", &type, &value, &tb)) return nullptr;
+    CriticalSection2 cs(self, self->bc);
+    if (type != Py_None || !self->log) return PyEdit_discard(self, nullptr);
+    PyObject* r = edit_commit(self);
+    if (!r) return nullptr;
+    Py_DECREF(r);
+    Py_RETURN_FALSE;
 }
 
+static PyMethodDef PyEdit_methods[] = {
+    {"insert_before", (PyCFunction)LOCKED(PyEdit_insert_before), METH_VARARGS,
+     "insert_before(index, instrs): insert instrs in front of instrs[index] "
+     "(index may be len(instrs), to append)."},
+    {"insert_after",  (PyCFunction)LOCKED(PyEdit_insert_after),  METH_VARARGS,
+     "insert_after(index, instrs): insert instrs right after instrs[index]."},
+    {"replace",       (PyCFunction)LOCKED(PyEdit_replace),       METH_VARARGS,
+     "replace(start, stop, instrs): put instrs in place of instrs[start:stop]; "
+     "labels on the removed instructions move to the first replacement."},
+    {"delete",        (PyCFunction)LOCKED(PyEdit_delete),        METH_VARARGS,
+     "delete(start, stop=start + 1): remove instrs[start:stop]; their labels "
+     "move to the next instruction that remains."},
+    {"move_labels",   (PyCFunction)LOCKED(PyEdit_move_labels),   METH_VARARGS,
+     "move_labels(src, dst): move the labels on instrs[src] to instrs[dst] "
+     "(end_labels if dst == len(instrs)), or onto dst if it is an Instr."},
+    {"commit",        (PyCFunction)PyEdit_commit,        METH_NOARGS,
+     "Apply every recorded edit in one pass."},
+    {"discard",       (PyCFunction)LOCKED(PyEdit_discard),       METH_NOARGS,
+     "Drop the recorded edits without applying them."},
+    {"__enter__",     (PyCFunction)LOCKED(PyEdit_enter),         METH_NOARGS,  nullptr},
+    {"__exit__",      (PyCFunction)PyEdit_exit,          METH_VARARGS, nullptr},
+    {nullptr},
+};
+
+static PyType_Slot PyEdit_slots[] = {
+    {Py_tp_dealloc, (void*)PyEdit_dealloc},
+    {Py_tp_doc,     (void*)
+        "A batch of edits to a Bytecode's instrs, addressed by index "
+        "into instrs as they were when Bytecode.edit() was called "
+        "and applied together by commit(), or on leaving a with block."},
+    {Py_tp_methods, PyEdit_methods},
+    {0, nullptr},
+};
+
+static PyType_Spec PyEdit_spec = {
+    .name      = "spasm._core.Edit",
+    .basicsize = sizeof(PyEditObject),
+    .flags     = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_IMMUTABLETYPE | Py_TPFLAGS_DISALLOW_INSTANTIATION,
+    .slots     = PyEdit_slots,
+};
+
 // ── Table property helpers ────────────────────────────────────────────────
 
-#define TABLE_PROP(field, doc)                                                  \
+// Handing a table out to Python means it may be edited in place from there
+// on, so its interning index (if it has one) is told to re-verify itself;
+// replacing the list outright drops the index altogether.
+#define TABLE_PROP(field, index, doc)                                           \
     static PyObject* PyBytecode_get_##field(PyBytecodeObject* s, void*) {       \
+        TableIndex Bytecode::* idx = index;                                     \
+        if (idx) (s->bc->*idx).mark_exposed();                                  \
         Py_INCREF(s->bc->meta.field); return s->bc->meta.field; }               \
     static int PyBytecode_set_##field(PyBytecodeObject* s, PyObject* v, void*) {\
         if (!v || !PyList_Check(v)) {                                            \
             PyErr_SetString(PyExc_TypeError, #field " must be a list"); return -1;} \
+        TableIndex Bytecode::* idx = index;                                     \
+        if (idx) (s->bc->*idx).invalidate();                                    \
         Py_INCREF(v); Py_DECREF(s->bc->meta.field); s->bc->meta.field = v; return 0;}
 
-TABLE_PROP(consts,   "Mutable list of co_consts entries.")
-TABLE_PROP(names,    "Mutable list of co_names strings.")
-TABLE_PROP(varnames, "Mutable list of co_varnames strings.")
-TABLE_PROP(freevars, "Mutable list of co_freevars strings.")
-TABLE_PROP(cellvars, "Mutable list of co_cellvars strings.")
+TABLE_PROP(consts,   &Bytecode::consts_index,   "Mutable list of co_consts entries.")
+TABLE_PROP(names,    &Bytecode::names_index,    "Mutable list of co_names strings.")
+TABLE_PROP(varnames, &Bytecode::varnames_index, "Mutable list of co_varnames strings.")
+TABLE_PROP(freevars, nullptr,                   "Mutable list of co_freevars strings.")
+TABLE_PROP(cellvars, nullptr,                   "Mutable list of co_cellvars strings.")
 #undef TABLE_PROP
 
 // bc.filename, bc.name, bc.qualname (read/write str scalars)
@@ -962,24 +5115,11 @@ INT_PROP(firstlineno,"First line number.")
 
 // ── add_const / add_name / add_varname ────────────────────────────────────
 
-// find_or_add: search list by identity then equality; append if absent.
-static Py_ssize_t py_find_or_add(PyObject* lst, PyObject* obj)
-{
-    Py_ssize_t n = PyList_GET_SIZE(lst);
-    for (Py_ssize_t i = 0; i < n; ++i) {
-        PyObject* it = PyList_GET_ITEM(lst, i);
-        if (it == obj) return i;
-        int eq = PyObject_RichCompareBool(it, obj, Py_EQ);
-        if (eq < 0) { PyErr_Clear(); continue; }
-        if (eq) return i;
-    }
-    if (PyList_Append(lst, obj) < 0) return -1;
-    return n;
-}
-
+// Interning goes through the Bytecode's hash indexes (see tableindex.h), so
+// each call is O(1) amortized however large the table already is.
 static PyObject* PyBytecode_add_const(PyBytecodeObject* self, PyObject* obj)
 {
-    Py_ssize_t idx = py_find_or_add(self->bc->meta.consts, obj);
+    Py_ssize_t idx = self->bc->consts_index.find_or_add(self->bc->meta.consts, obj);
     if (idx < 0) return nullptr;
     return PyLong_FromSsize_t(idx);
 }
@@ -990,7 +5130,7 @@ static PyObject* PyBytecode_add_name(PyBytecodeObject* self, PyObject* obj)
         PyErr_SetString(PyExc_TypeError, "name must be a str");
         return nullptr;
     }
-    Py_ssize_t idx = py_find_or_add(self->bc->meta.names, obj);
+    Py_ssize_t idx = self->bc->names_index.find_or_add(self->bc->meta.names, obj);
     if (idx < 0) return nullptr;
     return PyLong_FromSsize_t(idx);
 }
@@ -1001,7 +5141,7 @@ static PyObject* PyBytecode_add_varname(PyBytecodeObject* self, PyObject* obj)
         PyErr_SetString(PyExc_TypeError, "varname must be a str");
         return nullptr;
     }
-    Py_ssize_t idx = py_find_or_add(self->bc->meta.varnames, obj);
+    Py_ssize_t idx = self->bc->varnames_index.find_or_add(self->bc->meta.varnames, obj);
     if (idx < 0) return nullptr;
     return PyLong_FromSsize_t(idx);
 }
@@ -1009,113 +5149,226 @@ static PyObject* PyBytecode_add_varname(PyBytecodeObject* self, PyObject* obj)
 // ── properties / methods ──────────────────────────────────────────────────
 
 static PyGetSetDef PyBytecode_getset[] = {
-    {"exc_entries", (getter)PyBytecode_get_exc_entries,  (setter)PyBytecode_set_exc_entries,
+    {"exc_entries", (getter)LOCKED(PyBytecode_get_exc_entries),  (setter)LOCKED(PyBytecode_set_exc_entries),
      "Mutable list of ExcEntry objects (exception table).", nullptr},
-    {"instrs",      (getter)PyBytecode_get_instrs,      (setter)PyBytecode_set_instrs,
+    {"instrs",      (getter)LOCKED(PyBytecode_get_instrs),      (setter)LOCKED(PyBytecode_set_instrs),
      "Mutable list of Instr objects.", nullptr},
-    {"consts",      (getter)PyBytecode_get_consts,      (setter)PyBytecode_set_consts,
+    {"consts",      (getter)LOCKED(PyBytecode_get_consts),      (setter)LOCKED(PyBytecode_set_consts),
      "Mutable list of co_consts entries.", nullptr},
-    {"names",       (getter)PyBytecode_get_names,       (setter)PyBytecode_set_names,
+    {"names",       (getter)LOCKED(PyBytecode_get_names),       (setter)LOCKED(PyBytecode_set_names),
      "Mutable list of co_names strings.", nullptr},
-    {"varnames",    (getter)PyBytecode_get_varnames,    (setter)PyBytecode_set_varnames,
+    {"varnames",    (getter)LOCKED(PyBytecode_get_varnames),    (setter)LOCKED(PyBytecode_set_varnames),
      "Mutable list of co_varnames strings.", nullptr},
-    {"freevars",    (getter)PyBytecode_get_freevars,    (setter)PyBytecode_set_freevars,
+    {"freevars",    (getter)LOCKED(PyBytecode_get_freevars),    (setter)LOCKED(PyBytecode_set_freevars),
      "Mutable list of co_freevars strings.", nullptr},
-    {"cellvars",    (getter)PyBytecode_get_cellvars,    (setter)PyBytecode_set_cellvars,
+    {"cellvars",    (getter)LOCKED(PyBytecode_get_cellvars),    (setter)LOCKED(PyBytecode_set_cellvars),
      "Mutable list of co_cellvars strings.", nullptr},
-    {"filename",    (getter)PyBytecode_get_filename,    (setter)PyBytecode_set_filename,
+    {"filename",    (getter)LOCKED(PyBytecode_get_filename),    (setter)LOCKED(PyBytecode_set_filename),
      "Source filename (co_filename).", nullptr},
-    {"name",        (getter)PyBytecode_get_name,        (setter)PyBytecode_set_name,
+    {"name",        (getter)LOCKED(PyBytecode_get_name),        (setter)LOCKED(PyBytecode_set_name),
      "Code object name (co_name).", nullptr},
-    {"qualname",    (getter)PyBytecode_get_qualname,    (setter)PyBytecode_set_qualname,
+    {"qualname",    (getter)LOCKED(PyBytecode_get_qualname),    (setter)LOCKED(PyBytecode_set_qualname),
      "Qualified name (co_qualname). Ignored on 3.10.", nullptr},
-    {"argcount",    (getter)PyBytecode_get_argcount,    (setter)PyBytecode_set_argcount,
+    {"argcount",    (getter)LOCKED(PyBytecode_get_argcount),    (setter)LOCKED(PyBytecode_set_argcount),
      "Number of positional arguments.", nullptr},
-    {"flags",       (getter)PyBytecode_get_flags,       (setter)PyBytecode_set_flags,
+    {"flags",       (getter)LOCKED(PyBytecode_get_flags),       (setter)LOCKED(PyBytecode_set_flags),
      "Code flags.", nullptr},
-    {"firstlineno", (getter)PyBytecode_get_firstlineno, (setter)PyBytecode_set_firstlineno,
+    {"firstlineno", (getter)LOCKED(PyBytecode_get_firstlineno), (setter)LOCKED(PyBytecode_set_firstlineno),
      "First line number.", nullptr},
-    {"end_labels",  (getter)PyBytecode_get_end_labels,  (setter)PyBytecode_set_end_labels,
+    {"end_labels",  (getter)LOCKED(PyBytecode_get_end_labels),  (setter)LOCKED(PyBytecode_set_end_labels),
      "List of Label objects targeting the position one-past-the-last-instruction "
      "(e.g. an exception table range that runs to the very end of the code).", nullptr},
     {nullptr},
 };
 
 static PyMethodDef PyBytecode_methods[] = {
-    {"from_code",         PyBytecode_from_code,                      METH_VARARGS | METH_CLASS,
-     "Create a Bytecode from a code object. Jump targets are already "
-     "resolved to Labels."},
+    {"from_code",         (PyCFunction)(void(*)(void))PyBytecode_from_code,
+     METH_VARARGS | METH_KEYWORDS | METH_CLASS,
+     "from_code(code, *, lazy=False, recursive=False) -> Bytecode: decode a "
+     "code object. Jump targets are already resolved to Labels. With lazy=True, "
+     ".instrs is an InstrList that only creates an Instr when it is first "
+     "accessed. With recursive=True, nested code objects in consts are decoded "
+     "as well and appear as Bytecode objects."},
     {"to_code",           (PyCFunction)PyBytecode_to_code,           METH_NOARGS,
-     "Assemble back into a code object."},
-    {"new_label",         (PyCFunction)PyBytecode_new_label,         METH_NOARGS,
+     "Assemble back into a code object. Bytecode objects in consts are "
+     "assembled first, each with its own to_code()."},
+    {"new_label",         (PyCFunction)LOCKED(PyBytecode_new_label),         METH_NOARGS,
      "Allocate and return a new Label."},
-    {"label_positions",   (PyCFunction)PyBytecode_label_positions,   METH_NOARGS,
+    {"label_positions",   (PyCFunction)LOCKED(PyBytecode_label_positions),   METH_NOARGS,
      "label_positions() -> dict[Label, int]: recompute where every label "
      "currently points, as an index into .instrs (or len(.instrs) for a "
      "label in .end_labels)."},
-    {"add_const",         (PyCFunction)PyBytecode_add_const,         METH_O,
+    {"as_arrays",         (PyCFunction)LOCKED(PyBytecode_as_arrays),         METH_NOARGS,
+     "as_arrays() -> InstrArrays: the instructions as array.array columns "
+     "(op, arg, target, lineno, cache), one entry per instruction."},
+    {"stack_depths",      (PyCFunction)LOCKED(PyBytecode_stack_depths),      METH_NOARGS,
+     "stack_depths() -> array('i'): the stack depth at entry to each "
+     "instruction, -1 for those no path reaches. Computed as for "
+     "co_stacksize, and kept until the instructions, exc_entries or "
+     "end_labels change."},
+    {"find_pattern",      (PyCFunction)LOCKED(PyBytecode_find_pattern),      METH_O,
+     "find_pattern(pattern) -> list[PatternMatch]: every non-overlapping match "
+     "of a Pattern in .instrs, leftmost first, found in one pass."},
+    {"copy",              (PyCFunction)(void(*)(void))LOCKED(PyBytecode_copy),
+     METH_VARARGS | METH_KEYWORDS,
+     "copy(*, label_offset=0, lazy=None) -> Bytecode: a copy with new Instr "
+     "and ExcEntry objects and every label id shifted by label_offset. Tables "
+     "are copied shallowly. With lazy=True instrs is an InstrList that creates "
+     "its Instr objects on first access; by default the copy is lazy if this "
+     "Bytecode's instrs is."},
+    {"copy_into",         (PyCFunction)PyBytecode_copy_into,         METH_O,
+     "copy_into(other) -> (instrs, exc_entries, end_labels): new Instr and "
+     "ExcEntry objects for this Bytecode's code, with every label renumbered "
+     "to a fresh label of `other`, ready to be spliced into it."},
+    {"to_bytes",          (PyCFunction)PyBytecode_to_bytes,          METH_NOARGS,
+     "to_bytes() -> bytes: this Bytecode as it stands, labels and symbolic "
+     "arguments included, in a compact versioned format for from_bytes(). "
+     "Every argument and constant must be marshallable, or a Bytecode."},
+    {"from_bytes",        (PyCFunction)(void(*)(void))PyBytecode_from_bytes,
+     METH_VARARGS | METH_KEYWORDS | METH_CLASS,
+     "from_bytes(data, *, lazy=None) -> Bytecode: rebuild a Bytecode from "
+     "to_bytes() data made by the same Python version. By default instrs is "
+     "an InstrList if it was one when serialized. Raises ValueError if the "
+     "data is corrupt or from another version. Not for untrusted data, as "
+     "the tables are read with marshal."},
+    {"__reduce__",        (PyCFunction)PyBytecode_reduce,            METH_NOARGS,
+     "Pickle support, through to_bytes() and from_bytes()."},
+    {"edit",              (PyCFunction)LOCKED(PyBytecode_edit),              METH_NOARGS,
+     "edit() -> Edit: start a batch of insertions, removals and label moves "
+     "on .instrs, applied together in one pass."},
+    {"add_const",         (PyCFunction)LOCKED(PyBytecode_add_const),         METH_O,
      "add_const(obj) -> int: find or append obj in co_consts, return its index."},
-    {"add_name",          (PyCFunction)PyBytecode_add_name,          METH_O,
+    {"add_name",          (PyCFunction)LOCKED(PyBytecode_add_name),          METH_O,
      "add_name(name) -> int: find or append name in co_names, return its index."},
-    {"add_varname",       (PyCFunction)PyBytecode_add_varname,       METH_O,
+    {"add_varname",       (PyCFunction)LOCKED(PyBytecode_add_varname),       METH_O,
      "add_varname(name) -> int: find or append name in co_varnames, return index."},
     {nullptr},
 };
 
-PyTypeObject PyBytecodeType = {
-    .ob_base      = PyVarObject_HEAD_INIT(nullptr, 0)
-    .tp_name      = "spasm._core.Bytecode",
-    .tp_basicsize = sizeof(PyBytecodeObject),
-    .tp_dealloc   = (destructor)PyBytecode_dealloc,
-    .tp_flags     = Py_TPFLAGS_DEFAULT,
-    .tp_doc       = "Mutable bytecode sequence. Bytecode(instrs=()) builds an "
-                    "empty template for assembling from scratch; see also "
-                    "Bytecode.from_code(). Jump targets are always Labels "
-                    "(from_code() resolves them during decode) attached "
-                    "directly to their target Instr's .labels, or to "
-                    ".end_labels for the one-past-the-end position.",
-    .tp_methods   = PyBytecode_methods,
-    .tp_getset    = PyBytecode_getset,
-    .tp_init      = (initproc)PyBytecode_init,
-    .tp_new       = PyBytecode_new,
+static PyType_Slot PyBytecode_slots[] = {
+    {Py_tp_dealloc, (void*)PyBytecode_dealloc},
+    {Py_tp_doc,     (void*)
+        "Mutable bytecode sequence. Bytecode(instrs=()) builds an "
+        "empty template for assembling from scratch; see also "
+        "Bytecode.from_code(). Jump targets are always Labels "
+        "(from_code() resolves them during decode) attached "
+        "directly to their target Instr's .labels, or to "
+        ".end_labels for the one-past-the-end position."},
+    {Py_tp_methods, PyBytecode_methods},
+    {Py_tp_getset,  PyBytecode_getset},
+    {Py_tp_init,    (void*)LOCKED(PyBytecode_init)},
+    {Py_tp_new,     (void*)PyBytecode_new},
+    {0, nullptr},
+};
+
+static PyType_Spec PyBytecode_spec = {
+    .name      = "spasm._core.Bytecode",
+    .basicsize = sizeof(PyBytecodeObject),
+    .flags     = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_IMMUTABLETYPE,
+    .slots     = PyBytecode_slots,
 };
 
 // ════════════════════════════════════════════════════════════════════════════
 // Module
 // ════════════════════════════════════════════════════════════════════════════
 
-static PyModuleDef moduledef = {
-    .m_base = PyModuleDef_HEAD_INIT,
-    .m_name = "spasm._core",
-    .m_doc  = "Native CPython bytecode manipulation.",
-    .m_size = -1,
-};
+static int core_traverse(PyObject* m, visitproc visit, void* arg)
+{
+    auto* st = static_cast<ModuleState*>(PyModule_GetState(m));
+    Py_VISIT(st->label_type);
+    Py_VISIT(st->instr_type);
+    Py_VISIT(st->instrlist_type);
+    Py_VISIT(st->exc_entry_type);
+    Py_VISIT(st->step_type);
+    Py_VISIT(st->pattern_type);
+    Py_VISIT(st->bytecode_type);
+    Py_VISIT(st->edit_type);
+    Py_VISIT(st->instr_arrays_type);
+    Py_VISIT(st->pattern_match_type);
+    Py_VISIT(st->array_type.load(std::memory_order_relaxed));
+    for (auto& zero : st->zero_columns) Py_VISIT(zero.load(std::memory_order_relaxed));
+    return 0;
+}
 
-PyMODINIT_FUNC PyInit__core(void)
+static int core_clear(PyObject* m)
+{
+    auto* st = static_cast<ModuleState*>(PyModule_GetState(m));
+    Py_CLEAR(st->label_type);
+    Py_CLEAR(st->instr_type);
+    Py_CLEAR(st->instrlist_type);
+    Py_CLEAR(st->exc_entry_type);
+    Py_CLEAR(st->step_type);
+    Py_CLEAR(st->pattern_type);
+    Py_CLEAR(st->bytecode_type);
+    Py_CLEAR(st->edit_type);
+    Py_CLEAR(st->instr_arrays_type);
+    Py_CLEAR(st->pattern_match_type);
+    Py_XDECREF(st->array_type.exchange(nullptr));
+    for (auto& zero : st->zero_columns) Py_XDECREF(zero.exchange(nullptr));
+    for (auto& name : st->opnames) Py_XDECREF(name.exchange(nullptr));
+    return 0;
+}
+
+static void core_free(void* m)
 {
-    if (PyType_Ready(&PyLabelType)    < 0) return nullptr;
-    if (PyType_Ready(&PyInstrType)    < 0) return nullptr;
-    if (PyType_Ready(&PyExcEntryType) < 0) return nullptr;
-    if (PyType_Ready(&PyBytecodeType) < 0) return nullptr;
+    core_clear(static_cast<PyObject*>(m));
+}
 
-    PyObject* m = PyModule_Create(&moduledef);
-    if (!m) return nullptr;
+static int core_exec(PyObject* m)
+{
+    // The state arrives zeroed; this gives its atomics a proper start.
+    auto* st = new (PyModule_GetState(m)) ModuleState{};
 
-    auto add = [&](const char* name, PyTypeObject* tp) {
-        Py_INCREF(tp);
-        if (PyModule_AddObject(m, name, reinterpret_cast<PyObject*>(tp)) < 0) {
-            Py_DECREF(tp);
-            Py_DECREF(m);
-            m = nullptr;
-        }
+    auto add = [&](PyTypeObject*& slot, PyType_Spec* spec) {
+        slot = reinterpret_cast<PyTypeObject*>(PyType_FromModuleAndSpec(m, spec, nullptr));
+        return slot && PyModule_AddType(m, slot) == 0;
+    };
+    auto add_struct = [&](PyTypeObject*& slot, PyStructSequence_Desc* desc) {
+        slot = PyStructSequence_NewType(desc);
+        return slot && PyModule_AddType(m, slot) == 0;
     };
 
-    add("Label",    &PyLabelType);
-    add("Instr",    &PyInstrType);
-    add("ExcEntry", &PyExcEntryType);
-    add("Bytecode", &PyBytecodeType);
-    if (!m) return nullptr;
+    if (!add(st->label_type,     &PyLabel_spec) ||
+        !add(st->instr_type,     &PyInstr_spec) ||
+        !add(st->instrlist_type, &PyInstrList_spec) ||
+        !add(st->exc_entry_type, &PyExcEntry_spec) ||
+        !add(st->bytecode_type,  &PyBytecode_spec) ||
+        !add_struct(st->instr_arrays_type, &InstrArrays_desc) ||
+        !add(st->step_type,      &PyStep_spec) ||
+        !add(st->pattern_type,   &PyPattern_spec) ||
+        !add_struct(st->pattern_match_type, &PatternMatch_desc) ||
+        !add(st->edit_type,      &PyEdit_spec))
+        return -1;
+    st->label_type->tp_vectorcall = PyLabel_vectorcall;
+    st->instr_type->tp_vectorcall = PyInstr_vectorcall;
+
+    return PyModule_AddIntConstant(m, "PY_VERSION_HEX", PY_VERSION_HEX);
+}
+
+static PyModuleDef_Slot core_slots[] = {
+    {Py_mod_exec, reinterpret_cast<void*>(core_exec)},
+#if PY_VERSION_HEX >= 0x030C0000
+    {Py_mod_multiple_interpreters, Py_MOD_PER_INTERPRETER_GIL_SUPPORTED},
+#endif
+#if PY_VERSION_HEX >= 0x030D0000
+    // Every mutable type locks itself (see Locking above).
+    {Py_mod_gil, Py_MOD_GIL_NOT_USED},
+#endif
+    {0, nullptr},
+};
+
+static PyModuleDef moduledef = {
+    .m_base     = PyModuleDef_HEAD_INIT,
+    .m_name     = "spasm._core",
+    .m_doc      = "Native CPython bytecode manipulation.",
+    .m_size     = sizeof(ModuleState),
+    .m_slots    = core_slots,
+    .m_traverse = core_traverse,
+    .m_clear    = core_clear,
+    .m_free     = core_free,
+};
 
-    PyModule_AddIntConstant(m, "PY_VERSION_HEX", PY_VERSION_HEX);
-    return m;
+PyMODINIT_FUNC PyInit__core(void)
+{
+    return PyModuleDef_Init(&moduledef);
 }
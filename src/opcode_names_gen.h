@@ -0,0 +1,118 @@
+// Auto-generated for CPython 3.11
+#include <unordered_map>
+#include <string>
+static inline const std::unordered_map<std::string, uint8_t>& opcode_name_table() {
+    static const std::unordered_map<std::string, uint8_t> table = {
+        {"ASYNC_GEN_WRAP", 87},
+        {"BEFORE_ASYNC_WITH", 52},
+        {"BEFORE_WITH", 53},
+        {"BINARY_OP", 122},
+        {"BINARY_SUBSCR", 25},
+        {"BUILD_CONST_KEY_MAP", 156},
+        {"BUILD_LIST", 103},
+        {"BUILD_MAP", 105},
+        {"BUILD_SET", 104},
+        {"BUILD_SLICE", 133},
+        {"BUILD_STRING", 157},
+        {"BUILD_TUPLE", 102},
+        {"CACHE", 0},
+        {"CALL", 171},
+        {"CALL_FUNCTION_EX", 142},
+        {"CHECK_EG_MATCH", 37},
+        {"CHECK_EXC_MATCH", 36},
+        {"COMPARE_OP", 107},
+        {"CONTAINS_OP", 118},
+        {"COPY", 120},
+        {"COPY_FREE_VARS", 149},
+        {"DELETE_ATTR", 96},
+        {"DELETE_DEREF", 139},
+        {"DELETE_FAST", 126},
+        {"DELETE_GLOBAL", 98},
+        {"DELETE_NAME", 91},
+        {"DELETE_SUBSCR", 61},
+        {"DICT_MERGE", 164},
+        {"DICT_UPDATE", 165},
+        {"END_ASYNC_FOR", 54},
+        {"EXTENDED_ARG", 144},
+        {"FORMAT_VALUE", 155},
+        {"FOR_ITER", 93},
+        {"GET_AITER", 50},
+        {"GET_ANEXT", 51},
+        {"GET_AWAITABLE", 131},
+        {"GET_ITER", 68},
+        {"GET_LEN", 30},
+        {"GET_YIELD_FROM_ITER", 69},
+        {"IMPORT_FROM", 109},
+        {"IMPORT_NAME", 108},
+        {"IMPORT_STAR", 84},
+        {"IS_OP", 117},
+        {"JUMP_BACKWARD", 140},
+        {"JUMP_BACKWARD_NO_INTERRUPT", 134},
+        {"JUMP_FORWARD", 110},
+        {"JUMP_IF_FALSE_OR_POP", 111},
+        {"JUMP_IF_TRUE_OR_POP", 112},
+        {"KW_NAMES", 172},
+        {"LIST_APPEND", 145},
+        {"LIST_EXTEND", 162},
+        {"LIST_TO_TUPLE", 82},
+        {"LOAD_ASSERTION_ERROR", 74},
+        {"LOAD_ATTR", 106},
+        {"LOAD_BUILD_CLASS", 71},
+        {"LOAD_CLASSDEREF", 148},
+        {"LOAD_CLOSURE", 136},
+        {"LOAD_CONST", 100},
+        {"LOAD_DEREF", 137},
+        {"LOAD_FAST", 124},
+        {"LOAD_GLOBAL", 116},
+        {"LOAD_METHOD", 160},
+        {"LOAD_NAME", 101},
+        {"MAKE_CELL", 135},
+        {"MAKE_FUNCTION", 132},
+        {"MAP_ADD", 147},
+        {"MATCH_CLASS", 152},
+        {"MATCH_KEYS", 33},
+        {"MATCH_MAPPING", 31},
+        {"MATCH_SEQUENCE", 32},
+        {"NOP", 9},
+        {"POP_EXCEPT", 89},
+        {"POP_JUMP_BACKWARD_IF_FALSE", 175},
+        {"POP_JUMP_BACKWARD_IF_NONE", 174},
+        {"POP_JUMP_BACKWARD_IF_NOT_NONE", 173},
+        {"POP_JUMP_BACKWARD_IF_TRUE", 176},
+        {"POP_JUMP_FORWARD_IF_FALSE", 114},
+        {"POP_JUMP_FORWARD_IF_NONE", 129},
+        {"POP_JUMP_FORWARD_IF_NOT_NONE", 128},
+        {"POP_JUMP_FORWARD_IF_TRUE", 115},
+        {"POP_TOP", 1},
+        {"PRECALL", 166},
+        {"PREP_RERAISE_STAR", 88},
+        {"PRINT_EXPR", 70},
+        {"PUSH_EXC_INFO", 35},
+        {"PUSH_NULL", 2},
+        {"RAISE_VARARGS", 130},
+        {"RERAISE", 119},
+        {"RESUME", 151},
+        {"RETURN_GENERATOR", 75},
+        {"RETURN_VALUE", 83},
+        {"SEND", 123},
+        {"SETUP_ANNOTATIONS", 85},
+        {"SET_ADD", 146},
+        {"SET_UPDATE", 163},
+        {"STORE_ATTR", 95},
+        {"STORE_DEREF", 138},
+        {"STORE_FAST", 125},
+        {"STORE_GLOBAL", 97},
+        {"STORE_NAME", 90},
+        {"STORE_SUBSCR", 60},
+        {"SWAP", 99},
+        {"UNARY_INVERT", 15},
+        {"UNARY_NEGATIVE", 11},
+        {"UNARY_NOT", 12},
+        {"UNARY_POSITIVE", 10},
+        {"UNPACK_EX", 94},
+        {"UNPACK_SEQUENCE", 92},
+        {"WITH_EXCEPT_START", 49},
+        {"YIELD_VALUE", 86},
+    };
+    return table;
+}
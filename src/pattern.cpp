@@ -0,0 +1,67 @@
+#include "pattern.h"
+
+#include <algorithm>
+
+// Match steps[k:] at instrs[pos:]. Takes the longest run step k allows first
+// and gives instructions back one at a time until the rest of the pattern
+// matches. Recursion depth is the number of steps. `failed` holds, at
+// k * (instrs.size() + 1) + pos, whether steps[k:] is known not to match at pos.
+bool InstrPattern::match_from(const std::vector<PatternInput>& instrs, size_t k, size_t pos,
+                              PatternMatch& m, std::vector<bool>& failed) const
+{
+    if (k == steps.size()) {
+        m.end = pos;
+        return true;
+    }
+    const size_t slot = k * (instrs.size() + 1) + pos;
+    if (failed[slot]) return false;
+    const PatternStep& s = steps[k];
+    size_t avail = instrs.size() - pos;
+    size_t limit = s.max < 0 ? avail : std::min(avail, static_cast<size_t>(s.max));
+
+    size_t run = 0;
+    while (run < limit && s.accepts(instrs[pos + run])) ++run;
+    const size_t lo = static_cast<size_t>(s.min);
+    if (run >= lo) {
+        for (size_t r = run;; --r) {
+            if (match_from(instrs, k + 1, pos + r, m, failed)) {
+                if (s.capture >= 0) m.captures[static_cast<size_t>(s.capture)] = {pos, pos + r};
+                return true;
+            }
+            if (r == lo) break;
+        }
+    }
+    failed[slot] = true;
+    return false;
+}
+
+std::vector<PatternMatch> InstrPattern::find_all(const std::vector<PatternInput>& instrs) const
+{
+    std::vector<PatternMatch> out;
+    if (steps.empty()) return out;
+
+    // Most patterns start with a step that must take an instruction, so a
+    // position whose opcode that step rejects is skipped without recursing.
+    const PatternStep& first = steps.front();
+    const bool prefilter = first.min > 0;
+
+    PatternMatch m;
+    m.captures.resize(n_captures);
+    const size_t n = instrs.size();
+    std::vector<bool> failed(steps.size() * (n + 1));
+    size_t i = 0;
+    while (i <= n) {
+        if (prefilter && (i == n || !first.accepts(instrs[i]))) {
+            ++i;
+            continue;
+        }
+        m.start = i;
+        if (match_from(instrs, 0, i, m, failed)) {
+            out.push_back(m);
+            i = m.end > i ? m.end : i + 1;
+        } else {
+            ++i;
+        }
+    }
+    return out;
+}
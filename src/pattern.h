@@ -0,0 +1,65 @@
+#pragma once
+
+#include <bitset>
+#include <cstddef>
+#include <cstdint>
+#include <utility>
+#include <vector>
+
+// ── InstrPattern ─────────────────────────────────────────────────────────────
+// A sequence of steps matched against consecutive instructions, the way a
+// regular expression over opcodes would be: each step accepts a set of
+// opcodes, repeated between `min` and `max` times. Repetition is greedy and
+// backtracks, so `A* A` matches a run of A's the way the regex would. Whether
+// the steps from k on match at a position doesn't depend on how the match got
+// there, so each (step, position) that fails is remembered and never tried
+// again: a scan takes polynomial time however the steps overlap.
+//
+// A step may also require that no label is attached to the instructions it
+// takes (nothing jumps into the middle of a matched sequence), and may record
+// the span it took as a capture.
+//
+// The matcher only looks at opcodes and whether labels are attached, so it
+// runs over a PatternInput per instruction rather than the full Instr, which
+// a caller can fill without converting any argument.
+struct PatternInput {
+    uint8_t op;
+    bool    labeled;
+};
+
+struct PatternStep {
+    std::bitset<256> ops;               // opcodes this step accepts
+    int              min       = 1;
+    int              max       = 1;     // < 0: unbounded
+    bool             unlabeled = false; // reject instructions with .labels
+    int              capture   = -1;    // capture slot, or -1
+
+    bool accepts(const PatternInput& in) const noexcept
+    {
+        return ops.test(in.op) && !(unlabeled && in.labeled);
+    }
+};
+
+// One match: the instructions [start, end), plus each capture's span, in
+// slot order. A step repeated zero times captures the empty span at the
+// position it would have started.
+struct PatternMatch {
+    size_t                                start = 0;
+    size_t                                end   = 0;
+    std::vector<std::pair<size_t, size_t>> captures;
+};
+
+class InstrPattern {
+public:
+    std::vector<PatternStep> steps;
+    size_t                   n_captures = 0;
+
+    // Every non-overlapping match in `instrs`, leftmost first, in one pass.
+    // After a match the scan resumes at its end (or one past its start, for
+    // a match that took no instructions).
+    std::vector<PatternMatch> find_all(const std::vector<PatternInput>& instrs) const;
+
+private:
+    bool match_from(const std::vector<PatternInput>& instrs, size_t k, size_t pos,
+                    PatternMatch& m, std::vector<bool>& failed) const;
+};
@@ -0,0 +1,266 @@
+// Auto-generated for CPython 3.11
+enum class EffectKind : uint8_t { FALLBACK=0, CONST=1, LINEAR=2, MASKED=3, SMALL=4 };
+struct StackEffectRule {
+    EffectKind kind;
+    int32_t base;
+    int32_t mul;
+    int8_t table[16];
+};
+static constexpr StackEffectRule STACK_EFFECT_RULES[256][2] = {
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 0 CACHE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 1 POP_TOP
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 2 PUSH_NULL
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 3 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 4 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 5 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 6 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 7 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 8 
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 9 NOP
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 10 UNARY_POSITIVE
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 11 UNARY_NEGATIVE
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 12 UNARY_NOT
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 13 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 14 
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 15 UNARY_INVERT
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 16 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 17 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 18 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 19 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 20 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 21 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 22 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 23 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 24 
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 25 BINARY_SUBSCR
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 26 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 27 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 28 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 29 
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 30 GET_LEN
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 31 MATCH_MAPPING
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 32 MATCH_SEQUENCE
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 33 MATCH_KEYS
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 34 
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 35 PUSH_EXC_INFO
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 36 CHECK_EXC_MATCH
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 37 CHECK_EG_MATCH
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 38 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 39 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 40 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 41 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 42 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 43 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 44 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 45 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 46 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 47 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 48 
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 49 WITH_EXCEPT_START
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 50 GET_AITER
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 51 GET_ANEXT
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 52 BEFORE_ASYNC_WITH
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 53 BEFORE_WITH
+    {{EffectKind::CONST, -2, 0, {}}, {EffectKind::CONST, -2, 0, {}}},  // 54 END_ASYNC_FOR
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 55 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 56 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 57 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 58 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 59 
+    {{EffectKind::CONST, -3, 0, {}}, {EffectKind::CONST, -3, 0, {}}},  // 60 STORE_SUBSCR
+    {{EffectKind::CONST, -2, 0, {}}, {EffectKind::CONST, -2, 0, {}}},  // 61 DELETE_SUBSCR
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 62 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 63 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 64 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 65 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 66 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 67 
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 68 GET_ITER
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 69 GET_YIELD_FROM_ITER
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 70 PRINT_EXPR
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 71 LOAD_BUILD_CLASS
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 72 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 73 
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 74 LOAD_ASSERTION_ERROR
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 75 RETURN_GENERATOR
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 76 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 77 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 78 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 79 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 80 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 81 
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 82 LIST_TO_TUPLE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 83 RETURN_VALUE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 84 IMPORT_STAR
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 85 SETUP_ANNOTATIONS
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 86 YIELD_VALUE
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 87 ASYNC_GEN_WRAP
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 88 PREP_RERAISE_STAR
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 89 POP_EXCEPT
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 90 STORE_NAME
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 91 DELETE_NAME
+    {{EffectKind::LINEAR, -1, 1, {}}, {EffectKind::LINEAR, -1, 1, {}}},  // 92 UNPACK_SEQUENCE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 93 FOR_ITER
+    {{EffectKind::SMALL, 0, 0, {0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15}}, {EffectKind::SMALL, 0, 0, {0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15}}},  // 94 UNPACK_EX
+    {{EffectKind::CONST, -2, 0, {}}, {EffectKind::CONST, -2, 0, {}}},  // 95 STORE_ATTR
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 96 DELETE_ATTR
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 97 STORE_GLOBAL
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 98 DELETE_GLOBAL
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 99 SWAP
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 100 LOAD_CONST
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 101 LOAD_NAME
+    {{EffectKind::LINEAR, 1, -1, {}}, {EffectKind::LINEAR, 1, -1, {}}},  // 102 BUILD_TUPLE
+    {{EffectKind::LINEAR, 1, -1, {}}, {EffectKind::LINEAR, 1, -1, {}}},  // 103 BUILD_LIST
+    {{EffectKind::LINEAR, 1, -1, {}}, {EffectKind::LINEAR, 1, -1, {}}},  // 104 BUILD_SET
+    {{EffectKind::LINEAR, 1, -2, {}}, {EffectKind::LINEAR, 1, -2, {}}},  // 105 BUILD_MAP
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 106 LOAD_ATTR
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 107 COMPARE_OP
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 108 IMPORT_NAME
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 109 IMPORT_FROM
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 110 JUMP_FORWARD
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 111 JUMP_IF_FALSE_OR_POP
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 112 JUMP_IF_TRUE_OR_POP
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 113 
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 114 POP_JUMP_FORWARD_IF_FALSE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 115 POP_JUMP_FORWARD_IF_TRUE
+    {{EffectKind::MASKED, 0, 0, {1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2}}, {EffectKind::MASKED, 0, 0, {1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2}}},  // 116 LOAD_GLOBAL
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 117 IS_OP
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 118 CONTAINS_OP
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 119 RERAISE
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 120 COPY
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 121 
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 122 BINARY_OP
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 123 SEND
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 124 LOAD_FAST
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 125 STORE_FAST
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 126 DELETE_FAST
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 127 
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 128 POP_JUMP_FORWARD_IF_NOT_NONE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 129 POP_JUMP_FORWARD_IF_NONE
+    {{EffectKind::LINEAR, 0, -1, {}}, {EffectKind::LINEAR, 0, -1, {}}},  // 130 RAISE_VARARGS
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 131 GET_AWAITABLE
+    {{EffectKind::MASKED, 0, 0, {0, -1, -1, -2, -1, -2, -2, -3, -1, -2, -2, -3, -2, -3, -3, -4}}, {EffectKind::MASKED, 0, 0, {0, -1, -1, -2, -1, -2, -2, -3, -1, -2, -2, -3, -2, -3, -3, -4}}},  // 132 MAKE_FUNCTION
+    {{EffectKind::SMALL, 0, 0, {-1, -1, -1, -2, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1}}, {EffectKind::SMALL, 0, 0, {-1, -1, -1, -2, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1}}},  // 133 BUILD_SLICE
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 134 JUMP_BACKWARD_NO_INTERRUPT
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 135 MAKE_CELL
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 136 LOAD_CLOSURE
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 137 LOAD_DEREF
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 138 STORE_DEREF
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 139 DELETE_DEREF
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 140 JUMP_BACKWARD
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 141 
+    {{EffectKind::MASKED, 0, 0, {-2, -3, -2, -3, -2, -3, -2, -3, -2, -3, -2, -3, -2, -3, -2, -3}}, {EffectKind::MASKED, 0, 0, {-2, -3, -2, -3, -2, -3, -2, -3, -2, -3, -2, -3, -2, -3, -2, -3}}},  // 142 CALL_FUNCTION_EX
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 143 
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 144 EXTENDED_ARG
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 145 LIST_APPEND
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 146 SET_ADD
+    {{EffectKind::CONST, -2, 0, {}}, {EffectKind::CONST, -2, 0, {}}},  // 147 MAP_ADD
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 148 LOAD_CLASSDEREF
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 149 COPY_FREE_VARS
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 150 
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 151 RESUME
+    {{EffectKind::CONST, -2, 0, {}}, {EffectKind::CONST, -2, 0, {}}},  // 152 MATCH_CLASS
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 153 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 154 
+    {{EffectKind::MASKED, 0, 0, {0, 0, 0, 0, -1, -1, -1, -1, 0, 0, 0, 0, -1, -1, -1, -1}}, {EffectKind::MASKED, 0, 0, {0, 0, 0, 0, -1, -1, -1, -1, 0, 0, 0, 0, -1, -1, -1, -1}}},  // 155 FORMAT_VALUE
+    {{EffectKind::LINEAR, 0, -1, {}}, {EffectKind::LINEAR, 0, -1, {}}},  // 156 BUILD_CONST_KEY_MAP
+    {{EffectKind::LINEAR, 1, -1, {}}, {EffectKind::LINEAR, 1, -1, {}}},  // 157 BUILD_STRING
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 158 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 159 
+    {{EffectKind::CONST, 1, 0, {}}, {EffectKind::CONST, 1, 0, {}}},  // 160 LOAD_METHOD
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 161 
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 162 LIST_EXTEND
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 163 SET_UPDATE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 164 DICT_MERGE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 165 DICT_UPDATE
+    {{EffectKind::LINEAR, 0, -1, {}}, {EffectKind::LINEAR, 0, -1, {}}},  // 166 PRECALL
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 167 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 168 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 169 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 170 
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 171 CALL
+    {{EffectKind::CONST, 0, 0, {}}, {EffectKind::CONST, 0, 0, {}}},  // 172 KW_NAMES
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 173 POP_JUMP_BACKWARD_IF_NOT_NONE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 174 POP_JUMP_BACKWARD_IF_NONE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 175 POP_JUMP_BACKWARD_IF_FALSE
+    {{EffectKind::CONST, -1, 0, {}}, {EffectKind::CONST, -1, 0, {}}},  // 176 POP_JUMP_BACKWARD_IF_TRUE
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 177 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 178 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 179 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 180 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 181 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 182 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 183 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 184 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 185 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 186 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 187 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 188 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 189 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 190 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 191 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 192 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 193 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 194 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 195 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 196 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 197 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 198 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 199 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 200 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 201 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 202 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 203 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 204 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 205 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 206 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 207 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 208 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 209 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 210 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 211 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 212 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 213 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 214 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 215 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 216 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 217 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 218 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 219 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 220 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 221 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 222 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 223 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 224 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 225 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 226 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 227 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 228 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 229 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 230 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 231 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 232 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 233 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 234 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 235 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 236 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 237 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 238 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 239 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 240 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 241 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 242 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 243 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 244 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 245 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 246 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 247 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 248 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 249 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 250 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 251 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 252 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 253 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 254 
+    {{EffectKind::FALLBACK, 0, 0, {}}, {EffectKind::FALLBACK, 0, 0, {}}},  // 255 
+};
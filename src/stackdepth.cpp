@@ -1,30 +1,30 @@
 #include "stackdepth.h"
 #include "jump_opcodes_gen.h"
+#include "stack_effect_gen.h"
 #include "stackdepth_opcodes_gen.h"
 
 #include <algorithm>
+#include <climits>
 #include <limits>
 
 namespace {
 
-// Cache the _opcode.stack_effect callable for the process lifetime — this
-// intentionally never releases the reference, same as caching any other
-// process-lifetime singleton.
+// _opcode.stack_effect, looked up on each call: it is only asked about
+// opcodes the generated table doesn't cover, and each interpreter has its own
+// _opcode module, so there is no one object to keep for the process. The
+// import is a sys.modules lookup once the module is loaded.
 PyObject* stack_effect_callable()
 {
-    static PyObject* fn = nullptr;
-    if (!fn) {
-        PyObject* mod = PyImport_ImportModule("_opcode");
-        if (!mod) return nullptr;
-        fn = PyObject_GetAttrString(mod, "stack_effect");
-        Py_DECREF(mod);
-    }
+    PyObject* mod = PyImport_ImportModule("_opcode");
+    if (!mod) return nullptr;
+    PyObject* fn = PyObject_GetAttrString(mod, "stack_effect");
+    Py_DECREF(mod);
     return fn;
 }
 
 // jump: -1 = omit the keyword (opcode isn't a jump), 0 = False, 1 = True.
 // Returns false with a Python exception set on failure.
-bool stack_effect(uint8_t op, int arg, int jump, int& out)
+bool interpreter_stack_effect(uint8_t op, int arg, int jump, int& out)
 {
     PyObject* fn = stack_effect_callable();
     if (!fn) return false;
@@ -32,15 +32,16 @@ bool stack_effect(uint8_t op, int arg, int jump, int& out)
     PyObject* args = opcode_has_arg(op)
         ? Py_BuildValue("(ii)", static_cast<int>(op), arg)
         : Py_BuildValue("(i)", static_cast<int>(op));
-    if (!args) return false;
+    if (!args) { Py_DECREF(fn); return false; }
 
     PyObject* kwargs = nullptr;
     if (jump >= 0) {
         kwargs = PyDict_New();
-        if (!kwargs) { Py_DECREF(args); return false; }
+        if (!kwargs) { Py_DECREF(args); Py_DECREF(fn); return false; }
         if (PyDict_SetItemString(kwargs, "jump", jump ? Py_True : Py_False) < 0) {
             Py_DECREF(args);
             Py_DECREF(kwargs);
+            Py_DECREF(fn);
             return false;
         }
     }
@@ -48,6 +49,7 @@ bool stack_effect(uint8_t op, int arg, int jump, int& out)
     PyObject* result = PyObject_Call(fn, args, kwargs);
     Py_DECREF(args);
     Py_XDECREF(kwargs);
+    Py_DECREF(fn);
     if (!result) return false;
 
     long v = PyLong_AsLong(result);
@@ -57,32 +59,246 @@ bool stack_effect(uint8_t op, int arg, int jump, int& out)
     return true;
 }
 
+// Look up op's effect in the build-time rule table (see setup.py). Returns
+// false when the rule doesn't cover this oparg, and the caller has to ask the
+// interpreter instead.
+inline bool table_stack_effect(uint8_t op, int arg, int jump, int& out) noexcept
+{
+    const StackEffectRule& rule = STACK_EFFECT_RULES[op][jump == 0 ? 1 : 0];
+    switch (rule.kind) {
+    case EffectKind::CONST:
+        out = rule.base;
+        return true;
+    case EffectKind::LINEAR:
+        out = rule.base + rule.mul * arg;
+        return true;
+    case EffectKind::MASKED:
+        out = rule.table[arg & 0xF];
+        return true;
+    case EffectKind::SMALL:
+        if (arg < 0 || arg > 0xF) return false;
+        out = rule.table[arg];
+        return true;
+    default:
+        return false;
+    }
+}
+
+// Building with SPASM_DEBUG_STACK_EFFECT defined (setup.py does so when the
+// variable of the same name is set in the environment) checks every table
+// hit against the interpreter and raises SystemError on any disagreement.
+bool stack_effect(uint8_t op, int arg, int jump, int& out)
+{
+    if (!table_stack_effect(op, arg, jump, out))
+        return interpreter_stack_effect(op, arg, jump, out);
+#ifdef SPASM_DEBUG_STACK_EFFECT
+    int expected;
+    if (!interpreter_stack_effect(op, arg, jump, expected)) return false;
+    if (expected != out) {
+        PyErr_Format(PyExc_SystemError,
+            "stack effect table disagrees with the interpreter for opcode %d "
+            "(oparg %d, jump %d): table %d, interpreter %d",
+            static_cast<int>(op), arg, jump, out, expected);
+        return false;
+    }
+#endif
+    return true;
+}
+
+} // namespace
+
+namespace {
+
+constexpr size_t NO_SUCCESSOR = SIZE_MAX;
+
+// A basic block: a run of instructions entered only at its first and left
+// only after its last, at a jump, a scope exit or a generator-entry marker.
+// Every depth in it is its entry depth plus a constant, so walking it once
+// for its summary is enough however often a higher entry depth arrives.
+struct Block {
+    size_t start = 0, end = 0;     // [start, end) in instrs
+    bool   summarised = false;
+    int    peak   = 0;             // highest depth reached, relative to entry
+    size_t next   = NO_SUCCESSOR;  // where control falls through to, if it does
+    int    fall   = 0;             // depth at `next`, relative to entry
+    size_t target = NO_SUCCESSOR;  // where the closing jump goes, if any
+    int    taken  = 0;             // depth at `target`, relative to entry
+};
+
+inline bool ends_block(uint8_t op) noexcept
+{
+    return is_jump_opcode(op) || is_scope_exit(op) || is_stackdepth_neutral(op);
+}
+
+inline int int_arg(const Instr& instr) noexcept
+{
+    // The stack effect of every opcode that can carry a Label, PyObject*, or
+    // NoArg arg doesn't depend on the actual value — only (for jumps) on
+    // which edge is being computed — so 0 is always a safe placeholder for
+    // those.
+    auto* iv = std::get_if<int>(&instr.arg);
+    return iv ? *iv : 0;
+}
+
+// Walk `b` once, filling in its summary and each instruction's entry depth
+// relative to the block's (`offsets`). Done the first time the block is
+// reached, so an error in code that never runs is never reported.
+bool summarise(Block& b, const std::vector<Instr>& instrs,
+               const LabelIndex& label_idx, std::vector<int>& offsets)
+{
+    size_t n = instrs.size();
+    int rel = 0, peak = 0;
+    for (size_t idx = b.start; idx < b.end; ++idx) {
+        offsets[idx] = rel;
+        const Instr& instr = instrs[idx];
+        uint8_t op = instr.op;
+        int arg_val = int_arg(instr);
+
+        if (is_jump_opcode(op)) {
+            int effect_taken;
+            if (!stack_effect(op, arg_val, 1, effect_taken)) return false;
+            auto* lbl = std::get_if<Label>(&instr.arg);
+            if (!lbl) {
+                PyErr_SetString(PyExc_ValueError,
+                    "cannot compute stack size: jump instruction has a raw int "
+                    "arg instead of a Label — build jumps with Label targets "
+                    "(see Bytecode.new_label())");
+                return false;
+            }
+            b.target = label_idx.find(lbl->id);
+            if (b.target == LabelIndex::npos) {
+                PyErr_Format(PyExc_ValueError,
+                    "cannot compute stack size: unresolved jump label id %d", lbl->id);
+                return false;
+            }
+            b.taken = rel + effect_taken;
+            peak = std::max(peak, b.taken);
+            if (!is_unconditional_jump(op)) {
+                int effect_fall;
+                if (!stack_effect(op, arg_val, 0, effect_fall)) return false;
+                b.next = idx + 1;
+                b.fall = rel + effect_fall;
+            }
+        } else if (is_stackdepth_neutral(op)) {
+            // Generator-entry marker (GEN_START / RETURN_GENERATOR): its
+            // real effect models what happens when the generator function
+            // is *called*, but the body that follows always starts fresh
+            // at the incoming depth when later resumed — don't accumulate
+            // its effect. RETURN_GENERATOR is always immediately followed
+            // by a cleanup POP_TOP in CPython's own generated prologue;
+            // that pop must be neutralized too, or the offset comes right
+            // back via the very next instruction.
+            b.next = idx + 1;
+            if (b.next < n && instrs[b.next].op == POP_TOP_OPCODE) b.next += 1;
+            b.fall = rel;
+        } else {
+            int effect;
+            if (!stack_effect(op, arg_val, -1, effect)) return false;
+            rel += effect;
+            peak = std::max(peak, rel);
+            if (idx + 1 == b.end && !is_scope_exit(op)) {
+                b.next = idx + 1;
+                b.fall = rel;
+            }
+        }
+    }
+    b.peak = peak;
+    b.summarised = true;
+    return true;
+}
+
 } // namespace
 
 int compute_stacksize(const std::vector<Instr>& instrs,
-                      const std::unordered_map<int, size_t>& label_idx
+                      const LabelIndex& label_idx
 #if HAS_EXCEPTION_TABLE
                       , std::vector<ExcEntryL>& exc_labeled
 #endif
-                      )
+                      , std::vector<int>* depths)
 {
     size_t n = instrs.size();
+
+    // Split into basic blocks, as CPython's flowgraph.c does before its own
+    // calculate_stackdepth(). A block starts at the first instruction, at
+    // every jump target and handler, and after every instruction that ends
+    // one; a label nothing jumps to doesn't split anything. A jump whose
+    // label doesn't resolve is reported if and when it is reached.
+    std::vector<char> leader(n + 1, 0);
+    leader[0] = 1;
+    leader[n] = 1;
+    for (size_t idx = 0; idx < n; ++idx) {
+        const Instr& instr = instrs[idx];
+        if (!ends_block(instr.op)) continue;
+        leader[idx + 1] = 1;
+        if (is_stackdepth_neutral(instr.op) && idx + 1 < n &&
+            instrs[idx + 1].op == POP_TOP_OPCODE)
+            leader[idx + 2] = 1;
+        if (is_jump_opcode(instr.op))
+            if (auto* lbl = std::get_if<Label>(&instr.arg)) {
+                size_t target = label_idx.find(lbl->id);
+                if (target != LabelIndex::npos) leader[target] = 1;
+            }
+    }
+#if HAS_EXCEPTION_TABLE
+    for (const auto& e : exc_labeled) {
+        size_t handler = label_idx.find(e.handler_lbl.id);
+        if (handler != LabelIndex::npos) leader[handler] = 1;
+    }
+#endif
+
+    std::vector<Block> blocks;
+    std::vector<uint32_t> block_of(n);
+    for (size_t idx = 0; idx < n; ++idx) {
+        if (leader[idx]) {
+            if (!blocks.empty()) blocks.back().end = idx;
+            blocks.emplace_back();
+            blocks.back().start = idx;
+        }
+        block_of[idx] = static_cast<uint32_t>(blocks.size() - 1);
+    }
+    if (!blocks.empty()) blocks.back().end = n;
+
     // Sentinel for "not yet visited". Must be a value no real depth can
     // ever equal — depths can legitimately go transiently negative (e.g.
     // 3.10's GEN_START pops before the generator body's first real push),
     // so -1 is not a safe sentinel here.
     constexpr int UNVISITED = std::numeric_limits<int>::min();
-    std::vector<int> visited(n, UNVISITED);
-
-    // Per-instruction worklist DFS (mirrors CPython's own per-basic-block
-    // calculate_stackdepth() in Python/flowgraph.c). A node is only
-    // (re-)pushed when the newly proposed entry depth is strictly greater
-    // than what it was already explored with, so this naturally reaches a
-    // fixed point on graphs with back edges (loops) under the same
-    // assumption CPython's compiler makes: cycles have no net effect on
-    // stack depth.
-    std::vector<std::pair<size_t, int>> worklist;
-    worklist.emplace_back(0, 0);
+    std::vector<int> entry_depth(blocks.size(), UNVISITED);
+    std::vector<int> offsets(n, 0);
+
+    // The depth instruction `idx` was last explored with, or UNVISITED.
+    auto depth_at = [&](size_t idx) -> int {
+        int d = entry_depth[block_of[idx]];
+        return d == UNVISITED ? UNVISITED : d + offsets[idx];
+    };
+
+    // Worklist DFS over the blocks. A block is only (re-)pushed when the
+    // newly proposed entry depth is strictly greater than what it was
+    // already explored with, so this naturally reaches a fixed point on
+    // graphs with back edges (loops) under the same assumption CPython's
+    // compiler makes: cycles have no net effect on stack depth.
+    //
+    // Each entry also carries the depth its walk was seeded at. Unless some
+    // cycle gains depth, no walk gets deeper than that plus the gain of each
+    // block on it once (`growth`); past it, the walk would never stop.
+    struct Pending {
+        uint32_t block;
+        int      depth;
+        int      seed;
+    };
+    std::vector<Pending> worklist;
+    int maxdepth = 0;
+    long long growth = 0;
+    auto push = [&](size_t idx, int depth, int seed) {
+        if (idx >= n) {
+            // Fell off the end (e.g. a label in end_labels) — nothing more
+            // executes on this path.
+            if (depth > maxdepth) maxdepth = depth;
+            return;
+        }
+        worklist.push_back({block_of[idx], depth, seed});
+    };
+    push(0, 0, 0);
 
 #if HAS_EXCEPTION_TABLE
     // Exception handlers are reached by the interpreter's unwinder, not by
@@ -98,13 +314,18 @@ int compute_stacksize(const std::vector<Instr>& instrs,
     // a try block nested inside another handler, until *that* handler's
     // seed has been resolved and drained). Those are seeded lazily, below.
     auto seed_handler = [&](const ExcEntryL& e, int start_depth) -> bool {
-        auto it = label_idx.find(e.handler_lbl.id);
-        if (it == label_idx.end()) {
+        size_t handler_idx = label_idx.find(e.handler_lbl.id);
+        if (handler_idx == LabelIndex::npos) {
             PyErr_SetString(PyExc_ValueError,
                 "cannot compute stack size: unresolved exception handler label");
             return false;
         }
-        worklist.emplace_back(it->second, start_depth + 1 + (e.lasti ? 1 : 0));
+        if (start_depth > INT_MAX - 2) {
+            PyErr_SetString(PyExc_ValueError, "cannot compute stack size: stack too deep");
+            return false;
+        }
+        int depth = start_depth + 1 + (e.lasti ? 1 : 0);
+        push(handler_idx, depth, depth);
         return true;
     };
 
@@ -114,83 +335,32 @@ int compute_stacksize(const std::vector<Instr>& instrs,
     }
 #endif
 
-    int maxdepth = 0;
     auto drain = [&]() -> bool {
         while (!worklist.empty()) {
-            auto [idx, depth] = worklist.back();
+            auto [bi, depth, seed] = worklist.back();
             worklist.pop_back();
+            if (depth <= entry_depth[bi]) continue;
+            entry_depth[bi] = depth;
 
-            if (idx >= n) {
-                // Fell off the end (e.g. a label in end_labels) — nothing more
-                // executes on this path.
-                if (depth > maxdepth) maxdepth = depth;
-                continue;
+            Block& b = blocks[bi];
+            if (!b.summarised) {
+                if (!summarise(b, instrs, label_idx, offsets)) return false;
+                growth += std::max({0, b.fall, b.taken});
             }
-            if (depth <= visited[idx]) continue;
-            visited[idx] = depth;
-            if (depth > maxdepth) maxdepth = depth;
-
-            const Instr& instr = instrs[idx];
-            uint8_t op = instr.op;
-
-            // The stack effect of every opcode that can carry a Label,
-            // PyObject*, or NoArg arg doesn't depend on the actual value — only
-            // (for jumps) on which edge is being computed — so 0 is always a
-            // safe placeholder for those.
-            int arg_val = 0;
-            if (auto* iv = std::get_if<int>(&instr.arg)) arg_val = *iv;
-
-            if (is_jump_opcode(op)) {
-                int effect_taken;
-                if (!stack_effect(op, arg_val, 1, effect_taken)) return false;
-                int depth_taken = depth + effect_taken;
-                if (depth_taken > maxdepth) maxdepth = depth_taken;
-
-                size_t target_idx;
-                if (auto* lbl = std::get_if<Label>(&instr.arg)) {
-                    auto it = label_idx.find(lbl->id);
-                    if (it == label_idx.end()) {
-                        PyErr_Format(PyExc_ValueError,
-                            "cannot compute stack size: unresolved jump label id %d", lbl->id);
-                        return false;
-                    }
-                    target_idx = it->second;
-                } else {
-                    PyErr_SetString(PyExc_ValueError,
-                        "cannot compute stack size: jump instruction has a raw int "
-                        "arg instead of a Label — build jumps with Label targets "
-                        "(see Bytecode.new_label())");
-                    return false;
-                }
-                worklist.emplace_back(target_idx, depth_taken);
-
-                if (!is_unconditional_jump(op)) {
-                    int effect_fall;
-                    if (!stack_effect(op, arg_val, 0, effect_fall)) return false;
-                    worklist.emplace_back(idx + 1, depth + effect_fall);
-                }
-            } else if (is_stackdepth_neutral(op)) {
-                // Generator-entry marker (GEN_START / RETURN_GENERATOR): its
-                // real effect models what happens when the generator function
-                // is *called*, but the body that follows always starts fresh
-                // at the incoming depth when later resumed — don't accumulate
-                // its effect. RETURN_GENERATOR is always immediately followed
-                // by a cleanup POP_TOP in CPython's own generated prologue;
-                // that pop must be neutralized too, or the offset comes right
-                // back via the very next instruction.
-                size_t next_idx = idx + 1;
-                if (next_idx < n && instrs[next_idx].op == POP_TOP_OPCODE)
-                    next_idx += 1;
-                worklist.emplace_back(next_idx, depth);
-            } else {
-                int effect;
-                if (!stack_effect(op, arg_val, -1, effect)) return false;
-                int depth_next = depth + effect;
-                if (depth_next > maxdepth) maxdepth = depth_next;
-                if (!is_scope_exit(op)) {
-                    worklist.emplace_back(idx + 1, depth_next);
-                }
+            const char* bad = nullptr;
+            if (depth < 0)
+                bad = "cannot compute stack size: stack underflow";
+            else if (depth > seed + growth)
+                bad = "cannot compute stack size: a loop pushes more than it pops";
+            else if (static_cast<long long>(depth) + std::max({b.peak, b.fall, b.taken}) > INT_MAX)
+                bad = "cannot compute stack size: stack too deep";
+            if (bad) {
+                PyErr_SetString(PyExc_ValueError, bad);
+                return false;
             }
+            if (depth + b.peak > maxdepth) maxdepth = depth + b.peak;
+            if (b.target != NO_SUCCESSOR) push(b.target, depth + b.taken, seed);
+            if (b.next != NO_SUCCESSOR) push(b.next, depth + b.fall, seed);
         }
         return true;
     };
@@ -229,8 +399,8 @@ int compute_stacksize(const std::vector<Instr>& instrs,
     // Entries are only assigned a final depth — and their shared handler
     // only seeded — once every entry sharing that handler has a candidate.
     // Seeding early with a value that later turns out too high would have
-    // already driven downstream exploration (which only ever raises a
-    // visited[] depth, never lowers it) to the wrong depths.
+    // already driven downstream exploration (which only ever raises an
+    // entry depth, never lowers it) to the wrong depths.
 
     // Reachability from the function entry following only ordinary control
     // flow — no exception-handler edges. An AUTO entry whose region is
@@ -253,8 +423,8 @@ int compute_stacksize(const std::vector<Instr>& instrs,
                 // An unresolved label is reported with a better message by
                 // drain() above; just don't follow it here.
                 if (auto* lbl = std::get_if<Label>(&instr.arg)) {
-                    auto it = label_idx.find(lbl->id);
-                    if (it != label_idx.end()) stack.push_back(it->second);
+                    size_t target = label_idx.find(lbl->id);
+                    if (target != LabelIndex::npos) stack.push_back(target);
                 }
                 if (!is_unconditional_jump(op)) stack.push_back(idx + 1);
             } else if (is_stackdepth_neutral(op)) {
@@ -272,22 +442,21 @@ int compute_stacksize(const std::vector<Instr>& instrs,
         ok = true;
         int candidate = std::numeric_limits<int>::max();
         for (size_t idx = start_idx; idx < stop_idx; ++idx) {
-            int depth = visited[idx];
+            int depth = depth_at(idx);
             if (depth == UNVISITED) continue;
             if (depth < candidate) candidate = depth;
 
             const Instr& instr = instrs[idx];
             uint8_t op = instr.op;
-            int arg_val = 0;
-            if (auto* iv = std::get_if<int>(&instr.arg)) arg_val = *iv;
+            int arg_val = int_arg(instr);
 
             if (is_jump_opcode(op)) {
                 int effect_taken;
                 if (!stack_effect(op, arg_val, 1, effect_taken)) { ok = false; return 0; }
                 size_t target_idx = n;  // sentinel: "outside the region"
                 if (auto* lbl = std::get_if<Label>(&instr.arg)) {
-                    auto it = label_idx.find(lbl->id);
-                    if (it != label_idx.end()) target_idx = it->second;
+                    size_t found = label_idx.find(lbl->id);
+                    if (found != LabelIndex::npos) target_idx = found;
                 }
                 if (target_idx < start_idx || target_idx >= stop_idx) {
                     int depth_taken = depth + effect_taken;
@@ -337,13 +506,13 @@ int compute_stacksize(const std::vector<Instr>& instrs,
         for (size_t i = 0; i < m; ++i) {
             if (candidate_done[i]) continue;
             ExcEntryL& e = exc_labeled[i];
-            auto start_it = label_idx.find(e.start_lbl.id);
-            if (start_it == label_idx.end()) {
+            size_t start_at = label_idx.find(e.start_lbl.id);
+            if (start_at == LabelIndex::npos) {
                 PyErr_SetString(PyExc_ValueError,
                     "cannot compute stack size: unresolved exception entry start label");
                 return -1;
             }
-            if (!normally_reachable[start_it->second]) {
+            if (!normally_reachable[start_at]) {
                 PyErr_SetString(PyExc_ValueError,
                     "cannot compute stack size: exception entry's protected region is "
                     "only reachable by unwinding into an exception handler, so the "
@@ -352,17 +521,17 @@ int compute_stacksize(const std::vector<Instr>& instrs,
                     "bytecode — pass an explicit ExcEntry.depth for this entry");
                 return -1;
             }
-            if (visited[start_it->second] == UNVISITED) continue;  // not reachable yet
+            if (depth_at(start_at) == UNVISITED) continue;  // not reachable yet
 
-            auto stop_it = label_idx.find(e.stop_lbl.id);
-            if (stop_it == label_idx.end()) {
+            size_t stop_at = label_idx.find(e.stop_lbl.id);
+            if (stop_at == LabelIndex::npos) {
                 PyErr_SetString(PyExc_ValueError,
                     "cannot compute stack size: unresolved exception entry stop label");
                 return -1;
             }
 
             bool ok;
-            candidate[i] = candidate_for_entry(start_it->second, stop_it->second, ok);
+            candidate[i] = candidate_for_entry(start_at, stop_at, ok);
             if (!ok) return -1;
             candidate_done[i] = true;
             progress = true;
@@ -415,5 +584,20 @@ int compute_stacksize(const std::vector<Instr>& instrs,
     }
 #endif
 
+    if (depths) {
+        depths->resize(n);
+        for (size_t idx = 0; idx < n; ++idx) {
+            int d = depth_at(idx);
+            // The POP_TOP after RETURN_GENERATOR is stepped over by the walk,
+            // but runs when the generator is first resumed, on the value it
+            // was resumed with.
+            if (d == UNVISITED && idx > 0 && instrs[idx].op == POP_TOP_OPCODE &&
+                is_stackdepth_neutral(instrs[idx - 1].op)) {
+                int marker = depth_at(idx - 1);
+                if (marker != UNVISITED) d = marker + 1;
+            }
+            (*depths)[idx] = d == UNVISITED ? STACK_DEPTH_UNREACHABLE : d;
+        }
+    }
     return maxdepth;
 }
@@ -3,6 +3,7 @@
 #include "compat.h"
 #include "instr.h"
 #include "exctable.h"
+#include "labelindex.h"
 
 #include <vector>
 #include <unordered_map>
@@ -10,13 +11,15 @@
 // Compute the maximum value-stack depth reached while executing `instrs`,
 // so callers never have to track/set co_stacksize by hand.
 //
-// Walks the instruction graph (jump edges resolved via `label_idx`, as
+// Walks the graph of basic blocks (jump edges resolved via `label_idx`, as
 // produced by Bytecode::label_index_map(), plus a synthetic entry per
-// exception handler) computing each instruction's push/pop effect via the
-// running interpreter's own _opcode.stack_effect() — the same source of
-// truth CPython's own compiler uses — so this never needs a hand-maintained
-// per-opcode effect table and automatically tracks opcode changes across
-// versions.
+// exception handler), each summarised once by its net and peak effect,
+// computing each instruction's push/pop effect from a
+// table sampled at build time from the running interpreter's own
+// _opcode.stack_effect() — the same source of truth CPython's own compiler
+// uses — falling back to calling it for opcodes/opargs the table doesn't
+// cover. So this never needs a hand-maintained per-opcode effect table and
+// automatically tracks opcode changes across versions.
 //
 // Every jump instruction's arg must already be a Label (as from_code()
 // guarantees, and as new_label()-based hand-built jumps naturally are).
@@ -28,12 +31,17 @@
 // (>= 0) depth — e.g. those from_code() decoded from a real exception
 // table — are left untouched and used as given.
 //
+// With `depths`, also fills it with the depth each instruction is entered
+// at, or STACK_DEPTH_UNREACHABLE for those no path reaches.
+//
 // Returns -1 with a Python exception set on failure (unresolved label, a
 // jump with a raw int arg, or an EXC_DEPTH_AUTO entry whose start_lbl is
 // unreachable from normal control flow).
+constexpr int STACK_DEPTH_UNREACHABLE = -1;
+
 int compute_stacksize(const std::vector<Instr>& instrs,
-                      const std::unordered_map<int, size_t>& label_idx
+                      const LabelIndex& label_idx
 #if HAS_EXCEPTION_TABLE
                       , std::vector<ExcEntryL>& exc_labeled
 #endif
-                      );
+                      , std::vector<int>* depths = nullptr);
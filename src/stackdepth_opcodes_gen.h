@@ -0,0 +1,106 @@
+// Auto-generated for CPython 3.11
+static inline bool opcode_has_arg(uint8_t op) noexcept {
+    switch (op) {
+    case 90: return true;
+    case 91: return true;
+    case 92: return true;
+    case 93: return true;
+    case 94: return true;
+    case 95: return true;
+    case 96: return true;
+    case 97: return true;
+    case 98: return true;
+    case 99: return true;
+    case 100: return true;
+    case 101: return true;
+    case 102: return true;
+    case 103: return true;
+    case 104: return true;
+    case 105: return true;
+    case 106: return true;
+    case 107: return true;
+    case 108: return true;
+    case 109: return true;
+    case 110: return true;
+    case 111: return true;
+    case 112: return true;
+    case 114: return true;
+    case 115: return true;
+    case 116: return true;
+    case 117: return true;
+    case 118: return true;
+    case 119: return true;
+    case 120: return true;
+    case 122: return true;
+    case 123: return true;
+    case 124: return true;
+    case 125: return true;
+    case 126: return true;
+    case 128: return true;
+    case 129: return true;
+    case 130: return true;
+    case 131: return true;
+    case 132: return true;
+    case 133: return true;
+    case 134: return true;
+    case 135: return true;
+    case 136: return true;
+    case 137: return true;
+    case 138: return true;
+    case 139: return true;
+    case 140: return true;
+    case 142: return true;
+    case 144: return true;
+    case 145: return true;
+    case 146: return true;
+    case 147: return true;
+    case 148: return true;
+    case 149: return true;
+    case 151: return true;
+    case 152: return true;
+    case 155: return true;
+    case 156: return true;
+    case 157: return true;
+    case 160: return true;
+    case 162: return true;
+    case 163: return true;
+    case 164: return true;
+    case 165: return true;
+    case 166: return true;
+    case 171: return true;
+    case 172: return true;
+    case 173: return true;
+    case 174: return true;
+    case 175: return true;
+    case 176: return true;
+    default: return false;
+    }
+}
+static inline bool is_unconditional_jump(uint8_t op) noexcept {
+    switch (op) {
+    case 110: return true;
+    case 134: return true;
+    case 140: return true;
+    default: return false;
+    }
+}
+static inline bool is_scope_exit(uint8_t op) noexcept {
+    switch (op) {
+    case 83: return true;
+    case 119: return true;
+    case 130: return true;
+    default: return false;
+    }
+}
+static constexpr uint8_t POP_TOP_OPCODE = 1;
+static inline bool is_stackdepth_neutral(uint8_t op) noexcept {
+    switch (op) {
+    case 75: return true;
+    default: return false;
+    }
+}
+static inline bool is_internal_opcode(uint8_t op) noexcept {
+    switch (op) {
+    default: return false;
+    }
+}
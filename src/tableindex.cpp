@@ -0,0 +1,182 @@
+#include "tableindex.h"
+
+#include <cmath>
+#include <cstring>
+
+void TableIndex::invalidate() noexcept
+{
+    by_hash_.clear();
+    unhashable_.clear();
+    snapshot_.clear();
+    list_    = nullptr;
+    exposed_ = true;
+}
+
+void TableIndex::index_item(Py_ssize_t i, PyObject* item)
+{
+    Py_hash_t h = PyObject_Hash(item);
+    if (h == -1 && PyErr_Occurred()) {
+        PyErr_Clear();
+        unhashable_.push_back(i);
+    } else {
+        by_hash_.emplace(h, i);
+    }
+    snapshot_.push_back(item);
+}
+
+void TableIndex::sync(PyObject* lst)
+{
+    Py_ssize_t n = PyList_GET_SIZE(lst);
+    Py_ssize_t indexed = static_cast<Py_ssize_t>(snapshot_.size());
+
+    // A list only the Bytecode references can't have changed since the last
+    // lookup without it knowing; one held elsewhere can have, in place.
+    bool shared = Py_REFCNT(lst) > 1 && !(in_batch_ && batch_verified_);
+    bool rebuild = lst != list_ || n < indexed;
+    if (!rebuild && (exposed_ || shared) && indexed > 0) {
+        PyObject** items = reinterpret_cast<PyListObject*>(lst)->ob_item;
+        rebuild = std::memcmp(items, snapshot_.data(),
+                              static_cast<size_t>(indexed) * sizeof(PyObject*)) != 0;
+    }
+    batch_verified_ = in_batch_;
+    if (rebuild) {
+        invalidate();
+        list_   = lst;
+        indexed = 0;
+        by_hash_.reserve(static_cast<size_t>(n));
+        snapshot_.reserve(static_cast<size_t>(n));
+    }
+    exposed_ = false;
+
+    for (Py_ssize_t i = indexed; i < n; ++i)
+        index_item(i, PyList_GET_ITEM(lst, i));
+}
+
+// Whether a and b can share a co_consts slot: the same type all the way down
+// through tuples and frozensets, and for floats and complex numbers the same
+// sign of zero, so that -0.0 isn't merged into 0.0 nor (1.0,) into (1,). This
+// is the line CPython's _PyCode_ConstantKey draws. -1 with an exception set on
+// error.
+static int same_constant(PyObject* a, PyObject* b)
+{
+    if (a == b) return 1;
+    if (Py_TYPE(a) != Py_TYPE(b)) return 0;
+    if (PyFloat_CheckExact(a)) {
+        double x = PyFloat_AS_DOUBLE(a), y = PyFloat_AS_DOUBLE(b);
+        return x == y && std::signbit(x) == std::signbit(y);
+    }
+    if (PyComplex_CheckExact(a)) {
+        Py_complex x = PyComplex_AsCComplex(a), y = PyComplex_AsCComplex(b);
+        return x.real == y.real && x.imag == y.imag
+            && std::signbit(x.real) == std::signbit(y.real)
+            && std::signbit(x.imag) == std::signbit(y.imag);
+    }
+    if (PyTuple_CheckExact(a)) {
+        Py_ssize_t n = PyTuple_GET_SIZE(a);
+        if (PyTuple_GET_SIZE(b) != n) return 0;
+        for (Py_ssize_t i = 0; i < n; ++i) {
+            int same = same_constant(PyTuple_GET_ITEM(a, i), PyTuple_GET_ITEM(b, i));
+            if (same != 1) return same;
+        }
+        return 1;
+    }
+    if (PyFrozenSet_CheckExact(a)) {
+        // Equal sets whose items pair up one to one; the constant sets the
+        // compiler makes for `x in {...}` are small, so pairing is quadratic.
+        int eq = PyObject_RichCompareBool(a, b, Py_EQ);
+        if (eq != 1) return eq;
+        PyObject* ita = PyObject_GetIter(a);
+        if (!ita) return -1;
+        int result = 1;
+        while (result == 1) {
+            PyObject* x = PyIter_Next(ita);
+            if (!x) { if (PyErr_Occurred()) result = -1; break; }
+            PyObject* itb = PyObject_GetIter(b);
+            if (!itb) { Py_DECREF(x); result = -1; break; }
+            result = 0;
+            while (PyObject* y = PyIter_Next(itb)) {
+                result = same_constant(x, y);
+                Py_DECREF(y);
+                if (result != 0) break;
+            }
+            if (result == 0 && PyErr_Occurred()) result = -1;
+            Py_DECREF(itb);
+            Py_DECREF(x);
+        }
+        Py_DECREF(ita);
+        return result;
+    }
+    return PyObject_RichCompareBool(a, b, Py_EQ);
+}
+
+bool TableIndex::matches(PyObject* item, PyObject* obj) const
+{
+    if (item == obj) return true;
+    int eq = strict_ ? same_constant(item, obj) : PyObject_RichCompareBool(item, obj, Py_EQ);
+    if (eq < 0) { PyErr_Clear(); return false; }
+    return eq != 0;
+}
+
+// The plain linear scan, for values that can't be hashed.
+Py_ssize_t TableIndex::scan(PyObject* lst, PyObject* obj) const
+{
+    Py_ssize_t n = PyList_GET_SIZE(lst);
+    for (Py_ssize_t i = 0; i < n; ++i)
+        if (matches(PyList_GET_ITEM(lst, i), obj)) return i;
+    return -1;
+}
+
+// Lowest matching index among the candidates the index knows about. Sets
+// `stale` if a candidate's slot no longer holds the object it was indexed
+// from, in which case the result is meaningless and the caller must rebuild.
+Py_ssize_t TableIndex::lookup(PyObject* lst, PyObject* obj, bool& stale)
+{
+    stale = false;
+    Py_ssize_t best = -1;
+
+    auto consider = [&](Py_ssize_t i) {
+        if (best >= 0 && i > best) return;
+        PyObject* item = PyList_GET_ITEM(lst, i);
+        if (item != snapshot_[static_cast<size_t>(i)]) { stale = true; return; }
+        if (matches(item, obj)) best = i;
+    };
+
+    Py_hash_t h = PyObject_Hash(obj);
+    if (h == -1 && PyErr_Occurred()) {
+        PyErr_Clear();
+        return scan(lst, obj);
+    }
+    auto [lo, hi] = by_hash_.equal_range(h);
+    for (auto it = lo; it != hi && !stale; ++it) consider(it->second);
+    for (size_t k = 0; k < unhashable_.size() && !stale; ++k) consider(unhashable_[k]);
+    return best;
+}
+
+Py_ssize_t TableIndex::find(PyObject* lst, PyObject* obj)
+{
+    sync(lst);
+    bool stale;
+    Py_ssize_t i = lookup(lst, obj, stale);
+    if (stale) {
+        invalidate();
+        sync(lst);
+        i = lookup(lst, obj, stale);
+    }
+    return i;
+}
+
+Py_ssize_t TableIndex::find_or_add(PyObject* lst, PyObject* obj)
+{
+    Py_ssize_t i = find(lst, obj);
+    if (i >= 0) return i;
+
+    Py_ssize_t n = PyList_GET_SIZE(lst);
+    if (PyList_Append(lst, obj) < 0) return -1;
+    // An __eq__ run by the lookup could have edited the list behind our back;
+    // only extend the index if it is still exactly in step.
+    if (static_cast<Py_ssize_t>(snapshot_.size()) == n)
+        index_item(n, obj);
+    else
+        invalidate();
+    return n;
+}
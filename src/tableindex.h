@@ -0,0 +1,84 @@
+#pragma once
+
+#include "compat.h"
+
+#include <vector>
+#include <unordered_map>
+
+// ── TableIndex ───────────────────────────────────────────────────────────────
+// Hash index over one of a Bytecode's mutable table lists (consts, names,
+// varnames), so interning a value is O(1) amortized rather than a linear scan
+// with a rich comparison per entry.
+//
+// The lists themselves stay plain Python lists that callers may mutate
+// freely, so the index never trusts itself blindly:
+//   - a different list object, or one that got shorter, is re-indexed from
+//     scratch;
+//   - entries appended since the last lookup are indexed incrementally;
+//   - every hit is checked against the item pointer it was indexed from, and
+//     a mismatch (an in-place replacement) triggers a rebuild;
+//   - while anything besides the Bytecode holds the list, or once it has been
+//     handed out to Python (mark_exposed()), a lookup first compares the whole
+//     item-pointer snapshot with a single memcmp, which is what catches an
+//     in-place replacement that would otherwise only show up as a miss. A
+//     Batch of lookups with no Python code run in between (one encode) makes
+//     that comparison once, not once per lookup.
+//
+// Lookups return the *lowest* matching index, exactly like the linear scan
+// they replace. Unhashable values are kept on a side list that is scanned
+// linearly; looking up an unhashable value falls back to a full scan.
+//
+// With `type_strict`, a match additionally requires the same type, down
+// through tuples and frozensets, and the same sign of zero, so 0 and False (or
+// 1 and 1.0, or 0.0 and -0.0, or (1,) and (1.0,)) stay distinct constants.
+class TableIndex {
+public:
+    explicit TableIndex(bool type_strict) noexcept : strict_(type_strict) {}
+
+    // Index of obj in lst, or -1 if absent. Never sets a Python exception.
+    Py_ssize_t find(PyObject* lst, PyObject* obj);
+
+    // Index of obj in lst, appending it first if absent. Returns -1 with a
+    // Python exception set if the append fails.
+    Py_ssize_t find_or_add(PyObject* lst, PyObject* obj);
+
+    // Forget everything; the next lookup re-indexes from scratch.
+    void invalidate() noexcept;
+
+    // The list has been handed to Python code, which may hold on to it and
+    // edit it in place; verify the snapshot on the next lookup.
+    void mark_exposed() noexcept { exposed_ = true; }
+
+    // Lookups made while a Batch is alive verify the snapshot of a shared
+    // list only the first time. Only for lookups that run no Python code in
+    // between, other than the values' own __hash__ and __eq__.
+    class Batch {
+    public:
+        explicit Batch(TableIndex& index) noexcept : index_(index) {
+            index_.in_batch_ = true;
+            index_.batch_verified_ = false;
+        }
+        ~Batch() { index_.in_batch_ = false; }
+        Batch(const Batch&) = delete;
+        Batch& operator=(const Batch&) = delete;
+
+    private:
+        TableIndex& index_;
+    };
+
+private:
+    void sync(PyObject* lst);
+    void index_item(Py_ssize_t i, PyObject* item);
+    bool matches(PyObject* item, PyObject* obj) const;
+    Py_ssize_t lookup(PyObject* lst, PyObject* obj, bool& stale);
+    Py_ssize_t scan(PyObject* lst, PyObject* obj) const;
+
+    std::unordered_multimap<Py_hash_t, Py_ssize_t> by_hash_;
+    std::vector<Py_ssize_t> unhashable_;
+    std::vector<PyObject*>  snapshot_;   // borrowed; compared, never dereferenced
+    PyObject* list_    = nullptr;        // borrowed; identity only
+    bool      strict_;
+    bool      exposed_ = true;
+    bool      in_batch_ = false;
+    bool      batch_verified_ = false;
+};
@@ -88,6 +88,75 @@ def test_add_varname():
     assert bc.varnames[idx] == "x"  # already there
 
 
+def test_add_const_is_type_strict():
+    # 0 == False and 1 == True, but they are distinct constants.
+    bc = Bytecode()
+    indices = [bc.add_const(v) for v in (0, False, 1, True, 1.0, 0, True)]
+    assert indices == [0, 1, 2, 3, 4, 0, 3]
+    assert [type(c) for c in bc.consts] == [int, bool, int, bool, float]
+
+
+def test_add_const_is_strict_inside_containers_and_about_zero():
+    bc = Bytecode()
+    values = (0.0, -0.0, 0j, complex(0, -0.0), (1,), (1.0,), (True,), (0.0,), (-0.0,), frozenset({1}), frozenset({1.0}))
+    indices = [bc.add_const(v) for v in values]
+    assert indices == list(range(len(values)))
+    assert [bc.add_const(v) for v in (-0.0, (1.0,), (-0.0,), frozenset({1.0}))] == [1, 5, 8, 10]
+
+
+def test_add_const_unhashable():
+    bc = Bytecode()
+    a, b = bc.add_const([1, 2]), bc.add_const({"k": 1})
+    assert (a, b) == (0, 1)
+    assert bc.add_const([1, 2]) == 0
+    assert bc.add_const({"k": 1}) == 1
+    assert bc.add_const((1, [2])) == 2
+    assert bc.add_const((1, [2])) == 2
+
+
+def test_add_const_sees_edits_to_the_list():
+    bc = Bytecode()
+    for i in range(100):
+        assert bc.add_const(f"c{i}") == i
+
+    # Appending, replacing in place, and replacing the list outright are all
+    # picked up by the next lookup.
+    bc.consts.append("tail")
+    assert bc.add_const("tail") == 100
+    consts = bc.consts
+    consts[5] = "replaced"
+    assert bc.add_const("replaced") == 5
+    assert bc.add_const("c5") == 101
+    del consts[:50]
+    assert bc.add_const("c60") == 10
+    bc.consts = ["x", "c60"]
+    assert bc.add_const("c60") == 1
+
+
+def test_held_consts_edited_between_encodes():
+    bc = Bytecode()
+    consts = bc.consts
+    bc.instrs = [Instr(LOAD_CONST, "a"), Instr(RETURN_VALUE)]
+    assert bc.to_code().co_consts == ("a",)
+
+    # The list was fetched before the encode, and is edited without going
+    # through bc.consts again.
+    consts[0] = "z"
+    bc.instrs[0].arg = "z"
+    assert bc.to_code().co_consts == ("z",)
+    consts[0] = "y"
+    assert bc.add_const("y") == 0
+    assert bc.consts == ["y"]
+
+
+def test_add_name_many():
+    bc = Bytecode()
+    names = [f"name_{i}" for i in range(5000)]
+    assert [bc.add_name(n) for n in names] == list(range(5000))
+    assert [bc.add_name(n) for n in reversed(names)] == list(reversed(range(5000)))
+    assert bc.names == names
+
+
 # ── LOAD_CONST with new value ─────────────────────────────────────────────────
 
 
@@ -186,6 +255,48 @@ def test_add_new_local_and_store():
     assert new_fn(42) == 42
 
 
+def test_new_local_shifts_cells():
+    """A local added by an Instr argument moves every cell after it."""
+
+    def f(x):
+        a = x + 1
+        b = x + 2
+
+        def g():
+            return a * 10 + b
+
+        return g()
+
+    bc = Bytecode.from_code(f.__code__)
+    bc.instrs.insert(0, Instr(STORE_FAST, "tmp"))
+    bc.instrs.insert(0, Instr(LOAD_CONST, 100))
+
+    co = bc.to_code()
+    assert "tmp" in co.co_varnames
+    new_fn = types.FunctionType(co, f.__globals__)
+    assert new_fn(1) == 23
+
+
+def test_many_locals_and_cells_round_trip():
+    n = 300
+    lines = ["def outer():"]
+    lines += [f"    l{i} = {i}" for i in range(n)]
+    lines += [f"    c{i} = {i}" for i in range(n)]
+    lines.append("    def inner():")
+    lines.append("        return " + " + ".join(f"c{i}" for i in range(n)))
+    lines.append("    return inner() + " + " + ".join(f"l{i}" for i in range(n)))
+    ns = {}
+    # Too many locals to write out by hand; the source is built right above.
+    exec("\n".join(lines), ns)  # noqa: S102
+    outer = ns["outer"]
+
+    co = Bytecode.from_code(outer.__code__).to_code()
+    assert co.co_code == outer.__code__.co_code
+    assert co.co_varnames == outer.__code__.co_varnames
+    assert co.co_cellvars == outer.__code__.co_cellvars
+    assert types.FunctionType(co, ns)() == 2 * sum(range(n))
+
+
 if __name__ == "__main__":
     test_consts_exposed()
     test_varnames_exposed()
@@ -199,4 +310,6 @@ if __name__ == "__main__":
     test_load_fast_abstract()
     test_store_fast_abstract()
     test_add_new_local_and_store()
+    test_new_local_shifts_cells()
+    test_many_locals_and_cells_round_trip()
     print(f"All abstract API tests passed (Python {sys.version})")
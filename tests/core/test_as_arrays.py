@@ -0,0 +1,159 @@
+"""Tests for Bytecode.as_arrays(): the instruction stream as array columns."""
+
+import array
+import dis
+import sys
+
+from spasm import _core
+
+Bytecode = _core.Bytecode
+Instr = _core.Instr
+Label = _core.Label
+
+
+def f(x):
+    total = 0
+    for i in range(x):
+        if i % 3:
+            total += len(str(i))
+    return total
+
+
+def test_columns_match_instrs():
+    bc = Bytecode.from_code(f.__code__)
+    cols = bc.as_arrays()
+    assert isinstance(cols, _core.InstrArrays)
+    assert [c.typecode for c in cols] == ["B", "i", "i", "i", "B"]
+    n = len(bc.instrs)
+    assert all(len(c) == n for c in cols)
+
+    positions = bc.label_positions()
+    for i, instr in enumerate(bc.instrs):
+        assert cols.op[i] == instr.op
+        assert cols.lineno[i] == instr.lineno
+        if isinstance(instr.arg, Label):
+            assert cols.arg[i] == -1
+            assert cols.target[i] == positions[instr.arg]
+        else:
+            assert cols.target[i] == -1
+        if isinstance(instr.arg, int) and dis.opname[instr.op] != "LOAD_CONST":
+            assert cols.arg[i] == instr.arg
+
+
+def test_object_args_resolve_to_table_indices():
+    bc = Bytecode.from_code(f.__code__)
+    cols = bc.as_arrays()
+    co = f.__code__
+    for i, instr in enumerate(bc.instrs):
+        name = dis.opname[instr.op]
+        if name == "LOAD_CONST":
+            assert co.co_consts[cols.arg[i]] is instr.arg
+        elif name in ("LOAD_FAST", "STORE_FAST"):
+            assert co.co_varnames[cols.arg[i]] == instr.arg
+
+
+def test_objects_in_no_table_are_minus_one():
+    bc = Bytecode.from_code(f.__code__)
+    load = next(instr for instr in bc.instrs if dis.opname[instr.op] == "LOAD_FAST")
+    load.arg = "not_a_local"
+    cols = bc.as_arrays()
+    assert cols.arg[bc.instrs.index(load)] == -1
+    # Looking it up doesn't intern it.
+    assert "not_a_local" not in bc.varnames
+
+
+def test_cache_column():
+    bc = Bytecode.from_code(f.__code__)
+    cols = bc.as_arrays()
+    # Summing instructions and their caches gives back the code size.
+    assert (len(cols.op) + sum(cols.cache)) * 2 == len(f.__code__.co_code)
+
+
+def test_lazy_matches_eager_without_materialising():
+    eager = Bytecode.from_code(f.__code__).as_arrays()
+    bc = Bytecode.from_code(f.__code__, lazy=True)
+    assert bc.as_arrays() == eager
+
+
+def test_lazy_with_some_entries_materialised():
+    eager = Bytecode.from_code(f.__code__)
+    lazy = Bytecode.from_code(f.__code__, lazy=True)
+    for bc in (eager, lazy):
+        bc.instrs.insert(1, Instr("NOP"))
+        bc.instrs[3].lineno = 99
+    assert lazy.as_arrays() == eager.as_arrays()
+
+
+def test_end_labels_target_len_instrs():
+    bc = Bytecode.from_code(f.__code__)
+    end = bc.new_label()
+    bc.end_labels.append(end)
+    bc.instrs.insert(0, Instr("JUMP_FORWARD", end))
+    cols = bc.as_arrays()
+    assert cols.target[0] == len(bc.instrs)
+    assert cols.arg[0] == -1
+
+
+class _Meddler:
+    """A constant whose __eq__ empties the instructions being scanned."""
+
+    def __init__(self, bc):
+        self.bc = bc
+
+    def __hash__(self):
+        return 0
+
+    def __eq__(self, other):
+        self.bc.instrs.clear()
+        return self is other
+
+
+def test_lookups_that_edit_instrs():
+    bc = Bytecode.from_code(f.__code__)
+    n = len(bc.instrs)
+    bc.consts.append(_Meddler(bc))
+    bc.instrs.insert(0, Instr("LOAD_CONST", _Meddler(bc)))
+    cols = bc.as_arrays()
+    assert len(cols.op) == n + 1
+    assert cols.arg[0] == -1
+
+
+def test_columns_are_fresh_arrays():
+    bc = Bytecode.from_code(f.__code__)
+    cols = bc.as_arrays()
+    cols.op[0] = 0
+    cols.arg.append(7)
+    again = bc.as_arrays()
+    assert again.op[0] == bc.instrs[0].op
+    assert len(again.arg) == len(bc.instrs)
+
+
+def test_buffer_protocol():
+    cols = Bytecode.from_code(f.__code__).as_arrays()
+    view = memoryview(cols.arg)
+    assert view.format == "i" and view.itemsize == 4
+    assert view.tolist() == cols.arg.tolist()
+    assert bytes(memoryview(cols.op)) == cols.op.tobytes()
+
+
+def test_snapshot():
+    bc = Bytecode.from_code(f.__code__)
+    cols = bc.as_arrays()
+    bc.instrs.insert(0, Instr("NOP"))
+    assert len(cols.op) == len(bc.instrs) - 1
+    assert isinstance(cols.op, array.array)
+
+
+if __name__ == "__main__":
+    test_columns_match_instrs()
+    test_object_args_resolve_to_table_indices()
+    test_objects_in_no_table_are_minus_one()
+    test_cache_column()
+    test_lazy_matches_eager_without_materialising()
+    test_lazy_with_some_entries_materialised()
+    test_end_labels_target_len_instrs()
+    test_lookups_that_edit_instrs()
+    test_columns_are_fresh_arrays()
+    test_buffer_protocol()
+    test_snapshot()
+    print(f"All as_arrays tests passed (Python {sys.version})")
@@ -1,6 +1,8 @@
 """Smoke tests: round-trip a code object through from_code -> to_code."""
 
+import dis
 import sys
+import textwrap
 import types
 
 from spasm import _core
@@ -56,9 +58,81 @@ def test_round_trip_try_except():
     assert new_fn(10, 0) is None
 
 
+def test_stacksize_oparg_dependent_effects():
+    # Stack effects that vary with the oparg: wide BUILD_* counts, star
+    # unpacking past 15 leading targets, MAKE_FUNCTION flag bits, format
+    # specs and slice steps. co_stacksize has to match the compiler's on each.
+    names = ", ".join(f"a{i}" for i in range(300))
+    source = "\n".join(
+        [
+            f"t = ({names})",
+            f"d = {{{', '.join(f'{i}: a{i}' for i in range(40))}}}",
+            f"{', '.join(f'b{i}' for i in range(20))}, *rest, last = t",
+            "def g(x=1, *, y=2) -> int: return lambda z=x: z",
+            "s = f'{t!r:>{w}}' + f'{t}'",
+            "u = t[1:2:3] + t[1:2]",
+        ]
+    )
+    module = compile(source, "<oparg>", "exec")
+    function = compile("def f():\n" + textwrap.indent(source, "    "), "<oparg>", "exec").co_consts[0]
+    for co in (module, function):
+        new_co = Bytecode.from_code(co).to_code()
+        assert new_co.co_code == co.co_code
+        assert new_co.co_stacksize == co.co_stacksize
+
+
+def test_stacksize_join_reached_at_different_depths():
+    # A block reached first at a low depth and later at a higher one counts
+    # from the higher: the tail below runs at 1 or 3 and pushes one more.
+    # (Not runnable, only sized.)
+    jump_if_false = "POP_JUMP_IF_FALSE" if "POP_JUMP_IF_FALSE" in dis.opmap else "POP_JUMP_FORWARD_IF_FALSE"
+    bc = Bytecode()
+    bc.varnames = ["x"]
+    bc.argcount = 1
+    deep, tail, unused = bc.new_label(), bc.new_label(), bc.new_label()
+    instrs = [
+        _core.Instr("LOAD_FAST", "x"),
+        _core.Instr(jump_if_false, deep),
+        _core.Instr("LOAD_CONST", None),
+        _core.Instr("JUMP_FORWARD", tail),
+        *(_core.Instr("LOAD_CONST", None) for _ in range(3)),
+        _core.Instr("LOAD_CONST", None),
+        _core.Instr("RETURN_VALUE"),
+    ]
+    instrs[4].labels = [deep]
+    instrs[7].labels = [tail]
+    # A label nothing jumps to doesn't change anything.
+    instrs[5].labels = [unused]
+    bc.instrs = instrs
+    assert bc.to_code().co_stacksize == 4
+
+
+def test_round_trip_extended_arg_cascade():
+    # Nested blocks sized so that EXTENDED_ARG prefixes added to inner jumps
+    # push the jumps around them over the one-byte limit in turn, which takes
+    # the relaxation several rounds to settle. Both a loop (backward jumps)
+    # and straight-line ifs (forward jumps) at module and function level.
+    lines = []
+    for depth in range(6):
+        pad = "    " * depth
+        lines.append(f"{pad}while x{depth}:")
+        lines.append(f"{pad}    if y{depth}:")
+        lines += [f"{pad}        z = z + {k}" for k in range(24 + depth * 7)]
+    lines.append("    " * 6 + "pass")
+    source = "\n".join(lines)
+    module = compile(source, "<cascade>", "exec")
+    function = compile("def f():\n" + textwrap.indent(source, "    "), "<cascade>", "exec").co_consts[0]
+    for co in (module, function):
+        new_co = Bytecode.from_code(co).to_code()
+        assert new_co.co_code == co.co_code
+
+
 if __name__ == "__main__":
     test_version_hex()
     test_round_trip_simple()
     test_round_trip_loop()
     test_round_trip_try_except()
+    test_stacksize_oparg_dependent_effects()
+    test_stacksize_join_reached_at_different_depths()
+    test_round_trip_extended_arg_cascade()
     print(f"All tests passed (Python {sys.version})")
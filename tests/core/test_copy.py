@@ -0,0 +1,114 @@
+"""Tests for Bytecode.copy() and Bytecode.copy_into()."""
+
+import gc
+import types
+import weakref
+
+import pytest
+
+from spasm import _core
+
+Bytecode = _core.Bytecode
+Instr = _core.Instr
+Label = _core.Label
+
+
+def f(x):
+    try:
+        for i in range(x):
+            if i % 2:
+                x += i
+    except ValueError:
+        return -1
+    return x
+
+
+def _label_ids(bc_or_instrs):
+    instrs = bc_or_instrs.instrs if isinstance(bc_or_instrs, Bytecode) else bc_or_instrs
+    ids = set()
+    for instr in instrs:
+        ids.update(label.id for label in instr.labels)
+        if isinstance(instr.arg, Label):
+            ids.add(instr.arg.id)
+    return ids
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_copy_is_independent_and_runs(lazy):
+    bc = Bytecode.from_code(f.__code__, lazy=lazy)
+    copy = bc.copy()
+    assert copy is not bc
+    assert [instr.op for instr in copy.instrs] == [instr.op for instr in bc.instrs]
+    assert all(a is not b for a, b in zip(copy.instrs, bc.instrs, strict=True))
+    assert all(a is not b for a, b in zip(copy.exc_entries, bc.exc_entries, strict=True))
+    assert copy.consts == bc.consts and copy.consts is not bc.consts
+    assert (copy.name, copy.qualname, copy.argcount, copy.flags) == (bc.name, bc.qualname, bc.argcount, bc.flags)
+
+    copy.instrs[0].lineno = 12345
+    copy.consts.append("extra")
+    assert bc.instrs[0].lineno != 12345
+    assert "extra" not in bc.consts
+    assert types.FunctionType(copy.to_code(), {})(5) == f(5)
+
+
+def test_copy_label_offset():
+    bc = Bytecode.from_code(f.__code__)
+    copy = bc.copy(label_offset=1000)
+    assert _label_ids(copy) == {i + 1000 for i in _label_ids(bc)}
+    assert {e.handler.id for e in copy.exc_entries} == {e.handler.id + 1000 for e in bc.exc_entries}
+    # New labels in the copy don't collide with the shifted ones.
+    assert copy.new_label().id not in _label_ids(copy)
+    assert types.FunctionType(copy.to_code(), {})(5) == f(5)
+    with pytest.raises(ValueError):
+        bc.copy(label_offset=-1)
+
+
+def test_copy_into_renumbers_into_the_target():
+    bc = Bytecode.from_code(f.__code__)
+    target = Bytecode.from_code(f.__code__)
+    instrs, exc_entries, end_labels = bc.copy_into(target)
+    ids = _label_ids(instrs)
+    assert len(ids) == len(_label_ids(bc))
+    assert ids.isdisjoint(_label_ids(target))
+    assert len(exc_entries) == len(bc.exc_entries)
+    assert {label.id for e in exc_entries for label in (e.start, e.stop, e.handler)} <= ids
+    assert end_labels == []
+    # A second copy gets labels of its own.
+    again = bc.copy_into(target)[0]
+    assert _label_ids(again).isdisjoint(ids)
+    assert target.new_label().id not in ids | _label_ids(again)
+    with pytest.raises(TypeError):
+        bc.copy_into([])
+
+
+def test_copy_into_shares_label_objects_with_the_target():
+    bc = Bytecode([Instr("NOP"), Instr("JUMP_FORWARD", Label(7))])
+    bc.end_labels = [Label(7)]
+    target = Bytecode()
+    instrs, _, end_labels = bc.copy_into(target)
+    assert instrs[1].arg is end_labels[0]
+    assert end_labels[0].id != 7
+
+
+def test_lazy_copy_creates_no_instrs_and_keeps_no_code():
+    ns = {}
+    exec(compile("def g(x):\n    return [x, 'k', x + 1]\n", "<g>", "exec"), ns)  # noqa: S102
+    code = ns.pop("g").__code__
+    bc = Bytecode.from_code(code, lazy=True)
+    bc.instrs[1].lineno = 99  # one materialized entry
+    copy = bc.copy(label_offset=3)
+    assert isinstance(copy.instrs, _core.InstrList)
+    assert copy.instrs[1].lineno == 99 and copy.instrs[1] is not bc.instrs[1]
+    detached = Bytecode.from_code(code).copy(lazy=True)
+    again = detached.copy(lazy=False)
+    assert isinstance(again.instrs, list)
+
+    ref = weakref.ref(code)
+    del code, bc
+    gc.collect()
+    assert ref() is not None  # copy shares the lazy decode's code object
+    del copy
+    gc.collect()
+    assert ref() is None
+    assert types.FunctionType(detached.to_code(), {})(1) == [1, "k", 2]
+    assert types.FunctionType(again.to_code(), {})(1) == [1, "k", 2]
@@ -143,3 +143,86 @@ def test_instr_still_accepts_int_opcode():
     op = dis.opmap["LOAD_FAST"]
     i = Instr(op, "x")
     assert i.op == op
+
+
+def test_instr_constructor_arguments():
+    label = _core.Label(7)
+    i = Instr("LOAD_FAST", "x", end_col=6, lineno=3, col_offset=5, end_lineno=4, labels=[label])
+    assert (i.op, i.arg) == (dis.opmap["LOAD_FAST"], "x")
+    assert (i.lineno, i.end_lineno, i.col_offset, i.end_col) == (3, 4, 5, 6)
+    assert i.labels == [label]
+    assert Instr("NOP", arg=2).arg == 2
+    assert Instr(op="NOP").op == dis.opmap["NOP"]
+    assert Instr("NOP", lineno=True).lineno == 1
+    assert Instr("NOP", labels=(label,)).labels == [label]
+    for args, kwargs, exc in [
+        ((), {}, TypeError),
+        (("NOP", 1, 2, 3, 4, 5, (), 6), {}, TypeError),
+        (("NOP",), {"lineno": "3"}, TypeError),
+        (("NOP",), {"lineno": 2**40}, OverflowError),
+        (("NOP",), {"bogus": 1}, TypeError),
+        (("NOP",), {"labels": [1]}, TypeError),
+        (("NOP",), {"labels": None}, TypeError),
+        ((256,), {}, ValueError),
+    ]:
+        try:
+            Instr(*args, **kwargs)
+        except exc:
+            pass
+        else:
+            raise AssertionError(f"expected {exc.__name__} from Instr(*{args}, **{kwargs})")
+
+
+def test_instr_opnames_resolve_every_time():
+    # Interned names are remembered by identity; that must not confuse them.
+    for _ in range(2):
+        for name, op in dis.opmap.items():
+            if op < 256:  # not the pseudo-instructions of 3.12+
+                assert Instr(name).op == op
+    fresh = "".join(["LOAD_", "FAST"])
+    assert Instr(fresh).op == dis.opmap["LOAD_FAST"]
+    for _ in range(2):
+        try:
+            Instr("NOT_A_REAL_OPCODE")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+
+
+def test_label_constructor():
+    assert _core.Label(3).id == 3
+    assert _core.Label(-(2**31)).id == -(2**31)
+    assert _core.Label(True).id == 1
+    for args in [(), ("3",), (2**40,), (1, 2)]:
+        try:
+            _core.Label(*args)
+        except (TypeError, OverflowError):
+            pass
+        else:
+            raise AssertionError(f"expected an error from Label(*{args})")
+
+
+def test_instr_arg_reads_back_as_given():
+    # Small ints are kept inline rather than as objects; that must not show.
+    for arg in (0, 7, -1, 2**31, -(2**31) - 1, 2**80, True, "x", None, 1.5):
+        i = Instr("NOP", arg)
+        assert i.arg == arg and type(i.arg) is type(arg)
+    i = Instr("NOP")
+    assert i.arg == 0 and i.labels == []
+    # The labels list is made on first read, and is the same list from then on.
+    assert i.labels is i.labels
+
+
+def test_int_arg_is_the_constant_under_load_const():
+    def returning(instr):
+        instrs = [Instr("RESUME", 0)] if sys.version_info >= (3, 11) else []
+        bc = Bytecode([*instrs, instr, Instr("RETURN_VALUE")])
+        return types.FunctionType(bc.to_code(), {})()
+
+    assert returning(Instr("LOAD_CONST", 12345)) == 12345
+    assert returning(Instr("LOAD_CONST")) == 0
+    # An int given before the op was LOAD_CONST becomes the constant too.
+    i = Instr("NOP", 12345)
+    i.op = "LOAD_CONST"
+    assert returning(i) == 12345 and type(i.arg) is int
@@ -113,3 +113,38 @@ def test_line_table_survives_repeated_round_trips():
     )
     once = check(co)
     check(once)
+
+
+@pytest.mark.skipif(PY < (3, 11), reason="3.11+ location table")
+def test_line_only_positions_share_entries():
+    # Instr(lineno=n) leaves the end line unset, and a decoded line-only
+    # instruction has it equal to the line. Both encode to the same entry, so
+    # they must not split a run: 8 NOPs on one line take a single entry.
+    bc = Bytecode()
+    bc.firstlineno = 1
+    nops = [Instr("NOP", lineno=2) for _ in range(8)]
+    for instr in nops[1::2]:
+        instr.end_lineno = 2
+    bc.instrs = [
+        Instr("RESUME", 0, lineno=1),
+        *nops,
+        Instr("LOAD_CONST", None, lineno=3),
+        Instr("RETURN_VALUE", lineno=3),
+    ]
+    co = bc.to_code()
+    assert len(co.co_linetable) == 2 + 2 + 2
+    assert [lineno for _, _, lineno in co.co_lines()] == [1, 2, 3]
+
+
+@pytest.mark.skipif(PY < (3, 11), reason="3.11+ location table")
+def test_columns_without_an_end_line():
+    bc = Bytecode(
+        [
+            Instr("RESUME", 0, lineno=1),
+            Instr("LOAD_CONST", None, lineno=1, col_offset=4, end_col=9),
+            Instr("RETURN_VALUE", lineno=1, col_offset=4, end_col=9),
+        ]
+    )
+    bc.firstlineno = 1
+    co = bc.to_code()
+    assert list(co.co_positions())[1:] == [(1, 1, 4, 9), (1, 1, 4, 9)]
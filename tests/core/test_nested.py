@@ -0,0 +1,135 @@
+"""Tests for from_code(recursive=True): nested code objects decoded as
+Bytecode constants, and rebuilt bottom-up by to_code()."""
+
+import dis
+import sys
+import types
+
+from spasm import _core
+
+Bytecode = _core.Bytecode
+Instr = _core.Instr
+
+SOURCE = """
+def outer(a):
+    def inner(b):
+        return [x * b for x in range(a)]
+    return inner(2), (lambda: a)()
+
+class K:
+    def m(self):
+        return 1
+
+result = outer(3), K().m()
+"""
+
+
+def _module_code():
+    return compile(SOURCE, "<nested>", "exec")
+
+
+def _exec(co):
+    ns = {}
+    exec(co, ns)  # noqa: S102
+    return ns["result"]
+
+
+def _walk(bc):
+    yield bc
+    for c in bc.consts:
+        if isinstance(c, Bytecode):
+            yield from _walk(c)
+
+
+def test_nested_code_becomes_bytecode():
+    for lazy in (False, True):
+        bc = Bytecode.from_code(_module_code(), recursive=True, lazy=lazy)
+        assert not any(isinstance(c, types.CodeType) for b in _walk(bc) for c in b.consts)
+        names = {b.name for b in _walk(bc)}
+        assert {"<module>", "outer", "inner", "<lambda>", "K", "m"} <= names
+        # The instructions that load nested code load the same Bytecode.
+        for b in _walk(bc):
+            for instr in b.instrs:
+                if isinstance(instr.arg, types.CodeType):
+                    raise AssertionError(f"{b.name} still loads a code object")
+                if isinstance(instr.arg, Bytecode):
+                    assert any(instr.arg is c for c in b.consts)
+
+
+def test_recursive_round_trip():
+    co = _module_code()
+    for lazy in (False, True):
+        new = Bytecode.from_code(co, recursive=True, lazy=lazy).to_code()
+        assert new.co_code == co.co_code
+        assert _exec(new) == _exec(co)
+        nested = [c for c in new.co_consts if isinstance(c, types.CodeType)]
+        assert [c.co_name for c in nested] == [c.co_name for c in co.co_consts if isinstance(c, types.CodeType)]
+
+
+def test_non_recursive_leaves_code_objects():
+    bc = Bytecode.from_code(_module_code())
+    assert any(isinstance(c, types.CodeType) for c in bc.consts)
+
+
+def test_only_changed_subtrees_are_rebuilt():
+    bc = Bytecode.from_code(_module_code(), recursive=True)
+    co = bc.to_code()
+    assert bc.to_code() is co
+
+    outer = next(b for b in _walk(bc) if b.name == "outer")
+    k = next(b for b in _walk(bc) if b.name == "K")
+    k_code = next(c for c in co.co_consts if getattr(c, "co_name", None) == "K")
+    inner = next(b for b in _walk(outer) if b.name == "inner")
+
+    inner.instrs.insert(1, Instr("NOP", lineno=inner.firstlineno))
+    new = bc.to_code()
+    assert new is not co
+    assert any(c is k_code for c in new.co_consts)
+    assert _exec(new) == _exec(co)
+
+    new_outer = next(c for c in new.co_consts if getattr(c, "co_name", None) == "outer")
+    new_inner = next(c for c in new_outer.co_consts if getattr(c, "co_name", None) == "inner")
+    assert dis.opmap["NOP"] in new_inner.co_code[::2]
+    assert bc.to_code() is new
+    assert k.to_code() is k_code
+
+
+def test_bytecode_added_as_const():
+    def f():
+        return None
+
+    def g():
+        return 42
+
+    bc = Bytecode.from_code(f.__code__)
+    child = Bytecode.from_code(g.__code__)
+    load = next(instr for instr in bc.instrs if instr.arg is None)
+    load.arg = child
+    co = bc.to_code()
+    assert isinstance(co.co_consts[bc.consts.index(child)], types.CodeType)
+    built = types.FunctionType(co, {})()
+    assert types.FunctionType(built, {})() == 42
+
+
+def test_bytecode_cycle_raises():
+    def f():
+        return None
+
+    bc = Bytecode.from_code(f.__code__)
+    bc.add_const(bc)
+    try:
+        bc.to_code()
+    except RecursionError:
+        pass
+    else:
+        raise AssertionError("expected RecursionError")
+
+
+if __name__ == "__main__":
+    test_nested_code_becomes_bytecode()
+    test_recursive_round_trip()
+    test_non_recursive_leaves_code_objects()
+    test_only_changed_subtrees_are_rebuilt()
+    test_bytecode_added_as_const()
+    test_bytecode_cycle_raises()
+    print(f"All nested code tests passed (Python {sys.version})")
@@ -0,0 +1,139 @@
+"""Tests for Pattern / Step and Bytecode.find_pattern()."""
+
+import dis
+import time
+
+import pytest
+
+from spasm import _core
+
+Bytecode = _core.Bytecode
+Instr = _core.Instr
+Pattern = _core.Pattern
+Step = _core.Step
+
+
+def _bc(*names):
+    return Bytecode([Instr(name) for name in names])
+
+
+def test_step_defaults_and_ops():
+    step = Step("NOP")
+    assert step.ops == {dis.opmap["NOP"]}
+    assert (step.min_count, step.max_count, step.unlabeled, step.capture) == (1, 1, False, None)
+    assert Step().ops == frozenset(range(256))
+    assert Step(["NOP", dis.opmap["POP_TOP"]], max_count=None).ops == {dis.opmap["NOP"], dis.opmap["POP_TOP"]}
+    assert Step("NOP", max_count=None).max_count is None
+
+
+@pytest.mark.parametrize(
+    "kwargs, exc",
+    [
+        ({"ops": "NOT_AN_OPCODE"}, ValueError),
+        ({"ops": []}, ValueError),
+        ({"ops": "NOP", "min_count": 2, "max_count": 1}, ValueError),
+        ({"ops": "NOP", "min_count": -1}, ValueError),
+        ({"ops": "NOP", "max_count": 0}, ValueError),
+        ({"ops": "NOP", "capture": 1}, TypeError),
+    ],
+)
+def test_step_rejects_bad_arguments(kwargs, exc):
+    with pytest.raises(exc):
+        Step(**kwargs)
+
+
+def test_pattern_validation():
+    with pytest.raises(ValueError):
+        Pattern([])
+    with pytest.raises(TypeError):
+        Pattern(["NOP"])
+    with pytest.raises(ValueError):
+        Pattern([Step("NOP", capture="a"), Step("NOP", capture="a")])
+    pattern = Pattern([Step("NOP", capture="a"), Step("POP_TOP"), Step("NOP", capture="b")])
+    assert pattern.captures == ("a", "b")
+    assert len(pattern.steps) == 3
+
+
+def test_matches_are_leftmost_and_non_overlapping():
+    bc = _bc("NOP", "NOP", "NOP", "POP_TOP", "NOP", "NOP")
+    matches = bc.find_pattern(Pattern([Step("NOP"), Step("NOP")]))
+    assert [(m.start, m.end) for m in matches] == [(0, 2), (4, 6)]
+
+
+def test_repetition_is_greedy_and_backtracks():
+    bc = _bc("NOP", "NOP", "NOP", "POP_TOP")
+    # NOP* NOP has to give the last NOP back to the second step.
+    (m,) = bc.find_pattern(
+        Pattern([Step("NOP", min_count=0, max_count=None, capture="run"), Step("NOP"), Step("POP_TOP")])
+    )
+    assert (m.start, m.end) == (0, 4)
+    assert m.captures == {"run": (0, 2)}
+
+    (m,) = bc.find_pattern(Pattern([Step("NOP", min_count=1, max_count=2, capture="run"), Step("POP_TOP")]))
+    assert (m.start, m.end) == (1, 4)
+    assert m.captures == {"run": (1, 3)}
+
+
+def test_zero_repetitions_capture_an_empty_span():
+    bc = _bc("POP_TOP", "NOP")
+    (m,) = bc.find_pattern(Pattern([Step("POP_TOP"), Step("UNARY_NOT", min_count=0, capture="opt"), Step("NOP")]))
+    assert m.captures == {"opt": (1, 1)}
+
+
+def test_unlabeled_rejects_jump_targets():
+    bc = _bc("NOP", "NOP", "POP_TOP")
+    pattern = Pattern([Step("NOP", unlabeled=True), Step("POP_TOP")])
+    assert [(m.start, m.end) for m in bc.find_pattern(pattern)] == [(1, 3)]
+    bc.instrs[1].labels = [bc.new_label()]
+    assert bc.find_pattern(pattern) == []
+    # Without the constraint the labeled instruction matches.
+    assert len(bc.find_pattern(Pattern([Step("NOP"), Step("POP_TOP")]))) == 1
+
+
+def test_call_sites_in_real_code():
+    def f(a):
+        x = len(a)
+        return print(x, a, 1)
+
+    load_global = dis.opmap["LOAD_GLOBAL"]
+    simple = [name for name in ("LOAD_FAST", "LOAD_CONST", "LOAD_FAST_LOAD_FAST") if name in dis.opmap]
+    call = "CALL" if "CALL" in dis.opmap else "CALL_FUNCTION"
+    pattern = Pattern(
+        [
+            Step(load_global, capture="func"),
+            Step(simple, min_count=0, max_count=None, unlabeled=True, capture="args"),
+            *([Step("PRECALL")] if "PRECALL" in dis.opmap else []),
+            Step(call),
+        ]
+    )
+    bc = Bytecode.from_code(f.__code__)
+    matches = bc.find_pattern(pattern)
+    names = [bc.instrs[m.start].arg for m in matches]
+    assert len(matches) == 2
+    for m in matches:
+        assert bc.instrs[m.start].op == load_global
+        assert dis.opname[bc.instrs[m.end - 1].op] == call
+        start, end = m.captures["args"]
+        assert start == m.start + 1 and end <= m.end
+    assert names[0] != names[1]
+
+
+def test_lazy_decode_matches_eager():
+    def f(a):
+        return [len(a), len(a)]
+
+    pattern = Pattern([Step("LOAD_GLOBAL"), Step(None, max_count=None), Step("BUILD_LIST")])
+    eager = Bytecode.from_code(f.__code__).find_pattern(pattern)
+    assert Bytecode.from_code(f.__code__, lazy=True).find_pattern(pattern) == eager
+    assert len(eager) == 1
+
+
+def test_overlapping_unbounded_steps_match_in_polynomial_time():
+    # Three unbounded steps over a run of NOPs that never ends in POP_TOP: a
+    # backtracking matcher that forgot its failures would try every way of
+    # splitting the run between them, from every start position.
+    bc = _bc(*["NOP"] * 400)
+    pattern = Pattern([Step("NOP", max_count=None)] * 3 + [Step("POP_TOP")])
+    start = time.perf_counter()
+    assert bc.find_pattern(pattern) == []
+    assert time.perf_counter() - start < 1.0
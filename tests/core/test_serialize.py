@@ -0,0 +1,256 @@
+"""Tests for Bytecode.to_bytes(), Bytecode.from_bytes() and pickling."""
+
+import marshal
+import pickle
+import struct
+import sys
+import types
+
+import pytest
+
+from spasm import _core
+
+Bytecode = _core.Bytecode
+ExcEntry = _core.ExcEntry
+Instr = _core.Instr
+InstrList = _core.InstrList
+Label = _core.Label
+
+
+def f(x):
+    total = 0
+    for i in range(x):
+        try:
+            total += 10 // i
+        except ZeroDivisionError:
+            continue
+    return total
+
+
+def outer(n):
+    def inner(k):
+        return [k * j for j in range(n)]
+
+    return inner(2), lambda: n
+
+
+def _same_code(a, b):
+    assert a.co_code == b.co_code
+    assert a.co_consts == b.co_consts
+    assert a.co_names == b.co_names
+    assert a.co_varnames == b.co_varnames
+    assert a.co_linetable == b.co_linetable
+    assert a.co_stacksize == b.co_stacksize
+    assert (a.co_name, a.co_qualname if sys.version_info >= (3, 11) else a.co_name) == (
+        b.co_name,
+        b.co_qualname if sys.version_info >= (3, 11) else b.co_name,
+    )
+    if sys.version_info >= (3, 11):
+        assert a.co_exceptiontable == b.co_exceptiontable
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_round_trip(lazy):
+    bc = Bytecode.from_code(f.__code__, lazy=lazy)
+    data = bc.to_bytes()
+    assert isinstance(data, bytes) and data[:4] == b"SPBC"
+    back = Bytecode.from_bytes(data)
+    assert isinstance(back.instrs, InstrList) == lazy
+    assert [(i.op, i.lineno, i.col_offset) for i in back.instrs] == [(i.op, i.lineno, i.col_offset) for i in bc.instrs]
+    _same_code(back.to_code(), bc.to_code())
+    assert types.FunctionType(back.to_code(), {})(7) == f(7)
+
+
+def test_lazy_can_be_chosen():
+    data = Bytecode.from_code(f.__code__).to_bytes()
+    assert isinstance(Bytecode.from_bytes(data, lazy=True).instrs, InstrList)
+    data = Bytecode.from_code(f.__code__, lazy=True).to_bytes()
+    assert isinstance(Bytecode.from_bytes(data, lazy=False).instrs, list)
+    assert Bytecode.from_bytes(bytearray(data)).to_bytes() == data
+    assert Bytecode.from_bytes(memoryview(data)).to_bytes() == data
+
+
+def test_symbolic_state_is_kept():
+    bc = Bytecode.from_code(f.__code__)
+    bc.instrs.insert(1, Instr("NOP", lineno=bc.instrs[1].lineno))
+    bc.instrs[1].arg = "kept as given"
+    end = bc.new_label()
+    bc.end_labels.append(end)
+    if sys.version_info >= (3, 11):
+        entry = bc.exc_entries[0]
+        bc.exc_entries.append(ExcEntry(entry.start, entry.stop, entry.handler, lasti=True))
+    back = Bytecode.from_bytes(bc.to_bytes())
+
+    assert back.instrs[1].arg == "kept as given"
+    assert [i.arg for i in back.instrs if isinstance(i.arg, Label)] == [
+        i.arg for i in bc.instrs if isinstance(i.arg, Label)
+    ]
+    assert [i.labels for i in back.instrs] == [i.labels for i in bc.instrs]
+    assert back.end_labels == [end]
+    assert [(e.start, e.stop, e.handler, e.depth, e.lasti) for e in back.exc_entries] == [
+        (e.start, e.stop, e.handler, e.depth, e.lasti) for e in bc.exc_entries
+    ]
+    # Labels are shared with the rest of the Bytecode, as decoded ones are.
+    target = next(i.arg for i in back.instrs if isinstance(i.arg, Label))
+    assert any(target in i.labels for i in back.instrs)
+    # New labels carry on from where the original's left off.
+    assert back.new_label() == bc.new_label()
+
+
+def test_metadata_is_kept():
+    bc = Bytecode.from_code(f.__code__)
+    bc.name, bc.qualname, bc.filename = "g", "h.g", "somewhere.py"
+    bc.firstlineno += 10
+    for instr in bc.instrs:
+        if instr.lineno > 0:
+            instr.lineno += 10
+            instr.end_lineno += 10
+    back = Bytecode.from_bytes(bc.to_bytes())
+    for attr in (
+        "name",
+        "qualname",
+        "filename",
+        "firstlineno",
+        "argcount",
+        "flags",
+        "consts",
+        "names",
+        "varnames",
+        "freevars",
+        "cellvars",
+    ):
+        assert getattr(back, attr) == getattr(bc, attr), attr
+    _same_code(back.to_code(), bc.to_code())
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_nested_bytecodes(lazy):
+    bc = Bytecode.from_code(outer.__code__, recursive=True, lazy=lazy)
+    back = Bytecode.from_bytes(bc.to_bytes())
+    nested = [c for c in back.consts if isinstance(c, Bytecode)]
+    assert len(nested) == 2
+    # The instruction that loads a nested Bytecode loads the one in consts.
+    loads = [i.arg for i in back.instrs if isinstance(i.arg, Bytecode)]
+    assert loads and all(any(arg is c for c in nested) for arg in loads)
+    assert isinstance(nested[0].instrs, InstrList) == lazy
+    g = types.FunctionType(back.to_code(), {"range": range})
+    assert g(3)[0] == outer(3)[0]
+    assert g(3)[1]() == 3
+
+
+def test_shared_and_cyclic_nesting():
+    bc = Bytecode.from_code(f.__code__)
+    inner = Bytecode.from_code(outer.__code__)
+    bc.consts.extend([inner, inner, bc])
+    back = Bytecode.from_bytes(bc.to_bytes())
+    assert back.consts[-3] is back.consts[-2]
+    assert back.consts[-1] is back
+    assert back.consts[-3].name == "outer"
+    bc.consts.pop()  # Bytecode isn't tracked by the GC, so the cycles are undone by hand
+    back.consts.pop()
+
+
+def test_pickle():
+    bc = Bytecode.from_code(outer.__code__, recursive=True)
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        # The data was pickled on the line itself.
+        back = pickle.loads(pickle.dumps(bc, protocol))  # noqa: S301
+        assert type(back) is Bytecode
+        _same_code(back.to_code(), bc.to_code())
+
+
+def test_unmarshallable_args_raise():
+    bc = Bytecode.from_code(f.__code__)
+    bc.instrs[1].arg = object()
+    with pytest.raises(ValueError):
+        bc.to_bytes()
+    bc.instrs[1] = "not an instr"
+    with pytest.raises(TypeError, match=r"instrs\[1\]"):
+        bc.to_bytes()
+
+
+def test_bad_data_raises():
+    data = Bytecode.from_code(f.__code__).to_bytes()
+    for bad in (
+        b"",
+        b"SPBC",
+        b"XXXX" + data[4:],
+        data[:-1],
+        data + b"\0",
+        data[:40],
+        data[:12] + struct.pack("<I", 0) + data[16:],
+    ):
+        with pytest.raises(ValueError):
+            Bytecode.from_bytes(bad)
+    with pytest.raises(ValueError, match="format version"):
+        Bytecode.from_bytes(data[:4] + struct.pack("<H", 99) + data[6:])
+    with pytest.raises(ValueError, match=r"Python 2\.7"):
+        Bytecode.from_bytes(data[:6] + struct.pack("<H", 0x0207) + data[8:])
+    # Counts larger than the data are refused before anything is allocated.
+    with pytest.raises(ValueError, match="corrupt"):
+        Bytecode.from_bytes(data[:12] + struct.pack("<I", 1 << 30) + data[16:])
+    # An empty Bytecode's instruction count, the byte after its seven meta fields.
+    empty = Bytecode().to_bytes()
+    assert Bytecode.from_bytes(empty).instrs == []
+    with pytest.raises(ValueError, match="corrupt"):
+        Bytecode.from_bytes(empty[:23] + b"\xff\xff\xff\xff\x0f" + empty[24:])
+    with pytest.raises(TypeError):
+        Bytecode.from_bytes("SPBC")
+
+
+def _with_objects(data, change):
+    """`data` with its marshalled objects, the last part, passed through change()."""
+    for k in range(len(data) - 4, 3, -1):
+        if struct.unpack("<I", data[k - 4 : k])[0] == len(data) - k:
+            # The data was made by to_bytes() just above.
+            objects = marshal.loads(data[k:])  # noqa: S302
+            change(objects)
+            packed = marshal.dumps(objects)
+            return data[: k - 4] + struct.pack("<I", len(packed)) + packed
+    raise AssertionError("no marshalled objects found")
+
+
+@pytest.mark.parametrize("where", ["names", "varnames", "freevars", "cellvars", "filename", "name", "qualname"])
+def test_objects_of_the_wrong_type_raise(where):
+    def g(x):
+        y = x
+
+        def h():
+            return len(y)
+
+        return h
+
+    data = Bytecode.from_code(g.__code__).to_bytes()
+    table = ["consts", "names", "varnames", "freevars", "cellvars", "filename", "name", "qualname"].index(where)
+
+    def setting(value):
+        def change(objects):
+            entry = objects[0]
+            if isinstance(entry[table], list):
+                entry[table].append(value)
+            else:
+                entry[table] = value
+
+        return _with_objects(data, change)
+
+    # A str is taken as it comes; anything else is refused.
+    Bytecode.from_bytes(setting("other"))
+    for value in (7, b"other", None):
+        with pytest.raises(ValueError, match="corrupt"):
+            Bytecode.from_bytes(setting(value))
+
+
+if __name__ == "__main__":
+    for lazy in (False, True):
+        test_round_trip(lazy)
+        test_nested_bytecodes(lazy)
+    test_lazy_can_be_chosen()
+    test_symbolic_state_is_kept()
+    test_metadata_is_kept()
+    test_shared_and_cyclic_nesting()
+    test_pickle()
+    test_unmarshallable_args_raise()
+    test_bad_data_raises()
+    for where in ("names", "varnames", "freevars", "cellvars", "filename", "name", "qualname"):
+        test_objects_of_the_wrong_type_raise(where)
+    print(f"All serialization tests passed (Python {sys.version})")
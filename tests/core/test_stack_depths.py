@@ -0,0 +1,167 @@
+"""Tests for Bytecode.stack_depths(): the stack depth at entry to each instruction."""
+
+import dis
+import sys
+
+from spasm import _core
+
+Bytecode = _core.Bytecode
+Instr = _core.Instr
+
+
+def f(x):
+    total = 0
+    for i in range(x):
+        try:
+            total += 10 // i
+        except ZeroDivisionError:
+            continue
+    return total
+
+
+def _effect(instr):
+    if instr.op < dis.HAVE_ARGUMENT:
+        return dis.stack_effect(instr.op)
+    return dis.stack_effect(instr.op, instr.arg if isinstance(instr.arg, int) else 0, jump=False)
+
+
+def test_straight_line_follows_stack_effects():
+    bc = Bytecode.from_code(f.__code__)
+    depths = bc.stack_depths()
+    assert depths.typecode == "i"
+    assert len(depths) == len(bc.instrs)
+    assert depths[0] == 0
+    assert max(depths) <= f.__code__.co_stacksize
+    targets = set(bc.label_positions().values())
+    for i in range(len(bc.instrs) - 1):
+        instr = bc.instrs[i]
+        name = dis.opname[instr.op]
+        if i + 1 in targets or depths[i + 1] == -1 or "JUMP" in name or name in ("FOR_ITER", "SEND"):
+            continue
+        if name in ("RETURN_VALUE", "RAISE_VARARGS", "RERAISE", "RETURN_GENERATOR", "GEN_START"):
+            continue
+        assert depths[i + 1] == depths[i] + _effect(instr), (i, instr)
+
+
+def test_handlers_start_at_their_entry_depth():
+    if sys.version_info < (3, 11):
+        return
+    bc = Bytecode.from_code(f.__code__)
+    depths = bc.stack_depths()
+    positions = bc.label_positions()
+    assert bc.exc_entries
+    for entry in bc.exc_entries:
+        assert depths[positions[entry.handler]] == entry.depth + 1 + entry.lasti
+
+
+def test_unreachable_is_minus_one():
+    bc = Bytecode()
+    bc.consts = [None]
+    bc.instrs = [
+        Instr("LOAD_CONST", None),
+        Instr("RETURN_VALUE"),
+        Instr("LOAD_CONST", None),
+        Instr("LOAD_CONST", None),
+    ]
+    assert list(bc.stack_depths()) == [0, 1, -1, -1]
+
+
+def test_generator_prologue_is_reachable():
+    # The POP_TOP after RETURN_GENERATOR runs when the generator is first
+    # resumed, on the value it was resumed with.
+    def gen():
+        yield 1
+
+    bc = Bytecode.from_code(gen.__code__)
+    depths = bc.stack_depths()
+    assert -1 not in depths
+    names = [dis.opname[instr.op] for instr in bc.instrs]
+    if "RETURN_GENERATOR" in names:
+        at = names.index("RETURN_GENERATOR")
+        assert names[at + 1] == "POP_TOP"
+        assert depths[at + 1] == depths[at] + 1
+        assert depths[at + 2] == depths[at]
+
+
+def test_cached_until_the_flow_changes():
+    bc = Bytecode.from_code(f.__code__)
+    co = bc.to_code()
+    depths = bc.stack_depths()
+    # The to_code() record is kept and answers; metadata isn't part of it.
+    assert bc.to_code() is co
+    bc.name = "renamed"
+    assert bc.stack_depths() == depths
+    # The result is a copy.
+    depths[0] = 99
+    assert bc.stack_depths()[0] == 0
+
+    bc.instrs.insert(1, Instr("NOP", lineno=bc.instrs[1].lineno))
+    moved = bc.stack_depths()
+    assert len(moved) == len(depths) + 1
+    assert bc.to_code().co_code != co.co_code
+    assert bc.stack_depths() == moved
+
+    bc.instrs[2].op = dis.opmap["NOP"]
+    assert bc.stack_depths() != moved
+
+
+def test_before_to_code():
+    for lazy in (False, True):
+        bc = Bytecode.from_code(f.__code__, lazy=lazy)
+        depths = bc.stack_depths()
+        co = bc.to_code()
+        assert co.co_stacksize == f.__code__.co_stacksize
+        assert bc.stack_depths() == depths
+        assert bc.to_code() is co
+
+
+def test_errors_are_raised():
+    bc = Bytecode()
+    bc.instrs = [Instr("JUMP_FORWARD", bc.new_label())]
+    try:
+        bc.stack_depths()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_unbounded_depths_are_rejected():
+    jump_back = "JUMP_BACKWARD" if sys.version_info >= (3, 11) else "JUMP_ABSOLUTE"
+    bc = Bytecode()
+    top = bc.new_label()
+    bc.instrs = [Instr("LOAD_CONST", None, labels=[top]), Instr(jump_back, top)]
+    for call in (bc.stack_depths, bc.to_code):
+        try:
+            call()
+        except ValueError as e:
+            assert "loop" in str(e)
+        else:
+            raise AssertionError("expected ValueError")
+
+    bc = Bytecode()
+    end = bc.new_label()
+    bc.instrs = [
+        Instr("POP_TOP"),
+        Instr("JUMP_FORWARD", end),
+        Instr("LOAD_CONST", None, labels=[end]),
+        Instr("RETURN_VALUE"),
+    ]
+    try:
+        bc.stack_depths()
+    except ValueError as e:
+        assert "underflow" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+
+if __name__ == "__main__":
+    test_straight_line_follows_stack_effects()
+    test_handlers_start_at_their_entry_depth()
+    test_unreachable_is_minus_one()
+    test_generator_prologue_is_reachable()
+    test_cached_until_the_flow_changes()
+    test_before_to_code()
+    test_errors_are_raised()
+    test_unbounded_depths_are_rejected()
+    print(f"All stack_depths tests passed (Python {sys.version})")
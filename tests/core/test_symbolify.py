@@ -193,6 +193,25 @@ def test_label_positions_matches_jump_targets():
             assert instr.arg in bc.instrs[target_idx].labels
 
 
+def test_jump_label_is_its_targets_label_object():
+    """A jump's Label is the very object on its target, however often it is read."""
+
+    def f(x):
+        while x:
+            x -= 1
+        return x
+
+    for lazy in (False, True):
+        bc = Bytecode.from_code(f.__code__, lazy=lazy)
+        positions = bc.label_positions()
+        jumps = [instr for instr in bc.instrs if instr.op in JUMP_OPS]
+        assert jumps
+        for instr in jumps:
+            label = instr.arg
+            assert instr.arg is label
+            assert any(lbl is label for lbl in bc.instrs[positions[label]].labels)
+
+
 def test_label_positions_after_insertion():
     """label_positions() reflects edits — it's recomputed on every call."""
 
@@ -211,6 +230,189 @@ def test_label_positions_after_insertion():
     assert after == before + 1
 
 
+def test_hand_built_label_ids_far_apart():
+    """Label ids don't have to come from new_label(), or be close together."""
+
+    def f(x):
+        if x > 0:
+            return x
+        return -x
+
+    bc = Bytecode.from_code(f.__code__)
+    renumber = {}
+    for instr in bc.instrs:
+        instr.labels = [renumber.setdefault(lbl.id, Label(-(2**31) + len(renumber) * 10**9)) for lbl in instr.labels]
+    for instr in bc.instrs:
+        if isinstance(instr.arg, Label):
+            instr.arg = renumber[instr.arg.id]
+
+    co = bc.to_code()
+    assert co.co_code == f.__code__.co_code
+    new_fn = types.FunctionType(co, f.__globals__)
+    assert new_fn(3) == 3
+    assert new_fn(-4) == 4
+
+
+def test_labels_are_shared_per_bytecode():
+    """Every occurrence of a label id in a decoded Bytecode is one object."""
+
+    def f(x):
+        for i in range(x):
+            try:
+                if i % 2:
+                    continue
+            except ValueError:
+                break
+        return x
+
+    for lazy in (False, True):
+        bc = Bytecode.from_code(f.__code__, lazy=lazy)
+        by_id = {}
+        refs = [lbl for instr in bc.instrs for lbl in instr.labels]
+        refs += [instr.arg for instr in bc.instrs if isinstance(instr.arg, Label)]
+        refs += [lbl for e in bc.exc_entries for lbl in (e.start, e.stop, e.handler)]
+        refs += list(bc.end_labels)
+        for lbl in refs:
+            assert by_id.setdefault(lbl.id, lbl) is lbl
+        for lbl in bc.label_positions():
+            assert by_id[lbl.id] is lbl
+
+
+def test_new_label_is_shared_with_label_positions():
+    def f():
+        return 1
+
+    bc = Bytecode.from_code(f.__code__)
+    lbl = bc.new_label()
+    bc.instrs[-1].labels = [lbl]
+    assert next(iter(bc.label_positions())) is lbl
+    # Hand-built Labels still compare equal by id.
+    assert Label(lbl.id) == lbl and hash(Label(lbl.id)) == hash(lbl)
+
+
+# ── Lazy decode ───────────────────────────────────────────────────────────────
+
+
+def test_lazy_from_code_round_trip():
+    def f(x):
+        total = 0
+        for i in range(x):
+            try:
+                total += 10 // i
+            except ZeroDivisionError:
+                continue
+        return total
+
+    bc = Bytecode.from_code(f.__code__, lazy=True)
+    assert isinstance(bc.instrs, _core.InstrList)
+    assert len(bc.instrs) == len(Bytecode.from_code(f.__code__).instrs)
+    assert bc.to_code().co_code == f.__code__.co_code
+
+    # Looking entries up doesn't change what gets encoded.
+    assert [instr.op for instr in bc.instrs] == list(bc.instrs.opcodes())
+    assert bc.to_code().co_code == f.__code__.co_code
+
+
+def test_lazy_instrs_are_materialised_once():
+    def f(x):
+        return x + 1
+
+    bc = Bytecode.from_code(f.__code__, lazy=True)
+    assert bc.instrs[0] is bc.instrs[0]
+    assert bc.instrs[-1] is bc.instrs[len(bc.instrs) - 1]
+    assert bc.instrs[1:3] == [bc.instrs[1], bc.instrs[2]]
+
+
+def test_lazy_edits_are_written_back():
+    def f(x):
+        return x + 1
+
+    bc = Bytecode.from_code(f.__code__, lazy=True)
+    n = len(bc.instrs)
+    bc.instrs.insert(0, Instr(NOP))
+    nop = bc.instrs.pop(0)
+    assert nop.op == NOP and len(bc.instrs) == n
+
+    bc.instrs.insert(len(bc.instrs) - 1, Instr(NOP))
+    next(instr for instr in bc.instrs if instr.arg == 1).arg = 41
+    co = bc.to_code()
+    assert dis.opmap["NOP"] in co.co_code[::2]
+    assert types.FunctionType(co, f.__globals__)(1) == 42
+
+    del bc.instrs[-2]
+    bc.instrs[:] = list(bc.instrs)
+    assert types.FunctionType(bc.to_code(), f.__globals__)(1) == 42
+
+
+def test_lazy_instrs_reject_non_instr():
+    def f():
+        pass
+
+    bc = Bytecode.from_code(f.__code__, lazy=True)
+    for mutate in (
+        lambda: bc.instrs.append(NOP),
+        lambda: bc.instrs.insert(0, None),
+        lambda: bc.instrs.__setitem__(0, "NOP"),
+        lambda: bc.instrs.extend([Instr(NOP), 1]),
+    ):
+        try:
+            mutate()
+        except TypeError:
+            pass
+        else:
+            raise AssertionError("expected TypeError")
+    assert bc.to_code().co_code == f.__code__.co_code
+
+
+def test_lazy_label_positions_without_materialising():
+    def f(x):
+        while x:
+            if x % 2:
+                x -= 3
+            x -= 1
+        return x
+
+    eager = Bytecode.from_code(f.__code__)
+    lazy = Bytecode.from_code(f.__code__, lazy=True)
+    expected = {lbl.id: i for lbl, i in eager.label_positions().items()}
+    assert {lbl.id: i for lbl, i in lazy.label_positions().items()} == expected
+    lazy.instrs.insert(0, Instr(NOP))
+    assert {lbl.id: i for lbl, i in lazy.label_positions().items()} == {k: i + 1 for k, i in expected.items()}
+
+
+def test_lazy_entries_match_eager():
+    def f(x, y):
+        total = max(
+            x,
+            y,
+        )
+        for i in range(x):
+            total += i if i % 2 else y
+        return total
+
+    def view(instr):
+        arg = instr.arg.id if isinstance(instr.arg, Label) else instr.arg
+        return (
+            instr.op,
+            arg,
+            instr.lineno,
+            instr.end_lineno,
+            instr.col_offset,
+            instr.end_col,
+            [lbl.id for lbl in instr.labels],
+        )
+
+    eager = Bytecode.from_code(f.__code__)
+    lazy = Bytecode.from_code(f.__code__, lazy=True)
+    assert [view(i) for i in lazy.instrs] == [view(i) for i in eager.instrs]
+
+    # Locations that don't fit the packed form survive a lazy copy too.
+    lazy.instrs.insert(0, Instr(NOP, 0, lineno=3, end_lineno=9, col_offset=70000, end_col=-1))
+    lazy.instrs.insert(1, Instr(NOP, 0, lineno=-1, end_lineno=-1, col_offset=-1, end_col=-1))
+    copy = lazy.copy(lazy=True)
+    assert [view(i) for i in copy.instrs] == [view(i) for i in lazy.instrs]
+
+
 if __name__ == "__main__":
     test_instr_construction()
     test_instr_with_label()
@@ -226,4 +428,13 @@ if __name__ == "__main__":
     test_new_label()
     test_label_positions_matches_jump_targets()
     test_label_positions_after_insertion()
+    test_hand_built_label_ids_far_apart()
+    test_labels_are_shared_per_bytecode()
+    test_new_label_is_shared_with_label_positions()
+    test_lazy_from_code_round_trip()
+    test_lazy_instrs_are_materialised_once()
+    test_lazy_edits_are_written_back()
+    test_lazy_instrs_reject_non_instr()
+    test_lazy_label_positions_without_materialising()
+    test_lazy_entries_match_eager()
     print(f"All mutation tests passed (Python {sys.version})")
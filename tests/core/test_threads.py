@@ -0,0 +1,269 @@
+"""Stress tests for using spasm from many threads at once.
+
+On a free-threaded build these run truly in parallel, against the per-object
+locks; with a GIL a short switch interval interleaves them as finely as it can.
+"""
+
+import dis
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from spasm import _core
+
+Bytecode = _core.Bytecode
+Instr = _core.Instr
+
+NOP = dis.opmap["NOP"]
+THREADS = 8
+ROUNDS = 200
+
+
+def f(x):
+    total = 0
+    for i in range(x):
+        try:
+            total += 10 // i
+        except ZeroDivisionError:
+            continue
+    return total
+
+
+def _run(co, *args):
+    return types.FunctionType(co, f.__globals__)(*args)
+
+
+def _long_function(n):
+    src = "def g(x):\n" + "".join(f"    x = x + {k}\n" for k in range(n)) + "    return x\n"
+    namespace = {}
+    # Too long to write out; the source is built right above.
+    exec(src, namespace)  # noqa: S102
+    return namespace["g"].__code__
+
+
+gil_only = pytest.mark.skipif(
+    not getattr(sys, "_is_gil_enabled", lambda: True)(),
+    reason="nothing to release without a GIL",
+)
+
+
+def _in_threads(work, n=THREADS):
+    """Run work(index) on n threads started together; re-raise the first failure."""
+    barrier = threading.Barrier(n)
+    errors = []
+
+    def target(k):
+        try:
+            barrier.wait()
+            work(k)
+        except BaseException as e:
+            errors.append(e)
+
+    old = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=target, args=(k,)) for k in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(old)
+    if errors:
+        raise errors[0]
+
+
+def test_assemble_on_every_thread():
+    expected = f(7)
+
+    def work(k):
+        for r in range(ROUNDS // 4):
+            bc = Bytecode.from_code(f.__code__, lazy=(k + r) % 2 == 0)
+            with bc.edit() as ed:
+                ed.insert_after(len(bc.instrs) // 2, [Instr(NOP, lineno=bc.instrs[0].lineno)])
+            co = bc.to_code()
+            assert _run(co, 7) == expected
+            assert len(bc.stack_depths()) == len(bc.instrs)
+
+    _in_threads(work)
+
+
+def test_shared_bytecode_reads():
+    bc = Bytecode.from_code(f.__code__, lazy=True)
+    code = bc.to_code().co_code
+    depths = bc.stack_depths()
+    positions = bc.label_positions()
+
+    def work(k):
+        for _ in range(ROUNDS):
+            if k % 2:
+                bc.name = f"f{k}"
+            co = bc.to_code()
+            assert co.co_code == code
+            assert bc.stack_depths() == depths
+            assert bc.label_positions() == positions
+
+    _in_threads(work)
+    assert _run(bc.to_code(), 7) == f(7)
+
+
+def test_shared_lazy_instrs_materialize_once():
+    bc = Bytecode.from_code(f.__code__, lazy=True)
+    instrs = bc.instrs
+    seen = [[None] * len(instrs) for _ in range(THREADS)]
+
+    def work(k):
+        n = len(instrs)
+        # Every thread visits every entry, each starting somewhere else.
+        for i in range(n):
+            j = (i + k * n // THREADS) % n
+            seen[k][j] = instrs[j]
+
+    _in_threads(work)
+    for row in seen[1:]:
+        assert all(a is b for a, b in zip(row, seen[0], strict=True))
+    # Every thread got the same Label objects out of the shared cache.
+    for label, index in bc.label_positions().items():
+        assert any(lbl is label for lbl in instrs[index].labels)
+
+
+def test_concurrent_instr_mutation():
+    bc = Bytecode.from_code(f.__code__)
+    instr = bc.instrs[-1]
+    co = bc.to_code()
+
+    def work(_k):
+        for _ in range(ROUNDS):
+            instr.lineno = instr.lineno
+            repr(instr)
+            instr.labels = list(instr.labels)
+
+    _in_threads(work)
+    # Each setter moved the stamp on, so the cached code isn't handed back.
+    assert bc.to_code() is not co
+    assert _run(bc.to_code(), 7) == f(7)
+
+
+def test_shared_instrlist_mutation():
+    bc = Bytecode.from_code(f.__code__, lazy=True)
+    n = len(bc.instrs)
+
+    def work(_k):
+        for _ in range(ROUNDS):
+            bc.instrs.append(Instr(NOP))
+            bc.instrs.pop()
+            bc.instrs.opcodes()
+
+    _in_threads(work)
+    assert len(bc.instrs) == n
+    assert _run(bc.to_code(), 7) == f(7)
+
+
+def _nested_function(n):
+    """_long_function(n), defined inside another function."""
+    body = "".join(f"        x = x + {k}\n" for k in range(n))
+    src = "def outer(x):\n    def g(x):\n" + body + "        return x\n    return g(x)\n"
+    namespace = {}
+    exec(src, namespace)  # noqa: S102
+    return namespace["outer"].__code__
+
+
+def test_shared_nested_bytecode_first_to_code():
+    # Building the long nested code lets go of the GIL, so the other threads
+    # get into to_code() on the same outer Bytecode meanwhile, each about to
+    # try handing back the decoded code object.
+    co = _nested_function(400)
+    expected = _run(co, 1)
+
+    for _ in range(ROUNDS // 10):
+        bc = Bytecode.from_code(co, recursive=True)
+        bc.name = "renamed"  # so the first to_code() goes through code.replace()
+
+        def work(_k, bc=bc):
+            built = bc.to_code()
+            assert built.co_name == "renamed"
+            assert _run(built, 1) == expected
+
+        _in_threads(work)
+
+
+@gil_only
+def test_large_encodings_release_the_gil():
+    # With a switch interval longer than the test, the ticking thread only
+    # gets the GIL when it is let go of, and it lets go after every tick.
+    ticks = 0
+    stop = threading.Event()
+
+    def tick():
+        nonlocal ticks
+        while not stop.is_set():
+            ticks += 1
+            time.sleep(0)
+
+    def ticks_during(bc):
+        before = ticks
+        co = bc.to_code()
+        return ticks - before, co
+
+    small = Bytecode.from_code(_long_function(20))
+    large = [Bytecode.from_code(_long_function(5000)) for _ in range(5)]
+    interval = sys.getswitchinterval()
+    thread = threading.Thread(target=tick)
+    sys.setswitchinterval(1000)
+    try:
+        thread.start()
+        while not ticks:
+            time.sleep(0.001)
+        n, co = ticks_during(small)
+        assert n == 0
+        assert _run(co, 1) == _run(_long_function(20), 1)
+        # Each encode lets go of the GIL, but the ticking thread has to be
+        # woken in time to take it; one of a few is plenty.
+        assert any(ticks_during(bc)[0] for bc in large)
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+
+
+class _Touch:
+    """A constant whose hash changes an instruction: to_code() hashes it
+    after taking down what it encodes, as another thread could while the GIL
+    is released."""
+
+    def __init__(self, instr):
+        self.instr = instr
+
+    def __hash__(self):
+        self.instr.lineno = self.instr.lineno
+        return 0
+
+
+@gil_only
+def test_changes_while_encoding_are_caught():
+    co = _long_function(400)
+    bc = Bytecode.from_code(co)
+    const = next(instr for instr in bc.instrs if dis.opname[instr.op] == "LOAD_CONST")
+    value = const.arg
+    const.arg = _Touch(bc.instrs[2])
+    with pytest.raises(RuntimeError, match="changed while to_code"):
+        bc.to_code()
+    # Nothing was cached from an encoding that raced with a change.
+    const.arg = value
+    assert bc.to_code().co_code == co.co_code
+    assert bc.to_code() is bc.to_code()
+
+
+if __name__ == "__main__":
+    test_assemble_on_every_thread()
+    test_shared_bytecode_reads()
+    test_shared_lazy_instrs_materialize_once()
+    test_concurrent_instr_mutation()
+    test_shared_instrlist_mutation()
+    test_shared_nested_bytecode_first_to_code()
+    test_large_encodings_release_the_gil()
+    test_changes_while_encoding_are_caught()
+    print(f"All thread tests passed (Python {sys.version})")
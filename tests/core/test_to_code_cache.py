@@ -0,0 +1,235 @@
+"""Tests for the to_code() result cache: an unchanged Bytecode hands back the
+same code object, and every kind of edit is seen by the next call."""
+
+import dis
+import sys
+import types
+
+import pytest
+
+from spasm import _core
+
+Bytecode = _core.Bytecode
+Instr = _core.Instr
+Label = _core.Label
+
+NOP = dis.opmap["NOP"]
+
+
+def f(x):
+    total = 0
+    for i in range(x):
+        try:
+            total += 10 // i
+        except ZeroDivisionError:
+            continue
+    return total
+
+
+def _run(co, *args):
+    return types.FunctionType(co, f.__globals__)(*args)
+
+
+def test_unchanged_returns_same_code():
+    for lazy in (False, True):
+        bc = Bytecode.from_code(f.__code__, lazy=lazy)
+        co = bc.to_code()
+        assert bc.to_code() is co
+        # Reading doesn't count as a change.
+        _ = [(instr.op, instr.arg, instr.lineno) for instr in bc.instrs]
+        _ = bc.consts, bc.names, bc.varnames, bc.exc_entries
+        assert bc.to_code() is co
+
+
+def test_instr_setters_invalidate():
+    bc = Bytecode.from_code(f.__code__)
+    co = bc.to_code()
+    load = next(instr for instr in bc.instrs if instr.arg == 10)
+    load.arg = 20
+    co2 = bc.to_code()
+    assert co2 is not co
+    assert _run(co2, 3) == _run(co, 3) * 2
+
+    load.lineno = load.lineno + 1
+    co3 = bc.to_code()
+    assert co3 is not co2 and co3.co_code == co2.co_code
+    assert list(co3.co_lines()) != list(co2.co_lines())
+
+
+def test_list_edits_invalidate():
+    for lazy in (False, True):
+        bc = Bytecode.from_code(f.__code__, lazy=lazy)
+        co = bc.to_code()
+        bc.instrs.insert(1, Instr(NOP))
+        co2 = bc.to_code()
+        assert co2 is not co and len(co2.co_code) == len(co.co_code) + 2
+        del bc.instrs[1]
+        assert bc.to_code().co_code == co.co_code
+
+
+def test_lazy_entries_materialised_after_caching():
+    bc = Bytecode.from_code(f.__code__, lazy=True)
+    co = bc.to_code()
+    instr = bc.instrs[len(bc.instrs) // 2]
+    assert bc.to_code() is co
+    instr.lineno += 100
+    assert bc.to_code() is not co
+
+
+def test_replacing_instrs():
+    bc = Bytecode.from_code(f.__code__)
+    co = bc.to_code()
+    bc.instrs = list(bc.instrs)
+    # A new list holding the same, unchanged Instrs encodes the same way.
+    assert bc.to_code() is co
+    bc.instrs = [*bc.instrs[:-1], Instr(NOP), bc.instrs[-1]]
+    assert bc.to_code() is not co
+
+
+def test_labels_invalidate():
+    def g(x):
+        if x:
+            return 1
+        return 2
+
+    bc = Bytecode.from_code(g.__code__)
+    co = bc.to_code()
+    i = next(i for i, instr in enumerate(bc.instrs) if instr.labels)
+    target, before = bc.instrs[i], bc.instrs[i - 1]
+    # In-place edits to a labels list go through no setter at all. The label
+    # moves back one instruction: on 3.12+ the target is already the last one.
+    lbl = target.labels.pop()
+    before.labels.append(lbl)
+    co2 = bc.to_code()
+    assert co2 is not co and co2.co_code != co.co_code
+    before.labels.remove(lbl)
+    target.labels.append(lbl)
+    assert bc.to_code().co_code == co.co_code
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_labels_held_across_to_code(lazy):
+    def g(x):
+        if x:
+            return 1
+        return 2
+
+    bc = Bytecode.from_code(g.__code__, lazy=lazy)
+    i = next(i for i, instr in enumerate(bc.instrs) if instr.labels)
+    target_labels, before_labels = bc.instrs[i].labels, bc.instrs[i - 1].labels
+    co = bc.to_code()
+    # Both lists were fetched before the last to_code(), so editing them now
+    # leaves no trace on their Instrs.
+    before_labels.append(target_labels.pop())
+    co2 = bc.to_code()
+    assert co2 is not co and co2.co_code != co.co_code
+    target_labels.append(before_labels.pop())
+    assert bc.to_code().co_code == co.co_code
+
+
+def test_exc_entry_edit_invalidates():
+    if sys.version_info < (3, 11):
+        return
+    bc = Bytecode.from_code(f.__code__)
+    co = bc.to_code()
+    entry = bc.exc_entries[0]
+    entry.lasti = not entry.lasti
+    co2 = bc.to_code()
+    assert co2 is not co and co2.co_exceptiontable != co.co_exceptiontable
+    entry.lasti = not entry.lasti
+    assert bc.to_code().co_exceptiontable == co.co_exceptiontable
+
+
+def test_metadata_only_edits_reuse_encoding():
+    bc = Bytecode.from_code(f.__code__)
+    co = bc.to_code()
+    bc.name = "renamed"
+    bc.qualname = "Outer.renamed"
+    bc.filename = "<other>"
+    co2 = bc.to_code()
+    assert co2 is not co
+    assert (co2.co_name, co2.co_filename) == ("renamed", "<other>")
+    assert co2.co_code == co.co_code
+    assert bc.to_code() is co2
+
+    idx = bc.add_const("unused")
+    co3 = bc.to_code()
+    assert co3.co_consts[idx] == "unused" and co3.co_code == co.co_code
+    assert _run(co3, 4) == f(4)
+
+
+def test_table_edits_invalidate():
+    bc = Bytecode.from_code(f.__code__)
+    co = bc.to_code()
+    consts = bc.consts
+    consts.insert(0, "shifted")
+    co2 = bc.to_code()
+    assert co2.co_consts[0] == "shifted"
+    assert _run(co2, 4) == f(4)
+
+    bc.firstlineno += 10
+    co3 = bc.to_code()
+    assert co3.co_firstlineno == co.co_firstlineno + 10
+    assert co3.co_code == co2.co_code
+
+
+def test_metadata_only_edits_after_decode_pass_through():
+    for lazy in (False, True):
+        bc = Bytecode.from_code(f.__code__, lazy=lazy)
+        bc.name = "renamed"
+        bc.qualname = "Outer.renamed"
+        idx = bc.add_const("unused")
+        co = bc.to_code()
+        # Rebuilt with code.replace(): the tables are the decoded code's own.
+        assert co.co_linetable is f.__code__.co_linetable
+        assert co.co_code == f.__code__.co_code
+        assert (co.co_name, co.co_consts[idx]) == ("renamed", "unused")
+        if sys.version_info >= (3, 11):
+            assert co.co_exceptiontable is f.__code__.co_exceptiontable
+            assert co.co_qualname == "Outer.renamed"
+        assert _run(co, 4) == f(4)
+        assert bc.to_code() is co
+
+        bc.name = "again"
+        co2 = bc.to_code()
+        assert co2.co_name == "again" and co2.co_linetable is f.__code__.co_linetable
+
+
+def test_decoded_code_is_encoded_when_not_passed_through():
+    # Unchanged: still encoded, so that round trips exercise the encoder.
+    co = Bytecode.from_code(f.__code__).to_code()
+    assert co.co_linetable is not f.__code__.co_linetable
+    assert co.co_code == f.__code__.co_code
+
+    for lazy in (False, True):
+        bc = Bytecode.from_code(f.__code__, lazy=lazy)
+        bc.instrs[1].lineno += 1
+        bc.name = "renamed"
+        assert bc.to_code().co_linetable != f.__code__.co_linetable
+
+        bc = Bytecode.from_code(f.__code__, lazy=lazy)
+        bc.instrs.insert(0, Instr("NOP"))
+        bc.name = "renamed"
+        co = bc.to_code()
+        assert co.co_code != f.__code__.co_code and _run(co, 4) == f(4)
+
+        # The line table is relative to firstlineno.
+        bc = Bytecode.from_code(f.__code__, lazy=lazy)
+        bc.firstlineno += 1
+        bc.name = "renamed"
+        assert bc.to_code().co_linetable is not f.__code__.co_linetable
+
+
+if __name__ == "__main__":
+    test_unchanged_returns_same_code()
+    test_instr_setters_invalidate()
+    test_list_edits_invalidate()
+    test_lazy_entries_materialised_after_caching()
+    test_replacing_instrs()
+    test_labels_invalidate()
+    test_exc_entry_edit_invalidates()
+    test_metadata_only_edits_reuse_encoding()
+    test_table_edits_invalidate()
+    test_metadata_only_edits_after_decode_pass_through()
+    test_decoded_code_is_encoded_when_not_passed_through()
+    print(f"All to_code cache tests passed (Python {sys.version})")
@@ -0,0 +1,77 @@
+import gc
+import types
+
+import pytest
+
+from spasm import cache
+from spasm._core import Bytecode
+from spasm._core import InstrList
+from spasm.cache import DecodeCache
+
+
+def _make_code(n=0):
+    src = f"def f(x):\n    for i in range(x):\n        x += i + {n}\n    return x\n"
+    ns = {}
+    exec(compile(src, "<cache>", "exec"), ns)  # noqa: S102
+    return ns["f"].__code__
+
+
+def test_hits_hand_out_independent_copies():
+    code = _make_code()
+    c = DecodeCache()
+    first = c.from_code(code)
+    first.instrs.clear()
+    second = c.from_code(code, lazy=True)
+    assert isinstance(second.instrs, InstrList)
+    assert [instr.op for instr in second.instrs] == [instr.op for instr in Bytecode.from_code(code).instrs]
+    assert types.FunctionType(second.to_code(), {})(4) == 10
+    assert code in c and len(c) == 1
+    stats = c.stats()
+    assert (stats.hits, stats.misses, stats.evictions, stats.entries) == (1, 1, 0, 1)
+    assert 0 < stats.size <= stats.max_size
+
+
+def test_lru_eviction_within_max_size():
+    codes = [_make_code(i) for i in range(4)]
+    c = DecodeCache()
+    c.from_code(codes[0])
+    one = c.stats().size
+    c.max_size = one * 2
+    c.from_code(codes[1])
+    c.from_code(codes[0])  # codes[1] is now least recently used
+    c.from_code(codes[2])
+    assert codes[0] in c and codes[2] in c and codes[1] not in c
+    assert c.stats().evictions == 1
+    c.max_size = 0
+    assert len(c) == 0 and c.stats().size == 0
+    # Nothing fits: still decodes, caches nothing.
+    assert c.from_code(codes[3]).instrs
+    assert len(c) == 0
+    with pytest.raises(ValueError):
+        DecodeCache(-1)
+
+
+def test_entries_go_away_with_their_code():
+    c = DecodeCache()
+    code = _make_code()
+    c.from_code(code)
+    assert len(c) == 1
+    del code
+    gc.collect()
+    assert len(c) == 0
+    assert c.stats().size == 0
+
+
+def test_process_wide_cache_is_opt_in():
+    code = _make_code()
+    assert cache.default() is None
+    assert cache.from_code(code).instrs
+    try:
+        c = cache.enable(max_size=1 << 20)
+        assert cache.enable() is c
+        cache.from_code(code)
+        cache.from_code(code)
+        assert c.stats().hits == 1
+    finally:
+        cache.disable()
+    assert cache.default() is None
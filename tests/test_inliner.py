@@ -96,6 +96,29 @@ def test_inline_callee_with_multiple_returns() -> None:
     assert not _has_call(compute)
 
 
+def test_inline_threads_the_jumps_it_leaves() -> None:
+    @spasm.inline
+    def compute(a, b):
+        return double(a) + double(b)
+
+    # Each return became a jump to the instruction after it, and is gone.
+    assert compute(3, 4) == 14
+    assert not any("JUMP" in instr.opname for instr in dis.get_instructions(compute))
+
+    @spasm.inline
+    def choose(x, c):
+        y = sign(x) if c else 0
+        return y
+
+    # sign's first return jumps past the else branch, not to the jump there.
+    assert [choose(5, True), choose(-5, True), choose(5, False)] == [1, -1, 0]
+    instrs = list(dis.get_instructions(choose))
+    at = {instr.offset: instr for instr in instrs}
+    assert not any(
+        "JUMP" in at[instr.argval].opname for instr in instrs if "JUMP" in instr.opname and instr.argval in at
+    )
+
+
 def test_inline_no_call_sites_returns_unchanged() -> None:
     @spasm.inline
     def plain(x):
@@ -0,0 +1,383 @@
+import dis
+import math
+import sys
+
+import pytest
+
+import spasm
+from spasm.bytecode import BinaryOp
+from spasm.bytecode import Bytecode
+from spasm.bytecode import Compare
+from spasm.bytecode import ExcEntry
+from spasm.bytecode import Instr
+from spasm.bytecode import compare_oparg
+from spasm.optimize import fold_constants
+from spasm.optimize import optimize
+from spasm.optimize import remove_nops
+from spasm.optimize import remove_unreachable
+from spasm.optimize import thread_jumps
+
+PY = sys.version_info[:2]
+
+# Opcode spellings that moved between the supported versions.
+POP_JUMP_IF_FALSE = "POP_JUMP_FORWARD_IF_FALSE" if PY == (3, 11) else "POP_JUMP_IF_FALSE"
+POP_JUMP_IF_TRUE = "POP_JUMP_FORWARD_IF_TRUE" if PY == (3, 11) else "POP_JUMP_IF_TRUE"
+JUMP_BACKWARD = "JUMP_BACKWARD" if PY >= (3, 11) else "JUMP_ABSOLUTE"
+
+
+def binary(name):
+    if PY >= (3, 11):
+        return Instr("BINARY_OP", BinaryOp[name], lineno=1)
+    return Instr("BINARY_" + name.replace("REMAINDER", "MODULO"), lineno=1)
+
+
+def to_bool():
+    # From 3.13 a conditional jump or UNARY_NOT wants a bool, which TO_BOOL makes.
+    return [Instr("TO_BOOL", lineno=1)] if PY >= (3, 13) else []
+
+
+def const(value, lineno=1):
+    return Instr("LOAD_CONST", value, lineno=lineno)
+
+
+def program(*instrs):
+    """A module-level Bytecode running ``instrs``, which return a value."""
+    prologue = [Instr("RESUME", 0, lineno=1)] if PY >= (3, 11) else []
+    return Bytecode([*prologue, *instrs])
+
+
+def run(bc):
+    return eval(bc.to_code())  # noqa: S307
+
+
+def opnames(bc):
+    return [dis.opname[instr.op] for instr in bc.instrs if dis.opname[instr.op] != "RESUME"]
+
+
+def test_fold_a_whole_expression():
+    # -(2 + 3) * 4 // 3, then in a tuple with "a" * 3
+    bc = program(
+        const(2),
+        const(3),
+        binary("ADD"),
+        Instr("UNARY_NEGATIVE", lineno=1),
+        const(4),
+        binary("MULTIPLY"),
+        const(3),
+        binary("FLOOR_DIVIDE"),
+        const("a"),
+        const(3),
+        binary("MULTIPLY"),
+        Instr("BUILD_TUPLE", 2, lineno=1),
+        Instr("RETURN_VALUE", lineno=1),
+    )
+    assert fold_constants(bc) == 6
+    assert opnames(bc) == ["LOAD_CONST", "RETURN_VALUE"]
+    assert bc.instrs[-2].arg == (-7, "aaa")
+    assert run(bc) == (-7, "aaa")
+
+
+def test_fold_comparisons_and_not():
+    bc = program(
+        const(2),
+        const(3),
+        Instr("COMPARE_OP", compare_oparg(Compare.LT), lineno=1),
+        *to_bool(),
+        Instr("UNARY_NOT", lineno=1),
+        Instr("RETURN_VALUE", lineno=1),
+    )
+    optimize(bc)
+    assert opnames(bc) == ["LOAD_CONST", "RETURN_VALUE"]
+    assert run(bc) is False
+
+
+@pytest.mark.parametrize(
+    ("left", "op", "right"),
+    [
+        (1, "TRUE_DIVIDE", 0),  # raises
+        (2, "POWER", 1000),  # too big an int
+        ("x", "MULTIPLY", 5000),  # too long a string
+        ("%s", "REMAINDER", 1),  # formatting
+        ([], "ADD", []),  # not a constant
+    ],
+)
+def test_fold_leaves_what_it_should_not_compute(left, op, right):
+    bc = program(const(left), const(right), binary(op), Instr("RETURN_VALUE", lineno=1))
+    assert fold_constants(bc) == 0
+    assert len(opnames(bc)) == 4
+
+
+def test_fold_keeps_the_sign_of_zero():
+    bc = program(
+        const(0.0),
+        Instr("UNARY_NEGATIVE", lineno=1),
+        const(0.0),
+        Instr("BUILD_TUPLE", 2, lineno=1),
+        Instr("RETURN_VALUE", lineno=1),
+    )
+    optimize(bc)
+    assert opnames(bc) == ["LOAD_CONST", "RETURN_VALUE"]
+    negative, positive = run(bc)
+    assert math.copysign(1, negative) == -1
+    assert math.copysign(1, positive) == 1
+
+
+def test_fold_stops_at_jump_targets():
+    bc = program()
+    target = bc.new_label()
+    bc.instrs += [
+        const(1),
+        const(True),
+        *to_bool(),
+        Instr(POP_JUMP_IF_FALSE, target, lineno=1),
+        const(2),
+        binary("ADD"),
+        Instr("RETURN_VALUE", lineno=1),
+    ]
+    bc.instrs[-3].labels.append(target)
+    # The branch on True goes, but 1 + 2 can't be folded, as 2 is a jump
+    # target, until nothing jumps there any more.
+    assert fold_constants(bc) == 1 + (PY >= (3, 13))
+    assert opnames(bc) == ["LOAD_CONST", "LOAD_CONST", "BINARY_OP" if PY >= (3, 11) else "BINARY_ADD", "RETURN_VALUE"]
+    assert fold_constants(bc) == 1
+    assert run(bc) == 3
+
+
+@pytest.mark.parametrize("value", [True, False])
+def test_constant_branch_is_resolved(value):
+    bc = program()
+    otherwise = bc.new_label()
+    bc.instrs += [
+        const(value),
+        *to_bool(),
+        Instr(POP_JUMP_IF_FALSE, otherwise, lineno=1),
+        const("then"),
+        Instr("RETURN_VALUE", lineno=1),
+        const("else"),
+        Instr("RETURN_VALUE", lineno=1),
+    ]
+    bc.instrs[-2].labels.append(otherwise)
+    optimize(bc)
+    # When taken, the jump goes to what is the next instruction once the code
+    # it jumped over is gone.
+    assert opnames(bc) == ["LOAD_CONST", "RETURN_VALUE"]
+    assert run(bc) == ("then" if value else "else")
+
+
+@pytest.mark.parametrize(("first", "second"), [(True, False), (False, True), (True, True), (False, False)])
+def test_constant_branches_on_stacked_constants(first, second):
+    # The second branch tests the constant pushed before the first one's, so
+    # its range takes in the first branch and whatever that folded.
+    bc = program()
+    one, two = bc.new_label(), bc.new_label()
+    bc.instrs += [
+        const(first),
+        const(second),
+        *to_bool(),
+        Instr(POP_JUMP_IF_TRUE, one, lineno=1),
+        *to_bool(),
+        Instr(POP_JUMP_IF_TRUE, two, lineno=1),
+        const("neither"),
+        Instr("RETURN_VALUE", lineno=1),
+        const("one"),
+        Instr("RETURN_VALUE", lineno=1),
+        const("two"),
+        Instr("RETURN_VALUE", lineno=1),
+    ]
+    bc.instrs[-4].labels.append(one)
+    bc.instrs[-2].labels.append(two)
+    expected = "one" if second else "two" if first else "neither"
+    assert run(bc.copy()) == expected
+    optimize(bc)
+    assert not any("JUMP" in name for name in opnames(bc))
+    assert run(bc) == expected
+
+
+def test_remove_unreachable_after_return():
+    bc = program(const(1), Instr("RETURN_VALUE", lineno=1), const(2), Instr("RETURN_VALUE", lineno=2))
+    end = bc.new_label()
+    bc.instrs[-1].labels.append(end)
+    assert remove_unreachable(bc) == 2
+    assert opnames(bc) == ["LOAD_CONST", "RETURN_VALUE"]
+    # The label of a removed instruction goes to where it would have been.
+    assert bc.end_labels == [end]
+    assert remove_unreachable(bc) == 0
+
+
+@pytest.mark.skipif(PY < (3, 11), reason="no exception table before CPython 3.11")
+def test_remove_unreachable_drops_entries_protecting_nothing():
+    bc = program(const(1), Instr("RETURN_VALUE", lineno=1))
+    start, handler = bc.new_label(), bc.new_label()
+    protected = [const(2, lineno=2), Instr("RETURN_VALUE", lineno=2)]
+    recover = [Instr("POP_TOP", lineno=3), const(3, lineno=3), Instr("RETURN_VALUE", lineno=3)]
+    protected[0].labels.append(start)
+    recover[0].labels.append(handler)
+    bc.instrs += protected + recover
+    bc.exc_entries.append(ExcEntry(start, handler, handler, depth=0))
+    # The handler's depth is explicit, so it counts as reached until the entry
+    # is gone.
+    assert remove_unreachable(bc) == 5
+    assert bc.exc_entries == []
+    assert opnames(bc) == ["LOAD_CONST", "RETURN_VALUE"]
+    assert run(bc) == 1
+
+
+@pytest.mark.skipif(PY < (3, 11), reason="no exception table before CPython 3.11")
+def test_remove_unreachable_keeps_reachable_handlers():
+    def f(x):
+        try:
+            return 1 / x
+        except ZeroDivisionError:
+            return 0
+
+    bc = Bytecode.from_code(f.__code__)
+    entries = len(bc.exc_entries)
+    optimize(bc)
+    assert len(bc.exc_entries) == entries
+    f.__code__ = bc.to_code()
+    assert (f(2), f(0)) == (0.5, 0)
+
+
+def test_generators_keep_their_prologue():
+    def gen(n):
+        yield from range(n)
+
+    bc = Bytecode.from_code(gen.__code__)
+    before = opnames(bc)
+    optimize(bc)
+    assert opnames(bc) == before
+    gen.__code__ = bc.to_code()
+    assert list(gen(3)) == [0, 1, 2]
+
+
+def test_remove_nops_keeps_line_events():
+    bc = program(
+        Instr("NOP", lineno=2),  # line 2 has nothing else: kept
+        Instr("NOP", lineno=3),  # line 3 goes on below: removed
+        const(None, lineno=3),
+        Instr("NOP", lineno=3),  # same line as before: removed
+        Instr("NOP"),  # no line at all: removed
+        Instr("RETURN_VALUE", lineno=4),
+    )
+    assert remove_nops(bc) == 3
+    assert [(name, instr.lineno) for name, instr in zip(opnames(bc), bc.instrs[-3:], strict=True)] == [
+        ("NOP", 2),
+        ("LOAD_CONST", 3),
+        ("RETURN_VALUE", 4),
+    ]
+
+
+def test_remove_nops_keeps_a_jump_target_line():
+    bc = program(const(True), *to_bool())
+    loop = bc.new_label()
+    nop = Instr("NOP", lineno=1)
+    nop.labels.append(loop)
+    bc.instrs += [Instr(POP_JUMP_IF_FALSE, loop, lineno=1), nop, const(None, lineno=2), Instr("RETURN_VALUE", lineno=2)]
+    # Jumping to the NOP is a line 1 event that the jump itself doesn't give.
+    assert remove_nops(bc) == 0
+
+
+@pytest.mark.parametrize(("hop_line", "threaded"), [(1, True), (2, False), (3, True), (-1, True)])
+def test_thread_jumps_through_a_jump(hop_line, threaded):
+    bc = program(const("x"))
+    hop, end = bc.new_label(), bc.new_label()
+    jump = Instr("JUMP_FORWARD", hop, lineno=1)
+    through = Instr("JUMP_FORWARD", end, lineno=hop_line)
+    through.labels.append(hop)
+    ret = Instr("RETURN_VALUE", lineno=3)
+    ret.labels.append(end)
+    bc.instrs += [jump, const("not", lineno=2), Instr("RETURN_VALUE", lineno=2), through, const("here", 2), ret]
+    # Skipping a jump on line 2 would lose the line 2 event it gives.
+    assert thread_jumps(bc) == threaded
+    assert jump.arg == (end if threaded else hop)
+    assert run(bc) == "x"
+
+
+def test_thread_jumps_removes_jumps_to_the_next_instruction():
+    bc = program(const("x"))
+    first, second = bc.new_label(), bc.new_label()
+    ret = Instr("RETURN_VALUE", lineno=1)
+    ret.labels.append(second)
+    # The jump on line 2 is left as a NOP for its line event.
+    bc.instrs += [Instr("JUMP_FORWARD", first, lineno=1), Instr("JUMP_FORWARD", second, lineno=2), ret]
+    bc.instrs[-2].labels.append(first)
+    assert thread_jumps(bc) == 2
+    assert [(name, instr.lineno) for name, instr in zip(opnames(bc), bc.instrs[-3:], strict=True)] == [
+        ("LOAD_CONST", 1),
+        ("NOP", 2),
+        ("RETURN_VALUE", 1),
+    ]
+    assert run(bc) == "x"
+
+
+@pytest.mark.parametrize("value", [True, False])
+def test_thread_jumps_inverts_a_branch_over_a_jump(value):
+    bc = program(const(value), *to_bool())
+    otherwise, then = bc.new_label(), bc.new_label()
+    bc.instrs += [
+        Instr(POP_JUMP_IF_FALSE, otherwise, lineno=1),
+        Instr("JUMP_FORWARD", then, lineno=1),
+        const("else"),
+        Instr("RETURN_VALUE", lineno=1),
+        const("then"),
+        Instr("RETURN_VALUE", lineno=1),
+    ]
+    bc.instrs[-4].labels.append(otherwise)
+    bc.instrs[-2].labels.append(then)
+    assert thread_jumps(bc) == 1
+    assert opnames(bc)[-5:] == [POP_JUMP_IF_TRUE, "LOAD_CONST", "RETURN_VALUE", "LOAD_CONST", "RETURN_VALUE"]
+    assert bc.instrs[-5].arg == then
+    assert run(bc) == ("then" if value else "else")
+
+
+def test_thread_jumps_inverts_backward_only_where_it_can():
+    bc = program()
+    top, out = bc.new_label(), bc.new_label()
+    bc.instrs += [const(False), *to_bool()]
+    bc.instrs[-1 - len(to_bool())].labels.append(top)
+    branch = Instr(POP_JUMP_IF_FALSE, out, lineno=1)
+    bc.instrs += [branch, Instr(JUMP_BACKWARD, top, lineno=1), const(None), Instr("RETURN_VALUE", lineno=1)]
+    bc.instrs[-2].labels.append(out)
+    # 3.11 has a backward conditional jump, and 3.10's are absolute. From
+    # 3.12 conditional jumps only go forward, so the loop stays as it is.
+    assert thread_jumps(bc) == (PY < (3, 12))
+    if PY < (3, 12):
+        assert dis.opname[branch.op] == ("POP_JUMP_BACKWARD_IF_TRUE" if PY == (3, 11) else "POP_JUMP_IF_TRUE")
+        assert branch.arg == top
+    assert run(bc) is None
+
+
+def sign(x):
+    if x > 0:
+        return 1
+    return -1
+
+
+def test_optimize_after_inline():
+    @spasm.inline
+    def f():
+        return sign(5)
+
+    bc = Bytecode.from_code(f.__code__)
+    size = len(bc.instrs)
+    optimize(bc)
+    assert len(bc.instrs) < size
+    assert not any(dis.opname[instr.op] == "COMPARE_OP" for instr in bc.instrs)
+    f.__code__ = bc.to_code()
+    assert f() == 1
+
+
+def test_optimize_nested_code():
+    def outer():
+        def inner():
+            return 1
+            return 2
+
+        return inner
+
+    bc = Bytecode.from_code(outer.__code__, recursive=True)
+    assert optimize(bc) is bc
+    inner = next(c for c in bc.consts if isinstance(c, Bytecode))
+    assert 2 not in [instr.arg for instr in inner.instrs]
+    outer.__code__ = bc.to_code()
+    assert outer()() == 1